@@ -0,0 +1,72 @@
+"""
+Retrieval Evaluation Script
+Sweeps CHUNK_SIZE, OVERLAP and TOP_K against a labeled question set
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.document_processor import DocumentProcessor
+from src.services.evaluation import RetrievalEvaluator, load_documents, load_labeled_set, recommend
+from src.services.vector_store import QUANTIZATIONS
+from src.config.settings import CHUNK_SIZE, OVERLAP, TOP_K, VECTOR_QUANTIZATION, DATA_FOLDER
+
+
+def print_rows(rows):
+    """Print result rows as table lines"""
+    for row in rows:
+        print(f"{row['chunk_size']:>6}{row['overlap']:>8}{row['top_k']:>6}{row['chunks']:>8}"
+              f"{row['index_bytes'] / 1024:>9.0f}{row['ingest_seconds']:>9.1f}"
+              f"{row['recall_at_k']:>8.3f}{row['mrr']:>7.3f}"
+              f"{row['search_ms_p50']:>8.2f}{row['search_ms_p95']:>8.2f}")
+
+
+def main():
+    """Build a local index per chunking setting and compare retrieval quality and cost"""
+    parser = argparse.ArgumentParser(description="Evaluate retrieval settings on labeled questions")
+    parser.add_argument("labels", help='JSONL of {"question", "expected", "company"?} lines')
+    parser.add_argument("--chunk-sizes", nargs="+", type=int, default=[CHUNK_SIZE])
+    parser.add_argument("--overlaps", nargs="+", type=int, default=[OVERLAP])
+    parser.add_argument("--top-k", nargs="+", type=int, default=[1, TOP_K, 5])
+    parser.add_argument("--quantization", default=VECTOR_QUANTIZATION, choices=QUANTIZATIONS)
+    parser.add_argument("--companies", nargs="+", metavar="COMPANY",
+                        help="Restrict the corpus to these companies")
+    parser.add_argument("--pdf-folder", default=DATA_FOLDER,
+                        help="PDFs extracted when not in the text cache")
+    args = parser.parse_args()
+
+    questions = load_labeled_set(args.labels)
+    processor = DocumentProcessor()
+    print("[*] Loading documents...")
+    documents = load_documents(processor, args.companies, args.pdf_folder)
+    if not documents:
+        print("[x] No documents found in the text cache or PDF folder")
+        return
+
+    print(f"[✓] {len(documents)} companies, {len(questions)} labeled questions\n")
+    print("=" * 72)
+    print(f"{'chunk':>6}{'overlap':>8}{'top_k':>6}{'chunks':>8}{'index KB':>9}{'ingest s':>9}"
+          f"{'recall':>8}{'MRR':>7}{'p50 ms':>8}{'p95 ms':>8}")
+    print("-" * 72)
+
+    evaluator = RetrievalEvaluator(processor, documents, questions, args.quantization)
+    rows = evaluator.sweep(sorted(set(args.chunk_sizes)), sorted(set(args.overlaps)),
+                           sorted(set(args.top_k)), progress_callback=print_rows)
+    print("=" * 72)
+    if evaluator.query_embed_ms is not None:
+        print(f"Query embedding: {evaluator.query_embed_ms:.1f} ms/question "
+              f"(independent of the settings above)")
+
+    best = recommend(rows)
+    if best:
+        print(f"\n[✓] Cheapest setting within tolerance of the best recall: "
+              f"CHUNK_SIZE={best['chunk_size']}, OVERLAP={best['overlap']}, "
+              f"TOP_K={best['top_k']} (recall@k {best['recall_at_k']:.3f}, MRR {best['mrr']:.3f})")
+
+
+if __name__ == "__main__":
+    main()
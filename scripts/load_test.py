@@ -0,0 +1,161 @@
+"""
+Load Test Script
+Replays questions against the ask pipeline with concurrent simulated users
+(in-process with real or stubbed backends, or against a running query server)
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.settings import LOAD_TEST_CONCURRENCY, LOAD_TEST_STUB_LATENCY_MS
+from src.services.batch_qa import load_questions
+from src.services.load_test import (
+    LoadGenerator,
+    ResourceSampler,
+    local_ask,
+    server_ask,
+    stub_services
+)
+
+# Used when no --questions file is given
+DEFAULT_QUESTIONS = [
+    "What are the carbon emission reduction targets?",
+    "How much of the electricity consumed comes from renewable sources?",
+    "What water conservation measures are reported?",
+    "How does the company manage waste and recycling?",
+    "What is the gender diversity of the workforce?",
+    "What health and safety incidents were reported?",
+    "How is the board's ESG oversight structured?",
+    "What community development programmes are funded?"
+]
+
+
+def build_ask(args):
+    """Pick the ask callable and the process whose CPU / RSS are sampled"""
+    if args.server is not None:
+        from src.services.query_server import QueryClient
+        return server_ask(QueryClient(args.server or None)), args.server_pid
+
+    if args.stub:
+        latency = {
+            "encoder": args.encoder_ms,
+            "vector_query": args.vector_ms,
+            "llm": args.llm_ms
+        }
+        search_service, qa_service = stub_services(latency, cache=not args.no_cache)
+    else:
+        from src.services.qa_service import QAService
+        from src.services.search_cache import SearchResultCache
+        from src.services.search_service import SearchService
+        search_service = SearchService(cache=SearchResultCache(0) if args.no_cache else None)
+        qa_service = QAService()
+        print("[*] Loading the embedding model and connecting (not counted in the results)...")
+        search_service.model
+        if search_service.local_store is None:
+            search_service.index
+        qa_service.client
+    return local_ask(search_service, qa_service), None
+
+
+def print_report(report):
+    """Print throughput, latency percentiles, errors and resource usage"""
+    rate = f", {report['rate']:g} req/s offered" if report["rate"] else ""
+    print("\n" + "=" * 60)
+    print(f"LOAD TEST RESULTS ({report['mode']}, concurrency {report['concurrency']}{rate})")
+    print("=" * 60)
+    print(f"Requests: {report['requests']} in {report['seconds']:.1f}s  "
+          f"(ok {report['ok']}, degraded {report['degraded']}, busy {report['busy']}, "
+          f"errors {report['error']})")
+    print(f"Throughput: {report['throughput_rps']:.2f} answers/s  "
+          f"Error rate: {report['error_rate']:.1%}")
+
+    print(f"\n{'stage':<10}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for stage, stats in report["latency_ms"].items():
+        print(f"{stage:<10}{stats['count']:>7}{stats['mean']:>10.0f}{stats['p50']:>10.0f}"
+              f"{stats['p95']:>10.0f}{stats['p99']:>10.0f}{stats['max']:>10.0f}")
+
+    for error, count in report["errors_by_type"].items():
+        print(f"[!] {error}: {count}")
+
+    resources = report["resources"]
+    if resources["avg_cpu_percent"] is not None:
+        print(f"\nCPU: avg {resources['avg_cpu_percent']:.0f}%, "
+              f"peak {resources['peak_cpu_percent']:.0f}%  "
+              f"RSS peak: {resources['peak_rss_mb'] or 'n/a'} MB")
+    print("=" * 60)
+
+
+def main():
+    """Run a load test and print (and optionally save) the report"""
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the ask pipeline")
+    parser.add_argument("--questions", metavar="JSONL",
+                        help="Question corpus (batch QA format; built-in sample if omitted)")
+    parser.add_argument("--concurrency", type=int, default=LOAD_TEST_CONCURRENCY,
+                        help="Simulated users, or maximum requests in flight with --rate "
+                             f"(default: {LOAD_TEST_CONCURRENCY})")
+    parser.add_argument("--rate", type=float, metavar="RPS",
+                        help="Open-loop mode: average arrivals per second (Poisson)")
+    parser.add_argument("--requests", type=int, help="Requests to send (default: one pass)")
+    parser.add_argument("--duration", type=float, metavar="SECONDS",
+                        help="Keep sending for this long instead of a fixed request count")
+    parser.add_argument("--server", nargs="?", const="", metavar="URL",
+                        help="Send questions to a running query server")
+    parser.add_argument("--server-pid", type=int,
+                        help="Sample CPU / RSS of the server process (Linux) instead of this one")
+    parser.add_argument("--stub", action="store_true",
+                        help="Simulate the embedding model, index and LLM (no model, no network)")
+    parser.add_argument("--encoder-ms", type=float, default=LOAD_TEST_STUB_LATENCY_MS["encoder"],
+                        help="Stubbed CPU time per query embedding")
+    parser.add_argument("--vector-ms", type=float,
+                        default=LOAD_TEST_STUB_LATENCY_MS["vector_query"],
+                        help="Stubbed latency per index query")
+    parser.add_argument("--llm-ms", type=float, default=LOAD_TEST_STUB_LATENCY_MS["llm"],
+                        help="Stubbed latency per answer")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the search result cache (every request searches)")
+    parser.add_argument("--output", metavar="JSON", help="Write the full report, with samples")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ESG ASK PIPELINE LOAD TEST")
+    print("=" * 60)
+    try:
+        questions = load_questions(args.questions) if args.questions else [
+            {"id": f"sample-{i}", "question": q, "company": None, "companies": None}
+            for i, q in enumerate(DEFAULT_QUESTIONS, 1)
+        ]
+    except (OSError, ValueError) as e:
+        print(f"[x] {e}")
+        return
+
+    ask, pid = build_ask(args)
+    generator = LoadGenerator(ask, questions, concurrency=args.concurrency, rate=args.rate,
+                              sampler=ResourceSampler(pid))
+
+    def report_progress(done, record):
+        if done % 10 == 0:
+            print(f"  {done} requests done (last: {record['outcome']}, "
+                  f"{record['stages']['total']:.2f}s)")
+
+    backend = "server" if args.server is not None else ("stubbed" if args.stub else "in-process")
+    print(f"[*] Replaying {len(questions)} questions against the {backend} pipeline...")
+    try:
+        report = generator.run(args.requests, args.duration, progress_callback=report_progress)
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted.")
+        return
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[✓] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Index Migration Script
+Re-embeds every stored company into a new index generation (e.g. for a new
+embedding model) while queries keep using the active one, then switches
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.index_generations import IndexMigrator
+
+
+def print_status(migrator):
+    """Print every generation with its build progress"""
+    active_id = migrator.registry.active_id()
+    previous = migrator.registry.previous()
+    print(f"{'':2}{'id':<9}{'status':<10}{'companies':>10}{'chunks':>9}  index / model")
+    for generation in migrator.registry.list():
+        marker = "*" if generation["id"] == active_id else (
+            "<" if previous and generation["id"] == previous["id"] else " ")
+        # The manifest records what the active generation stores
+        companies = generation.get("companies", {})
+        if generation["id"] == active_id:
+            companies = migrator.manifest.get_companies()
+        progress = f"{len(companies)}/{generation.get('total') or len(companies)}"
+        chunks = sum(entry.get("chunks") or 0 for entry in companies.values())
+        print(f"{marker:<2}{generation['id']:<9}{generation['status']:<10}{progress:>10}{chunks:>9}"
+              f"  {generation['index_name']} / {generation['embedding_model']}")
+        if generation.get("error"):
+            print(f"{'':11}error: {generation['error']}")
+    print("\n  * active   < rollback target")
+
+
+def build(migrator, generation_id, switch):
+    """Build a generation and optionally switch to it"""
+    def report(company_name, done, total):
+        print(f"  [{done}/{total}] {company_name}")
+
+    print(f"[*] Building generation {generation_id} (queries keep using the active index)...")
+    success, message = migrator.build(generation_id, progress_callback=report)
+    print(f"[{'✓' if success else 'x'}] {message}")
+    if success and switch:
+        success, message = migrator.activate(generation_id)
+        print(f"[{'✓' if success else 'x'}] {message}")
+    elif success:
+        print(f"[i] Switch with: python scripts/migrate_index.py --activate {generation_id}")
+    else:
+        print(f"[i] Resume with: python scripts/migrate_index.py --resume {generation_id}")
+
+
+def main():
+    """Start, resume, switch or roll back index generations"""
+    parser = argparse.ArgumentParser(description="Blue/green re-embedding into a new index generation")
+    actions = parser.add_mutually_exclusive_group()
+    actions.add_argument("--start", metavar="EMBEDDING_MODEL",
+                         help="Create a generation using this model and build it from cached page text")
+    actions.add_argument("--resume", metavar="GENERATION", help="Continue an interrupted or failed build")
+    actions.add_argument("--activate", metavar="GENERATION", help="Switch queries to a ready generation")
+    actions.add_argument("--rollback", action="store_true",
+                         help="Switch back to the previously active generation")
+    parser.add_argument("--index-name", help="Pinecone index for --start (default: <INDEX_NAME>-<id>)")
+    parser.add_argument("--no-switch", action="store_true",
+                        help="Leave the built generation inactive (switch later with --activate)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ESG INDEX MIGRATION")
+    print("=" * 60)
+    migrator = IndexMigrator()
+
+    if args.start:
+        generation = migrator.start(args.start, args.index_name)
+        print(f"[✓] Created generation {generation['id']}: {generation['index_name']} "
+              f"({generation['dimension']} dimensions)")
+        build(migrator, generation["id"], not args.no_switch)
+    elif args.resume:
+        build(migrator, args.resume, not args.no_switch)
+    elif args.activate:
+        success, message = migrator.activate(args.activate)
+        print(f"[{'✓' if success else 'x'}] {message}")
+    elif args.rollback:
+        success, message = migrator.rollback()
+        print(f"[{'✓' if success else 'x'}] {message}")
+    else:
+        print_status(migrator)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,30 +3,73 @@ Process Documents Script
 Standalone script for bulk processing PDF documents into the vector database
 """
 
+import argparse
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Now we can import from src
-from src.services.document_processor import DocumentProcessor
-from src.config.settings import DATA_FOLDER
+# Now we can import from src (heavy libraries are imported on first use)
+from src.utils.startup_profiler import get_startup_profiler, timed
 
+with timed("import services", "import"):
+    from src.services.document_processor import DocumentProcessor
+    from src.utils.memory import MemoryReport
+    from src.config.settings import DATA_FOLDER, PROFILE_DIR
 
-def main():
-    """Main function to process all PDFs in data folder"""
-    print("=" * 60)
-    print("ESG DOCUMENT PROCESSING SCRIPT")
-    print("=" * 60)
-    print(f"\n[*] Initializing document processor...")
+
+def reprocess_cached(processor):
+    """Re-chunk and re-embed every ingested company from cached page text"""
+    companies = sorted(processor.manifest.get_companies())
+    print(f"[*] Re-processing {len(companies)} companies from the text cache...\n")
     
-    processor = DocumentProcessor()
+    failed = 0
+    for company_name in companies:
+        success, message = processor.reprocess_from_cache(company_name)
+        print(f"  [{'✓' if success else 'x'}] {message}")
+        failed += 0 if success else 1
     
+    print("\n" + "=" * 60)
+    print(f"Re-processed: {len(companies) - failed}, failed: {failed}")
+    print("=" * 60)
+
+
+def list_stored(processor):
+    """Print the companies stored in the vector database"""
+    companies = processor.list_companies()
+    print(f"[i] {len(companies)} companies stored:\n")
+    for entry in companies:
+        print(f"  {entry['company']:<45} {entry['chunks']:>6} chunks  "
+              f"{entry.get('source') or '-':<30} {entry.get('updated_at', '')}")
+
+
+def delete_companies(processor, company_names, confirm=True):
+    """Delete the vectors of the given companies"""
+    if confirm:
+        answer = input(f"[?] Delete all vectors of {', '.join(company_names)}? [y/N] ")
+        if answer.strip().lower() not in ("y", "yes"):
+            print("[!] Cancelled.")
+            return
+    
+    for company_name in company_names:
+        success, message = processor.delete_company(company_name)
+        print(f"  [{'✓' if success else 'x'}] {message}")
+
+
+def replace_company(processor, company_name, pdf_path):
+    """Replace a stored company's document with a new PDF"""
+    print(f"[*] Replacing {company_name} with {pdf_path}...")
+    success, message = processor.replace_company(company_name, pdf_path)
+    print(f"  [{'✓' if success else 'x'}] {message}")
+
+
+def process_data_folder(processor, profile=None):
+    """Process every PDF in DATA_FOLDER and print a summary"""
     print(f"[*] Processing PDFs from: {DATA_FOLDER}")
     print(f"[*] Please wait...\n")
     
-    results = processor.process_folder(DATA_FOLDER)
+    results = processor.process_folder(DATA_FOLDER, profile=profile)
     
     print("\n" + "=" * 60)
     print("PROCESSING COMPLETE!")
@@ -35,8 +78,66 @@ def main():
     print(f"Successfully processed: {results['successful']}")
     print(f"Failed: {results['failed']}")
     print(f"Total chunks stored: {results['total_chunks']}")
+    for engine, stats in results.get("extraction", {}).items():
+        print(f"Extraction [{engine}]: {stats['pages']} pages in {stats['seconds']:.2f}s")
+    dedup = results.get("deduplication", {})
+    if dedup.get("chunks"):
+        print(f"Deduplication: {dedup['duplicate_chunks']} of {dedup['chunks']} chunks skipped "
+              f"(embeddings and vectors saved), {dedup['boilerplate_lines']} header/footer lines stripped")
+    if profile:
+        print(f"Profiles: {PROFILE_DIR}")
     print("=" * 60)
 
 
+def main():
+    """Main function to process all PDFs in data folder"""
+    parser = argparse.ArgumentParser(description="Process ESG PDFs into the vector database")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="Re-chunk and re-embed ingested companies from cached page "
+                             "text instead of parsing PDFs")
+    parser.add_argument("--list", action="store_true",
+                        help="List the companies stored in the vector database")
+    parser.add_argument("--delete", nargs="+", metavar="COMPANY",
+                        help="Delete all vectors of these companies")
+    parser.add_argument("--replace", nargs=2, metavar=("COMPANY", "PDF"),
+                        help="Replace a stored company's document with a new PDF "
+                             "(old chunks are removed once the new ones are stored)")
+    parser.add_argument("--yes", action="store_true",
+                        help="Do not ask for confirmation before --delete")
+    parser.add_argument("--profile", nargs="?", const=True, choices=["cprofile", "sampling"],
+                        help="Profile each document's ingestion (cProfile unless 'sampling' "
+                             "is given) into PROFILE_DIR")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Report peak allocations per ingestion stage (extract, chunk, "
+                             "facts, embed_store) to size ingestion workers")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print a timing report of imports, model loading and connections")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("ESG DOCUMENT PROCESSING SCRIPT")
+    print("=" * 60)
+    print(f"\n[*] Initializing document processor...")
+    
+    processor = DocumentProcessor(memory_report=MemoryReport() if args.memory_report else None)
+    
+    if args.list:
+        list_stored(processor)
+    elif args.delete:
+        delete_companies(processor, args.delete, confirm=not args.yes)
+    elif args.replace:
+        replace_company(processor, *args.replace)
+    elif args.from_cache:
+        reprocess_cached(processor)
+    else:
+        process_data_folder(processor, args.profile)
+    
+    if processor.memory_report is not None:
+        print(processor.memory_report.report("process_documents"))
+        print(f"Ingestion memory budget: {processor.memory_budget.stats()}")
+    if args.profile_startup:
+        print(get_startup_profiler().report("process_documents"))
+
+
 if __name__ == "__main__":
     main()
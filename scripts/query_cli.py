@@ -3,30 +3,228 @@ Query CLI Script
 Command-line interface for asking ESG questions
 """
 
+import argparse
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Now we can import from src
-from src.services.search_service import SearchService
-from src.services.qa_service import QAService
-from src.config.settings import TOP_K
+# Now we can import from src (heavy libraries are imported on first use)
+from src.utils.startup_profiler import get_startup_profiler, timed
+
+with timed("import services", "import"):
+    from src.services.search_service import SearchService
+    from src.services.qa_service import QAService
+    from src.services.structured_query import get_query_router
+    from src.services.query_server import ROUTED_SOURCES, QueryClient, QueryServerError
+    from src.services.batch_qa import BatchQARunner
+    from src.utils.helpers import format_pages
+    from src.utils.profiling import profiled
+    from src.config.settings import TOP_K, BATCH_QA_WORKERS
+
+
+def warm_up(search_service, qa_service):
+    """Load the model and open connections now instead of on the first question"""
+    resources = [(search_service, "model"), (qa_service, "client")]
+    if search_service.local_store is None:
+        resources.append((search_service, "index"))
+    for service, attribute in resources:
+        try:
+            getattr(service, attribute)
+        except Exception as e:
+            print(f"[x] Could not initialize {type(service).__name__}.{attribute}: {e}")
+
+
+def print_sources(top_chunks):
+    """Print retrieved chunks with company and score"""
+    print(f"\n[✓] Found {len(top_chunks)} relevant sources:\n")
+    for i, chunk in enumerate(top_chunks, 1):
+        pages = format_pages(chunk)
+        print(f"  [{i}] {chunk['company']}{f', {pages}' if pages else ''} "
+              f"(Score: {chunk['score']:.2%})")
+        print(f"      {chunk['text'][:100]}...\n")
+
+
+def answer_locally(user_query, search_service, qa_service, router, compare):
+    """Answer one question in-process, printing sources and the answer"""
+    # Score/rating/ranking and table-number questions skip search and LLM
+    routed = router.route(user_query) if router else None
+    if routed is not None:
+        from_tables = any(source.get("source") == "esg_facts" for source in routed[0])
+        print()
+        print_answer(routed[1], f"ANSWER ({'report tables' if from_tables else 'ESG dataset'})")
+        return
+    
+    # Process the question
+    print(f"\n[*] Searching for relevant information...")
+    
+    # Get relevant chunks
+    if compare:
+        top_chunks = search_service.multi_company_search(user_query, compare)
+    else:
+        top_chunks = search_service.semantic_search(user_query, top_k=TOP_K)
+    
+    if not top_chunks:
+        print("[!] No relevant information found.\n")
+        return
+    
+    # Display top results
+    print_sources(top_chunks)
+    busy = getattr(top_chunks, "busy_companies", [])
+    if busy:
+        print(f"[!] Service busy, left out of the comparison: {', '.join(busy)}\n")
+        compare = [company for company in compare if company not in busy]
+    
+    # Generate answer
+    print("[*] Generating AI answer...\n")
+    answer = qa_service.generate_answer(user_query, top_chunks, compare)
+    
+    print_answer(answer)
+
+
+def print_answer(answer, label="ANSWER"):
+    """Print an answer block"""
+    print(f"[>] {label}:")
+    print("-" * 60)
+    print(answer)
+    print("-" * 60 + "\n")
+
+
+def run_thin_client(server_url, compare):
+    """Interactive loop answering every question through a running query server"""
+    client = QueryClient(server_url)
+    try:
+        health = client.health()
+    except QueryServerError as e:
+        print(f"[x] {e}")
+        print("    Start it with: python scripts/query_server.py")
+        return
+    
+    print(f"[✓] Connected to {client.base_url} (model loaded: {health['model_loaded']})")
+    if compare:
+        print(f"[i] Comparing: {', '.join(compare)}")
+    print("\n[i] Type your ESG-related questions below.")
+    print("    Type 'quit', 'exit', or 'q' to stop.\n")
+    
+    try:
+        while True:
+            user_query = input("[?] Your question: ").strip()
+            if user_query.lower() in ['quit', 'exit', 'q']:
+                print("\n[+] Goodbye!")
+                break
+            if not user_query:
+                print("[!] Please enter a question.\n")
+                continue
+            
+            try:
+                print(f"\n[*] Asking the query server...")
+                sources, answer = client.ask(user_query, companies=compare)
+                if sources and all(s.get("source") in ROUTED_SOURCES for s in sources):
+                    from_tables = any(s.get("source") == "esg_facts" for s in sources)
+                    print_answer(answer, f"ANSWER ({'report tables' if from_tables else 'ESG dataset'})")
+                    continue
+                if sources:
+                    print_sources(sources)
+                print_answer(answer)
+            except QueryServerError as e:
+                print(f"\n[x] Error: {e}\n")
+    
+    except KeyboardInterrupt:
+        print("\n\n[!] Interrupted by user. Exiting...")
+        print("[+] Goodbye!")
+
+
+def run_batch(input_path, output_path, workers, server_url=None):
+    """Answer a JSONL file of questions, resuming from the output file"""
+    if server_url is not None:
+        client = QueryClient(server_url or None)
+        runner = BatchQARunner(
+            lambda question, company, companies: client.ask(question, company, companies),
+            max_workers=workers
+        )
+    else:
+        print("\n[*] Loading services...")
+        router = get_query_router()
+        qa_service = QAService(router, retrieval_only_when_busy=False)
+        runner = BatchQARunner.local(SearchService(), qa_service, max_workers=workers)
+    
+    def report(done, total, record):
+        status = "✓" if record["status"] == "ok" else "x"
+        print(f"  [{status}] {done}/{total} {record['id']} ({record['seconds']:.1f}s)")
+    
+    print(f"[*] Answering {input_path} -> {output_path} ({workers} workers)")
+    try:
+        summary = runner.run(input_path, output_path, progress_callback=report)
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted. Run the same command again to resume.")
+        return
+    except (OSError, ValueError) as e:
+        print(f"[x] {e}")
+        return
+    
+    print(f"\n[✓] {summary['answered']} answered, {summary['failed']} failed, "
+          f"{summary['skipped']} already done ({summary['seconds']:.1f}s)")
+    if summary["failed"]:
+        print("[i] Run the same command again to retry failed questions.")
 
 
 def main():
     """Main function for interactive CLI query interface"""
+    parser = argparse.ArgumentParser(description="Ask ESG questions from the command line")
+    parser.add_argument("--compare", nargs="+", metavar="COMPANY",
+                        help="Answer every question by comparing these companies")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Load everything up front and print a timing report of "
+                             "imports, model loading and connections")
+    parser.add_argument("--server", nargs="?", const="", metavar="URL",
+                        help="Thin-client mode: send questions to a running query server "
+                             "(scripts/query_server.py) instead of loading the model")
+    parser.add_argument("--batch", metavar="INPUT",
+                        help="Answer questions from a JSONL file "
+                             '({"question", "id"?, "company"?, "companies"?} per line)')
+    parser.add_argument("--output", metavar="OUTPUT",
+                        help="Answers JSONL for --batch; an existing file is resumed "
+                             "(default: INPUT with .answers.jsonl)")
+    parser.add_argument("--profile", nargs="?", const=True, choices=["cprofile", "sampling"],
+                        help="Profile every question (cProfile unless 'sampling' is given); "
+                             "profiles and hot-function summaries go to PROFILE_DIR")
+    parser.add_argument("--workers", type=int, default=BATCH_QA_WORKERS,
+                        help=f"Concurrent questions for --batch (default: {BATCH_QA_WORKERS})")
+    args = parser.parse_args()
+    if args.compare is not None and len(set(args.compare)) < 2:
+        parser.error("--compare needs at least two companies")
+    if args.profile and (args.server is not None or args.batch):
+        parser.error("--profile cannot be combined with --server or --batch")
+    compare = args.compare
+    
     print("=" * 60)
     print("ESG QUESTION ANSWERING SYSTEM - CLI")
     print("=" * 60)
+    
+    if args.batch:
+        output = args.output or os.path.splitext(args.batch)[0] + ".answers.jsonl"
+        run_batch(args.batch, output, max(1, args.workers), args.server)
+        return
+    
+    if args.server is not None:
+        run_thin_client(args.server or None, compare)
+        return
+    
     print("\n[*] Loading services...")
     
     # Initialize services
     search_service = SearchService()
     qa_service = QAService()
+    router = get_query_router()
     
+    get_startup_profiler().mark("ready for input")
+    if args.profile_startup:
+        warm_up(search_service, qa_service)
+        print(get_startup_profiler().report("query_cli"))
     print("[✓] System ready!")
+    if compare:
+        print(f"[i] Comparing: {', '.join(compare)}")
     print("\n[i] Type your ESG-related questions below.")
     print("    Type 'quit', 'exit', or 'q' to stop.\n")
     
@@ -45,31 +243,11 @@ def main():
                 print("[!] Please enter a question.\n")
                 continue
             
-            # Process the question
-            print(f"\n[*] Searching for relevant information...")
-            
             try:
-                # Get relevant chunks
-                top_chunks = search_service.semantic_search(user_query, top_k=TOP_K)
-                
-                if not top_chunks:
-                    print("[!] No relevant information found.\n")
-                    continue
-                
-                # Display top results
-                print(f"\n[✓] Found {len(top_chunks)} relevant sources:\n")
-                for i, chunk in enumerate(top_chunks, 1):
-                    print(f"  [{i}] {chunk['company']} (Score: {chunk['score']:.2%})")
-                    print(f"      {chunk['text'][:100]}...\n")
-                
-                # Generate answer
-                print("[*] Generating AI answer...\n")
-                answer = qa_service.generate_answer(user_query, top_chunks)
-                
-                print("[>] ANSWER:")
-                print("-" * 60)
-                print(answer)
-                print("-" * 60 + "\n")
+                with profiled("query_cli", args.profile) as run:
+                    answer_locally(user_query, search_service, qa_service, router, compare)
+                if run is not None:
+                    print(f"[i] Profile summary: {run.summary_path}\n")
                 
             except Exception as e:
                 print(f"\n[x] Error: {e}\n")
@@ -0,0 +1,56 @@
+"""
+Query Server Script
+Runs a resident local server that keeps the embedding model, index handle and
+LLM client loaded for query_cli.py --server and other clients
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Now we can import from src (heavy libraries are imported on first use)
+from src.utils.startup_profiler import get_startup_profiler
+from src.services.query_server import QueryServer
+from src.config.settings import QUERY_SERVER_HOST, QUERY_SERVER_PORT
+
+
+def main():
+    """Start the query server and serve until interrupted"""
+    parser = argparse.ArgumentParser(description="Resident ESG query server (localhost HTTP/JSON)")
+    parser.add_argument("--host", default=QUERY_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=QUERY_SERVER_PORT)
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Load the model on the first request instead of at startup")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print a timing report of imports, model loading and connections")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("ESG QUERY SERVER")
+    print("=" * 60)
+    
+    server = QueryServer(args.host, args.port)
+    if not args.no_warmup:
+        print("[*] Loading model and connecting...")
+        try:
+            server.warm_up()
+        except Exception as e:
+            print(f"[x] Warm-up failed, will retry on first request: {e}")
+    if args.profile_startup:
+        print(get_startup_profiler().report("query_server"))
+    
+    print(f"[✓] Listening on {server.url}  (search, ask, ingest, health)")
+    print("    Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[+] Shutting down...")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
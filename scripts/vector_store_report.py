@@ -0,0 +1,59 @@
+"""
+Vector Store Report Script
+Reports recall versus memory for the local vector storage formats
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.services.vector_store import QUANTIZATIONS, recall_report
+
+
+def synthetic_embeddings(count: int, dim: int, seed: int = 0):
+    """Clustered random vectors standing in for real embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dim))
+    return centers[rng.integers(0, len(centers), count)] + rng.normal(size=(count, dim))
+
+
+def main():
+    """Build each storage format on the same vectors and compare recall@k and memory"""
+    parser = argparse.ArgumentParser(description="Local vector store recall vs. memory report")
+    parser.add_argument("--embeddings", help="Corpus embeddings saved with numpy.save (n x dim)")
+    parser.add_argument("--synthetic", type=int, default=10000,
+                        help="Number of synthetic 1024-d vectors if --embeddings is omitted")
+    parser.add_argument("--queries", type=int, default=200, help="Queries sampled from the corpus")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--formats", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+    else:
+        vectors = synthetic_embeddings(args.synthetic, 1024)
+
+    # Queries: perturbed corpus vectors, so exact neighbours are meaningful
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(scale=queries.std() / 2, size=queries.shape)
+
+    print("=" * 72)
+    print(f"VECTOR STORE REPORT: {len(vectors)} vectors x {vectors.shape[1]} dims, "
+          f"{len(queries)} queries, recall@{args.top_k}")
+    print("=" * 72)
+    print(f"{'format':<10}{'bytes/vec':>12}{'memory MB':>12}{'GB / 1M':>10}{'recall':>10}")
+    for row in recall_report(vectors, queries, args.top_k, tuple(args.formats)):
+        print(f"{row['quantization']:<10}{row['bytes_per_vector']:>12}"
+              f"{row['memory_mb']:>12.1f}{row['gb_per_million']:>10.2f}"
+              f"{row['recall_at_k']:>10.3f}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,32 @@ Main entry point for the web interface
 """
 
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
 from google import genai
 
 # Import from package structure (relative imports)
 from src.config.settings import (
-    PINECONE_API_KEY,
     GEMINI_API_KEY,
-    INDEX_NAME,
     TOP_K,
-    DATA_FOLDER,
     PAGE_TITLE,
     PAGE_ICON,
     LAYOUT
 )
-from src.services.document_processor import DocumentProcessor
-from src.services.search_service import semantic_search
+from src.services.admission import (
+    RETRIEVAL_ONLY_ANSWER,
+    ServiceBusyError,
+    get_admission_controller
+)
+from src.services.ingestion_queue import get_ingestion_queue
+from src.services.search_service import get_search_service
 from src.services.qa_service import generate_answer_with_gemini
-from src.utils.helpers import get_available_companies
+from src.services.structured_query import get_query_router
+from src.services.company_catalog import get_company_catalog
+from src.utils.helpers import (
+    expand_pdf_uploads,
+    format_file_size,
+    format_pages,
+    validate_pdf_file
+)
 
 # ---------------------------
 # PAGE CONFIG
@@ -195,20 +202,22 @@ st.markdown("""
 # ---------------------------
 # INITIALIZE SESSION STATE
 # ---------------------------
-if 'embedder' not in st.session_state:
+# One search service per process: every session shares the embedding model,
+# the index connection and the retrieval result cache
+search_service = get_search_service()
+if "model" not in vars(search_service):
     with st.spinner("🔄 Loading embedding model..."):
-        st.session_state.embedder = SentenceTransformer("intfloat/e5-large-v2")
-
-if 'pinecone_index' not in st.session_state:
+        search_service.model
+if "index" not in vars(search_service) and search_service.local_store is None:
     with st.spinner("🔄 Connecting to Pinecone..."):
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        st.session_state.pinecone_index = pc.Index(INDEX_NAME)
+        search_service.index
 
 if 'gemini_client' not in st.session_state:
     st.session_state.gemini_client = genai.Client(api_key=GEMINI_API_KEY)
 
-if 'document_processor' not in st.session_state:
-    st.session_state.document_processor = DocumentProcessor()
+if 'ingestion_jobs' not in st.session_state:
+    # Job ids submitted from this session to the shared ingestion queue
+    st.session_state.ingestion_jobs = []
 
 # ---------------------------
 # MAIN APP UI
@@ -241,6 +250,13 @@ with st.sidebar:
     st.success("✅ Embedding Model Loaded")
     st.success("✅ Pinecone Connected")
     st.success("✅ Gemini AI Ready")
+    
+    # Shared by all sessions: shows how busy the query pipeline is right now
+    with st.expander("📈 Query load"):
+        for stage, stats in get_admission_controller().stats().items():
+            st.caption(f"**{stage}**: {stats['active']}/{stats['max_concurrent']} running, "
+                       f"{stats['waiting']} waiting, avg wait {stats['avg_wait_ms']:.0f} ms, "
+                       f"{stats['rejected']} turned away")
 
 # Main content area
 tab1, tab2 = st.tabs(["🔍 Ask Questions", "📤 Upload Documents"])
@@ -252,13 +268,26 @@ with tab1:
     # Company filter dropdown
     col_filter1, col_filter2 = st.columns([1, 2])
     with col_filter1:
-        available_companies = get_available_companies(DATA_FOLDER)
+        # Cached per process; rebuilt only after ingestion or data folder changes
+        company_catalog = get_company_catalog()
+        available_companies = company_catalog.get_companies()
         selected_company = st.selectbox(
             "🏢 Filter by Company:",
             options=available_companies,
             index=0,  # Default to "General"
+            format_func=lambda name: (
+                f"{name} ({company_catalog.get_chunk_count(name)} chunks)"
+                if company_catalog.get_chunk_count(name) else name
+            ),
             help="Select a specific company or 'General' to search all companies"
         )
+    with col_filter2:
+        compare_companies = st.multiselect(
+            "⚖️ Compare Companies:",
+            options=[name for name in available_companies if name != "General"],
+            help="Pick two or more companies to retrieve sources for each of them side by side"
+        )
+    comparing = len(compare_companies) > 1
     
     query = st.text_area(
         "Enter your question:",
@@ -268,7 +297,9 @@ with tab1:
     )
     
     # Show active filter status
-    if selected_company != "General":
+    if comparing:
+        st.info(f"⚖️ Comparing **{', '.join(compare_companies)}**")
+    elif selected_company != "General":
         st.info(f"🔍 Searching only within **{selected_company}** documents")
     else:
         st.info(f"🔍 Searching across **all companies**")
@@ -277,42 +308,85 @@ with tab1:
     with col1:
         search_button = st.button("🔍 Search & Answer", use_container_width=True)
     
-    if search_button and query.strip():
+    # Score, rating and ranking questions are answered from the ESG dataset,
+    # numeric lookups from facts parsed out of report tables
+    routed = None
+    router = get_query_router()
+    if search_button and query.strip() and router is not None:
+        routed = router.route(
+            query, company_name=None if comparing else selected_company
+        )
+    
+    if routed is not None:
+        structured_sources, answer = routed
+        answer_html = answer.replace("\n", "<br>")
+        from_tables = any(s.get("source") == "esg_facts" for s in structured_sources)
+        st.markdown(f"""
+        <div class="answer-card">
+            <h3>📊 Answer from {"Report Tables" if from_tables else "ESG Dataset"}</h3>
+            <p>{answer_html}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if structured_sources:
+            with st.expander(f"📄 ESG data for {len(structured_sources)} companies"):
+                for result in structured_sources:
+                    page_tag = f" ({format_pages(result)})" if result.get("page") else ""
+                    st.markdown(f"**{result['company']}** - {result['text']}{page_tag}")
+    
+    elif search_button and query.strip():
         with st.spinner("🔎 Searching through ESG documents..."):
             try:
-                # Perform semantic search with company filter
-                top_chunks = semantic_search(
-                    query,
-                    st.session_state.embedder,
-                    st.session_state.pinecone_index,
-                    top_k=TOP_K,
-                    company_name=selected_company
-                )
+                if comparing:
+                    # One shared query embedding, per-company retrievals in parallel
+                    top_chunks = search_service.multi_company_search(query, compare_companies)
+                    busy = top_chunks.busy_companies
+                    if busy:
+                        st.warning(f"⏳ The service is busy, so {', '.join(busy)} could not be "
+                                   f"searched. Ask again in a few seconds to include them.")
+                        compare_companies = [c for c in compare_companies if c not in busy]
+                else:
+                    # Perform semantic search with company filter
+                    top_chunks = search_service.semantic_search(
+                        query,
+                        top_k=TOP_K,
+                        company_name=selected_company
+                    )
                 
                 if top_chunks:
-                    # Display top 3 results
-                    st.markdown("### 📊 Top 3 Relevant Sources")
+                    # Display top results
+                    st.markdown(f"### 📊 Top {len(top_chunks)} Relevant Sources")
                     
                     for i, result in enumerate(top_chunks, 1):
+                        pages = format_pages(result)
+                        page_tag = f'<span class="company-tag">📑 {pages}</span>' if pages else ""
                         st.markdown(f"""
                         <div class="result-card">
                             <h4>📄 Result {i}</h4>
                             <span class="score-badge">Relevance: {result['score']:.2%}</span>
                             <span class="company-tag">🏢 {result['company']}</span>
+                            {page_tag}
                             <p style="margin-top: 1rem; color: #e2e8f0; line-height: 1.6;">
                                 {result['text'][:300]}{'...' if len(result['text']) > 300 else ''}
                             </p>
                         </div>
                         """, unsafe_allow_html=True)
                     
-                    # Generate AI answer
+                    # Generate AI answer (sources only when the LLM stage is saturated)
                     with st.spinner("🤖 Generating AI-powered answer..."):
-                        answer = generate_answer_with_gemini(
-                            query,
-                            top_chunks,
-                            st.session_state.gemini_client
-                        )
-                        
+                        try:
+                            with get_admission_controller().slot("llm"):
+                                answer = generate_answer_with_gemini(
+                                    query,
+                                    top_chunks,
+                                    st.session_state.gemini_client,
+                                    company_names=compare_companies if comparing else None
+                                )
+                        except ServiceBusyError:
+                            answer = None
+                            st.warning(f"⏳ {RETRIEVAL_ONLY_ANSWER}")
+                    
+                    if answer is not None:
                         st.markdown(f"""
                         <div class="answer-card">
                             <h3>💡 AI-Generated Answer</h3>
@@ -322,6 +396,10 @@ with tab1:
                 else:
                     st.warning("⚠️ No relevant information found. Try rephrasing your question or upload more documents.")
             
+            except ServiceBusyError:
+                st.warning("⏳ Too many questions are being answered right now. "
+                           "Please try again in a few seconds.")
+            
             except Exception as e:
                 st.markdown(f"""
                 <div class="error-message">
@@ -344,38 +422,137 @@ with tab2:
     </div>
     """, unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader(
-        "Choose a PDF file",
-        type=['pdf'],
-        help="Upload ESG documents in PDF format"
+    uploaded_files = st.file_uploader(
+        "Choose PDF files or zip archives of PDFs",
+        type=['pdf', 'zip'],
+        accept_multiple_files=True,
+        help="Upload ESG documents in PDF format; zip archives are expanded"
     )
     
-    if uploaded_file is not None:
-        st.info(f"📄 Selected: **{uploaded_file.name}** ({uploaded_file.size / 1024:.2f} KB)")
+    if uploaded_files:
+        total_size = sum(f.size for f in uploaded_files)
+        st.info(f"📄 Selected: **{len(uploaded_files)} file(s)** ({format_file_size(total_size)})")
         
         col1, col2 = st.columns([1, 3])
         with col1:
             process_button = st.button("🚀 Process & Store", use_container_width=True)
         
         if process_button:
-            with st.spinner("⚙️ Processing document... This may take a moment."):
-                success, message = st.session_state.document_processor.process_and_store_pdf(
-                    uploaded_file
-                )
-                
-                if success:
-                    st.markdown(f"""
-                    <div class="success-message">
-                        ✅ {message}
-                    </div>
-                    """, unsafe_allow_html=True)
-                    st.balloons()
-                else:
+            documents, errors = expand_pdf_uploads(uploaded_files)
+            
+            # All files run on the shared background worker pool in parallel;
+            # this script thread returns immediately and the status panel
+            # below polls combined progress
+            job_ids, queue_errors = get_ingestion_queue().submit_many(documents)
+            st.session_state.ingestion_jobs.extend(job_ids)
+            
+            for filename, message in errors + queue_errors:
+                st.markdown(f"""
+                <div class="error-message">
+                    ❌ {filename}: {message}
+                </div>
+                """, unsafe_allow_html=True)
+    
+    ingestion_queue = get_ingestion_queue()
+    jobs_active = ingestion_queue.summarize(st.session_state.ingestion_jobs)["pending"] > 0
+    
+    @st.fragment(run_every=1.0 if jobs_active else None)
+    def show_ingestion_status():
+        """Poll the ingestion queue and render this session's jobs"""
+        job_ids = st.session_state.ingestion_jobs
+        summary = ingestion_queue.summarize(job_ids)
+        if not summary["total_files"]:
+            return
+        
+        st.markdown("### ⏳ Processing Status")
+        if summary["pending"]:
+            active_jobs = [job for job in ingestion_queue.list_jobs(job_ids)
+                           if job["status"] in ("queued", "running")]
+            st.progress(
+                summary["fraction"],
+                text=(f"⚙️ {summary['successful'] + summary['failed']}/{summary['total_files']} "
+                      f"files done, {summary['pending']} in progress")
+            )
+            for job in active_jobs:
+                pages = job["progress"]["pages"]
+                chunks = job["progress"]["chunks"]
+                vectors = job["progress"]["vectors"]
+                label = "Queued" if job["status"] == "queued" else "Processing"
+                st.caption(f"{label} **{job['filename']}** - pages {pages[0]}/{pages[1]}, "
+                           f"chunks {chunks[0]}/{chunks[1]}, vectors {vectors[0]}/{vectors[1]}")
+        
+        st.markdown(f"""
+        <div class="{'error-message' if summary['failed'] else 'success-message'}">
+            ✅ {summary['successful']} successful &nbsp; ❌ {summary['failed']} failed
+            &nbsp; 📦 {summary['total_chunks']} chunks stored
+        </div>
+        """, unsafe_allow_html=True)
+        
+        finished = [f for f in summary["files"] if f["status"] in ("succeeded", "failed")]
+        if finished:
+            with st.expander(f"📄 Per-file results ({len(finished)})"):
+                for result in reversed(finished):
+                    icon = "✅" if result["status"] == "succeeded" else "❌"
+                    st.markdown(f"{icon} **{result['filename']}** - {result['message']}")
+        
+        # A full rerun once everything finishes refreshes the company list
+        # and stops the polling timer
+        if not summary["pending"] and jobs_active:
+            st.rerun()
+    
+    show_ingestion_status()
+    
+    # Stored documents: list, replace and delete per company
+    st.markdown("### 🗂️ Manage Stored Documents")
+    stored_companies = ingestion_queue.processor.list_companies()
+    if not stored_companies:
+        st.caption("No documents stored yet.")
+    else:
+        with st.expander(f"📚 Stored companies ({len(stored_companies)})"):
+            for entry in stored_companies:
+                st.markdown(f"**{entry['company']}** - {entry['chunks']} chunks"
+                            f" from {entry.get('source') or 'unknown source'}"
+                            f" (updated {entry.get('updated_at', '-')})")
+        
+        manage_company = st.selectbox(
+            "Company:",
+            options=[entry["company"] for entry in stored_companies],
+            key="manage_company"
+        )
+        col_replace, col_delete = st.columns(2)
+        with col_replace:
+            replacement = st.file_uploader(
+                "Replacement PDF",
+                type=["pdf"],
+                key="replacement_pdf",
+                help="Stored under the selected company whatever the file is named; "
+                     "the old chunks are removed once the new ones are stored"
+            )
+            if st.button("🔄 Replace Document", use_container_width=True, disabled=replacement is None):
+                is_valid, message = validate_pdf_file(replacement)
+                try:
+                    if not is_valid:
+                        raise ValueError(message)
+                    job_id = ingestion_queue.submit(replacement, manage_company,
+                                                    filename=replacement.name, replace=True)
+                    st.session_state.ingestion_jobs.append(job_id)
+                    st.rerun()
+                except (ValueError, RuntimeError) as e:
                     st.markdown(f"""
                     <div class="error-message">
-                        ❌ {message}
+                        ❌ {replacement.name}: {e}
                     </div>
                     """, unsafe_allow_html=True)
+        with col_delete:
+            confirm_delete = st.checkbox(f"Yes, delete all chunks of {manage_company}",
+                                         key="confirm_delete")
+            if st.button("🗑️ Delete Company", use_container_width=True, disabled=not confirm_delete):
+                success, message = ingestion_queue.processor.delete_company(manage_company)
+                st.markdown(f"""
+                <div class="{'success-message' if success else 'error-message'}">
+                    {'✅' if success else '❌'} {message}
+                </div>
+                """, unsafe_allow_html=True)
 
 # Footer
 st.markdown("---")
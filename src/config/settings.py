@@ -18,17 +18,135 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Database Configuration  
 # ---------------------------
 INDEX_NAME = "capstone"
+PINECONE_CLOUD = "aws"         # Serverless spec for indexes created by index migrations
+PINECONE_REGION = "us-east-1"
 
 # ---------------------------
 # Search Configuration
 # ---------------------------
 TOP_K = 3  # Number of top results to retrieve
+MULTI_COMPANY_TOP_K = 3        # Results per company in comparison queries
+MULTI_COMPANY_MAX_WORKERS = 4  # Concurrent per-company retrievals
+SEARCH_CACHE_SIZE = 512        # Cached (query, company, top_k) results per process; 0 disables
+NEIGHBOR_WINDOW = 1            # Adjacent chunks merged into each hit by id lookup; 0 disables
+COMPANY_ROUTING_ENABLED = True        # Filter "General" searches that clearly name one company
+COMPANY_ROUTER_MIN_SIMILARITY = 0.82  # Query-to-description cosine needed to route by description
+COMPANY_ROUTER_MIN_MARGIN = 0.03      # Lead over the second closest description needed to route
 
 # ---------------------------
 # Document Processing Configuration
 # ---------------------------
 CHUNK_SIZE = 800  # Characters per chunk
 OVERLAP = 100     # Overlap between chunks
+EMBED_BATCH_SIZE = 64    # Chunks encoded per model call
+UPSERT_BATCH_SIZE = 100  # Vectors per Pinecone upsert request
+DELETE_BATCH_SIZE = 1000  # Vector ids per Pinecone delete request
+INGEST_MEMORY_BUDGET_MB = 512  # Text and embeddings held by in-flight ingestions (process-wide)
+
+# ---------------------------
+# PDF Extraction Configuration
+# ---------------------------
+PDF_EXTRACTION_ENGINE = "auto"     # "auto" (pdfium + pdfplumber fallback), "pdfium" or "pdfplumber"
+EXTRACTION_GARBLED_RATIO = 0.05    # Share of replacement/private-use/(cid:) chars that triggers fallback
+EXTRACTION_SHORT_LINE_RATIO = 0.45 # Share of 1-2 word lines that marks a page as a table
+EXTRACTION_NUMERIC_LINE_RATIO = 0.2  # Share of number-only lines that marks a page as a table
+EXTRACTION_MIN_TABLE_LINES = 20    # Pages with fewer lines are never treated as tables
+TEXT_CACHE_ENABLED = True          # Reuse extracted page text across runs
+OCR_ENABLED = True                 # OCR pages without a text layer (needs pytesseract + Tesseract)
+OCR_MIN_CHARS = 20                 # Pages with less extracted text are treated as scanned
+OCR_DPI = 300                      # Render resolution of scanned pages
+OCR_LANGUAGE = "eng"               # Tesseract language(s), e.g. "eng+hin"
+OCR_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # OCR processes shared by all ingestions
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")  # Tesseract executable
+
+# ---------------------------
+# Deduplication Configuration
+# ---------------------------
+DEDUP_ENABLED = True             # Strip headers/footers and skip near-duplicate chunks
+DEDUP_SIMILARITY = 0.8           # Estimated Jaccard similarity (word 3-grams) of a near-duplicate
+DEDUP_NUM_PERM = 64              # MinHash signature length
+DEDUP_LSH_BANDS = 16             # LSH bands (4 rows each) used to find candidate duplicates
+BOILERPLATE_EDGE_LINES = 3       # Lines at the top and bottom of a page checked for repeats
+BOILERPLATE_MIN_PAGE_RATIO = 0.3 # Share of pages a line must repeat on to be boilerplate
+BOILERPLATE_MIN_PAGES = 3        # Documents shorter than this keep all lines
+
+# ---------------------------
+# Local Vector Store Configuration
+# ---------------------------
+SEARCH_BACKEND = "pinecone"    # "pinecone" or "local" (LOCAL_INDEX_DIR, no network round trip)
+LOCAL_INDEX_ENABLED = False    # Mirror ingested vectors into the local store
+VECTOR_QUANTIZATION = "int8"   # Local storage: "float32", "float16", "int8" or "pq"
+PQ_SUBVECTORS = 64             # Product quantization bytes per vector (must divide the dimension)
+PQ_CENTROIDS = 256             # Centroids per subvector (one byte per code)
+PQ_TRAIN_SAMPLE = 20000        # Vectors kept in float32, then used to train PQ codebooks
+PQ_KMEANS_ITERATIONS = 15      # k-means iterations per codebook
+VECTOR_TRAIN_SAMPLE = 4096     # int8: vectors kept in float32 before training, and the refit sample
+VECTOR_REFIT_GROWTH = 4        # int8: refit ranges once the store is this many times its size at the last fit
+LOCAL_INDEX_MAX_SEGMENTS = 16  # Saves append segment files; this many are merged into one
+LOCAL_INDEX_COMPACT_DEAD_SHARE = 0.25  # Share of deleted rows that triggers a compacting snapshot
+LOCAL_INDEX_REFRESH_SECONDS = 2.0      # How often queries look for other processes' saves
+
+# ---------------------------
+# Ingestion Queue Configuration
+# ---------------------------
+INGESTION_WORKERS = 2        # Background ingestion threads shared by all sessions
+INGESTION_MAX_PENDING = 100  # Queued + running jobs before new uploads are rejected
+INGESTION_JOBS_KEPT = 200    # Finished jobs kept for status polling
+
+# ---------------------------
+# Admission Control Configuration
+# ---------------------------
+# Concurrent calls per query stage, shared by all sessions of a process
+ADMISSION_LIMITS = {
+    "encoder": 2,        # Query embeddings (CPU bound; more only thrashes)
+    "vector_query": 8,   # Pinecone / local index queries and neighbor fetches
+    "llm": 4             # Gemini answer generation
+}
+ADMISSION_QUEUE_SIZE = 16   # Callers waiting per stage before new ones are turned away
+ADMISSION_MAX_WAIT = 10.0   # Seconds a caller waits for a slot before giving up
+
+# ---------------------------
+# Query Server Configuration
+# ---------------------------
+QUERY_SERVER_HOST = "127.0.0.1"  # Localhost only: the API has no authentication
+QUERY_SERVER_PORT = 8765
+QUERY_SERVER_ALLOWED_HOSTS = ("localhost", "127.0.0.1", "::1")  # Host headers accepted
+QUERY_SERVER_TIMEOUT = 120       # Client timeout in seconds (answers wait on the LLM)
+QUERY_SERVER_MAX_TOP_K = 50      # Largest top_k a /search request may ask for
+
+# ---------------------------
+# Batch QA Configuration
+# ---------------------------
+BATCH_QA_WORKERS = 4   # Questions answered concurrently (bounded by LLM rate limits)
+BATCH_QA_RETRIES = 2   # Extra attempts per question, with exponential backoff
+
+# ---------------------------
+# Load Test Configuration
+# ---------------------------
+LOAD_TEST_CONCURRENCY = 4        # Simulated analysts asking at once
+LOAD_TEST_SAMPLE_INTERVAL = 0.5  # Seconds between CPU / RSS samples
+# Simulated per-call latency of stubbed backends (encoder time is spent on CPU)
+LOAD_TEST_STUB_LATENCY_MS = {
+    "encoder": 30,
+    "vector_query": 60,
+    "llm": 1500
+}
+
+# ---------------------------
+# Retrieval Evaluation Configuration
+# ---------------------------
+EVAL_MIN_COVERAGE = 0.6       # Shingle overlap for a chunk to match an expected passage
+EVAL_RECALL_TOLERANCE = 0.02  # Recall drop accepted when recommending a cheaper setting
+
+# ---------------------------
+# Profiling Configuration
+# ---------------------------
+# Requests profiled without an explicit per-request flag (files go to PROFILE_DIR)
+PROFILE_MODE = os.getenv("ESG_PROFILE", "off")                  # "off", "cprofile" or "sampling"
+PROFILE_SAMPLE_RATE = float(os.getenv("ESG_PROFILE_RATE", "1"))  # Fraction of requests profiled
+PROFILE_SAMPLING_INTERVAL = 0.005  # Seconds between stack samples in "sampling" mode
+PROFILE_TOP_FUNCTIONS = 25         # Hot functions listed in each profile summary
+MEMORY_REPORT = os.getenv("ESG_MEMORY_REPORT", "") == "1"  # Trace allocations per ingestion stage
 
 # ---------------------------
 # Model Configuration
@@ -39,7 +157,25 @@ LLM_MODEL = "gemini-2.0-flash-exp"        # Gemini model
 # ---------------------------
 # Paths Configuration
 # ---------------------------
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_FOLDER = r"D:\Project\Capestone\data\pdfs"  # PDF documents location
+ESG_DATA_FILE = os.path.join(PROJECT_ROOT, "data", "final_data.csv")  # ESG scores table
+MANIFEST_FILE = os.path.join(PROJECT_ROOT, "data", "manifest.json")   # Ingested companies
+CACHE_FOLDER = os.path.join(PROJECT_ROOT, "data", "cache")             # Derived, re-creatable data
+TEXT_CACHE_DIR = os.path.join(CACHE_FOLDER, "text")  # Page text by PDF hash / extractor version
+LOCAL_INDEX_DIR = os.path.join(CACHE_FOLDER, "index")  # Quantized local vector store
+OCR_CACHE_DIR = os.path.join(CACHE_FOLDER, "ocr")  # OCR text by rendered page hash
+COMPANY_ROUTER_CACHE_DIR = os.path.join(CACHE_FOLDER, "company_router")  # ESG table description embeddings
+FACTS_DB = os.path.join(PROJECT_ROOT, "data", "facts.db")  # Numeric ESG facts from report tables
+INDEX_GENERATIONS_FILE = os.path.join(PROJECT_ROOT, "data", "index_generations.json")  # Active index / model
+PROFILE_DIR = os.getenv("ESG_PROFILE_DIR", os.path.join(PROJECT_ROOT, "reports", "profiles"))  # Request profiles
+
+# ---------------------------
+# Structured Query Configuration
+# ---------------------------
+STRUCTURED_QUERY_ENABLED = True  # Answer score/rating/ranking questions from ESG_DATA_FILE
+STRUCTURED_RANKING_LIMIT = 5     # Companies listed for "highest/lowest" questions
+FACTS_ENABLED = True             # Index numbers from report tables and answer lookups from them
 
 # ---------------------------
 # UI Configuration
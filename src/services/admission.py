@@ -0,0 +1,185 @@
+"""
+Admission Control
+Bounded concurrency and bounded wait queues for the query pipeline stages
+(query encoder, vector query, LLM), shared by every session of the process
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.config.settings import (
+    ADMISSION_LIMITS,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_MAX_WAIT
+)
+
+STAGES = ("encoder", "vector_query", "llm")
+
+# Shown instead of an LLM answer when the LLM stage sheds load
+RETRIEVAL_ONLY_ANSWER = (
+    "The answer service is busy right now, so no AI answer was generated. "
+    "The most relevant sources are shown instead; please try again shortly."
+)
+
+
+class ServiceBusyError(RuntimeError):
+    """Raised when a stage's wait queue is full or the wait times out"""
+
+    def __init__(self, stage: str, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageLimiter:
+    """
+    Counting semaphore with a bounded, timed wait queue
+
+    Up to `max_concurrent` callers run at once and up to `max_queue` wait
+    for a slot; anyone beyond that is rejected immediately, so a burst
+    turns into fast "busy" responses instead of every caller slowing down.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = ADMISSION_QUEUE_SIZE,
+                 max_wait: float = ADMISSION_MAX_WAIT):
+        """
+        Initialize the limiter
+
+        Args:
+            name: Stage name (used in errors and stats)
+            max_concurrent: Callers running at once
+            max_queue: Callers allowed to wait for a slot
+            max_wait: Seconds a caller waits before giving up
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=200)  # Recent wait times in seconds
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one slot of the stage for the duration of the block
+
+        Raises:
+            ServiceBusyError: If the wait queue is full or no slot frees up
+                within max_wait seconds
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self):
+        """Take a slot (see slot())"""
+        start = time.perf_counter()
+        with self._condition:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self._rejected += 1
+                    raise ServiceBusyError(
+                        self.name, f"Service busy: {self.name} queue is full "
+                                   f"({self._waiting} waiting)", self._retry_after())
+                self._waiting += 1
+                try:
+                    admitted = self._condition.wait_for(
+                        lambda: self._active < self.max_concurrent, timeout=self.max_wait
+                    )
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    self._rejected += 1
+                    raise ServiceBusyError(
+                        self.name, f"Service busy: no {self.name} slot within "
+                                   f"{self.max_wait:g}s", self._retry_after())
+            self._active += 1
+            self._admitted += 1
+            self._waits.append(time.perf_counter() - start)
+
+    def release(self):
+        """Return a slot and wake the next waiter"""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def stats(self) -> dict:
+        """Current load and recent wait times of the stage"""
+        with self._condition:
+            waits = sorted(self._waits)
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "p95_wait_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0
+            }
+
+    def _retry_after(self) -> float:
+        waits = self._waits
+        return round(max(1.0, 2 * sum(waits) / len(waits)), 1) if waits else 1.0
+
+
+class AdmissionController:
+    """One StageLimiter per query pipeline stage"""
+
+    def __init__(self, limits: dict = None, max_queue: int = ADMISSION_QUEUE_SIZE,
+                 max_wait: float = ADMISSION_MAX_WAIT):
+        """
+        Initialize the controller
+
+        Args:
+            limits: Dictionary of stage -> concurrent callers (ADMISSION_LIMITS
+                if omitted)
+            max_queue: Callers allowed to wait per stage
+            max_wait: Seconds a caller waits for a slot before giving up
+        """
+        limits = dict(ADMISSION_LIMITS, **(limits or {}))
+        self.stages = {
+            stage: StageLimiter(stage, limits[stage], max_queue, max_wait) for stage in STAGES
+        }
+
+    def slot(self, stage: str):
+        """
+        Context manager holding one slot of a stage
+
+        Args:
+            stage: "encoder", "vector_query" or "llm"
+
+        Raises:
+            ServiceBusyError: If the stage is saturated
+        """
+        return self.stages[stage].slot()
+
+    def stats(self) -> dict:
+        """Dictionary of stage -> StageLimiter.stats()"""
+        return {stage: limiter.stats() for stage, limiter in self.stages.items()}
+
+
+_default_controller = None
+_default_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get the admission controller shared by every session of this process
+
+    Returns:
+        AdmissionController instance
+    """
+    global _default_controller
+    with _default_controller_lock:
+        if _default_controller is None:
+            _default_controller = AdmissionController()
+        return _default_controller
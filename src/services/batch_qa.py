@@ -0,0 +1,211 @@
+"""
+Batch QA Service
+Answers a JSONL file of questions with bounded concurrency, streaming answers
+to a JSONL output that doubles as the resume checkpoint
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.config.settings import BATCH_QA_WORKERS, BATCH_QA_RETRIES
+from src.services.admission import RETRIEVAL_ONLY_ANSWER, ServiceBusyError
+
+
+def load_questions(path: str) -> list:
+    """
+    Read questions from a JSONL file
+
+    Each line is {"question": ..., "id"?: ..., "company"?: ..., "companies"?: [...]};
+    a plain JSON string is accepted as a question too. Blank lines and lines
+    starting with '#' are skipped.
+
+    Args:
+        path: Input file
+
+    Returns:
+        List of question dictionaries with a unique "id"
+
+    Raises:
+        ValueError: On malformed lines or duplicate ids
+    """
+    questions = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+            if isinstance(item, str):
+                item = {"question": item}
+            if not isinstance(item, dict) or not str(item.get("question", "")).strip():
+                raise ValueError(f"{path}:{line_number}: missing 'question'")
+
+            question_id = str(item.get("id", f"line-{line_number}"))
+            if question_id in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate id {question_id!r}")
+            seen.add(question_id)
+            questions.append({
+                "id": question_id,
+                "question": item["question"].strip(),
+                "company": item.get("company"),
+                "companies": item.get("companies")
+            })
+    return questions
+
+
+def load_checkpoint(output_path: str) -> set:
+    """
+    Collect ids already answered in an output file
+
+    A line cut off by an interrupted run is truncated so appended records
+    start on a fresh line.
+
+    Args:
+        output_path: Output JSONL file
+
+    Returns:
+        Set of ids with status "ok" (failed questions are retried)
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    done = set()
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "ok":
+            done.add(record["id"])
+    return done
+
+
+class BatchQARunner:
+    """Runs retrieval and generation for many questions concurrently"""
+
+    def __init__(self, ask, max_workers: int = BATCH_QA_WORKERS,
+                 retries: int = BATCH_QA_RETRIES):
+        """
+        Initialize the runner
+
+        Args:
+            ask: Callable(question, company, companies) -> (sources, answer),
+                e.g. QAService.ask_question bound to a SearchService or
+                QueryClient.ask for a running query server
+            max_workers: Questions processed at the same time
+            retries: Extra attempts per question on errors (e.g. rate limits)
+        """
+        self.ask = ask
+        self.max_workers = max_workers
+        self.retries = retries
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def local(cls, search_service, qa_service, **kwargs) -> "BatchQARunner":
+        """
+        Runner answering in-process with the given services
+
+        Build qa_service with retrieval_only_when_busy=False, so a busy LLM
+        raises and is retried instead of returning RETRIEVAL_ONLY_ANSWER.
+        """
+        return cls(
+            lambda question, company, companies: qa_service.ask_question(
+                question, search_service, company_name=company, company_names=companies
+            ),
+            **kwargs
+        )
+
+    def run(self, input_path: str, output_path: str, progress_callback=None) -> dict:
+        """
+        Answer every question not yet answered in output_path
+
+        Args:
+            input_path: Questions JSONL
+            output_path: Answers JSONL (appended to; also the checkpoint)
+            progress_callback: Optional callable(done, total, record)
+
+        Returns:
+            Dictionary with total, skipped, answered, failed and seconds
+        """
+        start = time.perf_counter()
+        questions = load_questions(input_path)
+        done_ids = load_checkpoint(output_path)
+        pending = [q for q in questions if q["id"] not in done_ids]
+        summary = {
+            "total": len(questions),
+            "skipped": len(questions) - len(pending),
+            "answered": 0,
+            "failed": 0,
+            "seconds": 0.0
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-qa")
+        try:
+            with open(output_path, "a", encoding="utf-8") as output:
+                futures = [executor.submit(self._answer, question) for question in pending]
+                for completed, future in enumerate(as_completed(futures), 1):
+                    record = future.result()
+                    self._write(output, record)
+                    summary["answered" if record["status"] == "ok" else "failed"] += 1
+                    if progress_callback:
+                        progress_callback(completed, len(pending), record)
+        finally:
+            # On interruption, drop queued questions; finished ones are on disk
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        summary["seconds"] = time.perf_counter() - start
+        return summary
+
+    def _answer(self, question: dict) -> dict:
+        """
+        Answer one question, retrying with backoff
+
+        A retrieval-only answer (the LLM stage shed load) counts as a
+        failure, so it is retried and, if it persists, left for --resume.
+        """
+        record = dict(question)
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                sources, answer = self.ask(question["question"], question["company"],
+                                           question["companies"])
+                if answer == RETRIEVAL_ONLY_ANSWER:
+                    raise ServiceBusyError("llm", "LLM busy: only sources were returned")
+                record.pop("error", None)
+                record.update({
+                    "status": "ok",
+                    "answer": answer,
+                    "sources": [
+                        {key: source.get(key)
+                         for key in ("company", "score", "text", "source", "page", "page_end")
+                         if key in source}
+                        for source in sources
+                    ]
+                })
+                break
+            except Exception as e:
+                record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+                if attempt < self.retries:
+                    time.sleep(2 ** attempt)
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return record
+
+    def _write(self, output, record: dict):
+        """Append one record and flush it so it survives an interruption"""
+        with self._write_lock:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
@@ -0,0 +1,213 @@
+"""
+Company Catalog Service
+Cached list of searchable companies built from the ingestion state
+"""
+
+import os
+import threading
+
+from src.config.settings import DATA_FOLDER, ESG_DATA_FILE
+from src.services.ingestion_manifest import ID_GENERATION_SUFFIX, get_manifest
+from src.services.structured_query import EsgDataTable
+
+
+class CompanyCatalog:
+    """
+    In-process cache of companies known to the system
+
+    Sources, in order of precedence:
+        - Ingestion manifest (companies stored in the vector database, with chunk counts)
+        - Local PDF files in the data folder
+        - ESG data table (sector / symbol metadata, and ESG-only companies)
+
+    The cache is rebuilt only when the manifest changes (ingestion events) or the
+    modification time of the data folder or ESG table changes on disk.
+    """
+
+    def __init__(self, manifest=None, data_folder: str = DATA_FOLDER,
+                 esg_data_file: str = ESG_DATA_FILE):
+        """
+        Initialize the catalog
+
+        Args:
+            manifest: IngestionManifest (shared manifest if omitted)
+            data_folder: Folder containing local PDF files
+            esg_data_file: Path to the ESG CSV file
+        """
+        self.manifest = manifest or get_manifest()
+        self.data_folder = data_folder
+        self.esg_data_file = esg_data_file
+        self._lock = threading.Lock()
+        self._entries = None
+        self._signature = None
+        self._esg_table = None
+        self._esg_mtime = None
+        self.manifest.subscribe(lambda company_name: self.invalidate())
+
+    def invalidate(self):
+        """Drop the cached catalog so the next read rebuilds it"""
+        with self._lock:
+            self._entries = None
+
+    def get_entries(self) -> dict:
+        """
+        Get catalog entries
+
+        Returns:
+            Dictionary of company name -> {"chunks", "sources", "symbol", "sector"}
+        """
+        signature = self._current_signature()
+        with self._lock:
+            if self._entries is None or signature != self._signature:
+                self._entries = self._build(signature)
+                self._signature = signature
+            return self._entries
+
+    def get_companies(self, include_esg_only: bool = False) -> list:
+        """
+        Get company names for filter dropdowns
+
+        Args:
+            include_esg_only: Also list companies that only exist in the ESG table
+
+        Returns:
+            Sorted list of company names with "General" as first option
+        """
+        entries = self.get_entries()
+        names = [
+            name for name, entry in entries.items()
+            if include_esg_only or entry["sources"] != ["esg_data"]
+        ]
+        return ["General"] + sorted(names)
+
+    def get_chunk_count(self, company_name: str) -> int:
+        """
+        Get the number of stored chunks for a company
+
+        Args:
+            company_name: Company name
+
+        Returns:
+            Chunk count (0 if nothing is stored)
+        """
+        entry = self.get_entries().get(company_name)
+        return entry["chunks"] if entry else 0
+
+    def sync_from_vector_store(self, index) -> int:
+        """
+        Backfill the manifest from vector ids already stored in Pinecone
+        
+        Vector ids have the form "<company>_<chunk>", or
+        "<company>@g<generation>_<chunk>" for replaced documents, so
+        per-company counts can be rebuilt from a listing of the index. When
+        an interrupted replacement left two generations, the one already in
+        the manifest (or else the larger one) is kept. This scans every id
+        and is meant for one-off use.
+        
+        Args:
+            index: Pinecone index handle
+            
+        Returns:
+            Number of companies added or updated in the manifest
+        """
+        counts = {}  # company -> {id prefix: count}
+        for id_batch in index.list():
+            for vector_id in id_batch:
+                prefix, _, chunk = vector_id.rpartition("_")
+                if prefix and chunk.isdigit():
+                    company = ID_GENERATION_SUFFIX.sub("", prefix)
+                    prefixes = counts.setdefault(company, {})
+                    prefixes[prefix] = prefixes.get(prefix, 0) + 1
+        
+        known = self.manifest.get_companies()
+        updated = 0
+        for company, prefixes in sorted(counts.items()):
+            entry = known.get(company, {})
+            known_prefix = entry.get("id_prefix") or company
+            prefix = known_prefix if known_prefix in prefixes else max(prefixes, key=prefixes.get)
+            if entry.get("chunks") != prefixes[prefix] or known_prefix != prefix:
+                self.manifest.record_ingestion(company, prefixes[prefix], id_prefix=prefix)
+                updated += 1
+        return updated
+
+    def _current_signature(self) -> tuple:
+        """Cheap change detector: manifest version and on-disk modification times"""
+        return (
+            self.manifest.version,
+            _mtime(self.data_folder),
+            _mtime(self.esg_data_file)
+        )
+
+    def _build(self, signature: tuple) -> dict:
+        """Rebuild the catalog from all sources"""
+        entries = {}
+
+        for name, record in self.manifest.get_companies().items():
+            entries[name] = _new_entry(record.get("chunks", 0), "vector_store")
+
+        if signature[1] is not None:
+            for file in os.listdir(self.data_folder):
+                if file.lower().endswith(".pdf"):
+                    name = file[:-4]
+                    entry = entries.setdefault(name, _new_entry(0))
+                    entry["sources"].append("local_pdf")
+
+        table = self._load_esg_table(signature[2])
+        if table is not None:
+            matched = set()
+            for name, entry in entries.items():
+                rows = table.find_companies(name)
+                if len(rows) == 1:
+                    entry["symbol"] = rows[0]["symbol"]
+                    entry["sector"] = rows[0]["sector"]
+                    matched.add(rows[0]["company"])
+            for row in table.rows:
+                if row["company"] not in matched and row["company"] not in entries:
+                    entry = entries.setdefault(row["company"], _new_entry(0, "esg_data"))
+                    entry["symbol"] = row["symbol"]
+                    entry["sector"] = row["sector"]
+
+        return entries
+
+    def _load_esg_table(self, mtime):
+        """Load the ESG table, reusing the previous copy if unchanged on disk"""
+        if mtime is None:
+            return None
+        if self._esg_table is None or mtime != self._esg_mtime:
+            self._esg_table = EsgDataTable(self.esg_data_file)
+            self._esg_mtime = mtime
+        return self._esg_table
+
+
+def _new_entry(chunks: int, source: str = None) -> dict:
+    return {
+        "chunks": chunks,
+        "sources": [source] if source else [],
+        "symbol": None,
+        "sector": None
+    }
+
+
+def _mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+_default_catalog = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_company_catalog() -> CompanyCatalog:
+    """
+    Get the shared company catalog for this process
+
+    Returns:
+        CompanyCatalog instance
+    """
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = CompanyCatalog()
+        return _default_catalog
@@ -0,0 +1,250 @@
+"""
+Company Router
+Picks the company a "General" question is about, so its search can be filtered
+"""
+
+import hashlib
+import os
+import re
+import threading
+import uuid
+
+import numpy as np
+
+from src.config.settings import (
+    COMPANY_ROUTER_CACHE_DIR,
+    COMPANY_ROUTER_MIN_MARGIN,
+    COMPANY_ROUTER_MIN_SIMILARITY,
+    ESG_DATA_FILE
+)
+from src.services.ingestion_manifest import get_manifest
+from src.services.structured_query import (
+    COMPANY_SUFFIXES,
+    GENERIC_WORDS,
+    LIST_CUES,
+    RANK_ASC,
+    RANK_DESC,
+    EsgDataTable,
+    normalize_text
+)
+
+# One-word names that are also everyday or ESG words ("coal", "sun"):
+# enough to look up a score, too weak to narrow a search on their own
+WEAK_ALIASES = {"apollo", "bharat", "coal", "hindustan", "reliance", "sun", "titan"}
+
+
+class CompanyRouter:
+    """
+    Maps a question to one stored company, or to none
+
+    Three checks, cheapest first; the first confident one wins:
+        - Aliases of the ESG data table (full names, unique prefixes, upper-case symbols)
+        - Names of the companies in the manifest, matched as a token matrix
+          (also covers reports of companies missing from the table)
+        - Cosine similarity between the query embedding and embeddings of the
+          table's "company (symbol): description" rows, routed only when the
+          best row is both similar enough and clearly ahead of the runner-up
+
+    Ranking, listing and comparison questions are never routed, and a
+    company is only chosen if vectors are stored for it. A weak one-word
+    alias (WEAK_ALIASES) only counts when followed by the next word of the
+    name ("Coal India", not "coal"), and a question mentioning one is not
+    routed by description. Row embeddings are computed once per embedding
+    model and CSV content and cached as .npy.
+    """
+
+    def __init__(self, encode, model_name: str, table: EsgDataTable = None, manifest=None,
+                 esg_data_file: str = ESG_DATA_FILE, cache_dir: str = COMPANY_ROUTER_CACHE_DIR,
+                 min_similarity: float = COMPANY_ROUTER_MIN_SIMILARITY,
+                 min_margin: float = COMPANY_ROUTER_MIN_MARGIN):
+        """
+        Initialize the router
+
+        Args:
+            encode: Callable embedding a list of texts (the search model's encode)
+            model_name: Embedding model name (part of the embedding cache key)
+            table: EsgDataTable (loaded from esg_data_file if omitted)
+            manifest: IngestionManifest listing stored companies (shared if omitted)
+            esg_data_file: Path to the ESG CSV file
+            cache_dir: Folder for cached row embeddings
+            min_similarity: Cosine similarity the best row must reach
+            min_margin: Lead over the second best row required to route
+        """
+        self.encode = encode
+        self.model_name = model_name
+        self.esg_data_file = esg_data_file
+        self.table = table or EsgDataTable(esg_data_file)
+        self.manifest = manifest or get_manifest()
+        self.cache_dir = cache_dir
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self._version = None
+        self._row_targets = []     # Stored company per table row (None if not stored)
+        self._name_entries = []    # Word set per name matrix row
+        self._name_targets = []    # Stored company per name matrix row
+        self._name_matrix = None   # Name entries x vocabulary, 0/1
+        self._vocabulary = {}
+        self._embeddings = None    # Table rows x dim, L2-normalized
+
+    def route(self, user_query: str, query_embedding=None):
+        """
+        Find the company a question is about
+
+        Args:
+            user_query: User's question
+            query_embedding: The query's embedding from the search model
+                (the description check is skipped if omitted)
+
+        Returns:
+            Stored company name, or None to search every company
+        """
+        text = normalize_text(user_query)
+        if (re.search(RANK_ASC, text) or re.search(RANK_DESC, text)
+                or re.search(LIST_CUES, text)):
+            return None
+        self._refresh()
+        if not self._name_targets and not any(self._row_targets):
+            return None
+
+        rows = []
+        for alias, row in self.table.mentions(user_query):
+            if alias in WEAK_ALIASES and not _names_company(text, row):
+                continue
+            if row not in rows:
+                rows.append(row)
+        if len(rows) > 1:
+            return None  # A comparison: not one company
+        if rows:
+            # A named company without stored vectors may still be stored under another name
+            company = self._row_targets[self.table.rows.index(rows[0])]
+            return company or self._match_names(text)
+
+        # After a weak word the description check would mostly echo that word
+        company = self._match_names(text)
+        weak = any(word in WEAK_ALIASES for word in text.split())
+        if company is not None or query_embedding is None or weak:
+            return company
+        return self._match_description(query_embedding)
+
+    def _refresh(self):
+        """Rebuild the stored-company mappings when the manifest changes"""
+        version = self.manifest.version
+        with self._lock:
+            if version == self._version:
+                return
+            stored = list(self.manifest.get_companies())
+
+            # Table row -> stored company, when the stored name points at exactly that row
+            by_row = {}
+            for name in stored:
+                rows = self.table.find_companies(name)
+                if len(rows) == 1:
+                    by_row.setdefault(rows[0]["company"], name)
+            self._row_targets = [by_row.get(row["company"]) for row in self.table.rows]
+
+            # Name entries: each stored name's core words, plus its symbol
+            ambiguous = (GENERIC_WORDS | WEAK_ALIASES
+                         | {w for key in self.table.by_sector for w in key.split()})
+            entries = []
+            for name in stored:
+                words = frozenset(w for w in normalize_text(name.replace("_", " ")).split()
+                                  if w not in COMPANY_SUFFIXES and len(w) >= 3)
+                if len(words) == 1 and words <= ambiguous:
+                    continue
+                if words:
+                    entries.append((words, name))
+            for row, name in zip(self.table.rows, self._row_targets):
+                symbol = row["symbol"].lower()
+                if name is not None and len(symbol) >= 3 and symbol not in ambiguous:
+                    entries.append((frozenset([symbol]), name))
+
+            vocabulary = {w: i for i, w in enumerate(sorted(set().union(*(e[0] for e in entries))))}
+            matrix = np.zeros((len(entries), len(vocabulary)), dtype=np.float32)
+            for i, (words, _) in enumerate(entries):
+                matrix[i, [vocabulary[w] for w in words]] = 1
+            self._vocabulary = vocabulary
+            self._name_matrix = matrix
+            self._name_entries = [words for words, _ in entries]
+            self._name_targets = [name for _, name in entries]
+            self._version = version
+
+    def _match_names(self, text: str):
+        """Stored company whose name words all appear in the question, if exactly one"""
+        if not self._name_targets:
+            return None
+        query = np.zeros(len(self._vocabulary), dtype=np.float32)
+        for word in text.split():
+            if word in self._vocabulary:
+                query[self._vocabulary[word]] = 1
+        covered = self._name_matrix @ query == self._name_matrix.sum(axis=1)
+        full = list(np.flatnonzero(covered))
+        # "Tata Steel" also covers "Tata": keep the most specific entries only
+        full = [i for i in full
+                if not any(self._name_entries[i] < self._name_entries[j] for j in full)]
+        targets = {self._name_targets[i] for i in full}
+        return targets.pop() if len(targets) == 1 else None
+
+    def _match_description(self, query_embedding):
+        """Stored company whose table description is clearly the closest, if any"""
+        if not any(self._row_targets):
+            return None
+        embeddings = self._row_embeddings()
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm == 0 or embeddings.shape[1] != query.shape[0]:
+            return None
+        scores = embeddings @ (query / norm)
+        order = np.argsort(scores)[::-1]
+        best = scores[order[0]]
+        runner_up = scores[order[1]] if len(order) > 1 else -1.0
+        if best < self.min_similarity or best - runner_up < self.min_margin:
+            return None
+        return self._row_targets[order[0]]
+
+    def _row_embeddings(self) -> np.ndarray:
+        """Embeddings of the table rows, from the cache or encoded once"""
+        with self._lock:
+            if self._embeddings is not None:
+                return self._embeddings
+            path = os.path.join(self.cache_dir, f"{self._cache_key()}.npy")
+            try:
+                embeddings = np.load(path)
+            except (OSError, ValueError):
+                embeddings = None
+            if embeddings is None or len(embeddings) != len(self.table.rows):
+                texts = [f"{row['company']} ({row['symbol']}): {row['description']}"
+                         for row in self.table.rows]
+                embeddings = np.asarray(self.encode(texts), dtype=np.float32)
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings = embeddings / np.where(norms == 0, 1, norms)
+                _save_array(path, embeddings)
+            self._embeddings = embeddings
+            return embeddings
+
+    def _cache_key(self) -> str:
+        """Embedding model plus table content"""
+        digest = hashlib.sha256(self.model_name.encode())
+        try:
+            with open(self.esg_data_file, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(repr([row["description"] for row in self.table.rows]).encode())
+        return digest.hexdigest()[:16]
+
+
+def _names_company(text: str, row: dict) -> bool:
+    """Whether normalized text contains the first two words of a company's name"""
+    words = normalize_text(row["company"]).split()[:2]
+    return re.search(r"\b" + re.escape(" ".join(words)) + r"\b", text) is not None
+
+
+def _save_array(path: str, array: np.ndarray):
+    """Write an array atomically; a read-only cache folder only costs a re-encode"""
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}.npy"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
@@ -0,0 +1,237 @@
+"""
+Deduplication Service
+Strips repeated page headers/footers and drops near-duplicate chunks before embedding
+"""
+
+import hashlib
+import random
+import re
+from collections import Counter
+from functools import lru_cache
+
+from src.config.settings import (
+    DEDUP_SIMILARITY,
+    DEDUP_NUM_PERM,
+    DEDUP_LSH_BANDS,
+    BOILERPLATE_EDGE_LINES,
+    BOILERPLATE_MIN_PAGE_RATIO,
+    BOILERPLATE_MIN_PAGES
+)
+
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+MINHASH_SEED = 1  # Fixed so signatures are comparable across runs
+
+WORD_PATTERN = re.compile(r"\w+")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def normalize_line(line: str) -> str:
+    """
+    Normalize a line for header/footer comparison
+
+    Page numbers and dates differ between pages, so digit runs are collapsed.
+
+    Args:
+        line: Raw text line
+
+    Returns:
+        Lowercased line with digits replaced by '#' and whitespace collapsed
+    """
+    return " ".join(DIGITS_PATTERN.sub("#", line.lower()).split())
+
+
+def strip_boilerplate(pages: list) -> tuple:
+    """
+    Remove lines repeated at the top or bottom of many pages
+
+    Args:
+        pages: Page texts in page order
+
+    Returns:
+        Tuple of (cleaned pages, number of lines removed)
+    """
+    page_lines = [page.split("\n") for page in pages]
+    non_empty_pages = sum(1 for page in pages if page.strip())
+    if non_empty_pages < BOILERPLATE_MIN_PAGES:
+        return list(pages), 0
+
+    # Count each normalized edge line once per page
+    counts = Counter()
+    for lines in page_lines:
+        counts.update({normalize_line(lines[i]) for i in _edge_indices(lines)})
+    threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_PAGE_RATIO * non_empty_pages)
+    repeated = {line for line, count in counts.items() if line and count >= threshold}
+
+    cleaned = []
+    removed = 0
+    for lines in page_lines:
+        edges = set(_edge_indices(lines))
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edges and normalize_line(line) in repeated:
+                removed += 1
+            else:
+                kept.append(line)
+        cleaned.append("\n".join(kept))
+    return cleaned, removed
+
+
+def _edge_indices(lines: list) -> list:
+    """Indices of the first and last BOILERPLATE_EDGE_LINES non-empty lines of a page"""
+    non_empty = [i for i, line in enumerate(lines) if line.strip()]
+    if len(non_empty) <= 2 * BOILERPLATE_EDGE_LINES:
+        return non_empty
+    return non_empty[:BOILERPLATE_EDGE_LINES] + non_empty[-BOILERPLATE_EDGE_LINES:]
+
+
+def shingles(text: str) -> set:
+    """
+    Word shingles of a chunk
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Set of SHINGLE_SIZE-word strings (the whole text if shorter)
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+@lru_cache(maxsize=None)
+def _permutations(count: int) -> tuple:
+    """Fixed (a, b) coefficients of the universal hashes a * x + b mod MERSENNE_PRIME"""
+    generator = random.Random(MINHASH_SEED)
+    return tuple(
+        (generator.randrange(1, MERSENNE_PRIME), generator.randrange(0, MERSENNE_PRIME))
+        for _ in range(count)
+    )
+
+
+def minhash(text: str, num_perm: int = DEDUP_NUM_PERM) -> tuple:
+    """
+    Compute a MinHash signature over word shingles
+
+    Args:
+        text: Chunk text
+        num_perm: Signature length
+
+    Returns:
+        Tuple of num_perm integers; the share of equal positions between two
+        signatures estimates the Jaccard similarity of their shingle sets
+    """
+    values = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles(text)
+    ]
+    return tuple(
+        min((a * value + b) % MERSENNE_PRIME for value in values)
+        for a, b in _permutations(num_perm)
+    )
+
+
+class MinHashIndex:
+    """LSH index of MinHash signatures (banding) with a Jaccard check on candidates"""
+
+    def __init__(self, threshold: float = DEDUP_SIMILARITY, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_LSH_BANDS):
+        """
+        Initialize the index
+
+        Args:
+            threshold: Estimated Jaccard similarity treated as a duplicate
+            num_perm: Signature length
+            bands: Number of LSH bands (num_perm must be divisible by it);
+                candidate pairs are those agreeing on every row of some band
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self._rows = num_perm // bands
+        self._buckets = [dict() for _ in range(bands)]
+
+    def _band_keys(self, signature: tuple):
+        for band, buckets in enumerate(self._buckets):
+            yield buckets, signature[band * self._rows:(band + 1) * self._rows]
+
+    def find(self, signature: tuple):
+        """
+        Find a stored near-duplicate
+
+        Args:
+            signature: MinHash signature
+
+        Returns:
+            Matching signature or None
+        """
+        for buckets, key in self._band_keys(signature):
+            for candidate in buckets.get(key, ()):
+                if similarity(candidate, signature) >= self.threshold:
+                    return candidate
+        return None
+
+    def add(self, signature: tuple):
+        """Store a signature"""
+        for buckets, key in self._band_keys(signature):
+            buckets.setdefault(key, []).append(signature)
+
+
+def similarity(first: tuple, second: tuple) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+class ChunkDeduplicator:
+    """
+    Near-duplicate chunk filter
+
+    One index is shared by every document passed to the same instance, so
+    documents of one company processed together are deduplicated against
+    each other as well as internally.
+    """
+
+    def __init__(self, threshold: float = DEDUP_SIMILARITY):
+        """
+        Initialize the deduplicator
+
+        Args:
+            threshold: Estimated Jaccard similarity treated as a duplicate
+        """
+        self.index = MinHashIndex(threshold)
+
+    def deduplicate(self, chunks: list) -> tuple:
+        """
+        Drop chunks that near-duplicate an earlier chunk
+
+        Args:
+            chunks: Text chunks in document order
+
+        Returns:
+            Tuple of (kept chunks, number of chunks dropped)
+        """
+        kept, dropped = self.select(chunks)
+        return [chunks[i] for i in kept], dropped
+
+    def select(self, chunks: list) -> tuple:
+        """
+        Like deduplicate(), but return the positions of the kept chunks
+
+        Args:
+            chunks: Text chunks in document order
+
+        Returns:
+            Tuple of (indices of kept chunks, number of chunks dropped)
+        """
+        kept = []
+        for i, chunk in enumerate(chunks):
+            if not chunk.strip():
+                continue
+            signature = minhash(chunk)
+            if self.index.find(signature) is not None:
+                continue
+            self.index.add(signature)
+            kept.append(i)
+        return kept, len(chunks) - len(kept)
@@ -4,45 +4,179 @@ Handles PDF text extraction, chunking, embedding generation, and vector storage
 """
 
 import os
-import pdfplumber
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
+import threading
+from bisect import bisect_right
+from contextlib import nullcontext
+
+import numpy as np
 
 from src.config.settings import (
     PINECONE_API_KEY,
-    INDEX_NAME,
     CHUNK_SIZE,
     OVERLAP,
-    EMBEDDING_MODEL
+    EMBED_BATCH_SIZE,
+    UPSERT_BATCH_SIZE,
+    DELETE_BATCH_SIZE,
+    TEXT_CACHE_ENABLED,
+    DEDUP_ENABLED,
+    LOCAL_INDEX_ENABLED,
+    MEMORY_REPORT,
+    FACTS_ENABLED
 )
+from src.services.deduplication import ChunkDeduplicator, strip_boilerplate
+from src.services.facts_store import get_facts_store, parse_table, table_pages
+from src.services.index_generations import follow_active_generation, get_index_generations
+from src.services.ingestion_manifest import get_manifest, next_id_prefix
+from src.services.pdf_extraction import extract_tables, get_extraction_engine
+from src.services.text_cache import PageTextCache, hash_pdf_source
+from src.utils.lazy_imports import lazy_attribute, lazy_resource
+from src.utils.memory import MemoryReport, get_memory_budget
+from src.utils.profiling import profiled
+from src.utils.streams import open_binary_source, source_size
+
+# Heavy dependencies are imported on first use
+SentenceTransformer = lazy_attribute("sentence_transformers", "SentenceTransformer")
+Pinecone = lazy_attribute("pinecone", "Pinecone")
 
 
 class DocumentProcessor:
     """Service for processing PDF documents and storing in vector database"""
     
-    def __init__(self):
-        """Initialize the document processor with model and Pinecone connection"""
-        self.model = SentenceTransformer(EMBEDDING_MODEL)
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.index = self.pc.Index(INDEX_NAME)
+    def __init__(self, manifest=None, extractor=None, text_cache=None, local_store=None,
+                 generation: dict = None, memory_budget=None, memory_report=None,
+                 facts_store=None):
+        """
+        Initialize the document processor
+        
+        The embedding model and Pinecone connection are created on first use.
+        
+        Args:
+            manifest: IngestionManifest recording stored companies (shared if omitted)
+            extractor: PDF ExtractionEngine (PDF_EXTRACTION_ENGINE if omitted)
+            text_cache: PageTextCache for extracted text (TEXT_CACHE_DIR if
+                omitted and TEXT_CACHE_ENABLED)
+            local_store: LocalVectorStore mirroring stored vectors (the
+                generation's store if omitted and LOCAL_INDEX_ENABLED)
+            generation: Index generation to write to (index migrations);
+                by default the active generation is followed
+            memory_budget: MemoryBudget bounding in-flight ingestions (shared
+                by the process if omitted)
+            memory_report: MemoryReport collecting allocations per stage
+                (a new one if omitted and MEMORY_REPORT, else none)
+            facts_store: FactsStore receiving numbers parsed from report
+                tables (FACTS_DB if omitted and FACTS_ENABLED)
+        """
+        self.manifest = manifest or get_manifest()
+        self.extractor = extractor or get_extraction_engine()
+        self.text_cache = text_cache or (PageTextCache() if TEXT_CACHE_ENABLED else None)
+        if generation is None:
+            self.generations = get_index_generations()
+            self.generation = self.generations.active()
+        else:
+            self.generations = None
+            self.generation = generation
+        self._generation_lock = threading.Lock()
+        self._owns_local_store = local_store is None and LOCAL_INDEX_ENABLED
+        if local_store is None:
+            local_store = self._open_local_store(self.generation)
+        self.local_store = local_store
+        self.deduplicate = DEDUP_ENABLED
+        self.memory_budget = memory_budget or get_memory_budget()
+        self.memory_report = memory_report or (MemoryReport() if MEMORY_REPORT else None)
+        self.facts_store = facts_store or (get_facts_store() if FACTS_ENABLED else None)
+        self._local = threading.local()
+        self._company_locks = {}
+        self._company_locks_lock = threading.Lock()
+    
+    @lazy_resource("model", "load embedding model")
+    def model(self):
+        """Sentence transformer used for chunk embeddings"""
+        return self._load_model(self.generation)
+    
+    @lazy_resource("connection", "create Pinecone client")
+    def pc(self):
+        """Pinecone client"""
+        return Pinecone(api_key=PINECONE_API_KEY)
+    
+    @lazy_resource("connection", "connect Pinecone index")
+    def index(self):
+        """Pinecone index receiving the vectors"""
+        return self._connect_index(self.generation)
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    def _load_model(self, generation: dict):
+        return SentenceTransformer(generation["embedding_model"])
+    
+    def _connect_index(self, generation: dict):
+        return self.pc.Index(generation["index_name"])
+    
+    def _open_local_store(self, generation: dict):
+        if not self._owns_local_store:
+            return getattr(self, "local_store", None)
+        from src.services.vector_store import get_local_vector_store
+        return get_local_vector_store(generation)
+    
+    @property
+    def last_dedup_stats(self) -> dict:
+        """Deduplication stats for the most recent document processed on the calling thread"""
+        return getattr(self._local, "dedup_stats", {})
+    
+    @property
+    def last_extraction_stats(self) -> dict:
+        """Extractor stats for the most recent document on the calling thread ({} if cached)"""
+        return getattr(self._local, "extraction_stats", {})
+    
+    def extract_text_from_pdf(self, pdf_source, progress_callback=None,
+                              pdf_hash: str = None) -> str:
         """
         Extract text content from PDF file
         
         Args:
-            pdf_path: Path to the PDF file
+            pdf_source: Path to the PDF file or a seekable binary stream
+            progress_callback: Optional callable(stage, done, total)
+            pdf_hash: SHA-256 of the PDF if already known
             
         Returns:
             Extracted text as string
         """
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
+        pages = self.extract_pages_from_pdf(pdf_source, progress_callback, pdf_hash)
+        return "".join(page_text + "\n" for page_text in pages if page_text)
+    
+    def extract_pages_from_pdf(self, pdf_source, progress_callback=None,
+                               pdf_hash: str = None) -> list:
+        """
+        Extract text content per page using the configured extraction engine
+        
+        Pages are served from the text cache when this exact PDF was already
+        parsed by the same extractor version, so re-chunking and re-embedding
+        runs skip PDF parsing entirely.
+        
+        Args:
+            pdf_source: Path to the PDF file or a seekable binary stream
+            progress_callback: Optional callable(stage, done, total)
+            pdf_hash: SHA-256 of the PDF if already known
+            
+        Returns:
+            List of page texts in page order
+        """
+        self._local.extraction_stats = {}
+        if self.text_cache is not None:
+            pdf_hash = pdf_hash or hash_pdf_source(pdf_source)
+            cached = self.text_cache.get_pages(pdf_hash, self.extractor.cache_key)
+            if cached is not None:
+                if progress_callback:
+                    progress_callback("pages", len(cached), len(cached))
+                return cached
+        
+        on_page = None
+        if progress_callback:
+            on_page = lambda done, total: progress_callback("pages", done, total)
+        pages = self.extractor.extract_pages(pdf_source, progress_callback=on_page)
+        pages = [pages[number] for number in sorted(pages)]
+        self._local.extraction_stats = getattr(self.extractor, "last_stats", {})
+        
+        if self.text_cache is not None:
+            self.text_cache.put_pages(pdf_hash, self.extractor.cache_key, pages)
+        return pages
     
     def chunk_text(self, text: str, chunk_size: int = CHUNK_SIZE, 
                    overlap: int = OVERLAP) -> list:
@@ -57,87 +191,489 @@ class DocumentProcessor:
         Returns:
             List of text chunks
         """
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start = end - overlap
-        
-        return chunks
+        return [text[start:end] for start, end in chunk_spans(len(text), chunk_size, overlap)]
     
-    def process_and_store_pdf(self, pdf_file, company_name: str = None) -> tuple:
+    def process_and_store_pdf(self, pdf_file, company_name: str = None,
+                              progress_callback=None, profile=None) -> tuple:
         """
         Process PDF file and store vectors in Pinecone
         
+        Uploads and in-memory buffers are parsed straight from memory (no
+        temporary file, no copy of the upload).
+        
         Args:
-            pdf_file: PDF file object or path
+            pdf_file: Path, Streamlit uploaded file, bytes-like object or
+                readable binary stream (e.g. an object storage download)
             company_name: Name of the company (optional, extracted from filename) 
+            progress_callback: Optional callable(stage, done, total) called with
+                stage "pages", "chunks" (embedded) and "vectors" (stored)
+            profile: True (or "cprofile" / "sampling") to write a profile of
+                this ingestion to PROFILE_DIR; None follows ESG_PROFILE sampling
             
         Returns:
             Tuple of (success: bool, message: str)
         """
+        with profiled("process_and_store_pdf", profile):
+            return self._process_and_store_pdf(pdf_file, company_name, progress_callback)
+    
+    def _process_and_store_pdf(self, pdf_file, company_name: str, progress_callback) -> tuple:
+        source = None
+        owned = False
+        self._local.dedup_stats = {}
+        self._local.extraction_stats = {}
         try:
-            # Handle both file paths and uploaded file objects
-            if hasattr(pdf_file, 'name'):
-                # Streamlit uploaded file
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(pdf_file.getvalue())
-                    pdf_path = tmp_file.name
-                
-                if company_name is None:
-                    company_name = pdf_file.name.replace(".pdf", "")
-            else:
-                # File path
-                pdf_path = pdf_file
-                if company_name is None:
-                    company_name = os.path.basename(pdf_file).replace(".pdf", "")
+            source, source_name, owned = open_binary_source(pdf_file)
             
-            # Extract text
-            text = self.extract_text_from_pdf(pdf_path)
+            if company_name is None:
+                if not source_name:
+                    return False, "Company name is required for unnamed PDF streams"
+                company_name = source_name.replace(".pdf", "")
             
-            if not text.strip():
-                return False, "No text found in PDF"
+            pdf_hash = hash_pdf_source(source)
             
-            # Chunk text
-            chunks = self.chunk_text(text)
+            # Reserve room for the text (about the size of the PDF) and one
+            # window of embeddings before extracting; when other ingestions
+            # hold the budget this waits, so extraction never runs ahead
+            reservation = source_size(source) + self.memory_budget.window_bytes
+            with self.memory_budget.reserve(reservation):
+                # Extract text (served from the page text cache when possible)
+                with self._memory_stage("extract"):
+                    pages = self.extract_pages_from_pdf(source, progress_callback, pdf_hash)
+                
+                if not any(page.strip() for page in pages):
+                    if getattr(self.extractor, "ocr_engine", None) is None:
+                        return False, ("No text found in PDF (scanned documents need OCR: "
+                                       "install Tesseract and pytesseract)")
+                    return False, "No text found in PDF"
+                
+                with self._memory_stage("chunk"):
+                    chunks = self.prepare_chunk_records(pages)
+                facts_error = None
+                with self._memory_stage("facts"):
+                    try:
+                        facts = self.extract_facts(source, pages)
+                    except Exception as e:
+                        # A table finder failure must not cost the document its text
+                        facts, facts_error = [], str(e)
+                del pages  # The chunk records hold the text from here on
+                
+                with self._memory_stage("embed_store"):
+                    chunk_count = self._replace_company_vectors(
+                        chunks, company_name, progress_callback, source=source_name, sha256=pdf_hash,
+                        facts=facts
+                    )
             
-            # Create embeddings
-            embeddings = self.model.encode(chunks, show_progress_bar=False)
+            message = self._success_message(chunk_count, company_name, len(facts))
+            if facts_error and self.facts_store is not None:
+                message += f" (table facts skipped: {facts_error})"
+            return True, message
+        
+        except Exception as e:
+            return False, f"Error processing PDF: {str(e)}"
+        
+        finally:
+            if owned:
+                source.close()
+    
+    def reprocess_from_cache(self, company_name: str, progress_callback=None) -> tuple:
+        """
+        Re-chunk and re-embed a company from cached page text, without the PDF
+        
+        Used after changing CHUNK_SIZE / OVERLAP or the chunker: no PDF is
+        opened or parsed, pages are streamed from the text cache.
+        
+        Args:
+            company_name: Company recorded in the manifest
+            progress_callback: Optional callable(stage, done, total)
+            
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        try:
+            entry = self.manifest.get_company(company_name)
+            if not entry or not entry.get("sha256"):
+                return False, f"No cached source recorded for {company_name}"
+            if self.text_cache is None:
+                return False, "Text cache is disabled"
             
-            # Prepare vectors for Pinecone
-            vectors = []
-            for i, emb in enumerate(embeddings):
-                vectors.append((
-                    f"{company_name}_{i}",
-                    emb.tolist(),
-                    {
-                        "company": company_name,
-                        "text": chunks[i]
-                    }
-                ))
+            pdf_hash = entry["sha256"]
+            total_pages = self.text_cache.page_count(pdf_hash, self.extractor.cache_key)
+            if total_pages is None:
+                return False, f"Page text for {company_name} is not cached"
             
-            # Upsert into Pinecone
-            self.index.upsert(vectors=vectors)
+            pages = [
+                page_text
+                for _, page_text in self.text_cache.iter_pages(pdf_hash, self.extractor.cache_key)
+            ]
+            if progress_callback:
+                progress_callback("pages", total_pages, total_pages)
             
-            # Clean up temporary file if created
-            if hasattr(pdf_file, 'name') and os.path.exists(pdf_path):
-                os.remove(pdf_path)
+            chunks = self.prepare_chunk_records(pages)
+            chunk_count = self._replace_company_vectors(chunks, company_name, progress_callback,
+                                                        sha256=pdf_hash)
             
-            return True, f"Successfully processed {len(chunks)} chunks from {company_name}"
+            return True, self._success_message(chunk_count, company_name)
         
         except Exception as e:
-            return False, f"Error processing PDF: {str(e)}"
+            return False, f"Error processing cached text: {str(e)}"
+    
+    def list_companies(self) -> list:
+        """
+        List the companies stored in the vector database
+        
+        Returns:
+            List of manifest entries (company, chunks, source, updated_at,
+            generation, ...) sorted by company name
+        """
+        return [
+            dict(entry, company=name)
+            for name, entry in sorted(self.manifest.get_companies().items())
+        ]
+    
+    def delete_company(self, company_name: str) -> tuple:
+        """
+        Delete all vectors (and table facts) of a company
+        
+        The ids come from the manifest, so they are deleted in bulk without
+        listing or scanning the index.
+        
+        Args:
+            company_name: Company recorded in the manifest
+            
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        with self._company_lock(company_name), self._switch_guard():
+            try:
+                follow_active_generation(self)
+                if not self.manifest.get_company(company_name):
+                    return False, f"{company_name} is not stored"
+                
+                vector_ids = self.manifest.vector_ids(company_name)
+                self._delete_vectors(vector_ids)
+                self.manifest.remove_company(company_name)
+                if self.facts_store is not None:
+                    self.facts_store.delete_company(company_name)
+                return True, f"Deleted {len(vector_ids)} chunks of {company_name}"
+            
+            except Exception as e:
+                return False, f"Error deleting {company_name}: {str(e)}"
+    
+    def replace_company(self, company_name: str, pdf_file, progress_callback=None) -> tuple:
+        """
+        Replace a stored company's document with a new PDF
+        
+        The new vectors are written under fresh ids before the old ones are
+        deleted, so searches never see the company without a document, and a
+        failed replacement leaves the previous document in place. The PDF's
+        filename is ignored, so a renamed file does not create a new company.
+        
+        Args:
+            company_name: Company recorded in the manifest
+            pdf_file: Replacement PDF (any source accepted by process_and_store_pdf)
+            progress_callback: Optional callable(stage, done, total)
+            
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        if not self.manifest.get_company(company_name):
+            return False, f"{company_name} is not stored; upload it as a new document"
+        return self.process_and_store_pdf(pdf_file, company_name, progress_callback)
+    
+    def prepare_chunks(self, pages: list, deduplicator: ChunkDeduplicator = None,
+                       chunk_size: int = CHUNK_SIZE, overlap: int = OVERLAP) -> list:
+        """
+        Turn page texts into the chunks to embed
+        
+        Repeated page headers/footers are stripped before chunking and
+        near-duplicate chunks (disclaimers, repeated GRI index tables) are
+        dropped, so they are neither embedded nor stored. Counts are kept in
+        `last_dedup_stats`.
+        
+        Args:
+            pages: Page texts in page order
+            deduplicator: ChunkDeduplicator to share across documents of the
+                same company (a fresh one per document if omitted)
+            chunk_size: Size of each chunk in characters
+            overlap: Number of overlapping characters between chunks
+            
+        Returns:
+            List of text chunks
+        """
+        return [record["text"] for record in
+                self.prepare_chunk_records(pages, deduplicator, chunk_size, overlap)]
     
-    def process_folder(self, folder_path: str) -> dict:
+    def prepare_chunk_records(self, pages: list, deduplicator: ChunkDeduplicator = None,
+                              chunk_size: int = CHUNK_SIZE, overlap: int = OVERLAP) -> list:
+        """
+        Turn page texts into the chunks to embed, with their position in the document
+        
+        Same chunks as prepare_chunks(). Offsets index the cleaned document
+        text (pages joined with newlines), so consecutive chunks can be
+        stitched back together without repeating their overlap.
+        
+        Args:
+            pages: Page texts in page order
+            deduplicator: ChunkDeduplicator to share across documents of the
+                same company (a fresh one per document if omitted)
+            chunk_size: Size of each chunk in characters
+            overlap: Number of overlapping characters between chunks
+            
+        Returns:
+            List of dictionaries with text, chunk (sequence number of the
+            stored chunk), page, page_end (1-based) and char_start / char_end
+        """
+        boilerplate_lines = 0
+        if self.deduplicate:
+            pages, boilerplate_lines = strip_boilerplate(pages)
+        
+        # Start offset and page number of every page included in the text
+        page_starts, page_numbers, parts = [], [], []
+        offset = 0
+        for number, page in enumerate(pages, start=1):
+            if not (page.strip() if self.deduplicate else page):
+                continue
+            page_starts.append(offset)
+            page_numbers.append(number)
+            parts.append(page + "\n")
+            offset += len(page) + 1
+        text = "".join(parts)
+        
+        records = [
+            {
+                "text": text[start:end],
+                "page": page_numbers[bisect_right(page_starts, start) - 1],
+                "page_end": page_numbers[bisect_right(page_starts, end - 1) - 1],
+                "char_start": start,
+                "char_end": end
+            }
+            for start, end in chunk_spans(len(text), chunk_size, overlap)
+        ]
+        
+        if not self.deduplicate:
+            self._local.dedup_stats = {}
+        else:
+            kept, duplicates = (deduplicator or ChunkDeduplicator()).select(
+                [record["text"] for record in records]
+            )
+            self._local.dedup_stats = {
+                "boilerplate_lines": boilerplate_lines,
+                "chunks": len(records),
+                "duplicate_chunks": duplicates
+            }
+            records = [records[i] for i in kept]
+        
+        for sequence, record in enumerate(records):
+            record["chunk"] = sequence
+        return records
+    
+    def extract_facts(self, pdf_source, pages: list) -> list:
+        """
+        Parse numeric ESG facts from a document's tables
+        
+        Only pages whose text mentions a known metric next to numbers are
+        handed to pdfplumber's (slow) table finder.
+        
+        Args:
+            pdf_source: Path or seekable binary stream
+            pages: Page texts in page order
+            
+        Returns:
+            Fact records (see facts_store.parse_table)
+        """
+        if self.facts_store is None:
+            return []
+        facts = []
+        for page_number, table in extract_tables(pdf_source, table_pages(pages)):
+            facts.extend(parse_table(table, page_number))
+        return facts
+    
+    def _success_message(self, chunk_count: int, company_name: str, fact_count: int = 0) -> str:
+        message = f"Successfully processed {chunk_count} chunks from {company_name}"
+        duplicates = self.last_dedup_stats.get("duplicate_chunks")
+        if duplicates:
+            message += f" ({duplicates} duplicate chunks skipped)"
+        if fact_count:
+            message += f", {fact_count} table facts indexed"
+        return message
+    
+    def _memory_stage(self, name: str):
+        """Context manager measuring a stage when a memory report is collected"""
+        if self.memory_report is None:
+            return nullcontext()
+        return self.memory_report.stage(name)
+    
+    def _company_lock(self, company_name: str) -> threading.Lock:
+        """Lock serializing writes to one company's vectors"""
+        with self._company_locks_lock:
+            return self._company_locks.setdefault(company_name, threading.Lock())
+    
+    def _switch_guard(self):
+        """Keep index generation switches out while a company is written"""
+        if self.generations is None:
+            return nullcontext()  # Pinned to a generation being built
+        return self.generations.switch_lock.shared()
+    
+    def _replace_company_vectors(self, chunks: list, company_name: str, progress_callback=None,
+                                 source: str = None, sha256: str = None, facts: list = None) -> int:
+        """
+        Store a company's chunks, replacing any previously stored document
+        
+        Each ingestion after the first writes ids with a new generation
+        prefix, records them in the manifest and only then deletes the old
+        ids, so no orphans are left when the new document has fewer chunks.
+        The index generation cannot switch in between (see switch_lock).
+        Table facts are replaced under the same company lock, right after
+        the manifest, so they always describe the stored document.
+        
+        Args:
+            chunks: Chunk records from prepare_chunk_records()
+            company_name: Company name
+            progress_callback: Optional callable(stage, done, total)
+            source: Source file name for the manifest
+            sha256: Hash of the source PDF for the manifest
+            facts: Table facts of the document (None leaves stored facts as they are)
+            
+        Returns:
+            Number of chunks stored
+        """
+        with self._company_lock(company_name), self._switch_guard():
+            follow_active_generation(self)
+            previous = self.manifest.get_company(company_name)
+            old_ids = self.manifest.vector_ids(company_name)
+            id_prefix = next_id_prefix(
+                company_name, (previous.get("id_prefix") or company_name) if previous else None
+            )
+            
+            try:
+                chunk_count = self._embed_and_store(chunks, company_name, progress_callback,
+                                                    id_prefix, document=sha256)
+            except Exception:
+                # Roll back the partial upload; the previous document stays intact
+                try:
+                    self._delete_vectors([f"{id_prefix}_{i}" for i in range(len(chunks))])
+                except Exception:
+                    pass
+                raise
+            
+            # Record the ingestion event (invalidates company catalog caches)
+            self.manifest.record_ingestion(company_name, chunk_count, source=source,
+                                           sha256=sha256, id_prefix=id_prefix)
+            if facts is not None and self.facts_store is not None:
+                self.facts_store.replace_company(company_name, facts, document=sha256)
+            self._delete_vectors(old_ids)
+            return chunk_count
+    
+    def _delete_vectors(self, vector_ids: list):
+        """
+        Delete vectors by id from the index and the local store
+        
+        Args:
+            vector_ids: Ids to delete
+        """
+        for start in range(0, len(vector_ids), DELETE_BATCH_SIZE):
+            self.index.delete(ids=vector_ids[start:start + DELETE_BATCH_SIZE])
+        
+        if self.local_store is not None and vector_ids:
+            self.local_store.delete(vector_ids)
+            self.local_store.save()
+    
+    def _embed_and_store(self, chunks: list, company_name: str, progress_callback=None,
+                         id_prefix: str = None, document: str = None) -> int:
+        """
+        Embed and upsert a document's chunks
+        
+        Position fields are stored as metadata next to the text, so search
+        can cite pages and fetch a hit's neighbors (`<id_prefix>_<chunk ± 1>`)
+        by id.
+        
+        Args:
+            chunks: Chunk records from prepare_chunk_records()
+            company_name: Company name used for metadata
+            progress_callback: Optional callable(stage, done, total)
+            id_prefix: Vector id prefix (defaults to the company name)
+            document: SHA-256 of the source PDF, stored as the document identity
+            
+        Returns:
+            Number of chunks stored
+        """
+        # Embeddings are uploaded one window at a time: only the window's
+        # array and one upsert request's float lists are alive at once
+        id_prefix = id_prefix or company_name
+        window = None
+        embeddings = []
+        window_start = 0
+        for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = [chunk["text"] for chunk in chunks[start:start + EMBED_BATCH_SIZE]]
+            embeddings.append(np.asarray(self.model.encode(batch, show_progress_bar=False),
+                                         dtype=np.float32))
+            if progress_callback:
+                progress_callback("chunks", start + len(batch), len(chunks))
+            
+            end = start + len(batch)
+            if window is None:
+                window = self._window_size(embeddings[0].shape[1], chunks)
+            if end - window_start >= window or end == len(chunks):
+                self._store_window(chunks, window_start, np.concatenate(embeddings),
+                                   company_name, id_prefix, document, progress_callback)
+                embeddings = []
+                window_start = end
+        
+        if self.local_store is not None and chunks:
+            self.local_store.save()
+        
+        return len(chunks)
+    
+    def _window_size(self, dimension: int, chunks: list) -> int:
+        """Chunks whose embeddings fit in the memory budget's window"""
+        text_bytes = sum(len(chunk["text"]) for chunk in chunks) // max(1, len(chunks))
+        # float32 embedding plus the record and its copy in the stored metadata
+        chunk_bytes = 4 * dimension + 2 * text_bytes + 512
+        return max(EMBED_BATCH_SIZE, self.memory_budget.window_bytes // chunk_bytes)
+    
+    def _store_window(self, chunks: list, offset: int, embeddings: np.ndarray, company_name: str,
+                      id_prefix: str, document: str, progress_callback=None):
+        """
+        Upsert one window of embedded chunks into Pinecone and the local store
+        
+        Args:
+            chunks: All chunk records of the document
+            offset: Index of the window's first chunk
+            embeddings: Window embeddings (n, dim)
+            company_name: Company name used for metadata
+            id_prefix: Vector id prefix
+            document: SHA-256 of the source PDF, or None
+            progress_callback: Optional callable(stage, done, total)
+        """
+        ids, metadata = [], []
+        for i in range(offset, offset + len(embeddings)):
+            # Pinecone metadata values may not be null
+            meta = {"company": company_name}
+            meta.update(chunks[i])
+            if document:
+                meta["document"] = document
+            ids.append(f"{id_prefix}_{i}")
+            metadata.append(meta)
+        
+        # Upsert into Pinecone in request-sized batches
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            end = start + UPSERT_BATCH_SIZE
+            self.index.upsert(vectors=list(zip(ids[start:end], embeddings[start:end].tolist(),
+                                               metadata[start:end])))
+            if progress_callback:
+                progress_callback("vectors", offset + min(end, len(ids)), len(chunks))
+        
+        # Mirror into the quantized local store straight from the model's arrays
+        if self.local_store is not None:
+            self.local_store.upsert(ids, embeddings, metadata)
+    
+    def process_folder(self, folder_path: str, profile=None) -> dict:
         """
         Process all PDF files in a folder
         
         Args:
             folder_path: Path to folder containing PDFs
+            profile: Profile every document (see process_and_store_pdf)
             
         Returns:
             Dictionary with processing results
@@ -146,7 +682,9 @@ class DocumentProcessor:
             "total_files": 0,
             "successful": 0,
             "failed": 0,
-            "total_chunks": 0
+            "total_chunks": 0,
+            "extraction": {},  # engine -> {"pages", "seconds"}
+            "deduplication": {"boilerplate_lines": 0, "chunks": 0, "duplicate_chunks": 0}
         }
         
         if not os.path.exists(folder_path):
@@ -160,7 +698,15 @@ class DocumentProcessor:
             pdf_path = os.path.join(folder_path, file)
             company_name = file.replace(".pdf", "")
             
-            success, message = self.process_and_store_pdf(pdf_path, company_name)
+            success, message = self.process_and_store_pdf(pdf_path, company_name, profile=profile)
+            
+            # Accumulate per-engine extraction timings
+            for engine, values in self.last_extraction_stats.get("engines", {}).items():
+                totals = results["extraction"].setdefault(engine, {"pages": 0, "seconds": 0.0})
+                totals["pages"] += values["pages"]
+                totals["seconds"] += values["seconds"]
+            for key, value in self.last_dedup_stats.items():
+                results["deduplication"][key] += value
             
             if success:
                 results["successful"] += 1
@@ -171,3 +717,26 @@ class DocumentProcessor:
                 results["failed"] += 1
         
         return results
+
+
+def chunk_spans(length: int, chunk_size: int = CHUNK_SIZE, overlap: int = OVERLAP) -> list:
+    """
+    Character ranges of overlapping fixed-size chunks
+    
+    Args:
+        length: Text length
+        chunk_size: Size of each chunk in characters
+        overlap: Number of overlapping characters between chunks
+        
+    Returns:
+        List of (start, end) offsets
+    """
+    spans = []
+    start = 0
+    
+    while start < length:
+        end = start + chunk_size
+        spans.append((start, min(end, length)))
+        start = end - overlap
+    
+    return spans
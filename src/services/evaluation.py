@@ -0,0 +1,276 @@
+"""
+Retrieval Evaluation
+Sweeps chunking and retrieval settings against a labeled question set on a
+throwaway local index and reports quality, size and latency side by side
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from src.config.settings import (
+    DATA_FOLDER,
+    EMBED_BATCH_SIZE,
+    EVAL_MIN_COVERAGE,
+    EVAL_RECALL_TOLERANCE,
+    VECTOR_QUANTIZATION
+)
+from src.services.deduplication import shingles
+from src.services.vector_store import LocalVectorStore
+
+
+def load_labeled_set(path: str) -> list:
+    """
+    Read labeled questions from a JSONL file
+
+    Each line is {"question": ..., "expected": "passage" or [...], "company"?: ...}.
+    A retrieved chunk counts as relevant when it overlaps any expected passage.
+
+    Args:
+        path: Input file
+
+    Returns:
+        List of {"question", "expected": [passages], "company"} dictionaries
+
+    Raises:
+        ValueError: On malformed lines
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+            expected = item.get("expected")
+            if isinstance(expected, str):
+                expected = [expected]
+            if not item.get("question") or not expected:
+                raise ValueError(f"{path}:{line_number}: 'question' and 'expected' are required")
+            questions.append({
+                "question": item["question"],
+                "expected": expected,
+                "company": item.get("company")
+            })
+    return questions
+
+
+def is_relevant(chunk: str, expected: list, min_coverage: float = EVAL_MIN_COVERAGE) -> bool:
+    """
+    Check whether a chunk contains one of the expected passages
+
+    Word shingles are compared so the match survives different chunk
+    boundaries: the chunk is relevant when it covers most of a passage, or
+    when most of the chunk lies inside a passage longer than the chunk.
+
+    Args:
+        chunk: Retrieved chunk text
+        expected: Expected passages
+        min_coverage: Fraction of shingles that must overlap
+
+    Returns:
+        True if the chunk matches a passage
+    """
+    chunk_shingles = shingles(chunk)
+    for passage in expected:
+        passage_shingles = shingles(passage)
+        overlap = len(chunk_shingles & passage_shingles)
+        if overlap and overlap >= min_coverage * min(len(passage_shingles), len(chunk_shingles)):
+            return True
+    return False
+
+
+def load_documents(processor, companies: list = None, pdf_folder: str = DATA_FOLDER) -> dict:
+    """
+    Collect page texts for the evaluation corpus
+
+    Companies recorded in the manifest are read from the text cache; PDFs in
+    pdf_folder that are not cached are extracted (and cached for next time).
+
+    Args:
+        processor: DocumentProcessor providing the extractor and text cache
+        companies: Restrict to these companies (all if None)
+        pdf_folder: Folder with "<Company>.pdf" files
+
+    Returns:
+        Dictionary of company name -> list of page texts
+    """
+    documents = {}
+    if processor.text_cache is not None:
+        for company, entry in processor.manifest.get_companies().items():
+            if companies and company not in companies or not entry.get("sha256"):
+                continue
+            pages = processor.text_cache.get_pages(entry["sha256"], processor.extractor.cache_key)
+            if pages is not None:
+                documents[company] = pages
+
+    if os.path.isdir(pdf_folder):
+        for filename in sorted(os.listdir(pdf_folder)):
+            company = filename[:-len(".pdf")]
+            if not filename.endswith(".pdf") or company in documents:
+                continue
+            if companies and company not in companies:
+                continue
+            documents[company] = processor.extract_pages_from_pdf(os.path.join(pdf_folder, filename))
+    return documents
+
+
+class RetrievalEvaluator:
+    """Builds one local index per chunking setting and scores retrieval on it"""
+
+    def __init__(self, processor, documents: dict, questions: list,
+                 quantization: str = VECTOR_QUANTIZATION):
+        """
+        Initialize the evaluator
+
+        Args:
+            processor: DocumentProcessor used for chunking (with the same
+                boilerplate stripping and deduplication as ingestion) and
+                its embedding model
+            documents: Company name -> page texts
+            questions: Labeled questions from load_labeled_set()
+            quantization: Local store format for the evaluation indexes
+        """
+        self.processor = processor
+        self.documents = documents
+        self.questions = questions
+        self.quantization = quantization
+        self._query_vectors = None
+        self.query_embed_ms = None
+
+    def query_vectors(self) -> np.ndarray:
+        """Question embeddings (computed once; they do not depend on chunking)"""
+        if self._query_vectors is None:
+            start = time.perf_counter()
+            self._query_vectors = np.asarray(self.processor.model.encode(
+                [q["question"] for q in self.questions], show_progress_bar=False
+            ))
+            self.query_embed_ms = (time.perf_counter() - start) * 1000 / max(1, len(self.questions))
+        return self._query_vectors
+
+    def build_index(self, chunk_size: int, overlap: int) -> tuple:
+        """
+        Chunk, embed and index the corpus with one chunking setting
+
+        Args:
+            chunk_size: Chunk size in characters
+            overlap: Overlap in characters
+
+        Returns:
+            Tuple of (LocalVectorStore, ingestion seconds)
+        """
+        start = time.perf_counter()
+        ids, texts, metadata = [], [], []
+        for company, pages in self.documents.items():
+            chunks = self.processor.prepare_chunks(pages, chunk_size=chunk_size, overlap=overlap)
+            for i, chunk in enumerate(chunks):
+                ids.append(f"{company}_{i}")
+                texts.append(chunk)
+                metadata.append({"company": company, "text": chunk})
+
+        embeddings = []
+        for batch_start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[batch_start:batch_start + EMBED_BATCH_SIZE]
+            embeddings.extend(self.processor.model.encode(batch, show_progress_bar=False))
+
+        store = LocalVectorStore(self.quantization)
+        if embeddings:
+            store.upsert(ids, np.asarray(embeddings), metadata)
+        return store, time.perf_counter() - start
+
+    def evaluate(self, chunk_size: int, overlap: int, top_ks: list) -> list:
+        """
+        Score every top_k on the index built with one chunking setting
+
+        Args:
+            chunk_size: Chunk size in characters
+            overlap: Overlap in characters
+            top_ks: Retrieval depths to score
+
+        Returns:
+            One result row per top_k
+        """
+        query_vectors = self.query_vectors()
+        store, ingest_seconds = self.build_index(chunk_size, overlap)
+
+        rows = []
+        for top_k in top_ks:
+            hits, reciprocal_ranks, latencies = 0, 0.0, []
+            for question, vector in zip(self.questions, query_vectors):
+                start = time.perf_counter()
+                results = store.query(vector, top_k, question["company"])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                rank = next((i for i, result in enumerate(results, 1)
+                             if is_relevant(result["text"], question["expected"])), None)
+                if rank is not None:
+                    hits += 1
+                    reciprocal_ranks += 1.0 / rank
+
+            count = max(1, len(self.questions))
+            rows.append({
+                "chunk_size": chunk_size,
+                "overlap": overlap,
+                "top_k": top_k,
+                "chunks": len(store),
+                "index_bytes": store.memory_bytes,
+                "ingest_seconds": ingest_seconds,
+                "recall_at_k": hits / count,
+                "mrr": reciprocal_ranks / count,
+                "search_ms_p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+                "search_ms_p95": float(np.percentile(latencies, 95)) if latencies else 0.0
+            })
+        return rows
+
+    def sweep(self, chunk_sizes: list, overlaps: list, top_ks: list, progress_callback=None) -> list:
+        """
+        Evaluate every combination of chunk size, overlap and top_k
+
+        Overlaps not smaller than the chunk size are skipped.
+
+        Args:
+            chunk_sizes: Chunk sizes in characters
+            overlaps: Overlaps in characters
+            top_ks: Retrieval depths
+            progress_callback: Optional callable(rows) after each chunking setting
+
+        Returns:
+            List of result rows
+        """
+        rows = []
+        for chunk_size in chunk_sizes:
+            for overlap in overlaps:
+                if overlap >= chunk_size:
+                    continue
+                setting_rows = self.evaluate(chunk_size, overlap, top_ks)
+                rows.extend(setting_rows)
+                if progress_callback:
+                    progress_callback(setting_rows)
+        return rows
+
+
+def recommend(rows: list, tolerance: float = EVAL_RECALL_TOLERANCE):
+    """
+    Pick the cheapest configuration whose recall is close to the best
+
+    Cheapest means the fewest chunks sent to the LLM (top_k), then the
+    smallest index, then the fastest ingestion.
+
+    Args:
+        rows: Result rows from RetrievalEvaluator
+        tolerance: Allowed recall drop from the best row
+
+    Returns:
+        The chosen row, or None if rows is empty
+    """
+    if not rows:
+        return None
+    best_recall = max(row["recall_at_k"] for row in rows)
+    candidates = [row for row in rows if row["recall_at_k"] >= best_recall - tolerance]
+    return min(candidates, key=lambda row: (row["top_k"], row["index_bytes"],
+                                            row["ingest_seconds"], -row["mrr"]))
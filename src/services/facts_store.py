@@ -0,0 +1,616 @@
+"""
+ESG Facts Store
+Numeric facts (emissions, energy, water, waste) parsed from report tables,
+kept in SQLite and used to answer lookups, comparisons and rankings directly
+"""
+
+import os
+import re
+import sqlite3
+import threading
+
+from src.config.settings import FACTS_DB, STRUCTURED_RANKING_LIMIT
+from src.services.structured_query import (
+    COMPANY_SUFFIXES, COMPARISON_CUES, RANK_ASC, RANK_DESC, normalize_text
+)
+
+
+# Metric name -> (label, patterns on normalized text). The first match wins,
+# so scopes and intensities come before the totals whose words they contain
+FACT_METRICS = {
+    "scope1_emissions": ("Scope 1 GHG emissions", [
+        r"scope (1|i)\b", r"direct (ghg )?emissions"
+    ]),
+    "scope2_emissions": ("Scope 2 GHG emissions", [
+        r"scope (2|ii)\b", r"indirect (ghg )?emissions"
+    ]),
+    "scope3_emissions": ("Scope 3 GHG emissions", [
+        r"scope (3|iii)\b"
+    ]),
+    "emission_intensity": ("GHG emission intensity", [
+        r"emissions? intensity", r"carbon intensity"
+    ]),
+    "energy_intensity": ("Energy intensity", [
+        r"energy intensity"
+    ]),
+    "water_intensity": ("Water intensity", [
+        r"water intensity"
+    ]),
+    "renewable_energy": ("Renewable energy", [
+        r"renewable"
+    ]),
+    "total_emissions": ("Total GHG emissions", [
+        r"(ghg|greenhouse gas|carbon|co2) emissions", r"total emissions"
+    ]),
+    "energy_consumption": ("Energy consumption", [
+        r"energy (consum|use)", r"total energy", r"\benergy\b.*\bconsum"
+    ]),
+    "water_withdrawal": ("Water withdrawal", [
+        r"water withdraw", r"\bwater\b.*\bwithdr"
+    ]),
+    "water_consumption": ("Water consumption", [
+        r"water (consum|use)", r"\bwater\b.*\bconsum"
+    ]),
+    "waste_recycled": ("Waste recycled", [
+        r"waste (recycled|recovered|reused)", r"recycled waste"
+    ]),
+    "waste_generated": ("Waste generated", [
+        r"waste generat", r"total waste"
+    ]),
+}
+
+# Unit -> pattern on lower-cased raw text (CO2 before plain tonnes)
+UNITS = [
+    ("tCO2e", r"\b(mt|t|tonnes?|tons?)( of)? ?co2"),
+    ("GJ", r"\bgj\b|gigajoules?"),
+    ("TJ", r"\btj\b|terajoules?"),
+    ("GWh", r"\bgwh\b"),
+    ("MWh", r"\bmwh\b"),
+    ("kWh", r"\bkwh\b"),
+    ("kL", r"\bkl\b|kilo ?lit(re|er)s?"),
+    ("ML", r"\bml\b|mega ?lit(re|er)s?"),
+    ("m3", r"\bm3\b|m³|cubic met(re|er)s?"),
+    ("t", r"\b(metric )?(tonnes?|tons?|mt)\b"),
+    ("%", r"%|\bpercent"),
+]
+
+# Questions about narrative rather than numbers go to document search
+NARRATIVE_CUES = [
+    r"\bwhy\b", r"\bexplain", r"\bdescribe", r"\binitiatives?\b", r"\bpolic(y|ies)\b",
+    r"\bstrateg(y|ies)\b", r"\btargets?\b", r"\bplans?\b", r"\bsteps\b", r"\bmeasures\b",
+    r"\breduc", r"\bhow (does|do|did|is|are|can|will)\b"
+]
+
+YEAR_PATTERN = re.compile(
+    r"\b(?:fy\s*'?)?(20\d{2})(?:\s*[-–/]\s*'?(20\d{2}|\d{2}))?\b|\bfy\s*'?(\d{2})\b", re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r"(\()?([-–])?([\d,]*\.?\d+)\)?%?[*†#]*")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY,
+    company TEXT NOT NULL,
+    company_key TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    label TEXT,
+    value REAL NOT NULL,
+    unit TEXT,
+    year INTEGER,
+    period TEXT,
+    page INTEGER,
+    document TEXT
+);
+CREATE INDEX IF NOT EXISTS facts_metric ON facts (metric, year, company_key);
+CREATE INDEX IF NOT EXISTS facts_company ON facts (company_key, metric);
+"""
+COLUMNS = ("company", "company_key", "metric", "label", "value", "unit", "year", "period",
+           "page", "document")
+
+# Best fact per company: the requested year (or the latest), earliest page
+_BEST_PER_COMPANY = """
+SELECT * FROM (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY company_key ORDER BY year IS NULL, year DESC, page
+    ) AS rank_in_company
+    FROM facts WHERE {where}
+) WHERE rank_in_company = 1
+"""
+
+
+def detect_metric(text: str):
+    """
+    Detect which fact metric a table label or question is about
+
+    Args:
+        text: Label or question
+
+    Returns:
+        Metric name or None
+    """
+    normalized = normalize_text(text)
+    for metric, (_, patterns) in FACT_METRICS.items():
+        if any(re.search(pattern, normalized) for pattern in patterns):
+            return metric
+    return None
+
+
+def detect_unit(text: str):
+    """Unit named in a label or header, or None"""
+    lowered = (text or "").lower()
+    for unit, pattern in UNITS:
+        if re.search(pattern, lowered):
+            return unit
+    return None
+
+
+def detect_intensity_unit(text: str):
+    """
+    Full unit of an intensity, keeping its denominator
+
+    Intensities with different denominators ("GJ/Rs crore", "GJ/tonne")
+    cannot be compared, so they must not collapse to the same unit.
+
+    Args:
+        text: Label, unit cell or header
+
+    Returns:
+        Unit text such as "GJ/Rs crore", or None
+    """
+    text = " ".join((text or "").split())
+    for candidate in re.findall(r"\(([^()]*)\)", text) + [text]:
+        if re.search(r"/|\bper\b", candidate, re.IGNORECASE) and detect_unit(candidate):
+            return candidate.strip()
+    return None
+
+
+def parse_year(text: str):
+    """
+    Reporting year named in text
+
+    Financial years are identified by the calendar year they end in, so
+    "FY 2023-24", "FY24" and "2024" all give 2024.
+
+    Args:
+        text: Table header cell or question
+
+    Returns:
+        Year as an int, or None
+    """
+    match = YEAR_PATTERN.search(text or "")
+    if match is None:
+        return None
+    if match.group(3):
+        return 2000 + int(match.group(3))
+    start, end = int(match.group(1)), match.group(2)
+    return start // 100 * 100 + int(end[-2:]) if end else start
+
+
+def parse_number(cell: str):
+    """
+    Numeric value of a table cell
+
+    Args:
+        cell: Cell text such as "1,23,456.7", "(12)" or "45%"
+
+    Returns:
+        Float, or None if the cell is not a number
+    """
+    match = NUMBER_PATTERN.fullmatch((cell or "").replace(" ", ""))
+    if match is None:
+        return None
+    value = float(match.group(3).replace(",", ""))
+    return -value if match.group(1) or match.group(2) else value
+
+
+def parse_table(rows: list, page: int = None) -> list:
+    """
+    Turn an extracted table into fact records
+
+    Rows whose label names a known metric give one fact per column headed
+    by a year (or per row, for tables with a single value column). Units
+    come from the row label, a "Unit" column or the header row; intensity
+    units keep their denominator.
+
+    Args:
+        rows: Table rows as lists of cell strings (None for empty cells)
+        page: 1-based page the table was found on
+
+    Returns:
+        List of dictionaries with metric, label, value, unit, year, period and page
+    """
+    rows = [[" ".join((cell or "").split()) for cell in row] for row in rows if row]
+    header_index, year_columns = None, {}
+    for index, row in enumerate(rows[:3]):
+        if detect_metric(_row_label(row)) is not None:
+            continue  # A data row; its values may look like years ("2045")
+        years = {
+            column: (parse_year(cell), cell)
+            for column, cell in enumerate(row) if column and parse_year(cell)
+        }
+        if years:
+            header_index, year_columns = index, years
+            break
+
+    header = rows[header_index] if header_index is not None else []
+    unit_column = next((column for column, cell in enumerate(header)
+                        if re.fullmatch(r"units?|uom|unit of measure(ment)?", cell.lower())), None)
+    header_unit = detect_unit(" ".join(header))
+
+    facts = []
+    for row in rows[header_index + 1 if header_index is not None else 0:]:
+        label = _row_label(row)
+        metric = detect_metric(label)
+        if metric is None:
+            continue
+        unit_cell = row[unit_column] if unit_column is not None and unit_column < len(row) else ""
+        if metric.endswith("_intensity"):
+            unit = (detect_intensity_unit(unit_cell) or detect_intensity_unit(label)
+                    or detect_intensity_unit(" ".join(header)))
+        else:
+            unit = None
+        unit = unit or detect_unit(unit_cell) or detect_unit(label) or header_unit
+
+        if year_columns:
+            cells = [(column, year, period) for column, (year, period) in year_columns.items()
+                     if column < len(row)]
+        else:
+            numeric = [column for column, cell in enumerate(row) if parse_number(cell) is not None]
+            cells = [(numeric[0], None, None)] if len(numeric) == 1 else []
+
+        for column, year, period in cells:
+            value = parse_number(row[column])
+            if value is not None:
+                facts.append({
+                    "metric": metric,
+                    "label": label,
+                    "value": value,
+                    "unit": unit,
+                    "year": year,
+                    "period": period,
+                    "page": page
+                })
+    return facts
+
+
+def _row_label(row: list) -> str:
+    """First non-numeric cell of a table row"""
+    return next((cell for cell in row if cell and parse_number(cell) is None), "")
+
+
+def table_pages(pages: list) -> list:
+    """
+    Pages worth running the (slow) table finder on
+
+    Args:
+        pages: Page texts in page order
+
+    Returns:
+        1-based numbers of pages that mention a fact metric next to numbers
+    """
+    return [
+        number for number, text in enumerate(pages, start=1)
+        if re.search(r"\d", text) and detect_metric(text) is not None
+    ]
+
+
+def format_value(value: float, unit: str = None) -> str:
+    """Format a fact value with its unit, e.g. "12,345.6 tCO2e" or "42%" """
+    number = f"{value:,.2f}".rstrip("0").rstrip(".")
+    if not unit:
+        return number
+    return f"{number}{unit}" if unit == "%" else f"{number} {unit}"
+
+
+class FactsStore:
+    """
+    Numeric ESG facts in SQLite, indexed by metric, year and company
+
+    A company's facts are replaced as a whole when its report is ingested
+    again. One connection is shared behind a lock; it is opened (and the
+    database file created) on first use.
+    """
+
+    def __init__(self, path: str = FACTS_DB):
+        """
+        Initialize the store
+
+        Args:
+            path: SQLite database file (":memory:" for a throwaway store)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._companies = None  # Cached distinct company names
+        self._companies_stamp = None  # Database file stamp the cache was read at
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _exists(self) -> bool:
+        return self._connection is not None or os.path.exists(self.path)
+
+    def _file_stamp(self):
+        """Modification stamp of the database file (changes when any process commits)"""
+        if self.path == ":memory:":
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def replace_company(self, company_name: str, facts: list, document: str = None) -> int:
+        """
+        Store a company's facts, replacing any previously stored ones
+
+        Args:
+            company_name: Company name
+            facts: Records from parse_table()
+            document: SHA-256 of the source PDF
+
+        Returns:
+            Number of facts stored
+        """
+        if not facts and not self._exists():
+            return 0
+        key = normalize_text(company_name)
+        records = [
+            (company_name, key, fact["metric"], fact["label"], fact["value"], fact["unit"],
+             fact["year"], fact["period"], fact["page"], document)
+            for fact in facts
+        ]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM facts WHERE company_key = ?", (key,))
+                connection.executemany(
+                    f"INSERT INTO facts ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})", records
+                )
+            self._companies = None
+        return len(records)
+
+    def delete_company(self, company_name: str) -> int:
+        """
+        Delete a company's facts
+
+        Args:
+            company_name: Company name
+
+        Returns:
+            Number of facts deleted
+        """
+        if not self._exists():
+            return 0
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                deleted = connection.execute(
+                    "DELETE FROM facts WHERE company_key = ?", (normalize_text(company_name),)
+                ).rowcount
+            self._companies = None
+        return deleted
+
+    def companies(self) -> list:
+        """
+        Names of companies with stored facts
+
+        The list is cached until the database file changes, so facts
+        written by another process (the ingestion CLI) are picked up.
+        """
+        if not self._exists():
+            return []
+        with self._lock:
+            stamp = self._file_stamp()
+            if self._companies is None or stamp != self._companies_stamp:
+                rows = self._connect().execute("SELECT DISTINCT company FROM facts").fetchall()
+                self._companies = sorted(row["company"] for row in rows)
+                self._companies_stamp = stamp
+            return list(self._companies)
+
+    def lookup(self, metric: str, companies: list, year: int = None) -> list:
+        """
+        One fact per company for a metric
+
+        Args:
+            metric: FACT_METRICS name
+            companies: Company names
+            year: Reporting year (latest available if omitted)
+
+        Returns:
+            Fact dictionaries, in the order of companies (companies without
+            a matching fact are left out)
+        """
+        if not companies or not self._exists():
+            return []
+        keys = [normalize_text(company) for company in companies]
+        where = f"metric = ? AND company_key IN ({', '.join('?' * len(keys))})"
+        params = [metric] + keys
+        if year is not None:
+            where += " AND year = ?"
+            params.append(year)
+        with self._lock:
+            rows = self._connect().execute(_BEST_PER_COMPANY.format(where=where), params).fetchall()
+        by_key = {row["company_key"]: dict(row) for row in rows}
+        return [by_key[key] for key in keys if key in by_key]
+
+    def rank(self, metric: str, year: int = None, ascending: bool = False,
+             limit: int = STRUCTURED_RANKING_LIMIT) -> list:
+        """
+        Companies ranked by a metric
+
+        Only facts in the metric's most common unit are compared.
+
+        Args:
+            metric: FACT_METRICS name
+            year: Reporting year (each company's latest if omitted)
+            ascending: Lowest values first
+            limit: Companies returned
+
+        Returns:
+            Fact dictionaries, best first
+        """
+        if not self._exists():
+            return []
+        with self._lock:
+            connection = self._connect()
+            unit = connection.execute(
+                "SELECT unit FROM facts WHERE metric = ? GROUP BY unit "
+                "ORDER BY COUNT(*) DESC LIMIT 1", (metric,)
+            ).fetchone()
+            if unit is None:
+                return []
+            where = "metric = ? AND unit IS ?"
+            params = [metric, unit["unit"]]
+            if year is not None:
+                where += " AND year = ?"
+                params.append(year)
+            query = (_BEST_PER_COMPANY.format(where=where)
+                     + f" ORDER BY value {'ASC' if ascending else 'DESC'} LIMIT ?")
+            rows = connection.execute(query, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+
+class FactsRouter:
+    """Answers numeric lookups, comparisons and rankings from the facts store"""
+
+    def __init__(self, store: FactsStore = None):
+        """
+        Initialize the router
+
+        Args:
+            store: FactsStore (the shared FACTS_DB store if omitted)
+        """
+        self.store = store or get_facts_store()
+
+    def find_companies(self, text: str) -> list:
+        """
+        Companies with stored facts named in free text
+
+        Args:
+            text: Question
+
+        Returns:
+            Company names, in order of first mention
+        """
+        normalized = f" {normalize_text(text)} "
+        found = []
+        for company in self.store.companies():
+            full = normalize_text(company)
+            core = " ".join(w for w in full.split() if w not in COMPANY_SUFFIXES)
+            positions = [normalized.find(f" {key} ") for key in (full, core) if key]
+            positions = [position for position in positions if position != -1]
+            if positions:
+                found.append((min(positions), company))
+        return [company for _, company in sorted(found)]
+
+    def route(self, user_query: str, company_name: str = None):
+        """
+        Answer a numeric question from report tables if possible
+
+        Args:
+            user_query: User's question
+            company_name: Optional company filter selected by the user
+
+        Returns:
+            Tuple of (sources, answer) or None if search should answer it
+        """
+        text = normalize_text(user_query)
+        metric = detect_metric(user_query)
+        if metric is None or any(re.search(cue, text) for cue in NARRATIVE_CUES):
+            return None
+
+        year = parse_year(user_query)
+        companies = self.find_companies(user_query)
+        if not companies and company_name and company_name != "General":
+            companies = [company_name]
+        ascending = re.search(RANK_ASC, text) is not None
+        descending = not ascending and re.search(RANK_DESC, text) is not None
+
+        label = FACT_METRICS[metric][0]
+        if (ascending or descending) and len(companies) != 1:
+            facts = self.store.rank(metric, year, ascending)
+            title = f"Companies ranked by {label} ({'lowest' if ascending else 'highest'} first):"
+        elif companies:
+            # A comparison naming a company without facts cannot be answered here
+            if re.search(COMPARISON_CUES, text) and len(companies) < 2:
+                return None
+            facts = self.store.lookup(metric, companies, year)
+            title = f"{label}:"
+            # Some companies have no fact: search answers for all of them
+            if len(facts) < len(companies):
+                return None
+        else:
+            return None
+
+        # Nothing in the tables: the report text may still answer it
+        if not facts:
+            return None
+
+        sources = [self._fact_to_source(fact) for fact in facts]
+        if len(facts) == 1 and not (ascending or descending):
+            fact = facts[0]
+            answer = (f"{fact['company']} - {label} ({self._period(fact)}): "
+                      f"{format_value(fact['value'], fact['unit'])} (report table, p. {fact['page']}).")
+        else:
+            answer = title + "\n" + "\n".join(
+                f"- {fact['company']}: {format_value(fact['value'], fact['unit'])} "
+                f"({self._period(fact)}, p. {fact['page']})"
+                for fact in facts
+            )
+        return sources, answer
+
+    def _period(self, fact: dict) -> str:
+        return fact["period"] or (str(fact["year"]) if fact["year"] else "latest reported")
+
+    def _fact_to_source(self, fact: dict) -> dict:
+        """Format a fact like a search result so UIs can display it"""
+        return {
+            "score": 1.0,
+            "company": fact["company"],
+            "text": f"{fact['label']} ({self._period(fact)}): "
+                    f"{format_value(fact['value'], fact['unit'])}",
+            "page": fact["page"],
+            "source": "esg_facts"
+        }
+
+
+_store = None
+_router = None
+_lock = threading.Lock()
+
+
+def get_facts_store() -> FactsStore:
+    """
+    Get the facts store shared by this process
+
+    Returns:
+        FactsStore instance
+    """
+    global _store
+    with _lock:
+        if _store is None:
+            _store = FactsStore()
+        return _store
+
+
+def get_facts_router() -> FactsRouter:
+    """
+    Get the shared facts router
+
+    Returns:
+        FactsRouter instance
+    """
+    store = get_facts_store()
+    global _router
+    with _lock:
+        if _router is None:
+            _router = FactsRouter(store)
+        return _router
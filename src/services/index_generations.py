@@ -0,0 +1,551 @@
+"""
+Index Generations
+Registry of vector index generations (index name + embedding model) with
+blue/green migration: a new generation is built from cached page text while
+queries keep using the active one, then traffic switches in one step
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from src.config.settings import (
+    INDEX_GENERATIONS_FILE,
+    INDEX_NAME,
+    EMBEDDING_MODEL,
+    LOCAL_INDEX_ENABLED,
+    SEARCH_BACKEND,
+    PINECONE_CLOUD,
+    PINECONE_REGION
+)
+from src.services.ingestion_manifest import get_manifest, next_id_prefix
+from src.utils.lazy_imports import lazy_attribute
+from src.utils.locks import ReadWriteFileLock
+
+ServerlessSpec = lazy_attribute("pinecone", "ServerlessSpec")
+
+DEFAULT_GENERATION = "default"
+
+# Migration rounds before giving up on catching up with concurrent ingestion
+MAX_CATCH_UP_ROUNDS = 5
+
+
+class IndexGenerations:
+    """
+    Thread-safe JSON registry of index generations
+
+    Each generation records its Pinecone index, embedding model, build
+    status ("building", "ready", "failed") and the per-company vector ids it
+    holds. Exactly one generation is active; services compare its id on every
+    request, so a switch written by another process is picked up without a
+    restart. Without a registry file the active generation is INDEX_NAME
+    with EMBEDDING_MODEL.
+
+    `switch_lock` is a cross-process readers/writer lock: ingestions hold it
+    shared while they write a company's vectors and manifest entry, and a
+    switch holds it exclusively while it rewrites the manifest and the
+    active pointer, so no ingestion straddles a switch. Registry changes
+    themselves reload, edit and rewrite the file under a separate exclusive
+    lock file ("<path>.write.lock"), which a switch takes inside switch_lock.
+    """
+
+    def __init__(self, path: str = INDEX_GENERATIONS_FILE):
+        """
+        Initialize the registry
+
+        Args:
+            path: Location of the registry JSON file
+        """
+        self.path = path
+        self.switch_lock = ReadWriteFileLock(f"{path}.lock")
+        self._lock = threading.RLock()
+        self._file_lock = ReadWriteFileLock(f"{path}.write.lock")
+        self._mtime = None
+        self._data = _empty_registry()
+        self._reload_if_changed()
+
+    def active(self) -> dict:
+        """
+        Get the generation serving queries
+
+        Returns:
+            Generation dictionary (id, index_name, embedding_model, status, ...)
+        """
+        with self._lock:
+            self._reload_if_changed()
+            return copy.deepcopy(self._data["generations"][self._data["active"]])
+
+    def active_id(self) -> str:
+        """Id of the generation serving queries (cheap; checked on every request)"""
+        with self._lock:
+            self._reload_if_changed()
+            return self._data["active"]
+
+    def previous(self):
+        """Generation a rollback would return to, or None"""
+        with self._lock:
+            self._reload_if_changed()
+            previous = self._data.get("previous")
+            return copy.deepcopy(self._data["generations"][previous]) if previous else None
+
+    def get(self, generation_id: str):
+        """
+        Get one generation
+
+        Args:
+            generation_id: Generation id
+
+        Returns:
+            Generation dictionary or None if unknown
+        """
+        with self._lock:
+            self._reload_if_changed()
+            generation = self._data["generations"].get(generation_id)
+            return copy.deepcopy(generation) if generation else None
+
+    def list(self) -> list:
+        """All generations, oldest first"""
+        with self._lock:
+            self._reload_if_changed()
+            return copy.deepcopy(list(self._data["generations"].values()))
+
+    def create(self, embedding_model: str, index_name: str = None) -> dict:
+        """
+        Register a new generation in the "building" state
+
+        Args:
+            embedding_model: SentenceTransformer model name
+            index_name: Pinecone index the generation is built in
+                (defaults to "<INDEX_NAME>-<generation id>")
+
+        Returns:
+            The new generation
+
+        Raises:
+            ValueError: If another generation already uses index_name
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            generations = self._data["generations"]
+            generation_id = f"g{len(generations) + 1}"
+            index_name = index_name or f"{INDEX_NAME}-{generation_id}"
+            if any(g["index_name"] == index_name for g in generations.values()):
+                raise ValueError(f"Index {index_name} already belongs to a generation")
+            generations[generation_id] = _new_generation(generation_id, index_name,
+                                                         embedding_model, "building")
+            self._save()
+            return copy.deepcopy(generations[generation_id])
+
+    def update(self, generation_id: str, **fields):
+        """
+        Update fields of a generation (status, error, total, ...)
+
+        Args:
+            generation_id: Generation id
+            **fields: Values to set
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            self._data["generations"][generation_id].update(fields)
+            self._save()
+
+    def record_company(self, generation_id: str, company_name: str, entry: dict = None):
+        """
+        Record (or with entry=None, forget) a company stored in a generation
+
+        Args:
+            generation_id: Generation id
+            company_name: Company name
+            entry: {"chunks", "id_prefix", "sha256", "source"}
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            companies = self._data["generations"][generation_id].setdefault("companies", {})
+            if entry is None:
+                companies.pop(company_name, None)
+            else:
+                companies[company_name] = entry
+            self._save()
+
+    def activate(self, generation_id: str, companies_snapshot: dict = None):
+        """
+        Switch query traffic to a ready generation
+
+        Args:
+            generation_id: Generation to activate
+            companies_snapshot: Companies currently stored in the active
+                generation, kept on it so a rollback can restore them
+
+        Raises:
+            ValueError: If the generation is unknown or not ready
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            generations = self._data["generations"]
+            if generation_id not in generations:
+                raise ValueError(f"Unknown generation: {generation_id}")
+            if generations[generation_id]["status"] != "ready":
+                raise ValueError(f"Generation {generation_id} is "
+                                 f"{generations[generation_id]['status']}, not ready")
+            current = self._data["active"]
+            if current == generation_id:
+                return
+            if companies_snapshot is not None:
+                generations[current]["companies"] = companies_snapshot
+            generations[generation_id]["activated_at"] = _now()
+            self._data["previous"] = current
+            self._data["active"] = generation_id
+            self._save()
+
+    def _reload_if_changed(self):
+        """Reload from disk when another process has written the registry"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        mtime = (stat.st_ino, stat.st_mtime_ns)  # Every save replaces the file
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self._data = json.load(f)
+        self._mtime = mtime
+
+    def _save(self):
+        """Write the registry atomically (file lock held)"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{uuid.uuid4().hex[:8]}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.path)
+        self._mtime = (stat.st_ino, stat.st_mtime_ns)
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _new_generation(generation_id: str, index_name: str, embedding_model: str,
+                    status: str) -> dict:
+    return {
+        "id": generation_id,
+        "index_name": index_name,
+        "embedding_model": embedding_model,
+        "status": status,
+        "created_at": _now(),
+        "companies": {},
+        "total": 0,
+        "error": None
+    }
+
+
+def _empty_registry() -> dict:
+    return {
+        "active": DEFAULT_GENERATION,
+        "previous": None,
+        "generations": {
+            DEFAULT_GENERATION: _new_generation(DEFAULT_GENERATION, INDEX_NAME,
+                                                EMBEDDING_MODEL, "ready")
+        }
+    }
+
+
+def follow_active_generation(service) -> bool:
+    """
+    Point a service's embedding model and index at the active generation
+
+    The service provides `generations` (registry, or None when pinned to one
+    generation), `generation`, `_generation_lock` and the loaders
+    `_load_model(generation)`, `_connect_index(generation)` and
+    `_open_local_store(generation)` (each generation has its own local
+    store). Resources already loaded are replaced only after their
+    successors are ready, so requests keep using the old generation until
+    the switch is complete.
+
+    Args:
+        service: SearchService or DocumentProcessor
+
+    Returns:
+        True if the service switched generations
+    """
+    if service.generations is None or service.generations.active_id() == service.generation["id"]:
+        return False
+
+    with service._generation_lock:
+        current = service.generation
+        active = service.generations.active()
+        if active["id"] == current["id"]:
+            return False
+        loaded = vars(service)
+        updates = {}
+        if "model" in loaded and active["embedding_model"] != current["embedding_model"]:
+            updates["model"] = service._load_model(active)
+        if "index" in loaded and active["index_name"] != current["index_name"]:
+            updates["index"] = service._connect_index(active)
+        if getattr(service, "local_store", None) is not None:
+            updates["local_store"] = service._open_local_store(active)
+        loaded.update(updates)
+        service.generation = active
+    return True
+
+
+class IndexMigrator:
+    """Builds, switches and rolls back index generations"""
+
+    def __init__(self, registry: IndexGenerations = None, manifest=None, processor_factory=None):
+        """
+        Initialize the migrator
+
+        Args:
+            registry: IndexGenerations (shared if omitted)
+            manifest: IngestionManifest of the active generation (shared if omitted)
+            processor_factory: Callable(generation) returning a DocumentProcessor
+                pinned to that generation (for tests)
+        """
+        self.registry = registry or get_index_generations()
+        self.manifest = manifest or get_manifest()
+        self._processor_factory = processor_factory
+
+    def start(self, embedding_model: str, index_name: str = None) -> dict:
+        """
+        Register a generation and create its Pinecone index
+
+        Args:
+            embedding_model: SentenceTransformer model for the new generation
+            index_name: Pinecone index (defaults to "<INDEX_NAME>-<generation>")
+
+        Returns:
+            The new generation
+        """
+        generation = self.registry.create(embedding_model, index_name)
+        processor = self._processor(generation)
+        dimension = processor.model.get_sentence_embedding_dimension()
+        if generation["index_name"] not in processor.pc.list_indexes().names():
+            processor.pc.create_index(
+                name=generation["index_name"], dimension=dimension, metric="cosine",
+                spec=ServerlessSpec(cloud=PINECONE_CLOUD, region=PINECONE_REGION)
+            )
+            while not processor.pc.describe_index(generation["index_name"]).status["ready"]:
+                time.sleep(1)
+        self.registry.update(generation["id"], dimension=dimension)
+        return self.registry.get(generation["id"])
+
+    def build(self, generation_id: str, progress_callback=None) -> tuple:
+        """
+        Embed every company in the manifest into an inactive generation
+
+        Page text comes from the text cache (no PDF parsing). Companies
+        already built from their current document (same PDF hash) are
+        skipped, so an interrupted build resumes where it stopped. When a
+        local store is used, the generation's own local store is filled too
+        (companies missing from it are rebuilt). Documents
+        ingested, replaced or deleted in the active generation meanwhile are
+        caught up before the generation is marked ready.
+
+        Args:
+            generation_id: Generation to build
+            progress_callback: Optional callable(company_name, done, total)
+
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        generation = self.registry.get(generation_id)
+        if generation is None:
+            return False, f"Unknown generation: {generation_id}"
+        if generation_id == self.registry.active_id():
+            return False, f"Generation {generation_id} is active; start a new one instead"
+        self.registry.update(generation_id, status="building", error=None)
+        processor = self._processor(generation)
+
+        failures = {}
+        for _ in range(MAX_CATCH_UP_ROUNDS):
+            pending, removed = self._pending_companies(generation_id)
+            for company_name in removed:
+                self._drop_company(processor, generation_id, company_name)
+            pending = [name for name in pending if name not in failures]
+            if not pending:
+                break
+
+            self.registry.update(generation_id, total=len(self.manifest.get_companies()))
+            for done, company_name in enumerate(pending, 1):
+                try:
+                    self._build_company(processor, generation_id, company_name)
+                except Exception as e:
+                    failures[company_name] = str(e)
+                if progress_callback:
+                    progress_callback(company_name, done, len(pending))
+
+        if failures:
+            error = "; ".join(f"{name}: {message}" for name, message in sorted(failures.items()))
+            self.registry.update(generation_id, status="failed", error=error)
+            return False, f"{len(failures)} companies failed: {error}"
+
+        pending, removed = self._pending_companies(generation_id)
+        if pending or removed:
+            self.registry.update(generation_id, status="failed",
+                                 error="Ingestion kept changing documents; run the build again")
+            return False, "Ingestion kept changing documents; run the build again"
+
+        self.registry.update(generation_id, status="ready", completed_at=_now())
+        built = self.registry.get(generation_id)["companies"]
+        return True, (f"Generation {generation_id} is ready: {len(built)} companies, "
+                      f"{sum(entry['chunks'] for entry in built.values())} chunks")
+
+    def activate(self, generation_id: str) -> tuple:
+        """
+        Switch queries and ingestion to a ready generation
+
+        The manifest (the vector id registry) is rewritten to the new
+        generation's ids; the previous generation's ids are kept on it for
+        rollback. Its index is left untouched.
+
+        Args:
+            generation_id: Generation to activate
+
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        with self.registry.switch_lock.exclusive():
+            target = self.registry.get(generation_id)
+            if target is None:
+                return False, f"Unknown generation: {generation_id}"
+            if target["status"] != "ready":
+                return False, f"Generation {generation_id} is {target['status']}, not ready"
+            pending, removed = self._pending_companies(generation_id)
+            if pending or removed:
+                return False, (f"Generation {generation_id} is behind the active index or its "
+                               f"local store ({len(pending) + len(removed)} companies); "
+                               f"build it again")
+            return self._switch(target)
+
+    def rollback(self) -> tuple:
+        """
+        Switch back to the previously active generation
+
+        Documents ingested since the switch exist only in the newer index and
+        are not carried back.
+
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        with self.registry.switch_lock.exclusive():
+            previous = self.registry.previous()
+            if previous is None:
+                return False, "No previous generation to roll back to"
+            return self._switch(previous)
+
+    def _switch(self, target: dict) -> tuple:
+        """Rewrite the manifest to a generation's ids and make it active (switch lock held)"""
+        snapshot = {
+            name: {key: entry.get(key) for key in ("chunks", "id_prefix", "sha256", "source")}
+            for name, entry in self.manifest.get_companies().items()
+        }
+        self._apply_to_manifest(target["companies"])
+        self.registry.activate(target["id"], companies_snapshot=snapshot)
+        return True, (f"Switched to generation {target['id']} "
+                      f"({target['embedding_model']} on {target['index_name']})")
+
+    def _processor(self, generation: dict):
+        if self._processor_factory is not None:
+            return self._processor_factory(generation)
+        from src.services.document_processor import DocumentProcessor
+        return DocumentProcessor(manifest=self.manifest, generation=generation,
+                                 local_store=self._local_store(generation))
+    
+    def _local_store(self, generation: dict):
+        """The generation's local store, or None when no local store is used"""
+        if not (LOCAL_INDEX_ENABLED or SEARCH_BACKEND == "local"):
+            return None
+        from src.services.vector_store import get_local_vector_store
+        return get_local_vector_store(generation)
+
+    def _pending_companies(self, generation_id: str) -> tuple:
+        """
+        Compare a generation with the manifest of the active one
+
+        Returns:
+            Tuple of (companies to (re)build, companies to drop)
+        """
+        generation = self.registry.get(generation_id)
+        built = generation["companies"]
+        stored = self.manifest.get_companies()
+        local_store = self._local_store(generation)
+        pending = [
+            name for name, entry in sorted(stored.items())
+            if name not in built or built[name].get("sha256") != entry.get("sha256")
+            or (local_store is not None and not _stored_locally(local_store, built[name]))
+        ]
+        removed = sorted(name for name in built if name not in stored)
+        return pending, removed
+
+    def _build_company(self, processor, generation_id: str, company_name: str):
+        """Re-embed one company from cached page text into the generation's index"""
+        entry = self.manifest.get_company(company_name)
+        if not entry or not entry.get("sha256"):
+            raise ValueError("no cached source recorded")
+        pages = processor.text_cache.get_pages(entry["sha256"], processor.extractor.cache_key)
+        if pages is None:
+            raise ValueError("page text is not cached")
+
+        previous = self.registry.get(generation_id)["companies"].get(company_name)
+        id_prefix = next_id_prefix(company_name, previous["id_prefix"] if previous else None)
+        chunks = processor.prepare_chunk_records(pages)
+        chunk_count = processor._embed_and_store(chunks, company_name, id_prefix=id_prefix,
+                                                 document=entry["sha256"])
+        self.registry.record_company(generation_id, company_name, {
+            "chunks": chunk_count,
+            "id_prefix": id_prefix,
+            "sha256": entry["sha256"],
+            "source": entry.get("source")
+        })
+        if previous:
+            processor._delete_vectors([f"{previous['id_prefix']}_{i}"
+                                       for i in range(previous["chunks"])])
+
+    def _drop_company(self, processor, generation_id: str, company_name: str):
+        """Delete a company removed from the active generation meanwhile"""
+        previous = self.registry.get(generation_id)["companies"][company_name]
+        processor._delete_vectors([f"{previous['id_prefix']}_{i}" for i in range(previous["chunks"])])
+        self.registry.record_company(generation_id, company_name, None)
+
+    def _apply_to_manifest(self, companies: dict):
+        """Make the manifest describe the ids stored in a generation"""
+        for company_name, entry in companies.items():
+            self.manifest.record_ingestion(company_name, entry["chunks"], source=entry.get("source"),
+                                           sha256=entry.get("sha256"), id_prefix=entry["id_prefix"])
+        for company_name in self.manifest.get_companies():
+            if company_name not in companies:
+                self.manifest.remove_company(company_name)
+
+
+def _stored_locally(local_store, entry: dict) -> bool:
+    """Whether every vector of a generation's company entry is in the local store"""
+    vector_ids = [f"{entry['id_prefix']}_{i}" for i in range(entry["chunks"])]
+    return len(local_store.get(vector_ids)) == len(vector_ids)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_index_generations() -> IndexGenerations:
+    """
+    Get the shared index generation registry for this process
+
+    Returns:
+        IndexGenerations instance
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = IndexGenerations()
+        return _default_registry
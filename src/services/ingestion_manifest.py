@@ -0,0 +1,243 @@
+"""
+Ingestion Manifest
+Persistent record of which companies are stored in the vector database
+"""
+
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+from src.config.settings import MANIFEST_FILE
+from src.utils.locks import ReadWriteFileLock
+
+# Id prefix suffix distinguishing the vectors of a company's successive documents
+ID_GENERATION_SUFFIX = re.compile(r"@g(\d+)$")
+
+
+class IngestionManifest:
+    """
+    JSON manifest of ingested companies with change notifications
+
+    Safe across threads and processes: every change reloads, edits and
+    rewrites the file under an exclusive lock file ("<path>.lock"), so
+    concurrent ingestions in the app, the query server and the CLI never
+    lose each other's entries.
+    """
+
+    def __init__(self, path: str = MANIFEST_FILE):
+        """
+        Initialize the manifest
+
+        Args:
+            path: Location of the manifest JSON file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_lock = ReadWriteFileLock(f"{path}.lock")
+        self._listeners = []
+        self._mtime = None
+        self._data = {"version": 0, "companies": {}}
+        self._reload_if_changed()
+
+    @property
+    def version(self) -> int:
+        """Counter that increases on every ingestion event"""
+        with self._lock:
+            self._reload_if_changed()
+            return self._data["version"]
+
+    def get_companies(self) -> dict:
+        """
+        Get all recorded companies
+
+        Returns:
+            Dictionary of company name -> entry (chunks, source, sha256, id_prefix,
+            updated_at, generation)
+        """
+        with self._lock:
+            self._reload_if_changed()
+            return {name: dict(entry) for name, entry in self._data["companies"].items()}
+
+    def company_version(self, company_name: str):
+        """
+        Get the manifest version at which a company's vectors last changed
+
+        Unlike the per-company generation, this never repeats for a company
+        that is deleted and ingested again, so it can validate caches.
+
+        Args:
+            company_name: Company name
+
+        Returns:
+            Version number, or None if the company is not recorded
+        """
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._data["companies"].get(company_name)
+            return entry.get("changed_version", entry.get("updated_at")) if entry else None
+
+    def get_company(self, company_name: str):
+        """
+        Get the entry for a single company
+
+        Args:
+            company_name: Company name
+
+        Returns:
+            Entry dictionary or None if not recorded
+        """
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._data["companies"].get(company_name)
+            return dict(entry) if entry else None
+
+    def vector_ids(self, company_name: str) -> list:
+        """
+        Get the vector ids stored for a company
+
+        Ids are "<id_prefix>_<chunk>" for chunks 0..n-1, so the manifest is
+        the id registry: deletes go straight to the ids without scanning
+        the index.
+
+        Args:
+            company_name: Company name
+
+        Returns:
+            List of vector ids (empty if not recorded)
+        """
+        entry = self.get_company(company_name)
+        if not entry:
+            return []
+        prefix = entry.get("id_prefix") or company_name
+        return [f"{prefix}_{i}" for i in range(entry["chunks"])]
+
+    def record_ingestion(self, company_name: str, chunks: int, source: str = None,
+                         sha256: str = None, id_prefix: str = None):
+        """
+        Record that a company's vectors were (re)written
+
+        Args:
+            company_name: Company name
+            chunks: Number of chunks stored
+            source: Source file name (optional)
+            sha256: Hash of the source PDF, keying its cached page text (optional)
+            id_prefix: Prefix of the stored vector ids (defaults to the
+                previous prefix, or the company name)
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            previous = self._data["companies"].get(company_name, {})
+            self._data["companies"][company_name] = {
+                "chunks": chunks,
+                "source": source or previous.get("source"),
+                "sha256": sha256 or previous.get("sha256"),
+                "id_prefix": id_prefix or previous.get("id_prefix") or company_name,
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "generation": previous.get("generation", 0) + 1,
+                "changed_version": self._data["version"] + 1
+            }
+            self._save()
+        self._notify(company_name)
+
+    def remove_company(self, company_name: str) -> bool:
+        """
+        Remove a company from the manifest
+
+        Args:
+            company_name: Company name
+
+        Returns:
+            True if the company was recorded
+        """
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            if self._data["companies"].pop(company_name, None) is None:
+                return False
+            self._save()
+        self._notify(company_name)
+        return True
+
+    def subscribe(self, callback):
+        """
+        Register a callback invoked as callback(company_name) after each change
+
+        Args:
+            callback: Callable taking the changed company name
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _notify(self, company_name: str):
+        for callback in list(self._listeners):
+            callback(company_name)
+
+    def _reload_if_changed(self):
+        """Reload from disk when another process has written the manifest"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        mtime = (stat.st_ino, stat.st_mtime_ns)  # Every save replaces the file
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        data.setdefault("version", 0)
+        data.setdefault("companies", {})
+        self._data = data
+        self._mtime = mtime
+
+    def _save(self):
+        """Bump the version and write the manifest atomically (file lock held)"""
+        self._data["version"] += 1
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{uuid.uuid4().hex[:8]}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.path)
+        self._mtime = (stat.st_ino, stat.st_mtime_ns)
+
+
+def next_id_prefix(company_name: str, current_prefix: str = None) -> str:
+    """
+    Id prefix for a company's next document
+
+    Args:
+        company_name: Company name
+        current_prefix: Prefix of the ids currently stored (None if none)
+
+    Returns:
+        The company name for a first document, else "<company>@g<n>" with n
+        one above the current prefix's
+    """
+    if current_prefix is None:
+        return company_name
+    match = ID_GENERATION_SUFFIX.search(current_prefix)
+    return f"{company_name}@g{int(match.group(1)) + 1 if match else 2}"
+
+
+_default_manifest = None
+_default_manifest_lock = threading.Lock()
+
+
+def get_manifest() -> IngestionManifest:
+    """
+    Get the shared ingestion manifest for this process
+
+    Returns:
+        IngestionManifest instance
+    """
+    global _default_manifest
+    with _default_manifest_lock:
+        if _default_manifest is None:
+            _default_manifest = IngestionManifest()
+        return _default_manifest
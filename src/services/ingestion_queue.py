@@ -0,0 +1,315 @@
+"""
+Ingestion Queue Service
+Background document ingestion with a bounded worker pool and progress tracking
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config.settings import (
+    INGESTION_WORKERS,
+    INGESTION_MAX_PENDING,
+    INGESTION_JOBS_KEPT
+)
+
+
+class IngestionQueueFullError(RuntimeError):
+    """Raised by IngestionQueue.submit when too many jobs are already pending"""
+
+
+class IngestionJob:
+    """State of a single background ingestion job"""
+
+    def __init__(self, job_id: str, filename: str, company_name: str = None,
+                 replace: bool = False):
+        self.job_id = job_id
+        self.filename = filename
+        self.company_name = company_name
+        self.replace = replace  # Replace a stored company's document
+        self.status = "queued"  # queued -> running -> succeeded / failed
+        self.message = ""
+        self.progress = {
+            "pages": [0, 0],
+            "chunks": [0, 0],
+            "vectors": [0, 0]
+        }
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        """
+        Snapshot of the job for display
+
+        Returns:
+            Dictionary with status, message, progress counters and timings
+        """
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "company_name": self.company_name,
+            "status": self.status,
+            "message": self.message,
+            "progress": {stage: list(counts) for stage, counts in self.progress.items()},
+            "fraction": self.fraction(),
+            "queued_seconds": (self.started_at or end) - self.submitted_at,
+            "elapsed_seconds": end - self.started_at if self.started_at else 0.0
+        }
+
+    def fraction(self) -> float:
+        """Overall completion estimate (extraction, embedding and upsert weighted equally)"""
+        if self.done:
+            return 1.0
+        parts = [done / total if total else 0.0 for done, total in self.progress.values()]
+        return sum(parts) / len(parts)
+
+
+class IngestionQueue:
+    """
+    Process-wide ingestion queue
+
+    Jobs run on a small thread pool sharing one DocumentProcessor (one copy of
+    the embedding model), so concurrent uploads from different sessions are
+    serialized onto a bounded number of workers instead of competing for CPU.
+    """
+
+    def __init__(self, processor=None, processor_factory=None,
+                 max_workers: int = INGESTION_WORKERS,
+                 max_pending: int = INGESTION_MAX_PENDING,
+                 jobs_kept: int = INGESTION_JOBS_KEPT):
+        """
+        Initialize the queue
+
+        Args:
+            processor: DocumentProcessor to use (created lazily if omitted)
+            processor_factory: Callable creating the processor on first use
+            max_workers: Number of worker threads
+            max_pending: Maximum queued + running jobs
+            jobs_kept: Number of finished jobs retained for status queries
+        """
+        self._processor = processor
+        self._processor_factory = processor_factory
+        self._processor_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="ingestion")
+        self._max_pending = max_pending
+        self._jobs_kept = jobs_kept
+        self._jobs = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def processor(self):
+        """Shared document processor (model is loaded on first job)"""
+        with self._processor_lock:
+            if self._processor is None:
+                if self._processor_factory is None:
+                    from src.services.document_processor import DocumentProcessor
+                    self._processor_factory = DocumentProcessor
+                self._processor = self._processor_factory()
+            return self._processor
+
+    def submit(self, pdf_file, company_name: str = None, filename: str = None,
+               replace: bool = False) -> str:
+        """
+        Queue a PDF for background ingestion
+
+        Args:
+            pdf_file: Anything accepted by DocumentProcessor.process_and_store_pdf
+            company_name: Optional company name
+            filename: Display name (defaults to the file's name)
+            replace: Run DocumentProcessor.replace_company instead (the
+                company must already be stored)
+
+        Returns:
+            Job id
+
+        Raises:
+            IngestionQueueFullError: If too many jobs are already pending
+        """
+        if filename is None:
+            filename = getattr(pdf_file, "name", None) or company_name or str(pdf_file)
+            filename = os.path.basename(filename)
+        job = IngestionJob(uuid.uuid4().hex[:12], filename, company_name, replace=replace)
+
+        with self._lock:
+            if self.pending_count() >= self._max_pending:
+                raise IngestionQueueFullError(
+                    f"Ingestion queue is full ({self._max_pending} jobs pending), try again later"
+                )
+            self._jobs[job.job_id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, pdf_file)
+        return job.job_id
+
+    def submit_many(self, documents: list) -> tuple:
+        """
+        Queue several documents; they are processed in parallel by the workers
+
+        Args:
+            documents: List of (filename, source) pairs
+
+        Returns:
+            Tuple of (job_ids, errors) where errors lists (filename, message)
+            for documents rejected because the queue is full
+        """
+        job_ids = []
+        errors = []
+        for filename, source in documents:
+            company_name = os.path.basename(filename).replace(".pdf", "")
+            try:
+                job_ids.append(self.submit(source, company_name, filename=filename))
+            except IngestionQueueFullError as e:
+                errors.append((filename, str(e)))
+        return job_ids, errors
+
+    def summarize(self, job_ids: list) -> dict:
+        """
+        Combined result for a group of jobs, in the shape of process_folder()
+
+        Args:
+            job_ids: Job ids to summarize
+
+        Returns:
+            Dictionary with total_files, successful, failed, pending,
+            total_chunks, fraction and per-file results
+        """
+        jobs = self.list_jobs(job_ids)
+        results = {
+            "total_files": len(jobs),
+            "successful": 0,
+            "failed": 0,
+            "pending": 0,
+            "total_chunks": 0,
+            "fraction": sum(job["fraction"] for job in jobs) / len(jobs) if jobs else 1.0,
+            "files": []
+        }
+        for job in jobs:
+            if job["status"] == "succeeded":
+                results["successful"] += 1
+                results["total_chunks"] += job["progress"]["vectors"][1]
+            elif job["status"] == "failed":
+                results["failed"] += 1
+            else:
+                results["pending"] += 1
+            results["files"].append({
+                "filename": job["filename"],
+                "status": job["status"],
+                "message": job["message"]
+            })
+        return results
+
+    def get_status(self, job_id: str):
+        """
+        Get a job's status
+
+        Args:
+            job_id: Job id returned by submit()
+
+        Returns:
+            Job dictionary or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list_jobs(self, job_ids: list = None) -> list:
+        """
+        Get statuses for several jobs
+
+        Args:
+            job_ids: Job ids to include (all retained jobs if omitted)
+
+        Returns:
+            List of job dictionaries, oldest first
+        """
+        with self._lock:
+            if job_ids is None:
+                return [job.to_dict() for job in self._jobs.values()]
+            return [self._jobs[j].to_dict() for j in job_ids if j in self._jobs]
+
+    def pending_count(self) -> int:
+        """Number of queued or running jobs"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done)
+
+    def wait(self, job_ids: list, timeout: float = None) -> bool:
+        """
+        Block until the given jobs are finished (for scripts and tests)
+
+        Args:
+            job_ids: Job ids to wait for
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if all jobs finished
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            statuses = self.list_jobs(job_ids)
+            if all(status["status"] in ("succeeded", "failed") for status in statuses):
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and shut down the worker pool"""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: IngestionJob, pdf_file):
+        """Worker body: run the document pipeline and record progress"""
+        job.status = "running"
+        job.started_at = time.time()
+
+        def on_progress(stage, done, total):
+            job.progress[stage] = [done, total]
+
+        try:
+            if job.replace:
+                success, message = self.processor.replace_company(
+                    job.company_name, pdf_file, progress_callback=on_progress
+                )
+            else:
+                success, message = self.processor.process_and_store_pdf(
+                    pdf_file, job.company_name, progress_callback=on_progress
+                )
+        except Exception as e:
+            success, message = False, f"Error processing PDF: {str(e)}"
+
+        job.message = message
+        job.finished_at = time.time()
+        job.status = "succeeded" if success else "failed"
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(self._jobs) - self._jobs_kept)]:
+            del self._jobs[job_id]
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """
+    Get the ingestion queue shared by all sessions in this process
+
+    Returns:
+        IngestionQueue instance
+    """
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = IngestionQueue()
+        return _default_queue
@@ -0,0 +1,441 @@
+"""
+Load Test Service
+Replays a question corpus against the ask pipeline with many simulated users
+and reports throughput, per-stage latency percentiles, errors, CPU and RSS
+"""
+
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.config.settings import (
+    LOAD_TEST_CONCURRENCY,
+    LOAD_TEST_SAMPLE_INTERVAL,
+    LOAD_TEST_STUB_LATENCY_MS
+)
+from src.services.admission import RETRIEVAL_ONLY_ANSWER, ServiceBusyError
+
+STUB_TEXT = (
+    "The company reduced Scope 1 and Scope 2 greenhouse gas emissions by 18% against "
+    "its FY2020 baseline and targets net zero operations by 2040. Renewable sources "
+    "supplied 42% of electricity consumed during the year. "
+) * 4
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Nearest-rank percentile
+
+    Args:
+        values: Numbers (any order)
+        q: Percentile between 0 and 100
+
+    Returns:
+        Percentile value (0.0 for no values)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def read_process_usage(pid: int = None) -> tuple:
+    """
+    CPU time and resident memory of a process
+
+    Reads /proc on Linux; elsewhere only the current process's CPU time is
+    available.
+
+    Args:
+        pid: Process to inspect (the current process if omitted)
+
+    Returns:
+        Tuple of (cpu_seconds, rss_bytes), either may be None if unavailable
+    """
+    proc = f"/proc/{pid or 'self'}"
+    try:
+        with open(f"{proc}/stat") as f:
+            # Fields after the parenthesized command name; utime and stime follow
+            fields = f.read().rpartition(")")[2].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"{proc}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        return cpu, rss
+    except (OSError, ValueError, IndexError, AttributeError):
+        if pid is not None:
+            return None, None
+        times = os.times()
+        return times.user + times.system, None
+
+
+class ResourceSampler:
+    """Background thread recording CPU utilisation and RSS of a process over time"""
+
+    def __init__(self, pid: int = None, interval: float = LOAD_TEST_SAMPLE_INTERVAL):
+        """
+        Initialize the sampler
+
+        Args:
+            pid: Process to sample (the current process if omitted), e.g. a
+                running query server
+            interval: Seconds between samples
+        """
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="load-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> list:
+        """
+        Stop sampling
+
+        Returns:
+            List of {"t", "cpu_percent", "rss_mb"} samples (t in seconds
+            since start; cpu_percent may exceed 100 on several cores)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self):
+        start = last_time = time.perf_counter()
+        last_cpu, _ = read_process_usage(self.pid)
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            cpu, rss = read_process_usage(self.pid)
+            cpu_percent = None
+            if cpu is not None and last_cpu is not None:
+                cpu_percent = round(100 * (cpu - last_cpu) / (now - last_time), 1)
+            self.samples.append({
+                "t": round(now - start, 2),
+                "cpu_percent": cpu_percent,
+                "rss_mb": None if rss is None else round(rss / (1024 * 1024), 1)
+            })
+            last_time, last_cpu = now, cpu
+
+
+class LoadGenerator:
+    """
+    Drives an ask callable with many concurrent simulated users
+
+    Closed loop (default): `concurrency` users each ask their next question
+    as soon as the previous answer arrives. Open loop (`rate`): questions
+    arrive at a fixed average rate whatever the latency, at most
+    `concurrency` in flight; latency is measured from the scheduled arrival,
+    so queueing shows up in the numbers.
+    """
+
+    def __init__(self, ask, questions: list, concurrency: int = LOAD_TEST_CONCURRENCY,
+                 rate: float = None, poisson: bool = True, sampler: ResourceSampler = None):
+        """
+        Initialize the generator
+
+        Args:
+            ask: Callable(question dict) -> dictionary of stage -> seconds
+                (optionally with "degraded": True); see local_ask() and
+                server_ask()
+            questions: Question dictionaries (see batch_qa.load_questions),
+                replayed in a cycle
+            concurrency: Users (closed loop) or maximum requests in flight
+                (open loop)
+            rate: Arrivals per second for open-loop mode
+            poisson: Exponential inter-arrival times (bursty) instead of a
+                constant interval in open-loop mode
+            sampler: ResourceSampler for CPU / RSS (current process if omitted)
+        """
+        if not questions:
+            raise ValueError("No questions to replay")
+        self.ask = ask
+        self.questions = questions
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.poisson = poisson
+        self.sampler = sampler or ResourceSampler()
+        self._lock = threading.Lock()
+        self._records = []
+
+    def run(self, requests: int = None, duration: float = None,
+            progress_callback=None) -> dict:
+        """
+        Generate load until `requests` were sent or `duration` elapsed
+
+        Args:
+            requests: Requests to send (one pass over the corpus if neither
+                limit is given)
+            duration: Seconds to keep sending
+            progress_callback: Optional callable(done, record)
+
+        Returns:
+            Report dictionary (see summarize())
+        """
+        if requests is None and duration is None:
+            requests = len(self.questions)
+        self._records = []
+        self._progress_callback = progress_callback
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        self.sampler.start()
+        try:
+            if self.rate:
+                self._run_open_loop(start, requests, deadline)
+            else:
+                self._run_closed_loop(requests, deadline)
+        finally:
+            samples = self.sampler.stop()
+        return self.summarize(self._records, time.perf_counter() - start, samples)
+
+    def _run_closed_loop(self, requests: int, deadline: float):
+        counter = iter(range(requests if requests is not None else 1 << 62))
+
+        def user():
+            while deadline is None or time.perf_counter() < deadline:
+                with self._lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                self._one(self.questions[index % len(self.questions)], time.perf_counter())
+
+        users = [threading.Thread(target=user, name=f"load-user-{i}", daemon=True)
+                 for i in range(self.concurrency)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+
+    def _run_open_loop(self, start: float, requests: int, deadline: float):
+        rng = random.Random(0)
+        arrival = start
+        index = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency,
+                                thread_name_prefix="load-user") as executor:
+            while requests is None or index < requests:
+                if deadline is not None and arrival >= deadline:
+                    break
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._one, self.questions[index % len(self.questions)], arrival)
+                index += 1
+                arrival += rng.expovariate(self.rate) if self.poisson else 1 / self.rate
+
+    def _one(self, question: dict, arrival: float):
+        """Ask one question and record its outcome and stage timings"""
+        record = {"outcome": "ok", "stages": {}}
+        try:
+            stages = dict(self.ask(question))
+            if stages.pop("degraded", False):
+                record["outcome"] = "degraded"
+            record["stages"] = stages
+        except Exception as e:
+            busy = isinstance(e, ServiceBusyError) or getattr(e, "busy", False)
+            record.update(outcome="busy" if busy else "error", error=type(e).__name__)
+        record["stages"]["total"] = time.perf_counter() - arrival
+        with self._lock:
+            self._records.append(record)
+            done = len(self._records)
+        if self._progress_callback:
+            self._progress_callback(done, record)
+
+    def summarize(self, records: list, seconds: float, samples: list) -> dict:
+        """
+        Aggregate request records into a report
+
+        Args:
+            records: Per-request {"outcome", "stages", "error"?} records
+            seconds: Wall-clock duration of the run
+            samples: ResourceSampler samples
+
+        Returns:
+            Dictionary with request counts per outcome, error_rate,
+            throughput_rps (answered requests per second), latency_ms per
+            stage (count, mean, p50, p95, p99, max; answered requests only),
+            errors_by_type and resources (samples plus averages and peaks)
+        """
+        outcomes = {"ok": 0, "degraded": 0, "busy": 0, "error": 0}
+        errors_by_type = {}
+        stage_times = {}
+        for record in records:
+            outcomes[record["outcome"]] += 1
+            if record["outcome"] in ("busy", "error"):
+                errors_by_type[record["error"]] = errors_by_type.get(record["error"], 0) + 1
+                continue
+            for stage, value in record["stages"].items():
+                stage_times.setdefault(stage, []).append(value * 1000)
+
+        answered = outcomes["ok"] + outcomes["degraded"]
+        failed = outcomes["busy"] + outcomes["error"]
+        cpu = [s["cpu_percent"] for s in samples if s["cpu_percent"] is not None]
+        rss = [s["rss_mb"] for s in samples if s["rss_mb"] is not None]
+        return {
+            "mode": "open loop" if self.rate else "closed loop",
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "requests": len(records),
+            **outcomes,
+            "error_rate": round(failed / len(records), 4) if records else 0.0,
+            "seconds": round(seconds, 3),
+            "throughput_rps": round(answered / seconds, 3) if seconds else 0.0,
+            "latency_ms": {
+                stage: {
+                    "count": len(values),
+                    "mean": round(sum(values) / len(values), 1),
+                    "p50": round(percentile(values, 50), 1),
+                    "p95": round(percentile(values, 95), 1),
+                    "p99": round(percentile(values, 99), 1),
+                    "max": round(max(values), 1)
+                }
+                for stage, values in stage_times.items()
+            },
+            "errors_by_type": errors_by_type,
+            "resources": {
+                "avg_cpu_percent": round(sum(cpu) / len(cpu), 1) if cpu else None,
+                "peak_cpu_percent": max(cpu) if cpu else None,
+                "peak_rss_mb": max(rss) if rss else None,
+                "samples": samples
+            }
+        }
+
+
+def local_ask(search_service, qa_service):
+    """
+    Ask callable running retrieval and generation in-process, timing each stage
+
+    Structured-query routing is bypassed so every request exercises
+    semantic search and answer generation.
+
+    Args:
+        search_service: SearchService (real or from stub_services())
+        qa_service: QAService
+
+    Returns:
+        Callable(question dict) -> {"search": seconds, "answer": seconds}
+    """
+    def ask(question: dict) -> dict:
+        companies = question.get("companies") or []
+        comparing = len(companies) > 1
+        start = time.perf_counter()
+        if comparing:
+            chunks = search_service.multi_company_search(question["question"], companies)
+        else:
+            chunks = search_service.semantic_search(question["question"],
+                                                    company_name=question.get("company"))
+        searched = time.perf_counter()
+        qa_service.generate_answer(question["question"], chunks,
+                                   companies if comparing else None)
+        return {"search": searched - start, "answer": time.perf_counter() - searched}
+    return ask
+
+
+def server_ask(client):
+    """
+    Ask callable sending each question to a running query server
+
+    Args:
+        client: QueryClient
+
+    Returns:
+        Callable(question dict) -> {"server": seconds, "degraded": bool}
+    """
+    def ask(question: dict) -> dict:
+        start = time.perf_counter()
+        _, answer = client.ask(question["question"], question.get("company"),
+                               question.get("companies"))
+        return {"server": time.perf_counter() - start, "degraded": answer == RETRIEVAL_ONLY_ANSWER}
+    return ask
+
+
+class StubEncoder:
+    """Stand-in for the embedding model: deterministic vectors, CPU-bound latency"""
+
+    def __init__(self, latency_ms: float, dimension: int = 1024):
+        self.latency = latency_ms / 1000
+        self.dimension = dimension
+
+    def encode(self, texts, show_progress_bar=False):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        # Spin instead of sleeping so concurrent encodes contend for CPU like the real model
+        deadline = time.perf_counter() + self.latency * len(batch)
+        while time.perf_counter() < deadline:
+            pass
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            .standard_normal(self.dimension).astype(np.float32)
+            for text in batch
+        ])
+        return vectors[0] if single else vectors
+
+
+class StubIndex:
+    """Stand-in for the Pinecone index with fixed network latency"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def query(self, vector=None, top_k: int = 3, include_metadata: bool = True, filter=None):
+        time.sleep(self.latency)
+        company = filter["company"]["$eq"] if filter else "Stub Company"
+        return {"matches": [
+            {"id": f"stub_{i}", "score": 0.9 - 0.01 * i,
+             "metadata": {"company": company, "text": STUB_TEXT}}
+            for i in range(top_k)
+        ]}
+
+    def fetch(self, ids=None):
+        time.sleep(self.latency)
+        return {"vectors": {}}
+
+
+class StubLLM:
+    """Stand-in for the Gemini client with fixed generation latency"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.models = self
+
+    def generate_content(self, model=None, contents=None):
+        time.sleep(self.latency)
+        return SimpleNamespace(text="Stub answer generated for load testing.")
+
+
+def stub_services(latency_ms: dict = None, cache: bool = True) -> tuple:
+    """
+    Real SearchService and QAService wired to stubbed backends
+
+    Admission control, the result cache and neighbor expansion run as in
+    production; only the model, index and LLM are simulated.
+
+    Args:
+        latency_ms: Dictionary of "encoder" / "vector_query" / "llm" ->
+            milliseconds per call (LOAD_TEST_STUB_LATENCY_MS if omitted)
+        cache: Keep the search result cache (repeated questions become hits)
+
+    Returns:
+        Tuple of (search_service, qa_service)
+    """
+    from src.services.qa_service import QAService
+    from src.services.search_cache import SearchResultCache
+    from src.services.search_service import SearchService
+
+    latency_ms = dict(LOAD_TEST_STUB_LATENCY_MS, **(latency_ms or {}))
+    search_service = SearchService(cache=None if cache else SearchResultCache(max_entries=0))
+    search_service.local_store = None
+    search_service.model = StubEncoder(latency_ms["encoder"])
+    search_service.index = StubIndex(latency_ms["vector_query"])
+    qa_service = QAService()
+    qa_service.client = StubLLM(latency_ms["llm"])
+    return search_service, qa_service
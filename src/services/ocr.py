@@ -0,0 +1,283 @@
+"""
+OCR Extraction
+Tesseract OCR for scanned pages, run in a process pool and cached by page image hash
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from src.config.settings import (
+    OCR_CACHE_DIR,
+    OCR_DPI,
+    OCR_LANGUAGE,
+    OCR_MIN_CHARS,
+    OCR_WORKERS,
+    TESSERACT_CMD
+)
+from src.services.pdf_extraction import PDFIUM_LOCK, ExtractionEngine, _rewind, pdfium
+
+
+def needs_ocr(text: str, min_chars: int = OCR_MIN_CHARS) -> bool:
+    """
+    Check whether a page looks scanned (no usable text layer)
+
+    Args:
+        text: Text extracted from the page's text layer
+        min_chars: Non-whitespace characters below which the page is OCRed
+
+    Returns:
+        True if the page should be OCRed
+    """
+    return len("".join((text or "").split())) < min_chars
+
+
+def hash_page_image(size: tuple, pixels: bytes) -> str:
+    """SHA-256 of a rendered page (identical scans share one OCR result)"""
+    digest = hashlib.sha256(f"{size[0]}x{size[1]}:".encode())
+    digest.update(pixels)
+    return digest.hexdigest()
+
+
+def recognize_image(pixels: bytes, size: tuple, language: str = OCR_LANGUAGE,
+                    tesseract_cmd: str = TESSERACT_CMD) -> str:
+    """
+    OCR one grayscale page image (runs in a worker process)
+
+    Args:
+        pixels: 8-bit grayscale pixels, row by row
+        size: (width, height)
+        language: Tesseract language(s)
+        tesseract_cmd: Tesseract executable
+
+    Returns:
+        Recognized text
+    """
+    import pytesseract
+    from PIL import Image
+
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    return pytesseract.image_to_string(Image.frombytes("L", size, pixels), lang=language)
+
+
+class OcrCache:
+    """
+    On-disk OCR results
+
+    Layout: <cache_dir>/<hash[:2]>/<hash>/<engine_key>.txt.gz, written to a
+    temporary file first so partially written entries are never read.
+    """
+
+    def __init__(self, cache_dir: str = OCR_CACHE_DIR):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Root directory of the cache
+        """
+        self.cache_dir = cache_dir
+
+    def _path(self, page_hash: str, engine_key: str) -> str:
+        safe_key = "".join(c if c.isalnum() or c in "-_.+" else "_" for c in engine_key)
+        return os.path.join(self.cache_dir, page_hash[:2], page_hash, f"{safe_key}.txt.gz")
+
+    def get(self, page_hash: str, engine_key: str):
+        """
+        Read a cached OCR result
+
+        Args:
+            page_hash: hash_page_image() of the rendered page
+            engine_key: OCR engine cache key (engine version and language)
+
+        Returns:
+            Page text or None on a cache miss
+        """
+        try:
+            with gzip.open(self._path(page_hash, engine_key), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, page_hash: str, engine_key: str, text: str):
+        """
+        Store an OCR result
+
+        Args:
+            page_hash: hash_page_image() of the rendered page
+            engine_key: OCR engine cache key
+            text: Recognized text
+        """
+        path = self._path(page_hash, engine_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class OcrEngine(ExtractionEngine):
+    """
+    Renders pages with PDFium and OCRs them with Tesseract in worker processes
+
+    Pages are rendered one at a time on the calling thread and handed to the
+    pool as raw grayscale pixels; at most two pages per worker are in
+    flight, so a long scanned report never holds all its page images.
+    A page Tesseract fails on comes back empty. If a worker dies (e.g. it is
+    OOM-killed) the shared pool is restarted and the lost pages are
+    resubmitted once; a second crash fails the document.
+    """
+
+    name = "tesseract"
+    version = "1"
+
+    def __init__(self, language: str = OCR_LANGUAGE, dpi: int = OCR_DPI, cache: OcrCache = None,
+                 executor=None, workers: int = None, tesseract_cmd: str = TESSERACT_CMD):
+        """
+        Initialize the engine
+
+        Args:
+            language: Tesseract language(s)
+            dpi: Render resolution
+            cache: OcrCache for recognized pages (OCR_CACHE_DIR if omitted)
+            executor: concurrent.futures executor running recognize_image
+                (the process-wide OCR pool if omitted)
+            workers: Worker count of that executor (OCR_WORKERS if omitted)
+            tesseract_cmd: Tesseract executable
+        """
+        self.language = language
+        self.dpi = dpi
+        self.cache = cache or OcrCache()
+        self.executor = executor
+        self.workers = workers or OCR_WORKERS
+        self.tesseract_cmd = tesseract_cmd
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}-{self.version}-{self.language}-{self.dpi}"
+
+    def extract_pages(self, pdf_source, page_numbers: list = None,
+                      progress_callback=None) -> dict:
+        executor = self.executor or get_ocr_executor()
+        max_in_flight = 2 * self.workers
+        pages = {}
+        pending = {}  # future -> (page number, page hash)
+
+        def collect(futures):
+            for future in futures:
+                number, page_hash = pending[future]
+                try:
+                    text = future.result()
+                except BrokenProcessPool:
+                    raise  # Not the page's fault: the page stays pending
+                except Exception:
+                    text = None  # An unreadable page must not fail the document
+                del pending[future]
+                pages[number] = text or ""
+                if text is not None:
+                    self.cache.put(page_hash, self.cache_key, text)
+                if progress_callback:
+                    progress_callback(len(pages), total)
+
+        _rewind(pdf_source)
+        with PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_source)
+            numbers = list(page_numbers or range(1, len(pdf) + 1))
+        total = len(numbers)
+        queue = list(numbers)
+        restarted = False
+        try:
+            while queue or pending:
+                try:
+                    while queue:
+                        number = queue[0]
+                        size, pixels = self._render(pdf, number)
+                        page_hash = hash_page_image(size, pixels)
+                        cached = self.cache.get(page_hash, self.cache_key)
+                        if cached is None:
+                            if len(pending) >= max_in_flight:
+                                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                                collect(done)
+                            future = executor.submit(recognize_image, pixels, size,
+                                                     self.language, self.tesseract_cmd)
+                            pending[future] = (number, page_hash)
+                        else:
+                            pages[number] = cached
+                        queue.pop(0)
+                    collect(list(pending))
+                except BrokenProcessPool:
+                    if restarted or self.executor is not None:
+                        raise
+                    restarted = True
+                    # Every page in flight died with the pool: render and submit them again
+                    queue = sorted(number for number, _ in pending.values()) + queue
+                    pending.clear()
+                    executor = restart_ocr_executor(executor)
+        finally:
+            with PDFIUM_LOCK:
+                pdf.close()
+        return pages
+
+    def _render(self, pdf, number: int) -> tuple:
+        """Render one page to ((width, height), grayscale pixels)"""
+        with PDFIUM_LOCK:
+            page = pdf[number - 1]
+            bitmap = page.render(scale=self.dpi / 72, grayscale=True)
+            image = bitmap.to_pil()
+            size, pixels = image.size, image.convert("L").tobytes()
+            bitmap.close()
+            page.close()
+        return size, pixels
+
+
+def ocr_available(tesseract_cmd: str = TESSERACT_CMD) -> bool:
+    """Whether pytesseract, the Tesseract executable and PDFium are installed"""
+    return (pdfium is not None and importlib.util.find_spec("pytesseract") is not None
+            and shutil.which(tesseract_cmd) is not None)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """
+    Get the OCR process pool shared by every ingestion of this process
+
+    Workers are spawned rather than forked: forking a process that already
+    runs threads (Streamlit, torch, the ingestion pool) can deadlock them.
+
+    Returns:
+        ProcessPoolExecutor with OCR_WORKERS processes
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def restart_ocr_executor(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """
+    Replace the shared OCR pool after one of its workers died
+
+    Args:
+        broken: The pool that raised BrokenProcessPool (a concurrent
+            ingestion may already have replaced it)
+
+    Returns:
+        The current, working pool
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    return get_ocr_executor()
@@ -0,0 +1,284 @@
+"""
+PDF Extraction Engines
+Pluggable page-text extractors with a fast default and per-page pdfplumber fallback
+"""
+
+import importlib.util
+import re
+import threading
+import time
+
+from src.config.settings import (
+    PDF_EXTRACTION_ENGINE,
+    EXTRACTION_GARBLED_RATIO,
+    EXTRACTION_SHORT_LINE_RATIO,
+    EXTRACTION_NUMERIC_LINE_RATIO,
+    EXTRACTION_MIN_TABLE_LINES,
+    OCR_ENABLED
+)
+from src.utils.lazy_imports import lazy_module
+
+pdfplumber = lazy_module("pdfplumber")
+
+# pypdfium2 ships with pdfplumber >= 0.11
+if importlib.util.find_spec("pypdfium2") is not None:
+    pdfium = lazy_module("pypdfium2")
+else:  # pragma: no cover
+    pdfium = None
+
+# PDFium is not thread-safe: all calls into it go through this lock
+PDFIUM_LOCK = threading.Lock()
+
+GARBLED_PATTERN = re.compile(r"\(cid:\d+\)|[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]")
+NUMERIC_LINE_PATTERN = re.compile(r"[\d.,%()\-–\s]+")
+
+
+def suspicious_reason(text: str):
+    """
+    Check whether fast-path output for a page needs the layout-aware engine
+
+    Args:
+        text: Extracted page text
+
+    Returns:
+        Reason string ("empty", "garbled", "table") or None if the text looks fine
+    """
+    if not text or not text.strip():
+        return "empty"
+
+    garbled = sum(len(m.group(0)) for m in GARBLED_PATTERN.finditer(text))
+    if garbled / len(text) > EXTRACTION_GARBLED_RATIO:
+        return "garbled"
+
+    # Tables come out of content-stream order one cell per line
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    if len(lines) >= EXTRACTION_MIN_TABLE_LINES:
+        short = sum(1 for line in lines if len(line.split()) <= 2)
+        numeric = sum(1 for line in lines if NUMERIC_LINE_PATTERN.fullmatch(line))
+        if (short / len(lines) >= EXTRACTION_SHORT_LINE_RATIO
+                or numeric / len(lines) >= EXTRACTION_NUMERIC_LINE_RATIO):
+            return "table"
+    return None
+
+
+class ExtractionEngine:
+    """Base class for page-text extractors"""
+
+    name = "base"
+    version = "1"
+
+    @property
+    def cache_key(self) -> str:
+        """Identifier of this engine's output format, used to key cached text"""
+        return f"{self.name}-{self.version}"
+
+    def extract_pages(self, pdf_source, page_numbers: list = None,
+                      progress_callback=None) -> dict:
+        """
+        Extract text per page
+
+        Args:
+            pdf_source: Path or seekable binary stream
+            page_numbers: 1-based page numbers to extract (all pages if omitted)
+            progress_callback: Optional callable(done, total)
+
+        Returns:
+            Dictionary of page number -> text
+        """
+        raise NotImplementedError
+
+
+class PdfplumberEngine(ExtractionEngine):
+    """Accurate, layout-aware extraction (slow on long text-heavy reports)"""
+
+    name = "pdfplumber"
+    version = "1"
+
+    def extract_pages(self, pdf_source, page_numbers: list = None,
+                      progress_callback=None) -> dict:
+        _rewind(pdf_source)
+        pages = {}
+        with pdfplumber.open(pdf_source, pages=page_numbers) as pdf:
+            total = len(pdf.pages)
+            for done, page in enumerate(pdf.pages, 1):
+                pages[page.page_number] = page.extract_text() or ""
+                page.close()  # Drop the parsed layout objects cached on the page
+                if progress_callback:
+                    progress_callback(done, total)
+        return pages
+
+
+class PdfiumEngine(ExtractionEngine):
+    """Fast extraction straight from PDFium's text layer (no layout analysis)"""
+
+    name = "pdfium"
+    version = "1"
+
+    def extract_pages(self, pdf_source, page_numbers: list = None,
+                      progress_callback=None) -> dict:
+        _rewind(pdf_source)
+        pages = {}
+        with PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_source)
+            try:
+                numbers = page_numbers or range(1, len(pdf) + 1)
+                total = len(numbers)
+                for done, number in enumerate(numbers, 1):
+                    page = pdf[number - 1]
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range()
+                    textpage.close()
+                    page.close()
+                    pages[number] = text.replace("\r\n", "\n").replace("\r", "\n")
+                    if progress_callback:
+                        progress_callback(done, total)
+            finally:
+                pdf.close()
+        return pages
+
+
+class FallbackExtractor(ExtractionEngine):
+    """
+    Fast engine for every page, layout-aware engine only for suspicious pages
+
+    Pages still without text after the fallback (scans) go to the OCR engine
+    when one is configured. Per-engine page counts and wall time are kept in `last_stats` (most recent
+    document on this thread) and `stats` (cumulative) so the speed/accuracy
+    trade-off can be measured.
+    """
+
+    name = "auto"
+
+    def __init__(self, fast_engine: ExtractionEngine = None,
+                 accurate_engine: ExtractionEngine = None, ocr_engine: ExtractionEngine = None):
+        """
+        Initialize the extractor
+
+        Args:
+            fast_engine: Engine run on all pages (PdfiumEngine by default)
+            accurate_engine: Engine run on suspicious pages (PdfplumberEngine by default)
+            ocr_engine: Engine run on pages left without text (no OCR if omitted)
+        """
+        self.fast_engine = fast_engine or PdfiumEngine()
+        self.accurate_engine = accurate_engine or PdfplumberEngine()
+        self.ocr_engine = ocr_engine
+        self.version = f"{self.fast_engine.name}-{self.fast_engine.version}+" \
+                       f"{self.accurate_engine.name}-{self.accurate_engine.version}"
+        if ocr_engine is not None:
+            self.version += f"+{ocr_engine.cache_key}"
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def last_stats(self) -> dict:
+        """Stats for the most recent document extracted on the calling thread"""
+        return getattr(self._local, "stats", {})
+
+    def extract_pages(self, pdf_source, page_numbers: list = None,
+                      progress_callback=None) -> dict:
+        stats = {"engines": {}, "fallback_pages": {}}
+
+        start = time.perf_counter()
+        pages = self.fast_engine.extract_pages(pdf_source, page_numbers, progress_callback)
+        _record(stats, self.fast_engine.name, len(pages), time.perf_counter() - start)
+
+        for number, text in pages.items():
+            reason = suspicious_reason(text)
+            if reason:
+                stats["fallback_pages"][number] = reason
+
+        if stats["fallback_pages"]:
+            start = time.perf_counter()
+            retried = self.accurate_engine.extract_pages(
+                pdf_source, sorted(stats["fallback_pages"])
+            )
+            _record(stats, self.accurate_engine.name, len(retried),
+                    time.perf_counter() - start)
+            for number, text in retried.items():
+                # Keep the fast result if the fallback found nothing better
+                if text.strip() or not pages[number].strip():
+                    pages[number] = text
+
+        if self.ocr_engine is not None:
+            from src.services.ocr import needs_ocr
+            scanned = [number for number, text in sorted(pages.items()) if needs_ocr(text)]
+            stats["ocr_pages"] = scanned
+            if scanned:
+                start = time.perf_counter()
+                recognized = self.ocr_engine.extract_pages(pdf_source, scanned)
+                _record(stats, self.ocr_engine.name, len(recognized),
+                        time.perf_counter() - start)
+                for number, text in recognized.items():
+                    if len(text.strip()) > len(pages[number].strip()):
+                        pages[number] = text
+
+        self._local.stats = stats
+        with self._stats_lock:
+            for engine, values in stats["engines"].items():
+                total = self.stats.setdefault(engine, {"pages": 0, "seconds": 0.0})
+                total["pages"] += values["pages"]
+                total["seconds"] += values["seconds"]
+        return pages
+
+
+def extract_tables(pdf_source, page_numbers: list):
+    """
+    Extract tables with pdfplumber's table finder
+
+    Args:
+        pdf_source: Path or seekable binary stream
+        page_numbers: 1-based pages to look at (table finding is slow, so
+            callers pass only the pages likely to hold tables)
+
+    Yields:
+        Tuples of (page_number, rows) where rows are lists of cell strings
+        (None for empty cells)
+    """
+    if not page_numbers:
+        return
+    _rewind(pdf_source)
+    with pdfplumber.open(pdf_source, pages=page_numbers) as pdf:
+        for page in pdf.pages:
+            for table in page.extract_tables():
+                yield page.page_number, table
+            page.close()
+
+
+def _record(stats: dict, engine: str, pages: int, seconds: float):
+    stats["engines"][engine] = {"pages": pages, "seconds": round(seconds, 4)}
+
+
+def _rewind(pdf_source):
+    if hasattr(pdf_source, "seek"):
+        pdf_source.seek(0)
+
+
+# Engine name -> factory
+EXTRACTION_ENGINES = {
+    "auto": FallbackExtractor,
+    "pdfium": PdfiumEngine,
+    "pdfplumber": PdfplumberEngine
+}
+
+
+def get_extraction_engine(name: str = PDF_EXTRACTION_ENGINE) -> ExtractionEngine:
+    """
+    Create an extraction engine by name
+
+    Args:
+        name: "auto", "pdfium" or "pdfplumber"
+
+    Returns:
+        ExtractionEngine instance (pdfplumber if PDFium is unavailable; "auto"
+        adds OCR of scanned pages when OCR_ENABLED and Tesseract is installed)
+    """
+    if name not in EXTRACTION_ENGINES:
+        raise ValueError(f"Unknown PDF extraction engine: {name}")
+    if pdfium is None and name != "pdfplumber":
+        return PdfplumberEngine()
+    if name == "auto" and OCR_ENABLED:
+        from src.services.ocr import OcrEngine, ocr_available
+        if ocr_available():
+            return FallbackExtractor(ocr_engine=OcrEngine())
+    return EXTRACTION_ENGINES[name]()
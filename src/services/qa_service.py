@@ -3,37 +3,118 @@ Question Answering Service
 Generates AI-powered answers using LLM based on retrieved context
 """
 
-from google import genai
-
 from src.config.settings import GEMINI_API_KEY, LLM_MODEL
+from src.services.admission import (
+    RETRIEVAL_ONLY_ANSWER,
+    ServiceBusyError,
+    get_admission_controller
+)
+from src.utils.helpers import format_pages
+from src.utils.lazy_imports import lazy_module, lazy_resource
+from src.utils.profiling import profiled
+
+# google.genai takes about half a second to import; load it on first use
+genai = lazy_module("google.genai")
+
+
+def build_context(top_chunks: list, company_names: list = None) -> str:
+    """
+    Format retrieved chunks as the SOURCES block of the prompt
+    
+    Args:
+        top_chunks: Retrieved document chunks
+        company_names: Companies being compared; when given, sources are
+            grouped into one section per company (in this order)
+        
+    Returns:
+        Context string
+    """
+    if not company_names:
+        return "\n\n".join([
+            f"Source {i+1} (Company: {c['company']}{_page_suffix(c)}):\n{c['text']}"
+            for i, c in enumerate(top_chunks)
+        ])
+    
+    sections = []
+    source_number = 0
+    for company in company_names:
+        chunks = [c for c in top_chunks if c["company"] == company]
+        lines = [f"=== {company} ==="]
+        if not chunks:
+            lines.append("No sources found for this company.")
+        for c in chunks:
+            source_number += 1
+            pages = format_pages(c)
+            lines.append(f"Source {source_number}{f' ({pages})' if pages else ''}:\n{c['text']}")
+        sections.append("\n\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def _page_suffix(chunk: dict) -> str:
+    pages = format_pages(chunk)
+    return f", {pages}" if pages else ""
+
+
+def comparison_instructions(company_names: list) -> str:
+    """Extra prompt requirements for multi-company comparison questions"""
+    if not company_names:
+        return ""
+    return f"""
+COMPARISON:
+- The sources are grouped by company: {", ".join(company_names)}
+- Address each company separately, then compare them directly
+- Only attribute information to the company whose section it appears in
+- If a company's section lacks the information, say so for that company
+"""
 
 
 class QAService:
     """Service for generating answers using LLM"""
     
-    def __init__(self):
-        """Initialize QA service with Gemini client"""
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
+    def __init__(self, query_router=None, admission=None, retrieval_only_when_busy: bool = True):
+        """
+        Initialize QA service (the Gemini client is created on first use)
+        
+        Args:
+            query_router: Optional router (see structured_query.get_query_router)
+                answering score, rating, ranking and table-number questions
+                without search or LLM calls
+            admission: AdmissionController bounding concurrent LLM calls
+                (shared if omitted)
+            retrieval_only_when_busy: Return the sources with
+                RETRIEVAL_ONLY_ANSWER instead of raising ServiceBusyError
+                when the LLM stage is saturated
+        """
+        self.query_router = query_router
+        self.admission = admission or get_admission_controller()
+        self.retrieval_only_when_busy = retrieval_only_when_busy
+    
+    @lazy_resource("connection", "create Gemini client")
+    def client(self):
+        """Gemini client"""
+        return genai.Client(api_key=GEMINI_API_KEY)
     
-    def generate_answer(self, user_query: str, top_chunks: list) -> str:
+    def generate_answer(self, user_query: str, top_chunks: list,
+                        company_names: list = None) -> str:
         """
         Generate detailed answer using Gemini based on retrieved chunks
         
         Args:
             user_query: User's question
             top_chunks: List of relevant document chunks from search
+            company_names: Companies being compared (per-company context sections)
             
         Returns:
             Generated answer as string
+            
+        Raises:
+            ServiceBusyError: If the LLM stage is saturated
         """
         if not top_chunks:
             return "Information not found in the provided ESG documents."
         
         # Prepare context from chunks
-        context = "\n\n".join([
-            f"Source {i+1} (Company: {c['company']}):\n{c['text']}"
-            for i, c in enumerate(top_chunks)
-        ])
+        context = build_context(top_chunks, company_names)
         
         # Create detailed prompt
         prompt = f"""
@@ -54,7 +135,7 @@ RESPONSE STRUCTURE:
 3. Include relevant context about targets, timelines, and methodologies
 4. Discuss implications or significance where relevant
 5. Cite which companies the information comes from
-
+{comparison_instructions(company_names)}
 SOURCES:
 {context}
 
@@ -65,35 +146,82 @@ DETAILED ANSWER (200-400 words, professional, well-structured paragraphs):
 """
         
         # Generate answer using Gemini
-        response = self.client.models.generate_content(
-            model=LLM_MODEL,
-            contents=prompt
-        )
+        with self.admission.slot("llm"):
+            response = self.client.models.generate_content(
+                model=LLM_MODEL,
+                contents=prompt
+            )
         
         return response.text.strip()
     
-    def ask_question(self, user_query: str, search_service) -> tuple:
+    def ask_question(self, user_query: str, search_service,
+                     company_name: str = None, company_names: list = None,
+                     profile=None) -> tuple:
         """
-        Complete QA pipeline: search + answer generation
+        Complete QA pipeline: structured lookup or search + answer generation
         
         Args:
             user_query: User's question
             search_service: Instance of SearchService
+            company_name: Optional company filter (None or "General" for all)
+            company_names: Companies to compare (overrides company_name when
+                two or more are given)
+            profile: True (or "cprofile" / "sampling") to write a profile of
+                this question to PROFILE_DIR; None follows ESG_PROFILE sampling
             
         Returns:
-            Tuple of (top_chunks, answer)
+            Tuple of (top_chunks, answer); answer is RETRIEVAL_ONLY_ANSWER
+            when the LLM stage shed the request
+            
+        Raises:
+            ServiceBusyError: If search is saturated (or the LLM stage, with
+                retrieval_only_when_busy off)
         """
+        with profiled("ask_question", profile):
+            return self._ask_question(user_query, search_service, company_name, company_names)
+    
+    def _ask_question(self, user_query: str, search_service, company_name: str,
+                      company_names: list) -> tuple:
+        comparing = company_names is not None and len(company_names) > 1
+        
+        # Structured score/rating/ranking questions are answered from the table
+        if self.query_router is not None:
+            routed = self.query_router.route(
+                user_query, company_name=None if comparing else company_name
+            )
+            if routed is not None:
+                return routed
+        
         # Get relevant chunks
-        top_chunks = search_service.semantic_search(user_query)
+        busy = []
+        if comparing:
+            top_chunks = search_service.multi_company_search(user_query, company_names)
+            # Companies shed by admission control are left out of the answer
+            busy = getattr(top_chunks, "busy_companies", [])
+            company_names = [company for company in company_names if company not in busy]
+        else:
+            top_chunks = search_service.semantic_search(
+                user_query, company_name=company_name
+            )
         
-        # Generate answer
-        answer = self.generate_answer(user_query, top_chunks)
+        # Generate answer (degrading to the sources alone under overload)
+        try:
+            answer = self.generate_answer(user_query, top_chunks,
+                                          company_names if comparing else None)
+        except ServiceBusyError:
+            if not self.retrieval_only_when_busy:
+                raise
+            answer = RETRIEVAL_ONLY_ANSWER
+        if busy:
+            answer += (f"\n\nNote: {', '.join(busy)} could not be searched because the "
+                       f"service is busy; ask again shortly to include them.")
         
         return top_chunks, answer
 
 
 # Backward compatibility function
-def generate_answer_with_gemini(user_query: str, top_chunks: list, client) -> str:
+def generate_answer_with_gemini(user_query: str, top_chunks: list, client,
+                                company_names: list = None) -> str:
     """
     Legacy function for backward compatibility
     
@@ -101,6 +229,7 @@ def generate_answer_with_gemini(user_query: str, top_chunks: list, client) -> st
         user_query: User's question
         top_chunks: Retrieved document chunks
         client: Gemini client
+        company_names: Companies being compared (per-company context sections)
         
     Returns:
         Generated answer
@@ -108,10 +237,7 @@ def generate_answer_with_gemini(user_query: str, top_chunks: list, client) -> st
     if not top_chunks:
         return "Information not found in the provided ESG documents."
     
-    context = "\n\n".join([
-        f"Source {i+1} (Company: {c['company']}):\n{c['text']}"
-        for i, c in enumerate(top_chunks)
-    ])
+    context = build_context(top_chunks, company_names)
     
     prompt = f"""
 You are a Sustainability ESG Analyst providing detailed, comprehensive insights.
@@ -131,7 +257,7 @@ RESPONSE STRUCTURE:
 3. Include relevant context about targets, timelines, and methodologies
 4. Discuss implications or significance where relevant
 5. Cite which companies the information comes from
-
+{comparison_instructions(company_names)}
 SOURCES:
 {context}
 
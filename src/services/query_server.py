@@ -0,0 +1,404 @@
+"""
+Query Server
+Resident localhost HTTP/JSON server keeping the embedding model, index handle
+and LLM client warm for CLIs and batch jobs
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.config.settings import (
+    QUERY_SERVER_ALLOWED_HOSTS,
+    QUERY_SERVER_HOST,
+    QUERY_SERVER_MAX_TOP_K,
+    QUERY_SERVER_PORT,
+    QUERY_SERVER_TIMEOUT,
+    TOP_K
+)
+from src.services.admission import (
+    RETRIEVAL_ONLY_ANSWER,
+    ServiceBusyError,
+    get_admission_controller
+)
+from src.services.ingestion_queue import IngestionQueueFullError
+from src.utils.helpers import MAX_UPLOAD_SIZE
+from src.utils.profiling import profiled
+
+# Sources of answers routed past search: the ESG dataset and report-table facts
+ROUTED_SOURCES = ("esg_data", "esg_facts")
+
+
+class QueryServerError(Exception):
+    """Raised by QueryClient when the server is unreachable or rejects a request"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status  # HTTP status (None if the server was not reached)
+
+    @property
+    def busy(self) -> bool:
+        """True when admission control turned the request away (503)"""
+        return self.status == 503
+
+
+class QueryServer:
+    """
+    Threaded HTTP server exposing search, ask and ingest
+
+    Endpoints (JSON in, JSON out):
+        GET  /health           -> {"status", "model_loaded", "pending_jobs", "admission"}
+        POST /search           {"query", "top_k"?, "company"?, "companies"?}
+                               -> {"results", "busy_companies"?}
+        POST /ask              {"query", "company"?, "companies"?}
+                               -> {"sources", "answer", "routed", "degraded"}
+        POST /ingest           {"path", "company"?} or a raw PDF body
+                               (?company=...&filename=...) -> {"job_id"}
+        GET  /jobs/<job_id>    -> job status
+
+    Each request runs on its own thread; the services are shared, so the
+    model is loaded once per server instead of once per CLI invocation.
+    Requests must name a local Host (QUERY_SERVER_ALLOWED_HOSTS or the bound
+    host) and POST bodies must be application/json (or application/pdf for
+    /ingest), so web pages cannot reach the API with simple cross-site
+    requests or DNS rebinding.
+    Requests turned away by admission control, and ingestions while the
+    ingestion queue is full, get 503 with Retry-After; any other failure is a
+    500. Search clamps top_k to QUERY_SERVER_MAX_TOP_K and "companies" must
+    name at least two companies.
+    "degraded" answers carry the sources without an LLM answer. Search and
+    ask accept "profile": true (or a profiler mode) and then return the path
+    of the profile summary written on the server as "profile".
+    """
+
+    def __init__(self, host: str = QUERY_SERVER_HOST, port: int = QUERY_SERVER_PORT,
+                 search_service=None, qa_service=None, ingestion_queue=None, admission=None):
+        """
+        Initialize the server (services are created lazily if omitted)
+
+        Args:
+            host: Interface to bind (localhost by default)
+            port: TCP port (0 picks a free port)
+            search_service: SearchService instance
+            qa_service: QAService instance
+            ingestion_queue: IngestionQueue for /ingest
+            admission: AdmissionController reported by /health (shared if omitted)
+        """
+        if search_service is None:
+            from src.services.search_service import SearchService
+            search_service = SearchService()
+        if qa_service is None:
+            from src.services.qa_service import QAService
+            from src.services.structured_query import get_query_router
+            qa_service = QAService(get_query_router())
+        if ingestion_queue is None:
+            from src.services.ingestion_queue import get_ingestion_queue
+            ingestion_queue = get_ingestion_queue()
+
+        self.search_service = search_service
+        self.qa_service = qa_service
+        self.ingestion_queue = ingestion_queue
+        self.admission = admission or get_admission_controller()
+        self.allowed_hosts = {h.lower() for h in QUERY_SERVER_ALLOWED_HOSTS} | {host.lower()}
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self):
+        """Load the model and open connections before accepting requests"""
+        self.search_service.model
+        if getattr(self.search_service, "local_store", None) is None:
+            self.search_service.index
+        self.qa_service.client
+
+    def serve_forever(self):
+        """Handle requests until shutdown() (blocking)"""
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Handle requests on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name="query-server",
+                                        daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Stop the server and release the port"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Endpoint implementations --------------------------------------------
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "model_loaded": "model" in vars(self.search_service),
+            "pending_jobs": self.ingestion_queue.pending_count(),
+            "admission": self.admission.stats()
+        }
+
+    def search(self, payload: dict) -> dict:
+        query = _require_query(payload)
+        companies = _companies(payload)
+        top_k = _top_k(payload)
+        with profiled("search", payload.get("profile") or None) as run:
+            if companies:
+                results = self.search_service.multi_company_search(query, companies)
+            else:
+                results = self.search_service.semantic_search(
+                    query, top_k=top_k, company_name=payload.get("company")
+                )
+        response = {"results": results}
+        if getattr(results, "busy_companies", None):
+            response["busy_companies"] = results.busy_companies
+        return _with_profile(response, run)
+
+    def ask(self, payload: dict) -> dict:
+        query = _require_query(payload)
+        companies = _companies(payload)
+        # Covers the whole request; the nested ask_question profile is skipped
+        with profiled("ask", payload.get("profile") or None) as run:
+            sources, answer = self.qa_service.ask_question(
+                query, self.search_service,
+                company_name=payload.get("company"),
+                company_names=companies
+            )
+        return _with_profile({
+            "sources": sources,
+            "answer": answer,
+            "routed": bool(sources) and all(s.get("source") in ROUTED_SOURCES for s in sources),
+            "degraded": answer == RETRIEVAL_ONLY_ANSWER
+        }, run)
+
+    def ingest(self, payload: dict = None, pdf_bytes: bytes = None, params: dict = None) -> dict:
+        params = params or {}
+        if pdf_bytes is not None:
+            company = params.get("company")
+            filename = params.get("filename") or (f"{company}.pdf" if company else None)
+            if not filename:
+                raise ValueError("company or filename query parameter is required")
+            company = company or filename.replace(".pdf", "")
+            job_id = self.ingestion_queue.submit(pdf_bytes, company, filename=filename)
+        else:
+            path = (payload or {}).get("path")
+            if not path:
+                raise ValueError("'path' is required")
+            job_id = self.ingestion_queue.submit(path, payload.get("company"))
+        return {"job_id": job_id}
+
+    def job_status(self, job_id: str) -> dict:
+        status = self.ingestion_queue.get_status(job_id)
+        if status is None:
+            raise LookupError(f"Unknown job: {job_id}")
+        return status
+
+
+def _with_profile(response: dict, run) -> dict:
+    if run is not None and run.summary_path:
+        response["profile"] = run.summary_path
+    return response
+
+
+def _require_query(payload: dict) -> str:
+    query = (payload.get("query") or "").strip()
+    if not query:
+        raise ValueError("'query' is required")
+    return query
+
+
+def _top_k(payload: dict) -> int:
+    """top_k from a request, clamped to 1..QUERY_SERVER_MAX_TOP_K"""
+    try:
+        top_k = int(payload.get("top_k") or TOP_K)
+    except (TypeError, ValueError):
+        raise ValueError("'top_k' must be an integer")
+    return max(1, min(top_k, QUERY_SERVER_MAX_TOP_K))
+
+
+def _companies(payload: dict):
+    """Companies to compare from a request (None when not comparing)"""
+    companies = payload.get("companies")
+    if not companies:
+        return None
+    if not isinstance(companies, list) or not all(isinstance(c, str) for c in companies):
+        raise ValueError("'companies' must be a list of company names")
+    if len(companies) < 2:
+        raise ValueError("'companies' needs at least two companies; use 'company' for one")
+    return companies
+
+
+def _make_handler(server: QueryServer):
+    """Build the request handler class bound to a QueryServer"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if not self._host_allowed():
+                return
+            path = urllib.parse.urlparse(self.path).path
+            if path == "/health":
+                self._respond(server.health)
+            elif path.startswith("/jobs/"):
+                self._respond(lambda: server.job_status(path[len("/jobs/"):]))
+            else:
+                self._send(404, {"error": f"Not found: {path}"})
+
+        def do_POST(self):
+            if not self._host_allowed():
+                return
+            url = urllib.parse.urlparse(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_UPLOAD_SIZE:
+                # The unread body would corrupt a kept-alive connection
+                self.close_connection = True
+                self._send(413, {"error": "Request body too large"})
+                return
+            body = self.rfile.read(length)
+
+            content_type = self.headers.get_content_type()
+            if url.path == "/ingest" and content_type == "application/pdf":
+                self._respond(lambda: server.ingest(pdf_bytes=body, params=params))
+                return
+            if content_type != "application/json":
+                # text/plain and form posts need no CORS preflight from a browser
+                self._send(415, {"error": "Content-Type must be application/json"})
+                return
+
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                self._send(400, {"error": "Body must be JSON"})
+                return
+            if not isinstance(payload, dict):
+                self._send(400, {"error": "Body must be a JSON object"})
+                return
+            routes = {"/search": server.search, "/ask": server.ask, "/ingest": server.ingest}
+            if url.path not in routes:
+                self._send(404, {"error": f"Not found: {url.path}"})
+                return
+            self._respond(lambda: routes[url.path](payload))
+
+        def _host_allowed(self) -> bool:
+            """Reject Host headers other than the local names (DNS rebinding)"""
+            try:
+                host = urllib.parse.urlsplit("//" + (self.headers.get("Host") or "")).hostname
+            except ValueError:
+                host = None
+            if host in server.allowed_hosts:
+                return True
+            self.close_connection = True
+            self._send(403, {"error": "Host not allowed"})
+            return False
+
+        def _respond(self, call):
+            try:
+                self._send(200, call())
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except LookupError as e:
+                self._send(404, {"error": str(e)})
+            except ServiceBusyError as e:
+                self._send(503, {"error": str(e), "busy": True, "stage": e.stage},
+                           headers={"Retry-After": str(max(1, round(e.retry_after)))})
+            except IngestionQueueFullError as e:
+                self._send(503, {"error": str(e), "busy": True},
+                           headers={"Retry-After": "5"})
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def _send(self, status: int, payload: dict, headers: dict = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # Keep the console quiet; errors are returned to the client
+            pass
+
+    return Handler
+
+
+class QueryClient:
+    """Thin client for a running QueryServer (standard library only, no model)"""
+
+    def __init__(self, base_url: str = None, timeout: float = QUERY_SERVER_TIMEOUT):
+        """
+        Initialize the client
+
+        Args:
+            base_url: Server URL (defaults to QUERY_SERVER_HOST:QUERY_SERVER_PORT)
+            timeout: Seconds to wait for a response
+        """
+        self.base_url = (base_url or f"http://{QUERY_SERVER_HOST}:{QUERY_SERVER_PORT}").rstrip("/")
+        self.timeout = timeout
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def search(self, query: str, top_k: int = TOP_K, company: str = None,
+               companies: list = None) -> list:
+        """
+        Semantic search on the server
+
+        Returns:
+            List of result dictionaries (score, company, text)
+        """
+        payload = {"query": query, "top_k": top_k, "company": company, "companies": companies}
+        return self._request("POST", "/search", payload)["results"]
+
+    def ask(self, query: str, company: str = None, companies: list = None) -> tuple:
+        """
+        Full question answering on the server
+
+        Returns:
+            Tuple of (sources, answer) like QAService.ask_question
+        """
+        response = self._request("POST", "/ask",
+                                 {"query": query, "company": company, "companies": companies})
+        return response["sources"], response["answer"]
+
+    def ingest(self, path: str, company: str = None) -> str:
+        """
+        Queue a PDF on the server's filesystem for ingestion
+
+        Returns:
+            Job id
+        """
+        return self._request("POST", "/ingest", {"path": path, "company": company})["job_id"]
+
+    def job_status(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{urllib.parse.quote(job_id)}")
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise QueryServerError(message, e.code) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise QueryServerError(f"Query server not reachable at {self.base_url}: {e}") from e
@@ -0,0 +1,104 @@
+"""
+Search Result Cache
+Bounded LRU cache of retrieval results, validated against ingestion counters
+"""
+
+import threading
+from collections import OrderedDict
+
+from src.config.settings import SEARCH_CACHE_SIZE
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache lookups (case and whitespace insensitive)
+
+    Args:
+        query: User's search query
+
+    Returns:
+        Normalized query
+    """
+    return " ".join(query.casefold().split())
+
+
+class SearchResultCache:
+    """
+    Thread-safe LRU cache of search results
+
+    Each entry carries a stamp (the ingestion counters of the companies it
+    covers, captured before the search ran). A lookup with a different stamp
+    is a miss, so results are never served after the underlying vectors
+    changed.
+    """
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stamp, results)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, stamp):
+        """
+        Look up results
+
+        Args:
+            key: Hashable search key
+            stamp: Current ingestion stamp for the key
+
+        Returns:
+            Copy of the cached results, or None on a miss or stale entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(result) for result in entry[1]]
+
+    def put(self, key, stamp, results: list):
+        """
+        Store results
+
+        Args:
+            key: Hashable search key
+            stamp: Ingestion stamp captured before the search ran
+            results: Result dictionaries
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (stamp, tuple(dict(result) for result in results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Entry count, hits, misses and evictions"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -3,66 +3,519 @@ Search Service
 Handles semantic search functionality using vector embeddings
 """
 
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from src.config.settings import (
     PINECONE_API_KEY,
-    INDEX_NAME,
     TOP_K,
-    EMBEDDING_MODEL
+    SEARCH_BACKEND,
+    MULTI_COMPANY_TOP_K,
+    MULTI_COMPANY_MAX_WORKERS,
+    NEIGHBOR_WINDOW,
+    COMPANY_ROUTING_ENABLED,
+    ESG_DATA_FILE
 )
+from src.services.admission import ServiceBusyError, get_admission_controller
+from src.services.index_generations import follow_active_generation, get_index_generations
+from src.services.ingestion_manifest import get_manifest
+from src.services.search_cache import SearchResultCache, normalize_query
+from src.utils.lazy_imports import lazy_attribute, lazy_resource
+
+# Heavy dependencies are imported on first use
+SentenceTransformer = lazy_attribute("sentence_transformers", "SentenceTransformer")
+Pinecone = lazy_attribute("pinecone", "Pinecone")
+
+# Integer chunk metadata (Pinecone returns every number as a float)
+POSITION_FIELDS = ("chunk", "page", "page_end", "char_start", "char_end")
+
+
+class ComparisonResults(list):
+    """
+    Merged results of a comparison search
+
+    A list of result dictionaries like any search result, plus
+    `busy_companies`: companies left out because admission control shed
+    their retrieval.
+    """
+
+    def __init__(self, results=(), busy_companies=()):
+        super().__init__(results)
+        self.busy_companies = list(busy_companies)
 
 
 class SearchService:
     """Service for performing semantic search on vector database"""
     
-    def __init__(self):
-        """Initialize search service with model and Pinecone connection"""
-        self.model = SentenceTransformer(EMBEDDING_MODEL)
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.index = self.pc.Index(INDEX_NAME)
+    def __init__(self, local_store=None, cache: SearchResultCache = None, manifest=None,
+                 admission=None, company_router=None):
+        """
+        Initialize search service
+        
+        The embedding model and Pinecone connection are created on first use.
+        
+        Args:
+            local_store: LocalVectorStore to query instead of Pinecone (the
+                active generation's store if omitted and SEARCH_BACKEND is
+                "local"; it then follows generation switches)
+            cache: SearchResultCache for repeated searches (SEARCH_CACHE_SIZE
+                entries if omitted)
+            manifest: IngestionManifest whose counters validate cached
+                results (shared if omitted)
+            admission: AdmissionController bounding concurrent encoder and
+                vector query calls (shared if omitted)
+            company_router: CompanyRouter choosing the company of "General"
+                searches (built on first use if COMPANY_ROUTING_ENABLED)
+        """
+        self.cache = cache if cache is not None else SearchResultCache()
+        self.manifest = manifest or get_manifest()
+        self.admission = admission or get_admission_controller()
+        self.generations = get_index_generations()
+        self.generation = self.generations.active()
+        self._generation_lock = threading.Lock()
+        self._owns_local_store = local_store is None and SEARCH_BACKEND == "local"
+        if local_store is None:
+            local_store = self._open_local_store(self.generation)
+        self.local_store = local_store
+        self.company_router = company_router
+        self._owns_company_router = company_router is None
+        self._company_router_lock = threading.Lock()
+        self._executor = None  # Per-company retrievals of comparisons
+        self._executor_lock = threading.Lock()
+    
+    @lazy_resource("model", "load embedding model")
+    def model(self):
+        """Sentence transformer used for query embeddings"""
+        return self._load_model(self.generation)
+    
+    @lazy_resource("connection", "create Pinecone client")
+    def pc(self):
+        """Pinecone client"""
+        return Pinecone(api_key=PINECONE_API_KEY)
+    
+    @lazy_resource("connection", "connect Pinecone index")
+    def index(self):
+        """Pinecone index queried when no local store is used"""
+        return self._connect_index(self.generation)
+    
+    def _load_model(self, generation: dict):
+        return SentenceTransformer(generation["embedding_model"])
+    
+    def _connect_index(self, generation: dict):
+        return self.pc.Index(generation["index_name"])
+    
+    def _open_local_store(self, generation: dict):
+        if not self._owns_local_store:
+            return getattr(self, "local_store", None)
+        from src.services.vector_store import get_local_vector_store
+        return get_local_vector_store(generation)
     
     def semantic_search(self, user_query: str, top_k: int = TOP_K, 
-                       company_name: str = None) -> list:
+                       company_name: str = None, window: int = NEIGHBOR_WINDOW) -> list:
         """
         Perform semantic search to find relevant document chunks
         
+        Repeated searches are answered from the result cache until the
+        searched company's vectors (any company's, without a filter) change.
+        A search without a company filter is narrowed to one company when
+        the question clearly names or describes it (see route_company).
+        
         Args:
             user_query: User's search query
             top_k: Number of top results to return
             company_name: Optional company filter (None or "General" for all)
+            window: Neighboring chunks merged into each hit (see expand_neighbors)
             
         Returns:
             List of dictionaries containing search results with scores
+            
+        Raises:
+            ServiceBusyError: If the encoder or vector query stage is saturated
+        """
+        # Pick up an index migration switch made by another process
+        follow_active_generation(self)
+        
+        # The stamp is taken before searching, so an ingestion that lands
+        # mid-search leaves a stale stamp and the entry is refreshed next time
+        key = self._cache_key(user_query, company_name, top_k, window)
+        stamp = self._cache_stamp(company_name)
+        cached = self.cache.get(key, stamp)
+        if cached is not None:
+            return cached
+        
+        query_embedding = self._encode(user_query)
+        if company_name in (None, "", "General"):
+            company_name = self.route_company(user_query, query_embedding) or company_name
+        results = self._retrieve(query_embedding, top_k, company_name)
+        results = self.expand_neighbors(results, window)
+        
+        # Routing only depends on the manifest, which the unfiltered stamp covers
+        self.cache.put(key, stamp, results)
+        return results
+    
+    def route_company(self, user_query: str, query_embedding=None):
+        """
+        Pick the company a "General" question is about
+        
+        Args:
+            user_query: User's search query
+            query_embedding: The query's embedding
+            
+        Returns:
+            Stored company name, or None to search every company
+        """
+        router = self._get_company_router()
+        return router.route(user_query, query_embedding) if router is not None else None
+    
+    def _get_company_router(self):
+        """Company router for the active embedding model (None if routing is off)"""
+        if not self._owns_company_router:
+            return self.company_router
+        if not COMPANY_ROUTING_ENABLED or not os.path.exists(ESG_DATA_FILE):
+            return None
+        model_name = self.generation["embedding_model"]
+        with self._company_router_lock:
+            if self.company_router is None or self.company_router.model_name != model_name:
+                from src.services.company_router import CompanyRouter
+                self.company_router = CompanyRouter(self._encode_texts, model_name,
+                                                    manifest=self.manifest)
+            return self.company_router
+    
+    def _encode_texts(self, texts: list):
+        """Embeddings of several texts (the company router's descriptions)"""
+        with self.admission.slot("encoder"):
+            return self.model.encode(texts, show_progress_bar=False)
+    
+    def multi_company_search(self, user_query: str, company_names: list,
+                             top_k: int = MULTI_COMPANY_TOP_K,
+                             window: int = NEIGHBOR_WINDOW) -> list:
+        """
+        Search several companies at once for comparison questions
+        
+        The query is embedded once and the per-company retrievals run
+        concurrently on the service's search threads, so no single company
+        can crowd the others out of the results. A company whose retrieval
+        is shed by admission control is left out and listed in
+        `busy_companies` instead of failing the whole comparison.
+        
+        Args:
+            user_query: User's search query
+            company_names: Companies to compare
+            top_k: Number of results per company
+            window: Neighboring chunks merged into each hit
+            
+        Returns:
+            ComparisonResults, interleaved by company (best first)
+            
+        Raises:
+            ServiceBusyError: If the encoder, or every company's retrieval,
+                is saturated
         """
-        # Convert query to vector embedding
-        query_embedding = self.model.encode(user_query).tolist()
-        
-        # Build query parameters
-        query_params = {
-            "vector": query_embedding,
-            "top_k": top_k,
-            "include_metadata": True
+        follow_active_generation(self)
+        company_names = list(dict.fromkeys(company_names))
+        stamps = {company: self._cache_stamp(company) for company in company_names}
+        results_by_company = {
+            company: self.cache.get(self._cache_key(user_query, company, top_k, window),
+                                    stamps[company])
+            for company in company_names
         }
         
-        # Add company filter if specified
-        if company_name and company_name != "General":
-            query_params["filter"] = {"company": {"$eq": company_name}}
+        # Embed and search only for the companies not served from the cache
+        missing = [company for company, results in results_by_company.items() if results is None]
+        busy = {}
+        if missing:
+            query_embedding = self._encode(user_query)
+            
+            def search(company):
+                try:
+                    return self.expand_neighbors(
+                        self._retrieve(query_embedding, top_k, company), window
+                    )
+                except ServiceBusyError as e:
+                    return e
+            
+            searched = search_concurrently(search, missing, self._get_executor())
+            for company, results in searched.items():
+                if isinstance(results, ServiceBusyError):
+                    busy[company] = results
+                    results_by_company.pop(company)
+                    continue
+                self.cache.put(self._cache_key(user_query, company, top_k, window),
+                               stamps[company], results)
+                results_by_company[company] = results
+        if busy and not results_by_company:
+            raise next(iter(busy.values()))
+        return ComparisonResults(merge_balanced(results_by_company), busy)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Search threads shared by this service's comparisons"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=MULTI_COMPANY_MAX_WORKERS,
+                                                    thread_name_prefix="search")
+            return self._executor
+    
+    def expand_neighbors(self, results: list, window: int = NEIGHBOR_WINDOW) -> list:
+        """
+        Merge the chunks stored next to each hit into its text
+        
+        Neighbors are fetched by id (`<id_prefix>_<chunk ± n>`) in a single
+        lookup, without another vector search, and stitched on by character
+        offset so the chunk overlap is not repeated. Expansion stops at a gap
+        (a neighbor dropped as a duplicate), and a chunk that is itself a hit
+        or already merged into a better-ranked hit is not added again. Hits
+        stored without position metadata are returned unchanged.
+        
+        Args:
+            results: Search results (best first)
+            window: Chunks to add on each side of a hit (0 disables)
+            
+        Returns:
+            List of results with text, char offsets and page range widened
+        """
+        if window <= 0 or not results:
+            return results
+        
+        hit_ids = {result.get("id") for result in results}
+        wanted = []
+        for result in results:
+            prefix, sequence = split_vector_id(result.get("id"))
+            if prefix is None or result.get("char_start") is None:
+                continue
+            wanted.extend(
+                f"{prefix}_{sequence + offset}"
+                for offset in range(-window, window + 1)
+                if offset and sequence + offset >= 0
+            )
+        wanted = [vector_id for vector_id in dict.fromkeys(wanted) if vector_id not in hit_ids]
+        if not wanted:
+            return results
+        
+        with self.admission.slot("vector_query"):
+            if self.local_store is not None:
+                neighbors = self.local_store.get(wanted)
+            else:
+                neighbors = fetch_chunks(self.index, wanted)
+        
+        claimed = set()
+        return [merge_neighbors(result, neighbors, window, claimed) for result in results]
+    
+    def _encode(self, user_query: str):
+        """Query embedding (a Python list for Pinecone, the model's array for the local store)"""
+        with self.admission.slot("encoder"):
+            query_embedding = self.model.encode(user_query)
+        return query_embedding if self.local_store is not None else query_embedding.tolist()
+    
+    def _retrieve(self, query_embedding, top_k: int, company_name: str) -> list:
+        # Local quantized store: no list conversion, no network round trip
+        with self.admission.slot("vector_query"):
+            if self.local_store is not None:
+                return self.local_store.query(query_embedding, top_k, company_name)
+            return query_index(self.index, query_embedding, top_k, company_name)
+    
+    def _cache_key(self, user_query: str, company_name: str, top_k: int,
+                   window: int = NEIGHBOR_WINDOW) -> tuple:
+        company_name = None if company_name in (None, "", "General") else company_name
+        return (self.generation["id"], normalize_query(user_query), company_name, top_k, window)
+    
+    def _cache_stamp(self, company_name: str):
+        """Ingestion counter the cached results for a company filter depend on"""
+        if company_name in (None, "", "General"):
+            return self.manifest.version
+        return self.manifest.company_version(company_name)
+
+
+_default_search_service = None
+_default_search_service_lock = threading.Lock()
+
+
+def get_search_service() -> SearchService:
+    """
+    Get the search service shared by every session of this process
+    
+    Sharing it shares the embedding model, the index connection and the
+    result cache across users.
+    
+    Returns:
+        SearchService instance
+    """
+    global _default_search_service
+    with _default_search_service_lock:
+        if _default_search_service is None:
+            _default_search_service = SearchService()
+        return _default_search_service
+
+
+def query_index(index, query_embedding: list, top_k: int, company_name: str = None) -> list:
+    """
+    Run one query against the Pinecone index
+    
+    Args:
+        index: Pinecone index
+        query_embedding: Query vector
+        top_k: Number of results
+        company_name: Optional company filter (None or "General" for all)
+        
+    Returns:
+        List of dictionaries with score, id, company, text and the stored
+        position metadata
+    """
+    # Build query parameters
+    query_params = {
+        "vector": query_embedding,
+        "top_k": top_k,
+        "include_metadata": True
+    }
+    
+    # Add company filter if specified
+    if company_name and company_name != "General":
+        query_params["filter"] = {"company": {"$eq": company_name}}
+    
+    # Execute search
+    results = index.query(**query_params)
+    
+    # Extract and format results
+    retrieved_chunks = []
+    for match in results["matches"]:
+        retrieved_chunks.append(
+            dict(chunk_result(match["id"], match["metadata"]), score=match["score"])
+        )
+    
+    return retrieved_chunks
+
+
+def fetch_chunks(index, vector_ids: list) -> dict:
+    """
+    Fetch stored chunks by id from the Pinecone index
+    
+    Args:
+        index: Pinecone index
+        vector_ids: Vector ids
+        
+    Returns:
+        Dictionary of id -> chunk dictionary for the ids found
+    """
+    response = index.fetch(ids=vector_ids)
+    vectors = getattr(response, "vectors", None)
+    if vectors is None:
+        vectors = response["vectors"]
+    chunks = {}
+    for vector_id, vector in vectors.items():
+        metadata = getattr(vector, "metadata", None)
+        if metadata is None:
+            metadata = vector["metadata"]
+        chunks[vector_id] = chunk_result(vector_id, metadata or {})
+    return chunks
+
+
+def chunk_result(vector_id: str, metadata: dict) -> dict:
+    """Result dictionary for a stored chunk (id plus metadata, positions as ints)"""
+    result = dict(metadata, id=vector_id)
+    for field in POSITION_FIELDS:
+        if result.get(field) is not None:
+            result[field] = int(result[field])
+    return result
+
+
+def split_vector_id(vector_id: str) -> tuple:
+    """
+    Split a vector id into its prefix and chunk sequence number
+    
+    Args:
+        vector_id: Id of the form <id_prefix>_<n>
+        
+    Returns:
+        Tuple of (prefix, n), or (None, None) for other ids
+    """
+    prefix, _, sequence = (vector_id or "").rpartition("_")
+    if not prefix or not sequence.isdigit():
+        return None, None
+    return prefix, int(sequence)
+
+
+def merge_neighbors(result: dict, neighbors: dict, window: int, claimed: set) -> dict:
+    """
+    Stitch fetched neighbor chunks onto one hit
+    
+    Args:
+        result: Search result with id and char offsets
+        neighbors: Dictionary of id -> fetched chunk
+        window: Chunks to add on each side
+        claimed: Ids already merged into other hits (updated in place)
         
-        # Execute search
-        results = self.index.query(**query_params)
+    Returns:
+        Expanded copy of the result (the result itself if nothing was added)
+    """
+    prefix, sequence = split_vector_id(result.get("id"))
+    if prefix is None or result.get("char_start") is None:
+        return result
+    
+    expanded = dict(result)
+    for step in (-1, 1):
+        for distance in range(1, window + 1):
+            vector_id = f"{prefix}_{sequence + step * distance}"
+            neighbor = neighbors.get(vector_id)
+            if (neighbor is None or vector_id in claimed
+                    or neighbor.get("char_start") is None
+                    or neighbor.get("document") != result.get("document")):
+                break
+            if step < 0:
+                # Contiguous with the current start: prepend the part before it
+                if not neighbor["char_start"] < expanded["char_start"] <= neighbor["char_end"]:
+                    break
+                cut = expanded["char_start"] - neighbor["char_start"]
+                expanded["text"] = neighbor["text"][:cut] + expanded["text"]
+                expanded["char_start"] = neighbor["char_start"]
+                expanded["page"] = min(expanded["page"], neighbor["page"])
+            else:
+                if not neighbor["char_start"] <= expanded["char_end"] < neighbor["char_end"]:
+                    break
+                cut = expanded["char_end"] - neighbor["char_start"]
+                expanded["text"] = expanded["text"] + neighbor["text"][cut:]
+                expanded["char_end"] = neighbor["char_end"]
+                expanded["page_end"] = max(expanded["page_end"], neighbor["page_end"])
+            claimed.add(vector_id)
+    return expanded
+
+
+def search_concurrently(search, company_names: list, executor: ThreadPoolExecutor = None) -> dict:
+    """
+    Run a per-company search function for several companies in parallel
+    
+    Args:
+        search: Callable taking a company name and returning results
+        company_names: Companies to search
+        executor: Thread pool to run on (a temporary one if omitted)
         
-        # Extract and format results
-        retrieved_chunks = []
-        for match in results["matches"]:
-            retrieved_chunks.append({
-                "score": match["score"],
-                "company": match["metadata"].get("company"),
-                "text": match["metadata"].get("text")
-            })
+    Returns:
+        Dictionary of company name -> results, in the given company order
+    """
+    company_names = list(dict.fromkeys(company_names))
+    if not company_names:
+        return {}
+    if executor is not None:
+        return dict(zip(company_names, executor.map(search, company_names)))
+    workers = min(len(company_names), MULTI_COMPANY_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search") as executor:
+        return dict(zip(company_names, executor.map(search, company_names)))
+
+
+def merge_balanced(results_by_company: dict) -> list:
+    """
+    Interleave per-company results round-robin (rank 1 of each company, then rank 2, ...)
+    
+    Args:
+        results_by_company: Dictionary of company name -> ranked results
         
-        return retrieved_chunks
+    Returns:
+        Merged list of results
+    """
+    merged = []
+    ranked = list(results_by_company.values())
+    for rank in range(max((len(results) for results in ranked), default=0)):
+        merged.extend(results[rank] for results in ranked if rank < len(results))
+    return merged
 
 
 # Backward compatibility function
@@ -103,3 +556,25 @@ def semantic_search(user_query: str, model, index, top_k: int = TOP_K,
         })
     
     return retrieved_chunks
+
+
+def multi_company_search(user_query: str, model, index, company_names: list,
+                         top_k: int = MULTI_COMPANY_TOP_K) -> list:
+    """
+    Legacy-style function for comparison queries (shared embedding, parallel retrieval)
+    
+    Args:
+        user_query: User's search query
+        model: Sentence transformer model
+        index: Pinecone index
+        company_names: Companies to compare
+        top_k: Number of results per company
+        
+    Returns:
+        List of search results interleaved by company
+    """
+    query_embedding = model.encode(user_query).tolist()
+    return merge_balanced(search_concurrently(
+        lambda company: query_index(index, query_embedding, top_k, company),
+        company_names
+    ))
@@ -0,0 +1,516 @@
+"""
+Structured Query Service
+Answers ESG score, rating and ranking questions directly from the ESG data table
+"""
+
+import csv
+import re
+import threading
+
+from src.config.settings import (
+    ESG_DATA_FILE,
+    STRUCTURED_QUERY_ENABLED,
+    STRUCTURED_RANKING_LIMIT,
+    FACTS_ENABLED
+)
+
+
+# Words dropped from company names when building aliases
+COMPANY_SUFFIXES = {
+    "ltd", "limited", "inc", "corp", "corporation", "company", "co", "plc",
+    "enterprise", "india", "of", "the", "and"
+}
+
+# Legal-form words dropped from the end of a name for the short-name alias
+LEGAL_SUFFIXES = {"ltd", "limited", "inc", "corp", "corporation", "co", "plc"}
+
+# Everyday words that must not be used as one-word company aliases
+GENERIC_WORDS = {"state", "coal", "tech", "hero", "axis", "asian", "power", "oil"}
+
+# Upper-case sector abbreviations (matched case-sensitively: "it" is a word)
+SECTOR_ABBREVIATIONS = {"IT": "information technology", "FMCG": "fast moving consumer goods"}
+
+# Risk / controversy levels, ordered from best to worst
+LEVELS = ["negligible", "low", "moderate", "medium", "significant", "high", "severe"]
+
+# Metric name -> (label, question patterns)
+METRICS = {
+    "predicted_esg_score": ("Predicted future ESG risk score", [
+        r"predicted", r"future (esg )?(risk )?score", r"forecast"
+    ]),
+    "controversy": ("Controversy", [
+        r"controvers"
+    ]),
+    "risk_exposure": ("ESG risk exposure", [
+        r"exposure"
+    ]),
+    "risk_management": ("ESG risk management", [
+        r"risk management", r"management (score|rating|quality)"
+    ]),
+    "risk_level": ("ESG risk level", [
+        r"risk (level|rating|category)", r"esg rating", r"rated"
+    ]),
+    "material_issues": ("Material ESG issues", [
+        r"material (esg )?issues?", r"key (esg )?issues?", r"main (esg )?issues?"
+    ]),
+    "sector": ("Sector", [
+        r"which sector", r"what sector", r"which industry", r"what industry"
+    ]),
+    "esg_risk_score": ("ESG risk score (2024)", [
+        r"esg (risk )?score", r"risk score", r"esg risk\b", r"sustainalytics"
+    ]),
+}
+
+# Phrases that need document text rather than a table lookup
+DOCUMENT_CUES = [
+    r"\bhow\b", r"\bwhy\b", r"\bexplain", r"\bdescribe", r"\binitiatives?\b",
+    r"\bpolic(y|ies)\b", r"\bstrateg(y|ies)\b", r"\btargets?\b", r"\bplans?\b",
+    r"\bsteps\b", r"\bmeasures\b", r"\bcommitments?\b", r"\breport(ed)?\b",
+    r"\bdisclos", r"\bdo about\b", r"\bdoing\b", r"\bapproach(es)?\b",
+    r"\baddress(es|ing)?\b", r"\btackl(e|es|ing)\b"
+]
+
+RANK_DESC = r"\b(highest|most|worst|riskiest|largest|maximum)\b"
+RANK_ASC = r"\b(lowest|least|best|safest|bottom|smallest|minimum)\b"
+LIST_CUES = r"\b(which|list|show|rank|ranking|all)\b.*\bcompan(y|ies)\b"
+# Comparisons need every company's figures side by side: left to search
+COMPARISON_CUES = r"\b(compar\w*|versus|vs|against|relative to|than|others?|peers?)\b"
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for alias matching
+
+    Args:
+        text: Input text
+
+    Returns:
+        Lower-cased text with possessives and punctuation removed
+    """
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"'s\b|'", "", text)
+    text = re.sub(r"[^a-z0-9&]+", " ", text)
+    return " ".join(text.split())
+
+
+def _to_float(value: str):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value, spec: str = "") -> str:
+    """Format a table number, which may be missing"""
+    return "n/a" if value is None else format(value, spec)
+
+
+class EsgDataTable:
+    """In-memory ESG table indexed by company alias, symbol and sector"""
+
+    def __init__(self, csv_path: str = ESG_DATA_FILE):
+        """
+        Load and index the ESG data table
+
+        Args:
+            csv_path: Path to the ESG CSV file
+        """
+        self.csv_path = csv_path
+        self.rows = []
+        self.by_symbol = {}
+        self.by_alias = {}
+        self.by_sector = {}
+        self.prefix_next = {}  # Prefix alias -> the company's next name word
+        self.name_words = set()  # Words of company, sector and industry names
+        self._load()
+        self._alias_pattern = self._compile_alias_pattern()
+
+    def _load(self):
+        """Read the CSV and build lookup indexes"""
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                if not record.get("company"):
+                    continue
+                controversy = (record.get("Controversy Level") or "").strip()
+                row = {
+                    "symbol": record["Symbol"].strip(),
+                    "company": record["company"].strip(),
+                    "sector": record["Sector"].strip(),
+                    "industry": record["Industry"].strip(),
+                    "description": record["Description"].strip(),
+                    "esg_risk_score": _to_float(record["esg_risk_score_2024"]),
+                    "predicted_esg_score": _to_float(record["predicted_future_esg_score"]),
+                    "risk_exposure": record["esg_risk_exposure"].strip(),
+                    "risk_management": record["esg_risk_management"].strip(),
+                    "risk_level": record["esg_risk_level"].strip(),
+                    "material_issues": [
+                        record[key].strip()
+                        for key in ("Material ESG Issues 1", "Material ESG Issues 2",
+                                    "Material ESG Issues 3")
+                        if record.get(key, "").strip()
+                    ],
+                    "controversy_level": controversy.replace(" Controversy Level", ""),
+                    "controversy_score": _to_float(record.get("controversy_score")),
+                }
+                self.rows.append(row)
+                self.by_symbol[row["symbol"].upper()] = row
+                for key in (row["sector"], row["industry"]):
+                    self.by_sector.setdefault(normalize_text(key), []).append(row)
+
+        # Aliases: full name, name without its legal form, core name (unless a
+        # generic or sector word on its own), plus unique one/two-word prefixes
+        sector_words = {w for key in self.by_sector for w in key.split()}
+        core_names = {}
+        for row in self.rows:
+            name = normalize_text(row["company"]).split()
+            words = [w for w in name if w not in COMPANY_SUFFIXES]
+            core_names[row["company"]] = words
+            self.by_alias[" ".join(name)] = row
+            while len(name) > 1 and name[-1] in LEGAL_SUFFIXES:
+                name.pop()
+            self.by_alias[" ".join(name)] = row
+            if len(words) > 1 or (words and words[0] not in GENERIC_WORDS | sector_words):
+                self.by_alias[" ".join(words)] = row
+
+        self.name_words = sector_words.union(*core_names.values()) - COMPANY_SUFFIXES
+        for size in (2, 1):
+            prefixes = {}
+            for row in self.rows:
+                words = core_names[row["company"]]
+                if len(words) >= size:
+                    prefixes.setdefault(" ".join(words[:size]), []).append(row)
+            for prefix, matches in prefixes.items():
+                if len(matches) != 1 or len(prefix) < 3:
+                    continue
+                if size == 1 and (prefix in GENERIC_WORDS or prefix in sector_words):
+                    continue
+                if prefix not in self.by_alias:
+                    self.by_alias[prefix] = matches[0]
+                    words = core_names[matches[0]["company"]]
+                    self.prefix_next[prefix] = words[size] if len(words) > size else None
+
+    def _compile_alias_pattern(self):
+        """Compile a single alternation regex over all aliases (longest first)"""
+        aliases = sorted(self.by_alias, key=len, reverse=True)
+        return re.compile(r"\b(" + "|".join(re.escape(a) for a in aliases) + r")\b")
+
+    def find_companies(self, text: str) -> list:
+        """
+        Find companies mentioned in free text
+
+        Args:
+            text: Question or company name
+
+        Returns:
+            List of matching rows, in order of first mention
+        """
+        found = []
+        for _, row in self.mentions(text):
+            if row not in found:
+                found.append(row)
+        return found
+
+    def mentions(self, text: str):
+        """
+        Find company mentions in free text, with the alias that matched
+
+        Args:
+            text: Question or company name
+
+        Yields:
+            Tuples of (normalized alias or upper-case symbol, row)
+        """
+        normalized = normalize_text(text)
+        for match in self._alias_pattern.finditer(normalized):
+            alias = match.group(1)
+            if not self._other_company_follows(alias, normalized, match.end()):
+                yield alias, self.by_alias[alias]
+
+        # Ticker symbols are only trusted when written in upper case
+        for token in re.findall(r"\b[A-Z][A-Z&\-]{2,}\b", text):
+            row = self.by_symbol.get(token)
+            if row is not None:
+                yield token, row
+
+    def names_unlisted_company(self, text: str) -> bool:
+        """
+        Check whether text names a company that has no row, like "JSW Energy"
+        next to the table's JSW Steel
+
+        Args:
+            text: Question text
+
+        Returns:
+            True if a name prefix is followed by another company's name word
+        """
+        normalized = normalize_text(text)
+        return any(self._other_company_follows(match.group(1), normalized, match.end())
+                   for match in self._alias_pattern.finditer(normalized))
+
+    def _other_company_follows(self, alias: str, normalized: str, end: int) -> bool:
+        """A prefix followed by a different name word is another company sharing it"""
+        if alias not in self.prefix_next:
+            return False
+        following = normalized[end:].split()[:1]
+        return bool(following and following[0] in self.name_words
+                    and following[0] != self.prefix_next[alias])
+
+    def find_sectors(self, text: str) -> list:
+        """
+        Find sectors or industries mentioned in free text
+
+        Args:
+            text: Question text
+
+        Returns:
+            List of matching sector/industry keys
+        """
+        normalized = f" {normalize_text(text)} "
+        sectors = [key for key in self.by_sector if f" {key} " in normalized]
+        for abbreviation, key in SECTOR_ABBREVIATIONS.items():
+            if re.search(rf"\b{abbreviation}\b", text) and key not in sectors:
+                sectors.append(key)
+        return sectors
+
+
+class StructuredQueryRouter:
+    """Routes structured ESG questions to the data table instead of RAG"""
+
+    def __init__(self, table: EsgDataTable = None):
+        """
+        Initialize the router
+
+        Args:
+            table: ESG data table (loaded from ESG_DATA_FILE if omitted)
+        """
+        self.table = table or EsgDataTable()
+
+    def detect_metric(self, question: str):
+        """
+        Detect which table metric a question asks about
+
+        Args:
+            question: User's question
+
+        Returns:
+            Metric key or None
+        """
+        text = question.lower()
+        for metric, (_, patterns) in METRICS.items():
+            if any(re.search(p, text) for p in patterns):
+                return metric
+        return None
+
+    def route(self, user_query: str, company_name: str = None):
+        """
+        Answer a question from the ESG table if it is a structured question
+
+        Args:
+            user_query: User's question
+            company_name: Optional company filter selected by the user
+
+        Returns:
+            Tuple of (sources, answer) or None if the question needs RAG
+        """
+        text = user_query.lower()
+        if any(re.search(cue, text) for cue in DOCUMENT_CUES):
+            return None
+        # An answer covering only some of the companies would drop the others silently
+        if re.search(COMPARISON_CUES, text) or self.table.names_unlisted_company(user_query):
+            return None
+
+        metric = self.detect_metric(user_query)
+        if metric is None:
+            return None
+
+        companies = self.table.find_companies(user_query)
+        if not companies and company_name and company_name != "General":
+            companies = self.table.find_companies(company_name)
+
+        ascending = re.search(RANK_ASC, text) is not None
+        descending = not ascending and (
+            re.search(RANK_DESC, text) is not None
+            or re.search(r"\btop\s+\d*", text) is not None
+        )
+        level = self._detect_level(text, metric)
+        sectors = self.table.find_sectors(user_query)
+        is_ranking = descending or ascending or level or (
+            re.search(LIST_CUES, text) is not None
+        )
+
+        if is_ranking and len(companies) != 1:
+            rows = companies or self._filter_rows(sectors, metric, level)
+            rows = self._sort_rows(rows, metric, ascending)[:self._detect_limit(text)]
+            title = self._ranking_title(metric, sectors, level, ascending)
+        elif companies:
+            rows = companies
+            title = None
+        else:
+            return None
+
+        if not rows:
+            return [], "No companies in the ESG dataset match this question."
+
+        sources = [self._row_to_source(row, metric) for row in rows]
+        lines = [f"- {s['company']}: {self._format_value(row, metric)}"
+                 for s, row in zip(sources, rows)]
+        label = METRICS[metric][0]
+        if title is None and len(rows) == 1:
+            answer = (f"{rows[0]['company']} ({rows[0]['symbol']}) - {label}: "
+                      f"{self._format_value(rows[0], metric)}.")
+        else:
+            answer = (title or f"{label}:") + "\n" + "\n".join(lines)
+        return sources, answer
+
+    def _detect_level(self, text: str, metric: str):
+        """Detect a level filter such as 'high controversy' or 'low risk'"""
+        if metric not in ("controversy", "risk_level", "esg_risk_score",
+                          "risk_exposure", "risk_management"):
+            return None
+        match = re.search(
+            r"\b(" + "|".join(LEVELS) + r"|strong|average|weak)\s+"
+            r"(esg\s+)?(controvers\w*|risk|exposure|management)", text
+        )
+        return match.group(1) if match else None
+
+    def _detect_limit(self, text: str) -> int:
+        """Detect 'top N' style limits"""
+        match = re.search(r"\b(top|bottom|first)\s+(\d+)\b", text)
+        return int(match.group(2)) if match else STRUCTURED_RANKING_LIMIT
+
+    def _filter_rows(self, sectors: list, metric: str, level: str) -> list:
+        """Filter table rows by sector and level"""
+        if sectors:
+            rows = []
+            for key in sectors:
+                rows.extend(r for r in self.table.by_sector[key] if r not in rows)
+        else:
+            rows = list(self.table.rows)
+
+        if level:
+            field = {
+                "controversy": "controversy_level",
+                "risk_exposure": "risk_exposure",
+                "risk_management": "risk_management",
+            }.get(metric, "risk_level")
+            rows = [r for r in rows if r[field].lower() == level]
+        return rows
+
+    def _sort_rows(self, rows: list, metric: str, ascending: bool) -> list:
+        """Sort rows by the numeric value behind a metric"""
+        key = {
+            "predicted_esg_score": "predicted_esg_score",
+            "controversy": "controversy_score",
+        }.get(metric, "esg_risk_score")
+        rows = [r for r in rows if r[key] is not None]
+        return sorted(rows, key=lambda r: r[key], reverse=not ascending)
+
+    def _ranking_title(self, metric, sectors, level, ascending) -> str:
+        """Build a heading for ranking answers"""
+        label = METRICS[metric][0]
+        scope = " / ".join(s.title() for s in sectors) if sectors else "All"
+        if level:
+            return f"{scope} companies with {level} {label[0].lower() + label[1:]}:"
+        direction = "lowest" if ascending else "highest"
+        return f"{scope} companies ranked by {label} ({direction} first):"
+
+    def _format_value(self, row: dict, metric: str) -> str:
+        """Format a metric value for display"""
+        if metric == "esg_risk_score":
+            return f"{_number(row['esg_risk_score'])} ({row['risk_level']} risk)"
+        if metric == "predicted_esg_score":
+            return (f"{_number(row['predicted_esg_score'], '.2f')} "
+                    f"(2024: {_number(row['esg_risk_score'])})")
+        if metric == "controversy":
+            return (f"{row['controversy_level']} controversy "
+                    f"(level {_number(row['controversy_score'], '.0f')} of 5)")
+        if metric == "material_issues":
+            return ", ".join(row["material_issues"])
+        if metric == "sector":
+            return f"{row['sector']} ({row['industry']})"
+        return row[metric]
+
+    def _row_to_source(self, row: dict, metric: str) -> dict:
+        """Format a table row like a search result so UIs can display it"""
+        text = (
+            f"{row['company']} ({row['symbol']}), {row['sector']} / {row['industry']}. "
+            f"ESG risk score 2024: {_number(row['esg_risk_score'])} ({row['risk_level']}); "
+            f"predicted: {_number(row['predicted_esg_score'], '.2f')}; "
+            f"exposure: {row['risk_exposure']}; management: {row['risk_management']}; "
+            f"controversy: {row['controversy_level']} "
+            f"({_number(row['controversy_score'], '.0f')}); "
+            f"material issues: {', '.join(row['material_issues'])}."
+        )
+        return {
+            "score": 1.0,
+            "company": row["company"],
+            "text": text,
+            "source": "esg_data"
+        }
+
+
+class RouterChain:
+    """Tries several routers in order; the first answer wins"""
+
+    def __init__(self, routers: list):
+        """
+        Initialize the chain
+
+        Args:
+            routers: Objects with route(user_query, company_name=None)
+        """
+        self.routers = list(routers)
+
+    def route(self, user_query: str, company_name: str = None):
+        """
+        Answer a question with the first router that can
+
+        Args:
+            user_query: User's question
+            company_name: Optional company filter selected by the user
+
+        Returns:
+            Tuple of (sources, answer) or None if the question needs RAG
+        """
+        for router in self.routers:
+            routed = router.route(user_query, company_name=company_name)
+            if routed is not None:
+                return routed
+        return None
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_structured_router() -> StructuredQueryRouter:
+    """
+    Get the shared structured query router (the table is loaded once per process)
+
+    Returns:
+        StructuredQueryRouter instance
+    """
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = StructuredQueryRouter()
+        return _default_router
+
+
+def get_query_router():
+    """
+    Get the routers enabled in settings as one router
+
+    The ESG data table answers score, rating and ranking questions; the
+    facts store answers numeric questions from report tables.
+
+    Returns:
+        RouterChain, or None if neither is enabled
+    """
+    routers = []
+    if STRUCTURED_QUERY_ENABLED:
+        routers.append(get_structured_router())
+    if FACTS_ENABLED:
+        from src.services.facts_store import get_facts_router
+        routers.append(get_facts_router())
+    return RouterChain(routers) if routers else None
@@ -0,0 +1,164 @@
+"""
+Page Text Cache
+Compressed, content-addressed store of extracted PDF page text
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+from src.config.settings import TEXT_CACHE_DIR
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_pdf_source(pdf_source) -> str:
+    """
+    Compute the SHA-256 of a PDF without copying it
+
+    Args:
+        pdf_source: Path, object exposing getbuffer(), or seekable binary stream
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    if isinstance(pdf_source, (str, os.PathLike)):
+        with open(pdf_source, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    elif hasattr(pdf_source, "getbuffer"):
+        digest.update(pdf_source.getbuffer())
+    else:
+        pdf_source.seek(0)
+        for block in iter(lambda: pdf_source.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        pdf_source.seek(0)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """
+    On-disk page text cache
+
+    Layout: <cache_dir>/<hash[:2]>/<hash>/<extractor_version>/<page>.txt.gz
+    plus a meta.json written last, so partially written entries are ignored.
+    """
+
+    def __init__(self, cache_dir: str = TEXT_CACHE_DIR):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Root directory of the cache
+        """
+        self.cache_dir = cache_dir
+
+    def _entry_dir(self, pdf_hash: str, extractor_version: str) -> str:
+        safe_version = "".join(c if c.isalnum() or c in "-_.+" else "_" for c in extractor_version)
+        return os.path.join(self.cache_dir, pdf_hash[:2], pdf_hash, safe_version)
+
+    def page_count(self, pdf_hash: str, extractor_version: str):
+        """
+        Number of cached pages for a document
+
+        Args:
+            pdf_hash: SHA-256 of the PDF
+            extractor_version: Extraction engine cache key
+
+        Returns:
+            Page count, or None if the document is not (completely) cached
+        """
+        meta_path = os.path.join(self._entry_dir(pdf_hash, extractor_version), "meta.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def get_page(self, pdf_hash: str, extractor_version: str, page_number: int):
+        """
+        Read one cached page
+
+        Args:
+            pdf_hash: SHA-256 of the PDF
+            extractor_version: Extraction engine cache key
+            page_number: 1-based page number
+
+        Returns:
+            Page text or None if missing
+        """
+        path = os.path.join(self._entry_dir(pdf_hash, extractor_version),
+                            f"{page_number:05d}.txt.gz")
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def iter_pages(self, pdf_hash: str, extractor_version: str):
+        """
+        Stream cached pages in order without holding the whole document
+
+        Args:
+            pdf_hash: SHA-256 of the PDF
+            extractor_version: Extraction engine cache key
+
+        Yields:
+            Tuples of (page_number, text)
+        """
+        total = self.page_count(pdf_hash, extractor_version) or 0
+        for page_number in range(1, total + 1):
+            yield page_number, self.get_page(pdf_hash, extractor_version, page_number) or ""
+
+    def get_pages(self, pdf_hash: str, extractor_version: str):
+        """
+        Read all cached pages
+
+        Args:
+            pdf_hash: SHA-256 of the PDF
+            extractor_version: Extraction engine cache key
+
+        Returns:
+            List of page texts, or None on a cache miss
+        """
+        if self.page_count(pdf_hash, extractor_version) is None:
+            return None
+        return [text for _, text in self.iter_pages(pdf_hash, extractor_version)]
+
+    def put_pages(self, pdf_hash: str, extractor_version: str, pages: list):
+        """
+        Store extracted pages
+
+        Args:
+            pdf_hash: SHA-256 of the PDF
+            extractor_version: Extraction engine cache key
+            pages: Page texts in page order
+        """
+        entry_dir = self._entry_dir(pdf_hash, extractor_version)
+        tmp_dir = f"{entry_dir}.tmp-{uuid.uuid4().hex[:8]}"
+        os.makedirs(tmp_dir)
+        try:
+            for page_number, text in enumerate(pages, 1):
+                path = os.path.join(tmp_dir, f"{page_number:05d}.txt.gz")
+                with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+                    f.write(text)
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"pages": len(pages)}, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            # A concurrent writer storing the same document is not an error
+            if self.page_count(pdf_hash, extractor_version) is None:
+                raise
+
+    def size_bytes(self) -> int:
+        """Total size of the cache on disk"""
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
@@ -0,0 +1,961 @@
+"""
+Local Vector Store
+Compact in-process vector index with float16, int8 and product-quantized storage
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from src.config.settings import (
+    LOCAL_INDEX_DIR,
+    VECTOR_QUANTIZATION,
+    PQ_SUBVECTORS,
+    PQ_CENTROIDS,
+    PQ_TRAIN_SAMPLE,
+    PQ_KMEANS_ITERATIONS,
+    VECTOR_TRAIN_SAMPLE,
+    VECTOR_REFIT_GROWTH,
+    LOCAL_INDEX_MAX_SEGMENTS,
+    LOCAL_INDEX_COMPACT_DEAD_SHARE,
+    LOCAL_INDEX_REFRESH_SECONDS
+)
+from src.utils.locks import ReadWriteFileLock
+
+QUANTIZATIONS = ("float32", "float16", "int8", "pq")
+SEARCH_BLOCK_ROWS = 65536  # Codes decoded per block while scoring
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension scalar codes
+
+    float32 / float16 store the (normalized) vectors directly. int8 maps each
+    dimension's [min, max] range onto 256 levels, so a vector costs one byte
+    per dimension and scores are computed on the codes:
+    q . x ~= q . offset + codes . (q * scale)
+    """
+
+    def __init__(self, dtype: str = "int8"):
+        """
+        Initialize the quantizer
+
+        Args:
+            dtype: "float32", "float16" or "int8"
+        """
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported scalar quantization: {dtype}")
+        self.name = dtype
+        self.code_dtype = np.dtype(dtype)
+        self.offset = None
+        self.scale = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.name != "int8" or self.scale is not None
+
+    def code_size(self, dim: int) -> int:
+        """Bytes per encoded vector"""
+        return dim * self.code_dtype.itemsize
+
+    def fit(self, vectors: np.ndarray):
+        """Learn per-dimension ranges (int8 only)"""
+        if self.name != "int8":
+            return
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.offset = (low + high) / 2
+        self.scale = np.maximum(high - low, 1e-12) / 255
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode float32 vectors into codes"""
+        if self.name != "int8":
+            return vectors.astype(self.code_dtype)
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def score(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Inner products between a query and encoded vectors"""
+        if self.name != "int8":
+            return codes.astype(np.float32) @ query
+        return codes.astype(np.float32) @ (query * self.scale) + float(query @ self.offset)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors back from codes"""
+        if self.name != "int8":
+            return codes.astype(np.float32)
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def state(self) -> dict:
+        if self.name != "int8" or self.scale is None:
+            return {}
+        return {"offset": self.offset, "scale": self.scale}
+
+    def load_state(self, arrays: dict):
+        if self.name == "int8" and "scale" in arrays:
+            self.offset = arrays["offset"]
+            self.scale = arrays["scale"]
+
+
+class ProductQuantizer:
+    """
+    Product quantization
+
+    Each vector is split into `subvectors` slices and every slice is replaced
+    by the index of its nearest k-means centroid, so a 1024-d vector costs
+    `subvectors` bytes. Queries are scored with a per-slice lookup table
+    (asymmetric distance computation) without decoding any vector.
+    """
+
+    name = "pq"
+
+    def __init__(self, subvectors: int = PQ_SUBVECTORS, centroids: int = PQ_CENTROIDS):
+        """
+        Initialize the quantizer
+
+        Args:
+            subvectors: Number of slices per vector (must divide the dimension)
+            centroids: Centroids per slice (at most 256, one byte per code)
+        """
+        if centroids > 256:
+            raise ValueError("Product quantization supports at most 256 centroids")
+        self.subvectors = subvectors
+        self.centroids = centroids
+        self.codebooks = None  # (subvectors, centroids, slice_dim)
+
+    @property
+    def fitted(self) -> bool:
+        return self.codebooks is not None
+
+    def code_size(self, dim: int) -> int:
+        """Bytes per encoded vector"""
+        return self.subvectors
+
+    def fit(self, vectors: np.ndarray, iterations: int = PQ_KMEANS_ITERATIONS,
+            sample_size: int = PQ_TRAIN_SAMPLE, seed: int = 0):
+        """
+        Train one k-means codebook per slice
+
+        Args:
+            vectors: Training vectors (n, dim)
+            iterations: Lloyd iterations
+            sample_size: Maximum vectors used for training
+            seed: Random seed for sampling and initialization
+        """
+        dim = vectors.shape[1]
+        if dim % self.subvectors:
+            raise ValueError(f"Dimension {dim} is not divisible by {self.subvectors} subvectors")
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        k = min(self.centroids, len(vectors))
+
+        slices = self._slices(vectors)
+        codebooks = np.zeros((self.subvectors, self.centroids, dim // self.subvectors),
+                             dtype=np.float32)
+        for m in range(self.subvectors):
+            data = slices[:, m, :]
+            centers = data[rng.choice(len(data), k, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = _nearest(data, centers)
+                counts = np.bincount(assignment, minlength=k)
+                sums = np.zeros_like(centers)
+                np.add.at(sums, assignment, data)
+                filled = counts > 0  # Empty clusters keep their previous center
+                centers[filled] = sums[filled] / counts[filled, None]
+            codebooks[m, :k] = centers
+            # Unused slots duplicate the first centroid so they are never nearer
+            codebooks[m, k:] = centers[0]
+        self.codebooks = codebooks
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode float32 vectors into (n, subvectors) uint8 codes"""
+        slices = self._slices(vectors)
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for m in range(self.subvectors):
+            codes[:, m] = _nearest(slices[:, m, :], self.codebooks[m])
+        return codes
+
+    def score(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Inner products via per-slice lookup tables"""
+        tables = np.einsum("mkd,md->mk", self.codebooks,
+                           query.reshape(self.subvectors, -1).astype(np.float32))
+        return tables[np.arange(self.subvectors), codes.astype(np.intp)].sum(axis=1)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors back from codes (centroids concatenated)"""
+        centers = self.codebooks[np.arange(self.subvectors), codes.astype(np.intp)]
+        return centers.reshape(len(codes), -1)
+
+    def state(self) -> dict:
+        return {} if self.codebooks is None else {"codebooks": self.codebooks}
+
+    def load_state(self, arrays: dict):
+        if "codebooks" not in arrays:
+            return
+        self.codebooks = arrays["codebooks"]
+        self.subvectors, self.centroids = self.codebooks.shape[:2]
+
+    def _slices(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.subvectors, -1)
+
+
+def _nearest(data: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Index of the nearest center (squared L2) for each row"""
+    distances = (centers ** 2).sum(axis=1) - 2 * data @ centers.T
+    return distances.argmin(axis=1)
+
+
+def make_quantizer(quantization: str):
+    """
+    Create a quantizer by name
+
+    Args:
+        quantization: "float32", "float16", "int8" or "pq"
+
+    Returns:
+        ScalarQuantizer or ProductQuantizer
+    """
+    if quantization == "pq":
+        return ProductQuantizer()
+    return ScalarQuantizer(quantization)
+
+
+class LocalVectorStore:
+    """
+    In-process vector index on contiguous NumPy arrays
+
+    Vectors are L2-normalized (scores are cosine similarities, like the
+    Pinecone index) and kept only in quantized form; metadata lives in plain
+    lists indexed by row. Upserting an existing id rewrites its row, deletes
+    leave a tombstone until the next snapshot compacts the rows away.
+
+    int8 and PQ need training. Until train_size vectors are stored they are
+    kept (and searched) in float32; then the quantizer is fitted on them.
+    int8 also keeps an in-memory reservoir sample of upserted vectors: once
+    the store has grown refit_growth times since the last fit, the ranges
+    are refitted on it (topped up with decoded rows after a reload) and
+    every row is re-encoded from its decoded value. PQ codes cannot be
+    re-encoded without compounding the error, so a PQ store keeps its
+    codebooks; fit() it on a sample before upserting, or rebuild it, to
+    retrain.
+
+    Several processes (app, query server, CLI) may share one directory. Saves
+    hold an exclusive file lock ("<path>.lock"); if another process saved
+    since this one last read the directory, its state is loaded first and
+    this process's unsaved changes are replayed on top. Queries pick up
+    other processes' saves at most every LOCAL_INDEX_REFRESH_SECONDS (new
+    segments are applied incrementally) while nothing is left unsaved.
+    """
+
+    def __init__(self, quantization: str = VECTOR_QUANTIZATION, path: str = None,
+                 train_size: int = None, refit_growth: float = VECTOR_REFIT_GROWTH):
+        """
+        Initialize an empty store
+
+        Args:
+            quantization: "float32", "float16", "int8" or "pq"
+            path: Directory used by save() / load()
+            train_size: Vectors stored before int8/PQ training, and int8 reservoir
+                size (default VECTOR_TRAIN_SAMPLE, PQ_TRAIN_SAMPLE for PQ)
+            refit_growth: Growth factor since the last fit that triggers a refit
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {quantization}")
+        self.quantization = quantization
+        self.quantizer = make_quantizer(quantization)
+        self.path = path
+        if train_size is None:
+            train_size = PQ_TRAIN_SAMPLE if quantization == "pq" else VECTOR_TRAIN_SAMPLE
+        self.train_size = train_size
+        self.refit_growth = refit_growth
+        self.dim = None
+        self._lock = threading.RLock()
+        self._codes = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._company_codes = np.zeros(0, dtype=np.int32)
+        self._count = 0
+        self._ids = []
+        self._texts = []
+        self._extras = []  # Per-row metadata besides text and company (positions)
+        self._rows = {}
+        self._companies = []
+        self._company_index = {}
+        self._trainable = quantization in ("int8", "pq")
+        self._sample = None   # int8: reservoir of upserted vectors (normalized float32)
+        self._seen = 0        # Vectors offered to the reservoir
+        self._fitted_on = 0   # Stored vectors when the quantizer was last fitted
+        self._rng = np.random.default_rng(0)
+        self._saved_path = None     # Directory holding the last snapshot
+        self._snapshot_rows = 0     # Rows in that snapshot
+        self._segments = []         # Segment files saved on top of it
+        self._segment_rows = set()  # Rows written to those segments
+        self._dirty = set()         # Rows changed since the last save
+        self._needs_snapshot = False
+        self._stamp = None          # On-disk state this store matches (see _disk_stamp)
+        self._snapshot_stamp = None
+        self._checked_at = 0.0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._alive[:self._count].sum())
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes used by vector codes and quantizer state (metadata and reservoir excluded)"""
+        with self._lock:
+            used = 0 if self._codes is None else self._codes[:self._count].nbytes
+            return used + sum(array.nbytes for array in self.quantizer.state().values())
+
+    def fit(self, vectors):
+        """
+        Fit the quantizer on a representative sample (stored rows are re-encoded)
+
+        Args:
+            vectors: Array-like of shape (n, dim)
+        """
+        vectors = _normalize(vectors)
+        with self._lock:
+            self._refit(vectors)
+            self._fitted_on = max(len(self), len(vectors))
+
+    def upsert(self, ids: list, vectors, metadata: list):
+        """
+        Insert or overwrite vectors
+
+        Args:
+            ids: Vector ids
+            vectors: Array-like of shape (n, dim) (embeddings straight from the model)
+            metadata: Dictionaries with "company" and "text" (other keys,
+                e.g. page and char offsets, are returned with query results)
+        """
+        self._upsert(ids, _normalize(vectors), metadata)
+
+    def _upsert(self, ids: list, vectors: np.ndarray, metadata: list):
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            codes = self.quantizer.encode(vectors) if self.quantizer.fitted else vectors
+
+            rows = []
+            for vector_id, meta in zip(ids, metadata):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = self._append_row(vector_id, codes.shape[1:], codes.dtype)
+                self._texts[row] = meta.get("text")
+                self._extras[row] = {
+                    key: value for key, value in meta.items() if key not in ("text", "company")
+                } or None
+                self._company_codes[row] = self._company_code(meta.get("company"))
+                self._alive[row] = True
+                rows.append(row)
+            self._codes[rows] = codes
+            self._dirty.update(rows)
+            if self.quantization == "int8":
+                self._add_to_sample(vectors)
+            if self._trainable:
+                self._maybe_refit()
+
+    def delete(self, ids: list) -> int:
+        """
+        Delete vectors by id
+
+        Args:
+            ids: Vector ids
+
+        Returns:
+            Number of vectors deleted
+        """
+        deleted = 0
+        with self._lock:
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    self._texts[row] = None
+                    self._extras[row] = None
+                    self._dirty.add(row)
+                    deleted += 1
+        return deleted
+
+    def query(self, vector, top_k: int, company_name: str = None) -> list:
+        """
+        Find the most similar vectors, scoring directly on the quantized codes
+
+        Args:
+            vector: Query embedding
+            top_k: Number of results
+            company_name: Optional company filter (None or "General" for all)
+
+        Returns:
+            List of dictionaries with score, id, company, text and any other
+            stored metadata (best first)
+        """
+        query = _normalize(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        self.refresh()
+        with self._lock:
+            if self._count == 0:
+                return []
+            mask = self._alive[:self._count].copy()
+            if company_name and company_name != "General":
+                code = self._company_index.get(company_name)
+                if code is None:
+                    return []
+                mask &= self._company_codes[:self._count] == code
+
+            scores = np.full(self._count, -np.inf, dtype=np.float32)
+            for start in range(0, self._count, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self._count)
+                block = mask[start:end]
+                if block.any():
+                    rows = np.flatnonzero(block) + start
+                    scores[rows] = self._score(query, self._codes[rows])
+
+            top_k = min(top_k, int(mask.sum()))
+            if top_k == 0:
+                return []
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best])]
+            return [dict(self._metadata(row), score=float(scores[row])) for row in best]
+
+    def get(self, ids: list) -> dict:
+        """
+        Look up stored metadata by id (no similarity search)
+
+        Args:
+            ids: Vector ids
+
+        Returns:
+            Dictionary of id -> metadata (id, company, text, ...) for the ids found
+        """
+        self.refresh()
+        with self._lock:
+            return {
+                vector_id: self._metadata(self._rows[vector_id])
+                for vector_id in ids if vector_id in self._rows
+            }
+
+    def save(self, path: str = None):
+        """
+        Persist the store to a directory
+
+        Saves after the first one only append the rows upserted or deleted
+        since the previous save, as a segment file committed by rewriting the
+        small segments.json list; LOCAL_INDEX_MAX_SEGMENTS segments are merged
+        into one. A full snapshot of the live rows (replacing the directory
+        atomically) is written on a new path, after the quantizer was
+        refitted, once the segments would be as large as the snapshot, or once
+        LOCAL_INDEX_COMPACT_DEAD_SHARE of the rows are deleted; it drops the
+        deleted rows from memory as well. Rows both added and deleted since
+        the snapshot are left out of segments.
+
+        Args:
+            path: Target directory (defaults to the store's path)
+        """
+        path = path or self.path
+        with self._lock, _store_lock(path).exclusive():
+            stamp = _disk_stamp(path)
+            if self._saved_path in (None, path) and stamp not in (None, self._stamp):
+                self._rebase(path)
+            since_snapshot = self._segment_rows | self._dirty
+            deleted = self._count - len(self)
+            if (path != self._saved_path or self._needs_snapshot
+                    or len(since_snapshot) >= self._snapshot_rows
+                    or deleted > LOCAL_INDEX_COMPACT_DEAD_SHARE * self._count):
+                self._write_snapshot(path)
+            elif self._dirty:
+                # Rows appended since the snapshot need no tombstone once deleted
+                if len(self._segments) + 1 >= LOCAL_INDEX_MAX_SEGMENTS:
+                    replaces = self._segments
+                    rows = [row for row in sorted(since_snapshot)
+                            if self._alive[row] or row < self._snapshot_rows]
+                else:
+                    replaces = []
+                    rows = [row for row in sorted(self._dirty)
+                            if self._alive[row] or row < self._snapshot_rows
+                            or row in self._segment_rows]
+                if rows or replaces:
+                    self._write_segment(path, rows, replaces=replaces)
+                self._segment_rows = since_snapshot
+                self._dirty = set()
+            self._stamp = _disk_stamp(path)
+        self.path = path
+
+    def refresh(self):
+        """Pick up rows saved by other processes (skipped while changes are unsaved)"""
+        path = self._saved_path or self.path
+        now = time.monotonic()
+        if path is None or self._dirty or now - self._checked_at < LOCAL_INDEX_REFRESH_SECONDS:
+            return
+        self._checked_at = now
+        if _disk_stamp(path) == self._stamp:
+            return
+        with self._lock, _store_lock(path).shared():
+            stamp = _disk_stamp(path)
+            if self._dirty or stamp == self._stamp or stamp is None:
+                return
+            segments = _read_segments(path)
+            if (_file_stamp(os.path.join(path, "metadata.json")) == self._snapshot_stamp
+                    and segments[:len(self._segments)] == self._segments):
+                for segment in segments[len(self._segments):]:
+                    with np.load(os.path.join(path, segment)) as arrays:
+                        self._apply_segment(arrays)
+                self._segments = segments
+                self._stamp = stamp
+            else:
+                self._adopt(self._read(path))
+
+    def _rebase(self, path: str):
+        """Load the state another process saved and replay this one's unsaved changes"""
+        fresh = self._read(path)
+        rows = sorted(self._dirty)
+        fresh.delete([self._ids[row] for row in rows if not self._alive[row]])
+        live = [row for row in rows if self._alive[row]]
+        if live:
+            fresh._upsert([self._ids[row] for row in live], self._decode(self._codes[live]),
+                          [dict(self._extras[row] or {},
+                                company=self._companies[self._company_codes[row]],
+                                text=self._texts[row]) for row in live])
+        self._adopt(fresh)
+
+    def _adopt(self, other: "LocalVectorStore"):
+        """Take over another store's rows and save state (the reservoir stays)"""
+        for name in ("quantization", "quantizer", "dim", "_codes", "_alive", "_company_codes",
+                     "_count", "_ids", "_texts", "_extras", "_rows", "_companies",
+                     "_company_index", "_trainable", "_fitted_on", "_saved_path",
+                     "_snapshot_rows", "_segments", "_segment_rows", "_dirty",
+                     "_needs_snapshot", "_stamp", "_snapshot_stamp"):
+            setattr(self, name, getattr(other, name))
+
+    def _write_snapshot(self, path: str):
+        """Write the live rows to a fresh directory and swap it in"""
+        if self._count > len(self):
+            self._compact()
+        tmp_dir = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+        os.makedirs(tmp_dir)
+        try:
+            arrays = {
+                "codes": self._codes[:self._count] if self._codes is not None
+                else np.zeros((0, 0), dtype=np.float32),
+                "alive": self._alive[:self._count],
+                "company_codes": self._company_codes[:self._count]
+            }
+            arrays.update({f"quantizer_{k}": v for k, v in self.quantizer.state().items()})
+            np.savez(os.path.join(tmp_dir, "vectors.npz"), **arrays)
+            _write_json(os.path.join(tmp_dir, "segments.json"), [])
+            with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "quantization": self.quantization,
+                    "dim": self.dim,
+                    "fitted_on": self._fitted_on,
+                    "ids": self._ids,
+                    "texts": self._texts,
+                    "extras": self._extras,
+                    "companies": self._companies
+                }, f)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_dir, path)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self._saved_path = path
+        self._snapshot_rows = self._count
+        self._segments = []
+        self._segment_rows = set()
+        self._dirty = set()
+        self._needs_snapshot = False
+        self._snapshot_stamp = _file_stamp(os.path.join(path, "metadata.json"))
+
+    def _write_segment(self, path: str, rows: list, replaces: list):
+        """Append the given rows as a segment file (replacing merged segments)"""
+        name = f"segment-{uuid.uuid4().hex[:12]}.npz"
+        rows = np.asarray(rows, dtype=np.int64)
+        meta = {
+            "dim": self.dim,
+            "fitted_on": self._fitted_on,
+            "ids": [self._ids[row] for row in rows],
+            "texts": [self._texts[row] for row in rows],
+            "extras": [self._extras[row] for row in rows],
+            "companies": self._companies
+        }
+        _save_npz(os.path.join(path, name), rows=rows, codes=self._codes[rows],
+                  alive=self._alive[rows], company_codes=self._company_codes[rows],
+                  meta=np.array(json.dumps(meta)))
+        segments = [segment for segment in self._segments if segment not in replaces] + [name]
+        _write_json(os.path.join(path, "segments.json"), segments)
+        for segment in replaces:
+            try:
+                os.remove(os.path.join(path, segment))
+            except OSError:
+                pass
+        self._segments = segments
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorStore":
+        """
+        Load a store written by save() (snapshot plus segments)
+
+        Args:
+            path: Store directory
+
+        Returns:
+            LocalVectorStore instance
+        """
+        with _store_lock(path).shared():
+            return cls._read(path)
+
+    @classmethod
+    def _read(cls, path: str) -> "LocalVectorStore":
+        """load() without the file lock (the caller holds it)"""
+        stamp = _disk_stamp(path)
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(meta["quantization"], path=path)
+        with np.load(os.path.join(path, "vectors.npz")) as arrays:
+            store.quantizer.load_state({
+                key[len("quantizer_"):]: arrays[key]
+                for key in arrays.files if key.startswith("quantizer_")
+            })
+            store._codes = arrays["codes"]
+            store._alive = arrays["alive"]
+            store._company_codes = arrays["company_codes"]
+        store.dim = meta["dim"]
+        store._count = len(meta["ids"])
+        store._ids = meta["ids"]
+        store._texts = meta["texts"]
+        # Stores written before position metadata was recorded have none
+        store._extras = meta.get("extras") or [None] * store._count
+        store._companies = meta["companies"]
+        store._company_index = {name: i for i, name in enumerate(store._companies)}
+        store._rows = {
+            vector_id: row for row, vector_id in enumerate(store._ids) if store._alive[row]
+        }
+        store._fitted_on = meta.get("fitted_on")
+        store._saved_path = path
+        store._snapshot_rows = store._count
+        store._snapshot_stamp = _file_stamp(os.path.join(path, "metadata.json"))
+
+        store._segments = _read_segments(path)
+        for segment in store._segments:
+            with np.load(os.path.join(path, segment)) as arrays:
+                store._apply_segment(arrays)
+        if store._fitted_on is None:
+            store._fitted_on = len(store._rows)
+        store._stamp = stamp
+        return store
+
+    def _apply_segment(self, arrays):
+        """Replay a saved segment on top of the loaded rows"""
+        meta = json.loads(str(arrays["meta"]))
+        rows = arrays["rows"]
+        codes = arrays["codes"]
+        if self._codes is None or self._codes.shape[1:] != codes.shape[1:]:
+            capacity = len(self._alive)
+            self._codes = np.zeros((capacity,) + codes.shape[1:], dtype=codes.dtype)
+        end = int(rows.max()) + 1 if len(rows) else 0
+        if end > len(self._codes):
+            self._codes = _grow(self._codes, end)
+            self._alive = _grow(self._alive, end)
+            self._company_codes = _grow(self._company_codes, end)
+        if end > self._count:
+            for values in (self._ids, self._texts, self._extras):
+                values.extend([None] * (end - self._count))
+            self._count = end
+        self._codes[rows] = codes
+        self._alive[rows] = arrays["alive"]
+        self._company_codes[rows] = arrays["company_codes"]
+        self._companies = meta["companies"]
+        self._company_index = {name: i for i, name in enumerate(self._companies)}
+        for row, vector_id, alive, text, extras in zip(rows.tolist(), meta["ids"],
+                                                       arrays["alive"].tolist(),
+                                                       meta["texts"], meta["extras"]):
+            if self._rows.get(self._ids[row]) == row:
+                del self._rows[self._ids[row]]
+            self._ids[row] = vector_id
+            self._texts[row] = text
+            self._extras[row] = extras
+            if alive:
+                self._rows[vector_id] = row
+        self.dim = meta["dim"]
+        self._fitted_on = meta["fitted_on"]
+        self._segment_rows.update(rows.tolist())
+
+    def _compact(self):
+        """Drop deleted rows (row numbers change, so a snapshot must follow)"""
+        keep = np.flatnonzero(self._alive[:self._count])
+        if self._codes is not None:
+            self._codes = self._codes[keep]
+        self._alive = self._alive[keep]
+        self._company_codes = self._company_codes[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._texts = [self._texts[row] for row in keep]
+        self._extras = [self._extras[row] for row in keep]
+        self._count = len(keep)
+        self._rows = {vector_id: row for row, vector_id in enumerate(self._ids)}
+
+    def _score(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        if self.quantizer.fitted:
+            return self.quantizer.score(query, codes)
+        return codes @ query  # Not trained yet: codes are the float32 vectors
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        if self.quantizer.fitted:
+            return self.quantizer.decode(codes)
+        return codes
+
+    def _add_to_sample(self, vectors: np.ndarray):
+        """Reservoir-sample upserted vectors for (re)fitting the quantizer"""
+        if self._sample is None:
+            self._sample = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        for vector in vectors:
+            if self._seen < self.train_size:
+                slot = self._seen
+                if slot == len(self._sample):
+                    capacity = min(self.train_size, max(16, 2 * len(self._sample)))
+                    self._sample = _grow(self._sample, capacity)
+            else:
+                slot = int(self._rng.integers(self._seen + 1))
+            if slot < self.train_size:
+                self._sample[slot] = vector
+            self._seen += 1
+
+    def _maybe_refit(self):
+        """Train once train_size vectors are stored; refit int8 as the store grows"""
+        stored = len(self)
+        alive = np.flatnonzero(self._alive[:self._count])
+        if not self.quantizer.fitted:
+            if stored >= self.train_size:
+                self._refit(self._codes[alive])  # Still the float32 vectors
+                self._fitted_on = stored
+            return
+        if self.quantization != "int8" or stored < self.refit_growth * max(self._fitted_on, 1):
+            return
+        # The reservoir, topped up with decoded rows (it is not saved with the store)
+        sample = self._sample[:min(self._seen, self.train_size)]
+        missing = self.train_size - len(sample)
+        if missing > 0 and self._seen < len(alive):
+            rows = np.sort(self._rng.choice(alive, min(missing, len(alive)), replace=False))
+            sample = np.concatenate([sample, self._decode(self._codes[rows])])
+        self._refit(sample)
+        self._fitted_on = stored
+
+    def _refit(self, vectors: np.ndarray):
+        """Fit a new quantizer and re-encode the stored rows with it"""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        quantizer = make_quantizer(self.quantization)
+        quantizer.fit(vectors)
+        if self._count:
+            codes = None
+            for start in range(0, self._count, SEARCH_BLOCK_ROWS):
+                end = min(start + SEARCH_BLOCK_ROWS, self._count)
+                block = quantizer.encode(self._decode(self._codes[start:end]))
+                if codes is None:
+                    codes = np.zeros((len(self._codes),) + block.shape[1:], dtype=block.dtype)
+                codes[start:end] = block
+            self._codes = codes
+        else:
+            self._codes = None
+        self.quantizer = quantizer
+        self._needs_snapshot = True
+
+    def _append_row(self, vector_id: str, code_shape: tuple, code_dtype) -> int:
+        if self._codes is None:
+            self._codes = np.zeros((0,) + code_shape, dtype=code_dtype)
+        if self._count == len(self._codes):
+            # Grow geometrically so appends stay amortized O(1)
+            capacity = max(16, 2 * len(self._codes))
+            self._codes = _grow(self._codes, capacity)
+            self._alive = _grow(self._alive, capacity)
+            self._company_codes = _grow(self._company_codes, capacity)
+        row = self._count
+        self._count += 1
+        self._ids.append(vector_id)
+        self._texts.append(None)
+        self._extras.append(None)
+        self._rows[vector_id] = row
+        return row
+
+    def _metadata(self, row: int) -> dict:
+        metadata = dict(self._extras[row] or {})
+        metadata.update(
+            id=self._ids[row],
+            company=self._companies[self._company_codes[row]],
+            text=self._texts[row]
+        )
+        return metadata
+
+    def _company_code(self, company_name: str) -> int:
+        code = self._company_index.get(company_name)
+        if code is None:
+            code = len(self._companies)
+            self._companies.append(company_name)
+            self._company_index[company_name] = code
+        return code
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _save_npz(path: str, **arrays):
+    """Write an .npz file atomically"""
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}.npz"
+    try:
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_json(path: str, value):
+    """Write a JSON file atomically"""
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _file_stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _disk_stamp(path: str):
+    """Identity of a saved store's state: segments.json is rewritten by every save"""
+    return (_file_stamp(os.path.join(path, "segments.json"))
+            or _file_stamp(os.path.join(path, "metadata.json")))
+
+
+def _read_segments(path: str) -> list:
+    try:
+        with open(os.path.join(path, "segments.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+
+def _store_lock(path: str) -> ReadWriteFileLock:
+    """Cross-process lock of a store directory (one object per path in this process)"""
+    path = os.path.abspath(path)
+    with _file_locks_lock:
+        if path not in _file_locks:
+            _file_locks[path] = ReadWriteFileLock(f"{path}.lock")
+        return _file_locks[path]
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def recall_report(vectors, queries, top_k: int = 10,
+                  quantizations: tuple = QUANTIZATIONS) -> list:
+    """
+    Measure recall against exact float32 search for each storage format
+
+    Args:
+        vectors: Corpus embeddings (n, dim)
+        queries: Query embeddings (q, dim)
+        top_k: Neighbours compared per query
+        quantizations: Formats to evaluate
+
+    Returns:
+        List of dictionaries with quantization, bytes_per_vector, memory_mb
+        (for this corpus), gb_per_million and recall_at_k
+    """
+    vectors = _normalize(vectors)
+    queries = _normalize(queries)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :top_k]
+    ids = [str(i) for i in range(len(vectors))]
+    metadata = [{"company": "corpus", "text": vector_id} for vector_id in ids]
+
+    report = []
+    for quantization in quantizations:
+        store = LocalVectorStore(quantization)
+        store.fit(vectors)
+        store.upsert(ids, vectors, metadata)
+
+        hits = 0
+        for query, truth in zip(queries, exact):
+            found = {int(match["text"]) for match in store.query(query, top_k)}
+            hits += len(found & set(truth.tolist()))
+
+        bytes_per_vector = store.quantizer.code_size(vectors.shape[1])
+        report.append({
+            "quantization": quantization,
+            "bytes_per_vector": bytes_per_vector,
+            "memory_mb": store.memory_bytes / 1024 ** 2,
+            "gb_per_million": bytes_per_vector * 1_000_000 / 1024 ** 3,
+            "recall_at_k": hits / (len(queries) * top_k)
+        })
+    return report
+
+
+_default_stores = {}
+_default_stores_lock = threading.Lock()
+
+
+def local_index_dir(generation_id: str) -> str:
+    """
+    Directory of an index generation's local store
+
+    Each generation has its own store, since generations may use embedding
+    models of different dimensions. The original generation keeps
+    LOCAL_INDEX_DIR; later ones use sibling "<LOCAL_INDEX_DIR>-<id>" folders.
+
+    Args:
+        generation_id: Index generation id
+
+    Returns:
+        Store directory
+    """
+    from src.services.index_generations import DEFAULT_GENERATION
+    if generation_id == DEFAULT_GENERATION:
+        return LOCAL_INDEX_DIR
+    return f"{LOCAL_INDEX_DIR}-{generation_id}"
+
+
+def get_local_vector_store(generation: dict = None) -> LocalVectorStore:
+    """
+    Get the local vector store of an index generation for this process
+
+    Args:
+        generation: Index generation (the active one if omitted)
+
+    Returns:
+        LocalVectorStore instance (loaded from its directory if saved)
+    """
+    if generation is None:
+        from src.services.index_generations import get_index_generations
+        generation = get_index_generations().active()
+    path = local_index_dir(generation["id"])
+    with _default_stores_lock:
+        if path not in _default_stores:
+            if os.path.exists(os.path.join(path, "metadata.json")):
+                _default_stores[path] = LocalVectorStore.load(path)
+            else:
+                _default_stores[path] = LocalVectorStore(path=path)
+        return _default_stores[path]
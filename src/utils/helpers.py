@@ -3,6 +3,11 @@ Helper utility functions for the ESG Question Answering System
 """
 
 import os
+import zipfile
+
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB in bytes
+MAX_ZIP_MEMBERS = 200  # Entries allowed in an uploaded zip archive
+MAX_ZIP_TOTAL_SIZE = 500 * 1024 * 1024  # Decompressed PDF bytes allowed per archive
 
 
 def get_available_companies(data_folder: str) -> list:
@@ -44,13 +49,81 @@ def validate_pdf_file(file) -> tuple:
         return False, "File must be a PDF"
     
     # Check file size (max 50MB)
-    max_size = 50 * 1024 * 1024  # 50MB in bytes
+    max_size = MAX_UPLOAD_SIZE
     if file.size > max_size:
         return False, f"File too large. Maximum size is 50MB"
     
     return True, "Valid PDF file"
 
 
+def expand_pdf_uploads(files: list) -> tuple:
+    """
+    Expand uploaded PDFs and zip archives of PDFs into individual documents
+    
+    Archives are bounded by entry count and total decompressed size, and
+    members are read with a bounded read rather than trusting the sizes the
+    archive declares. File names must be unique across the upload, since the
+    name becomes the company: a repeated name is reported as an error.
+    
+    Args:
+        files: Uploaded file objects (.pdf or .zip)
+        
+    Returns:
+        Tuple of (documents, errors) where documents is a list of
+        (filename, source) pairs and errors a list of (filename, message)
+    """
+    documents = []
+    errors = []
+    seen = set()
+    
+    def add(name, source):
+        if name.lower() in seen:
+            errors.append((name, "Duplicate file name; rename one of the files"))
+            return
+        seen.add(name.lower())
+        documents.append((name, source))
+    
+    for file in files:
+        if file.name.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(file) as archive:
+                    members = archive.infolist()
+                    if len(members) > MAX_ZIP_MEMBERS:
+                        errors.append((file.name, f"Too many files in archive. "
+                                                  f"Maximum is {MAX_ZIP_MEMBERS}"))
+                        continue
+                    remaining = MAX_ZIP_TOTAL_SIZE
+                    for member in members:
+                        name = os.path.basename(member.filename)
+                        if member.is_dir() or not name.lower().endswith(".pdf"):
+                            continue
+                        if name.startswith(".") or "__MACOSX" in member.filename:
+                            continue
+                        limit = min(MAX_UPLOAD_SIZE, remaining)
+                        with archive.open(member) as source:
+                            data = source.read(limit + 1)
+                        if len(data) > limit:
+                            if limit < MAX_UPLOAD_SIZE:
+                                errors.append((file.name, "Archive too large. Maximum "
+                                               f"{format_file_size(MAX_ZIP_TOTAL_SIZE)} unpacked"))
+                                break
+                            errors.append((name, "File too large. Maximum size is 50MB"))
+                            continue
+                        remaining -= len(data)
+                        add(name, data)
+            except zipfile.BadZipFile:
+                errors.append((file.name, "Not a valid zip archive"))
+            continue
+        
+        is_valid, message = validate_pdf_file(file)
+        if is_valid:
+            add(file.name, file)
+        else:
+            errors.append((file.name, message))
+    
+    return documents, errors
+
+
 def format_file_size(size_bytes: int) -> str:
     """
     Format file size in human-readable format
@@ -69,6 +142,23 @@ def format_file_size(size_bytes: int) -> str:
         return f"{size_bytes / (1024 * 1024):.2f} MB"
 
 
+def format_pages(chunk: dict) -> str:
+    """
+    Format the page range of a retrieved chunk for citations
+    
+    Args:
+        chunk: Search result with optional "page" / "page_end"
+        
+    Returns:
+        "p. 12", "pp. 12-13", or "" for chunks stored without pages
+    """
+    page = chunk.get("page")
+    if page is None:
+        return ""
+    page_end = chunk.get("page_end") or page
+    return f"p. {page}" if page_end == page else f"pp. {page}-{page_end}"
+
+
 def truncate_text(text: str, max_length: int = 300) -> str:
     """
     Truncate text to maximum length
@@ -0,0 +1,148 @@
+"""
+Lazy import helpers
+Defer heavy dependencies (torch, sentence_transformers, pinecone, google.genai)
+until they are first used, so entry points start producing output immediately
+"""
+
+import importlib
+import sys
+import threading
+import types
+
+from src.utils.startup_profiler import timed
+
+_import_lock = threading.RLock()
+
+
+def import_module(name: str):
+    """
+    Import a module, recording the time in the startup profile
+
+    Args:
+        name: Dotted module name
+
+    Returns:
+        The imported module
+    """
+    with _import_lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        with timed(f"import {name}", "import"):
+            return importlib.import_module(name)
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module stand-in that imports the real module on first attribute access
+
+    Resolved attributes are cached on the stand-in itself, so they can be
+    replaced with unittest.mock.patch like normal module attributes.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+
+    def __getattr__(self, attribute: str):
+        value = getattr(import_module(self.__name__), attribute)
+        setattr(self, attribute, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+class LazyAttribute:
+    """
+    Stand-in for a class or function imported from a heavy module
+
+    Calling it (or accessing any of its attributes) imports the module.
+    """
+
+    def __init__(self, module_name: str, attribute: str):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target = None
+
+    def resolve(self):
+        """Import the module and return the real object"""
+        if self._target is None:
+            self._target = getattr(import_module(self._module_name), self._attribute)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, attribute: str):
+        if attribute.startswith("_"):
+            raise AttributeError(attribute)
+        return getattr(self.resolve(), attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._module_name}.{self._attribute}>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """
+    Get a lazily imported module
+
+    Args:
+        name: Dotted module name
+
+    Returns:
+        LazyModule proxy
+    """
+    return LazyModule(name)
+
+
+def lazy_attribute(module_name: str, attribute: str) -> LazyAttribute:
+    """
+    Get a lazily imported class or function (like `from module import attribute`)
+
+    Args:
+        module_name: Dotted module name
+        attribute: Name inside the module
+
+    Returns:
+        LazyAttribute proxy
+    """
+    return LazyAttribute(module_name, attribute)
+
+
+class lazy_resource:
+    """
+    Decorator for expensive instance attributes (models, clients, connections)
+
+    The decorated method runs on first access, once per instance even with
+    concurrent first accesses, and its duration is recorded in the startup
+    profile. The result is stored on the instance, so it can also be assigned
+    directly (e.g. a test double).
+    """
+
+    def __init__(self, category: str, label: str = None):
+        """
+        Args:
+            category: Startup profile category ("model" or "connection")
+            label: Stage label (defaults to the attribute name)
+        """
+        self.category = category
+        self.label = label
+        self._lock = threading.RLock()
+
+    def __call__(self, method):
+        self.method = method
+        self.__doc__ = method.__doc__
+        return self
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+        self.label = self.label or f"{owner.__name__}.{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with self._lock:
+            if self.name not in instance.__dict__:
+                with timed(self.label, self.category):
+                    instance.__dict__[self.name] = self.method(instance)
+        return instance.__dict__[self.name]
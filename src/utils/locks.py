@@ -0,0 +1,143 @@
+"""
+Cross-Process Locks
+Readers/writer lock on a lock file, shared by every process using the same data folder
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ReadWriteFileLock:
+    """
+    Readers/writer lock held across threads and processes
+
+    Threads of one process share a single OS lock for their shared
+    sections: the first reader takes it, the last one releases it. On POSIX
+    readers of different processes run together (flock LOCK_SH); on Windows
+    the file lock is exclusive only, so readers of different processes take
+    turns. A writer waits for every reader and excludes everyone.
+
+    Writers have priority within a process: once one is waiting, new
+    readers queue behind it (a thread already reading may nest), so a steady
+    stream of reads cannot starve a switch. OS locks are always waited for
+    outside the thread condition, so a reader blocked on another process
+    never stalls threads that only need the in-process state.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the lock
+
+        Args:
+            path: Lock file (created on first use)
+        """
+        self.path = path
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._acquiring = False  # The first reader is waiting for the OS lock
+        self._handle = None
+        self._local = threading.local()  # Shared sections held by this thread
+
+    @contextmanager
+    def shared(self):
+        """Hold the lock shared for the duration of the block"""
+        nested = getattr(self._local, "depth", 0) > 0
+        with self._condition:
+            self._condition.wait_for(lambda: nested or (
+                not self._writer and not self._writers_waiting and not self._acquiring
+            ))
+            first = self._readers == 0
+            if first:
+                self._acquiring = True
+            else:
+                self._readers += 1
+        if first:
+            try:
+                handle = _acquire(self.path, exclusive=False)
+            except BaseException:
+                with self._condition:
+                    self._acquiring = False
+                    self._condition.notify_all()
+                raise
+            with self._condition:
+                self._handle = handle
+                self._acquiring = False
+                self._readers += 1
+                self._condition.notify_all()
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    _release(self._handle)
+                    self._handle = None
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the lock exclusively for the duration of the block"""
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                self._condition.wait_for(
+                    lambda: not self._writer and self._readers == 0 and not self._acquiring
+                )
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            handle = _acquire(self.path, exclusive=True)
+            try:
+                yield
+            finally:
+                _release(handle)
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+def _acquire(path: str, exclusive: bool):
+    """Open the lock file and wait for the OS lock"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+    except BaseException:
+        handle.close()
+        raise
+    return handle
+
+
+def _release(handle):
+    """Release the OS lock and close the lock file"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        handle.close()
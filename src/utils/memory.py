@@ -0,0 +1,193 @@
+"""
+Ingestion memory
+Process-wide memory budget for in-flight ingestions and a per-stage
+allocation report (tracemalloc) used to size ingestion workers
+"""
+
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from src.config.settings import INGEST_MEMORY_BUDGET_MB, INGESTION_WORKERS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+
+class MemoryBudget:
+    """
+    Counting semaphore over bytes
+
+    Every ingestion reserves its estimated footprint (extracted text, chunk
+    records and one window of embeddings) before extracting anything, so
+    once the budget is taken further documents wait instead of piling up.
+    A reservation larger than the whole budget is admitted when nothing
+    else is reserved, so an oversized document still goes through, alone.
+    """
+
+    def __init__(self, limit_bytes: int = INGEST_MEMORY_BUDGET_MB * MB,
+                 workers: int = INGESTION_WORKERS):
+        """
+        Initialize the budget
+
+        Args:
+            limit_bytes: Bytes shared by all in-flight ingestions
+            workers: Ingestions expected to run at once (sizes window_bytes)
+        """
+        self.limit_bytes = limit_bytes
+        self.workers = max(1, workers)
+        self._condition = threading.Condition()
+        self._reserved = 0
+        self._peak = 0
+        self._waits = 0
+
+    @property
+    def window_bytes(self) -> int:
+        """Bytes of embeddings one ingestion keeps in memory before uploading them"""
+        # Half of a worker's share; the other half holds the document's text
+        return self.limit_bytes // (2 * self.workers)
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        """
+        Hold nbytes of the budget for the duration of the block, waiting if needed
+
+        Args:
+            nbytes: Estimated bytes the block keeps resident
+        """
+        nbytes = max(0, int(nbytes))
+        with self._condition:
+            if not self._fits(nbytes):
+                self._waits += 1
+                self._condition.wait_for(lambda: self._fits(nbytes))
+            self._reserved += nbytes
+            self._peak = max(self._peak, self._reserved)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._reserved -= nbytes
+                self._condition.notify_all()
+
+    def _fits(self, nbytes: int) -> bool:
+        return self._reserved == 0 or self._reserved + nbytes <= self.limit_bytes
+
+    def stats(self) -> dict:
+        """Budget, current and peak reservations (MB) and how often ingestions waited"""
+        with self._condition:
+            return {
+                "limit_mb": round(self.limit_bytes / MB, 1),
+                "reserved_mb": round(self._reserved / MB, 1),
+                "peak_mb": round(self._peak / MB, 1),
+                "waits": self._waits
+            }
+
+
+class MemoryReport:
+    """
+    Peak Python allocations per ingestion stage
+
+    Stages are measured with tracemalloc: the peak is the highest traced
+    memory above the stage's starting point, retained is what is still
+    allocated when it ends. NumPy arrays are traced; memory held by native
+    libraries (the PDF parser, the model's tensors) only shows in RSS.
+    tracemalloc is process-wide, so stages of documents ingested at the
+    same time blur together; process documents one at a time when sizing.
+    """
+
+    def __init__(self):
+        self.stages = {}  # stage -> {"runs", "peak_bytes", "retained_bytes", "rss_bytes"}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure a block of code
+
+        Args:
+            name: Stage label (e.g. "extract")
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            rss = rss_bytes()
+            with self._lock:
+                stats = self.stages.setdefault(name, {
+                    "runs": 0, "peak_bytes": 0, "retained_bytes": 0, "rss_bytes": None
+                })
+                stats["runs"] += 1
+                stats["peak_bytes"] = max(stats["peak_bytes"], peak - start)
+                stats["retained_bytes"] = max(stats["retained_bytes"], current - start)
+                if rss is not None:
+                    stats["rss_bytes"] = max(stats["rss_bytes"] or 0, rss)
+
+    def stop(self):
+        """Stop tracing (started by the first stage)"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self, title: str = "ingestion") -> str:
+        """
+        Format the largest value seen per stage
+
+        Args:
+            title: Label printed in the header
+
+        Returns:
+            Table of stages with peak / retained traced MB and RSS after the stage
+        """
+        lines = [f"Memory by stage ({title}, max over documents)",
+                 f"{'stage':<14}{'runs':>6}{'peak MB':>10}{'retained MB':>13}{'RSS MB':>10}"]
+        with self._lock:
+            for name, stats in self.stages.items():
+                rss = f"{stats['rss_bytes'] / MB:.0f}" if stats["rss_bytes"] is not None else "n/a"
+                lines.append(f"{name:<14}{stats['runs']:>6}{stats['peak_bytes'] / MB:>10.1f}"
+                             f"{stats['retained_bytes'] / MB:>13.1f}{rss:>10}")
+        peak_rss = peak_rss_bytes()
+        if peak_rss is not None:
+            lines.append(f"Process peak RSS: {peak_rss / MB:.0f} MB")
+        return "\n".join(lines)
+
+
+def rss_bytes():
+    """Current resident set size of this process (Linux), or None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes():
+    """Highest resident set size of this process so far, or None"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """
+    Get the ingestion memory budget shared by every processor of this process
+
+    Returns:
+        MemoryBudget instance
+    """
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = MemoryBudget()
+        return _budget
@@ -0,0 +1,260 @@
+"""
+Request profiler
+Opt-in per-request profiles (cProfile or stack sampling) written to PROFILE_DIR
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from src.config.settings import (
+    PROFILE_DIR,
+    PROFILE_MODE,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SAMPLING_INTERVAL,
+    PROFILE_TOP_FUNCTIONS
+)
+
+MODES = ("cprofile", "sampling")
+
+
+class ProfileRun:
+    """Files written for one profiled request"""
+
+    def __init__(self, name: str, mode: str):
+        self.name = name
+        self.mode = mode
+        self.seconds = None
+        self.profile_path = None  # .prof (pstats) or .folded (flame graph stacks)
+        self.summary_path = None  # Top hot functions as text
+
+
+class StackSampler:
+    """Samples one thread's call stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLING_INTERVAL):
+        """
+        Initialize the sampler
+
+        Args:
+            thread_id: Thread to sample (threading.get_ident() of the request)
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # Tuple of frame labels (root first) -> samples
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                location = f"{_short_path(code.co_filename)}:{code.co_firstlineno}"
+                stack.append(f"{code.co_name} ({location})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+class RequestProfiler:
+    """
+    Profiles selected requests
+
+    A request is profiled when its caller forces it (per-request flag) or,
+    with a mode configured, when it falls in the sampled fraction. Only the
+    calling thread is profiled; work handed to pools (parallel per-company
+    searches) shows up as waiting. Nested profile() calls on a thread that
+    is already being profiled do nothing, so entry points can be wrapped at
+    every layer.
+    """
+
+    def __init__(self, mode: str = PROFILE_MODE, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 output_dir: str = PROFILE_DIR, interval: float = PROFILE_SAMPLING_INTERVAL,
+                 top: int = PROFILE_TOP_FUNCTIONS):
+        """
+        Initialize the profiler
+
+        Args:
+            mode: "off", "cprofile" (deterministic, higher overhead) or
+                "sampling" (stack samples, suitable for production)
+            sample_rate: Fraction of requests profiled when mode is not "off"
+            output_dir: Directory receiving profile and summary files
+            interval: Seconds between stack samples in "sampling" mode
+            top: Hot functions listed in each summary
+        """
+        if mode not in MODES + ("off",):
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        self._local = threading.local()
+        # cProfile cannot run on two threads at once (Python 3.12+); extra
+        # concurrent requests are sampled instead
+        self._cprofile_lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, name: str, force=None):
+        """
+        Profile a block of code if it is selected
+
+        Args:
+            name: Request label used in file names (e.g. "ask_question")
+            force: True to profile with the configured mode ("cprofile" if
+                profiling is off), a mode name to use that mode, False to
+                never profile, None to follow the sample rate
+
+        Yields:
+            ProfileRun (paths are set when the block exits) or None
+        """
+        mode = self._select(force)
+        if mode is None or getattr(self._local, "active", False):
+            yield None
+            return
+
+        run = ProfileRun(name, mode)
+        self._local.active = True
+        profiler = sampler = None
+        if mode == "cprofile" and self._cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        else:
+            run.mode = "sampling"
+            sampler = StackSampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            else:
+                sampler.start()
+            yield run
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._cprofile_lock.release()
+            else:
+                sampler.stop()
+            run.seconds = time.perf_counter() - start
+            self._local.active = False
+            try:
+                self._write(run, profiler, sampler)
+            except OSError:
+                pass  # A full or read-only disk must not fail the request
+
+    def _select(self, force) -> str:
+        """Mode to profile with, or None"""
+        if force is False:
+            return None
+        if force in MODES:
+            return force
+        if force:
+            return self.mode if self.mode != "off" else "cprofile"
+        if self.mode != "off" and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    def _write(self, run: ProfileRun, profiler, sampler):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.join(self.output_dir, "{}-{}-{}".format(
+            time.strftime("%Y%m%d-%H%M%S"), re.sub(r"[^\w.-]+", "_", run.name), uuid.uuid4().hex[:6]
+        ))
+        header = f"{run.name}: {run.seconds:.3f}s ({run.mode})\n\n"
+
+        if profiler is not None:
+            run.profile_path = stem + ".prof"
+            profiler.dump_stats(run.profile_path)
+            summary = io.StringIO()
+            stats = pstats.Stats(profiler, stream=summary)
+            stats.sort_stats("tottime").print_stats(self.top)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            body = summary.getvalue()
+        else:
+            run.profile_path = stem + ".folded"
+            with open(run.profile_path, "w", encoding="utf-8") as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{';'.join(stack)} {count}\n")
+            body = summarize_samples(sampler.stacks, self.top)
+
+        run.summary_path = stem + ".txt"
+        with open(run.summary_path, "w", encoding="utf-8") as f:
+            f.write(header + body)
+
+
+def summarize_samples(stacks: Counter, top: int = PROFILE_TOP_FUNCTIONS) -> str:
+    """
+    Hot functions of a sampled profile
+
+    Args:
+        stacks: Counter of stack tuples (root first) -> samples
+        top: Functions to list
+
+    Returns:
+        Table of functions by self samples, with inclusive share
+    """
+    total = sum(stacks.values())
+    if not total:
+        return "No samples (the request finished within one sampling interval)\n"
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for label in set(stack):
+            inclusive[label] += count
+    lines = [f"{total} samples", f"{'self %':>7} {'incl %':>7}  function"]
+    for label, count in own.most_common(top):
+        lines.append(f"{100 * count / total:>7.1f} {100 * inclusive[label] / total:>7.1f}  {label}")
+    return "\n".join(lines) + "\n"
+
+
+def _short_path(path: str) -> str:
+    """Path relative to site-packages or the project, for readable labels"""
+    index = path.rfind("site-packages" + os.sep)
+    if index != -1:
+        return path[index + len("site-packages" + os.sep):]
+    index = path.rfind(os.sep + "src" + os.sep)
+    if index != -1:
+        return path[index + 1:]
+    return os.path.basename(path)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_request_profiler() -> RequestProfiler:
+    """
+    Get the request profiler for this process
+
+    Returns:
+        RequestProfiler instance
+    """
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = RequestProfiler()
+        return _profiler
+
+
+def profiled(name: str, force=None):
+    """Shortcut for get_request_profiler().profile(name, force)"""
+    return get_request_profiler().profile(name, force)
@@ -0,0 +1,107 @@
+"""
+Startup profiler
+Records how long imports, model loads and connections take per entry point
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Categories in report order
+CATEGORIES = ("import", "model", "connection", "other")
+
+
+class StartupProfiler:
+    """Collects named, categorized timings from process start"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []  # (category, name, seconds, offset, exclusive seconds)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str, category: str = "other"):
+        """
+        Time a block of code
+
+        Args:
+            name: Stage label (e.g. "import sentence_transformers")
+            category: "import", "model", "connection" or "other"
+        """
+        # Nested stages (an import inside a model load) are subtracted from
+        # their parent so category totals do not double count
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            nested = stack.pop()
+            if stack:
+                stack[-1] += end - start
+            with self._lock:
+                self.stages.append((category, name, end - start, end - self.started,
+                                    end - start - nested))
+
+    def mark(self, name: str):
+        """Record a point in time (e.g. first output) with no duration"""
+        with self._lock:
+            self.stages.append(("other", name, 0.0, time.perf_counter() - self.started, 0.0))
+
+    def totals(self) -> dict:
+        """Seconds per category, excluding time spent in nested stages"""
+        totals = {category: 0.0 for category in CATEGORIES}
+        with self._lock:
+            for category, _, _, _, exclusive in self.stages:
+                totals[category] = totals.get(category, 0.0) + exclusive
+        return totals
+
+    def report(self, title: str = None) -> str:
+        """
+        Format the timing report
+
+        Args:
+            title: Entry point name (defaults to the running script)
+
+        Returns:
+            Multi-line report
+        """
+        title = title or os.path.basename(sys.argv[0] or "python")
+        lines = [
+            "=" * 60,
+            f"STARTUP PROFILE: {title}",
+            "=" * 60,
+            f"{'at (s)':>8} {'took (s)':>9}  {'category':<11} stage"
+        ]
+        with self._lock:
+            stages = sorted(self.stages, key=lambda stage: stage[3] - stage[2])
+        for category, name, seconds, offset, _ in stages:
+            lines.append(f"{offset - seconds:>8.2f} {seconds:>9.3f}  {category:<11} {name}")
+        lines.append("-" * 60)
+        for category, seconds in self.totals().items():
+            lines.append(f"{category:<11} {seconds:>8.2f}s")
+        lines.append(f"{'elapsed':<11} {time.perf_counter() - self.started:>8.2f}s")
+        lines.append("=" * 60)
+        return "\n".join(lines)
+
+
+_profiler = StartupProfiler()
+
+
+def get_startup_profiler() -> StartupProfiler:
+    """
+    Get the profiler for this process
+
+    Returns:
+        StartupProfiler instance
+    """
+    return _profiler
+
+
+def timed(name: str, category: str = "other"):
+    """Shortcut for get_startup_profiler().stage(name, category)"""
+    return _profiler.stage(name, category)
@@ -0,0 +1,129 @@
+"""
+Binary stream helpers for in-memory document ingestion
+"""
+
+import io
+import os
+
+
+class MemoryViewStream(io.RawIOBase):
+    """
+    Read-only, seekable file object over a memoryview
+
+    Lets pdfplumber read an in-memory upload without copying the whole
+    buffer into a new bytes object or a temporary file. Each instance keeps
+    its own position, so several readers can share one underlying buffer.
+    """
+
+    def __init__(self, buffer):
+        """
+        Wrap a bytes-like object
+
+        Args:
+            buffer: bytes, bytearray, memoryview or any buffer-protocol object
+        """
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        if self.closed:
+            raise ValueError("I/O operation on closed stream")
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos:end].tobytes() if end > self._pos else b""
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = memoryview(buffer).cast("B")
+        size = max(0, min(len(data), len(self._view) - self._pos))
+        data[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+    def getbuffer(self) -> memoryview:
+        """Zero-copy access to the underlying buffer (e.g. for hashing)"""
+        return self._view
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def open_binary_source(source):
+    """
+    Turn a PDF source into a seekable binary file object
+
+    Args:
+        source: Path, bytes-like object, object with getbuffer() (e.g. a
+            Streamlit UploadedFile or BytesIO) or any readable binary stream
+
+    Returns:
+        Tuple of (file_or_path, display_name, owned) where owned tells the
+        caller to close the returned stream when done. Paths are returned
+        unchanged so pdfplumber can open them itself.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source), os.path.basename(os.fspath(source)), False
+
+    name = getattr(source, "name", None)
+    name = os.path.basename(name) if isinstance(name, str) else None
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return MemoryViewStream(source), name, True
+
+    if hasattr(source, "getbuffer"):
+        # In-memory upload: read straight from its buffer, no copy
+        return MemoryViewStream(source.getbuffer()), name, True
+
+    if hasattr(source, "read"):
+        if getattr(source, "seekable", lambda: False)():
+            source.seek(0)
+            return source, name, False
+        # Non-seekable streams (sockets, HTTP bodies) must be buffered once
+        # because PDF parsing needs random access to the cross-reference table
+        return MemoryViewStream(source.read()), name, True
+
+    raise TypeError(f"Unsupported PDF source: {type(source).__name__}")
+
+
+def source_size(source) -> int:
+    """
+    Size in bytes of a source returned by open_binary_source()
+
+    Args:
+        source: Path or seekable binary stream
+
+    Returns:
+        Number of bytes
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
@@ -2,6 +2,7 @@
 Comprehensive Unit and Integration Tests for ESG Question Answering System
 """
 
+import os
 import unittest
 from unittest.mock import Mock, MagicMock, patch
 from src.utils.helpers import get_available_companies, validate_pdf_file, format_file_size, truncate_text
@@ -70,6 +71,66 @@ class TestHelpers(unittest.TestCase):
         self.assertTrue(is_valid)
         self.assertEqual(message, "Valid PDF file")
     
+    def test_expand_pdf_uploads_with_zip(self):
+        """Test that zip archives are expanded into their PDF members"""
+        import io
+        import zipfile
+        from src.utils.helpers import expand_pdf_uploads
+        
+        archive_bytes = io.BytesIO()
+        with zipfile.ZipFile(archive_bytes, "w") as archive:
+            archive.writestr("reports/Infosys.pdf", b"%PDF-1.7 a")
+            archive.writestr("reports/Wipro.pdf", b"%PDF-1.7 b")
+            archive.writestr("reports/readme.txt", b"ignored")
+        archive_bytes.name = "reports.zip"
+        archive_bytes.seek(0)
+        
+        single = Mock()
+        single.name = "TCS.pdf"
+        single.size = 1024
+        bad = Mock()
+        bad.name = "notes.txt"
+        bad.size = 10
+        
+        documents, errors = expand_pdf_uploads([archive_bytes, single, bad])
+        
+        self.assertEqual([name for name, _ in documents], ["Infosys.pdf", "Wipro.pdf", "TCS.pdf"])
+        self.assertEqual(documents[0][1], b"%PDF-1.7 a")
+        self.assertEqual(errors, [("notes.txt", "File must be a PDF")])
+    
+    def test_expand_pdf_uploads_limits_and_duplicates(self):
+        """Test archive size and entry caps and that repeated names are rejected"""
+        import io
+        import zipfile
+        from src.utils.helpers import expand_pdf_uploads
+        
+        def make_zip(name, members):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                for member, data in members:
+                    archive.writestr(member, data)
+            buffer.name = name
+            buffer.seek(0)
+            return buffer
+        
+        reports = make_zip("a.zip", [("2023/Infosys.pdf", b"a"), ("2024/Infosys.pdf", b"b")])
+        single = Mock()
+        single.name = "Infosys.pdf"
+        single.size = 10
+        documents, errors = expand_pdf_uploads([reports, single])
+        self.assertEqual(documents, [("Infosys.pdf", b"a")])
+        self.assertEqual([name for name, _ in errors], ["Infosys.pdf", "Infosys.pdf"])
+        
+        with patch("src.utils.helpers.MAX_ZIP_TOTAL_SIZE", 1500):
+            big = make_zip("big.zip", [(f"{i}.pdf", b"0" * 1000) for i in range(3)])
+            documents, errors = expand_pdf_uploads([big])
+        self.assertEqual([name for name, _ in documents], ["0.pdf"])
+        self.assertEqual(errors[0][0], "big.zip")
+        with patch("src.utils.helpers.MAX_ZIP_MEMBERS", 2):
+            documents, errors = expand_pdf_uploads([make_zip("many.zip", [(f"{i}.pdf", b"x")
+                                                                           for i in range(3)])])
+        self.assertEqual((documents, len(errors)), ([], 1))
+    
     def test_truncate_text_short(self):
         """Test text truncation with short text"""
         text = "Short text"
@@ -150,6 +211,1286 @@ class TestDocumentProcessor(unittest.TestCase):
         self.assertGreater(len(chunks), 0)
         # Verify it uses the default chunk size
         self.assertLessEqual(len(chunks[0]), CHUNK_SIZE)
+    
+    def test_chunk_records_have_pages_and_offsets(self):
+        """Test that chunk records map back to their pages and document offsets"""
+        from src.services.document_processor import DocumentProcessor
+        processor = DocumentProcessor()
+        processor.deduplicate = False
+        
+        pages = ["a" * 30, "", "b" * 30]
+        records = processor.prepare_chunk_records(pages, chunk_size=25, overlap=5)
+        text = "a" * 30 + "\n" + "b" * 30 + "\n"
+        
+        self.assertEqual([r["chunk"] for r in records], list(range(len(records))))
+        self.assertEqual([r["text"] for r in records], processor.chunk_text(text, 25, 5))
+        for record in records:
+            self.assertEqual(text[record["char_start"]:record["char_end"]], record["text"])
+        self.assertEqual((records[0]["page"], records[0]["page_end"]), (1, 1))
+        self.assertEqual((records[1]["page"], records[1]["page_end"]), (1, 3))
+        self.assertEqual(records[-1]["page_end"], 3)
+
+
+class TestDocumentLifecycle(unittest.TestCase):
+    """Test company delete and replace through the manifest id registry"""
+    
+    def setUp(self):
+        import tempfile
+        import numpy as np
+        from src.services.document_processor import DocumentProcessor
+        from src.services.facts_store import FactsStore
+        from src.services.ingestion_manifest import IngestionManifest
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = IngestionManifest(os.path.join(self.tmp.name, "manifest.json"))
+        self.text_cache = Mock()
+        self.facts = FactsStore(os.path.join(self.tmp.name, "facts.db"))
+        self.processor = DocumentProcessor(manifest=self.manifest, extractor=Mock(),
+                                           text_cache=self.text_cache, facts_store=self.facts)
+        self.processor.deduplicate = False
+        self.processor.model = Mock()
+        self.processor.model.encode.side_effect = lambda batch, **kwargs: [np.ones(4) for _ in batch]
+        self.processor.index = Mock()
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _ingest(self, text):
+        self.text_cache.get_pages.return_value = [text]
+        return self.processor.process_and_store_pdf(b"%PDF-1.4", "Infosys")
+    
+    def _upserted_ids(self):
+        return [v[0] for call in self.processor.index.upsert.call_args_list for v in call.kwargs["vectors"]]
+    
+    def test_replace_removes_old_chunks(self):
+        """Test that a shorter replacement leaves no orphaned ids"""
+        self._ingest("a" * 2000)
+        self.assertEqual(self._upserted_ids(), ["Infosys_0", "Infosys_1", "Infosys_2"])
+        self.processor.index.reset_mock()
+        
+        success, _ = self.processor.replace_company("Infosys", b"%PDF-1.4")
+        
+        self.assertTrue(success)
+        self.assertEqual(self._upserted_ids(), ["Infosys@g2_0", "Infosys@g2_1", "Infosys@g2_2"])
+        self.processor.index.delete.assert_called_once_with(ids=["Infosys_0", "Infosys_1", "Infosys_2"])
+        self.assertEqual(self.manifest.vector_ids("Infosys")[0], "Infosys@g2_0")
+    
+    def test_failed_replace_keeps_previous_document(self):
+        """Test that a failed upload is rolled back and the manifest is unchanged"""
+        self._ingest("a" * 900)
+        self.processor.index.upsert.side_effect = RuntimeError("network down")
+        
+        success, message = self._ingest("b" * 900)
+        
+        self.assertFalse(success)
+        self.assertIn("network down", message)
+        self.processor.index.delete.assert_called_once_with(ids=["Infosys@g2_0", "Infosys@g2_1"])
+        self.assertEqual(self.manifest.vector_ids("Infosys"), ["Infosys_0", "Infosys_1"])
+    
+    def test_delete_and_list(self):
+        """Test bulk delete by registered ids"""
+        self._ingest("a" * 900)
+        self.assertEqual([e["company"] for e in self.processor.list_companies()], ["Infosys"])
+        
+        success, message = self.processor.delete_company("Infosys")
+        
+        self.assertTrue(success)
+        self.processor.index.delete.assert_called_once_with(ids=["Infosys_0", "Infosys_1"])
+        self.assertEqual(self.processor.list_companies(), [])
+        self.assertFalse(self.processor.delete_company("Infosys")[0])
+        self.assertFalse(self.processor.replace_company("Wipro", b"%PDF-1.4")[0])
+
+    
+    def test_small_memory_budget_stores_in_windows(self):
+        """Test that embeddings are uploaded window by window and stages are reported"""
+        from src.config.settings import EMBED_BATCH_SIZE
+        from src.utils.memory import MemoryBudget, MemoryReport
+        self.processor.memory_budget = MemoryBudget(limit_bytes=1024)
+        self.processor.memory_report = MemoryReport()
+        self.processor.local_store = Mock()
+        
+        success, _ = self._ingest("a" * (700 * (EMBED_BATCH_SIZE + 10)))
+        
+        self.assertTrue(success)
+        windows = [call.args[0] for call in self.processor.local_store.upsert.call_args_list]
+        self.assertEqual(len(windows), 2)
+        self.assertEqual(len(windows[0]), EMBED_BATCH_SIZE)
+        self.assertEqual(windows[1][0], f"Infosys_{EMBED_BATCH_SIZE}")
+        self.assertEqual(self._upserted_ids(), windows[0] + windows[1])
+        self.processor.local_store.save.assert_called_once()
+        self.assertEqual(list(self.processor.memory_report.stages), ["extract", "chunk", "facts", "embed_store"])
+        self.assertIn("embed_store", self.processor.memory_report.report())
+        self.processor.memory_report.stop()
+
+    
+    def test_table_facts_follow_the_document(self):
+        """Test that facts from table pages are stored with the document and deleted with it"""
+        table = [["Parameter", "Unit", "FY 2023-24", "FY 2022-23"],
+                 ["Scope 1 emissions", "tCO2e", "1,23,456", "1,30,000"]]
+        with patch("src.services.document_processor.extract_tables",
+                   return_value=iter([(2, table)])) as extract:
+            success, message = self._ingest("Scope 1 emissions were 1,23,456 tCO2e " * 30)
+        
+        self.assertTrue(success)
+        self.assertIn("2 table facts indexed", message)
+        self.assertEqual(extract.call_args.args[1], [1])
+        self.assertEqual(self.facts.lookup("scope1_emissions", ["infosys"])[0]["value"], 123456.0)
+        self.processor.delete_company("Infosys")
+        self.assertEqual(self.facts.companies(), [])
+    
+    def test_table_errors_do_not_fail_ingestion(self):
+        """Test that a table finder error still stores the document's text"""
+        with patch("src.services.document_processor.extract_tables",
+                   side_effect=ValueError("bad table")):
+            success, message = self._ingest("Scope 1 emissions were 1,23,456 tCO2e " * 30)
+        
+        self.assertTrue(success)
+        self.assertIn("table facts skipped: bad table", message)
+        self.assertIsNotNone(self.manifest.get_company("Infosys"))
+
+
+class TestFactsStore(unittest.TestCase):
+    """Test numeric facts parsed from report tables"""
+    
+    def test_parse_table_years_units_and_values(self):
+        """Test header years, unit columns and number formats"""
+        from src.services.facts_store import parse_table, parse_year
+        
+        facts = parse_table([
+            ["Parameter", "Unit", "FY 2023-24", "FY 2022-23"],
+            ["Scope-2\nemissions", "tCO2e", "45,000.5", "(12)"],
+            ["Share of renewable energy (%)", None, "42%", "40%"],
+            ["Number of employees", None, "300", "200"]
+        ], page=7)
+        
+        self.assertEqual([(f["metric"], f["year"], f["value"], f["unit"]) for f in facts], [
+            ("scope2_emissions", 2024, 45000.5, "tCO2e"), ("scope2_emissions", 2023, -12.0, "tCO2e"),
+            ("renewable_energy", 2024, 42.0, "%"), ("renewable_energy", 2023, 40.0, "%")
+        ])
+        self.assertEqual([parse_year(t) for t in ("FY24", "2023-24", "in 2022", "no year")],
+                         [2024, 2024, 2022, None])
+    
+    def test_parse_table_value_years_and_intensity_units(self):
+        """Test that year-like values are not headers and intensity units keep their denominator"""
+        from src.services.facts_store import parse_table
+        
+        facts = parse_table([
+            ["Metric", "Value"],
+            ["Scope 1 emissions (tCO2e)", "2045"],
+            ["Scope 2 emissions (tCO2e)", "3,000"],
+            ["Energy intensity (GJ/Rs crore)", "1.5"]
+        ])
+        
+        self.assertEqual([(f["metric"], f["year"], f["value"], f["unit"]) for f in facts], [
+            ("scope1_emissions", None, 2045.0, "tCO2e"), ("scope2_emissions", None, 3000.0, "tCO2e"),
+            ("energy_intensity", None, 1.5, "GJ/Rs crore")
+        ])
+    
+    def test_router_lookups_comparisons_and_rankings(self):
+        """Test numeric questions answered from the store, narrative ones left to search"""
+        from src.services.facts_store import FactsRouter, FactsStore
+        from src.services.structured_query import RouterChain
+        
+        def fact(value, year, page):
+            return {"metric": "scope1_emissions", "label": "Scope 1 emissions", "value": value,
+                    "unit": "tCO2e", "year": year, "period": f"FY{year}", "page": page}
+        
+        store = FactsStore(":memory:")
+        store.replace_company("Infosys Ltd", [fact(130000.0, 2023, 7), fact(123456.0, 2024, 7)])
+        store.replace_company("Wipro", [fact(99000.0, 2024, 3)])
+        router = RouterChain([Mock(route=Mock(return_value=None)), FactsRouter(store)])
+        
+        sources, answer = router.route("What were Infosys scope 1 emissions in FY 2022-23?")
+        self.assertEqual(answer, "Infosys Ltd - Scope 1 GHG emissions (FY2023): "
+                                 "130,000 tCO2e (report table, p. 7).")
+        self.assertEqual(sources[0]["source"], "esg_facts")
+        
+        _, answer = router.route("Which company has the lowest scope 1 emissions?")
+        self.assertIn("Wipro: 99,000 tCO2e", answer.split("\n")[1])
+        sources, _ = router.route("Scope 1 emissions of Wipro and Infosys")
+        self.assertEqual([s["company"] for s in sources], ["Wipro", "Infosys Ltd"])
+        self.assertIsNone(router.route("How does Infosys plan to cut scope 1 emissions?"))
+        self.assertIsNone(router.route("Scope 1 emissions", company_name="TCS"))
+    
+    def test_router_leaves_partial_comparisons_to_search(self):
+        """Test that a comparison with a company lacking facts is not answered for one company"""
+        from src.services.facts_store import FactsRouter, FactsStore
+        
+        store = FactsStore(":memory:")
+        store.replace_company("Tata Power", [{
+            "metric": "scope1_emissions", "label": "Scope 1 emissions", "value": 5.0,
+            "unit": "tCO2e", "year": 2024, "period": "FY2024", "page": 2
+        }])
+        router = FactsRouter(store)
+        
+        self.assertIsNone(router.route("Compare scope 1 emissions of Tata Power and Adani Green"))
+        self.assertIsNone(router.route("Scope 1 emissions", company_name="Adani Green"))
+        self.assertIsNotNone(router.route("Scope 1 emissions of Tata Power"))
+    
+    def test_company_cache_follows_other_writers(self):
+        """Test that companies written through another connection are seen"""
+        import tempfile
+        from src.services.facts_store import FactsStore
+        
+        fact = {"metric": "scope1_emissions", "label": "Scope 1", "value": 1.0, "unit": "tCO2e",
+                "year": 2024, "period": None, "page": 1}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "facts.db")
+            reader, writer = FactsStore(path), FactsStore(path)
+            writer.replace_company("Wipro", [fact])
+            self.assertEqual(reader.companies(), ["Wipro"])
+            writer.replace_company("Infosys", [fact])
+            self.assertEqual(reader.companies(), ["Infosys", "Wipro"])
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """Test the ingestion memory budget"""
+    
+    def test_reservations_wait_for_room(self):
+        """Test that a reservation over the budget waits and an oversized one runs alone"""
+        import threading
+        from src.utils.memory import MemoryBudget
+        budget = MemoryBudget(limit_bytes=100, workers=1)
+        self.assertEqual(budget.window_bytes, 50)
+        entered = threading.Event()
+        
+        def second():
+            with budget.reserve(50):
+                entered.set()
+        
+        with budget.reserve(80):
+            worker = threading.Thread(target=second)
+            worker.start()
+            self.assertFalse(entered.wait(0.1))
+        self.assertTrue(entered.wait(2))
+        worker.join()
+        
+        with budget.reserve(500):
+            self.assertEqual(budget.stats()["reserved_mb"], 0.0)
+        self.assertEqual(budget.stats()["waits"], 1)
+
+
+class TestIndexGenerations(unittest.TestCase):
+    """Test blue/green index migrations"""
+    
+    def setUp(self):
+        import tempfile
+        from src.services.index_generations import IndexGenerations, IndexMigrator
+        from src.services.ingestion_manifest import IngestionManifest
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = IndexGenerations(os.path.join(self.tmp.name, "generations.json"))
+        self.manifest = IngestionManifest(os.path.join(self.tmp.name, "manifest.json"))
+        self.manifest.record_ingestion("Infosys", 5, sha256="aa", id_prefix="Infosys@g3")
+        self.manifest.record_ingestion("Wipro", 2, sha256="bb")
+        
+        self.processor = Mock()
+        self.processor.text_cache.get_pages.return_value = ["page"]
+        self.processor.prepare_chunk_records.return_value = [{"text": t} for t in ("c1", "c2", "c3")]
+        self.processor._embed_and_store.side_effect = lambda chunks, *args, **kwargs: len(chunks)
+        self.migrator = IndexMigrator(self.registry, self.manifest, lambda generation: self.processor)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_build_switch_and_rollback(self):
+        """Test that the manifest follows the active generation's ids"""
+        generation = self.registry.create("small-model")
+        
+        self.assertTrue(self.migrator.build(generation["id"])[0])
+        self.assertEqual(self.registry.active_id(), "default")
+        self.assertTrue(self.migrator.activate(generation["id"])[0])
+        
+        self.assertEqual(self.registry.active()["index_name"], "capstone-g2")
+        self.assertEqual(self.manifest.vector_ids("Infosys"), ["Infosys_0", "Infosys_1", "Infosys_2"])
+        
+        self.assertTrue(self.migrator.rollback()[0])
+        self.assertEqual(self.registry.active_id(), "default")
+        self.assertEqual(self.manifest.vector_ids("Infosys")[-1], "Infosys@g3_4")
+    
+    def test_switch_waits_for_ingestion(self):
+        """Test that a switch waits for writes holding the switch lock"""
+        import threading
+        generation = self.registry.create("small-model")
+        self.migrator.build(generation["id"])
+        
+        with self.registry.switch_lock.shared():
+            thread = threading.Thread(target=self.migrator.activate, args=(generation["id"],))
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(self.registry.active_id(), "default")
+        thread.join(5)
+        self.assertEqual(self.registry.active_id(), generation["id"])
+    
+    def test_concurrent_registry_writers_keep_every_entry(self):
+        """Test that registry handles in separate threads never drop each other's writes"""
+        import threading
+        from src.services.index_generations import IndexGenerations
+        generation = self.registry.create("small-model")
+        other = IndexGenerations(self.registry.path)
+        
+        def record(registry, prefix):
+            for i in range(20):
+                registry.record_company(generation["id"], f"{prefix}{i}", {"chunks": i})
+        
+        threads = [threading.Thread(target=record, args=(registry, prefix))
+                   for registry, prefix in ((self.registry, "a"), (other, "b"))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(IndexGenerations(self.registry.path).get(generation["id"])["companies"]),
+                         40)
+    
+    def test_waiting_writer_blocks_new_readers(self):
+        """Test that the switch lock lets a waiting writer in before new readers"""
+        import threading
+        import time
+        order = []
+        lock = self.registry.switch_lock
+        
+        def write():
+            with lock.exclusive():
+                order.append("write")
+        
+        def read():
+            with lock.shared():
+                order.append("read")
+        
+        with lock.shared():
+            writer = threading.Thread(target=write)
+            writer.start()
+            while not lock._writers_waiting:
+                time.sleep(0.01)
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(0.2)
+            self.assertTrue(reader.is_alive())
+            with lock.shared():  # A thread already reading may nest
+                pass
+        writer.join(5)
+        reader.join(5)
+        self.assertEqual(order, ["write", "read"])
+    
+    def test_activation_waits_for_the_local_store(self):
+        """Test that a generation is only activated once its own local store is complete"""
+        import numpy as np
+        from src.services.vector_store import LocalVectorStore, local_index_dir
+        generation = self.registry.create("small-model")
+        self.migrator.build(generation["id"])
+        store = LocalVectorStore("float32")
+        
+        with patch('src.services.index_generations.SEARCH_BACKEND', "local"), \
+                patch('src.services.vector_store.get_local_vector_store', return_value=store):
+            self.assertFalse(self.migrator.activate(generation["id"])[0])
+            for entry in self.registry.get(generation["id"])["companies"].values():
+                ids = [f"{entry['id_prefix']}_{i}" for i in range(entry["chunks"])]
+                store.upsert(ids, np.ones((len(ids), 4)), [{"company": "c", "text": "t"}] * len(ids))
+            self.assertTrue(self.migrator.activate(generation["id"])[0])
+        self.assertNotEqual(local_index_dir(generation["id"]), local_index_dir("default"))
+    
+    def test_build_catches_up_with_ingestion(self):
+        """Test that documents changed during a build are rebuilt or dropped"""
+        generation = self.registry.create("small-model")
+        self.migrator.build(generation["id"])
+        self.manifest.record_ingestion("Infosys", 4, sha256="cc")
+        self.manifest.remove_company("Wipro")
+        
+        self.assertFalse(self.migrator.activate(generation["id"])[0])
+        self.assertTrue(self.migrator.build(generation["id"])[0])
+        
+        companies = self.registry.get(generation["id"])["companies"]
+        self.assertEqual(list(companies), ["Infosys"])
+        self.assertEqual(companies["Infosys"]["id_prefix"], "Infosys@g2")
+        self.processor._delete_vectors.assert_any_call(["Wipro_0", "Wipro_1", "Wipro_2"])
+    
+    def test_services_follow_the_active_generation(self):
+        """Test that a switch made elsewhere swaps the loaded model and index"""
+        from src.services.index_generations import follow_active_generation
+        service = Mock(generations=self.registry, generation=self.registry.active(),
+                       _generation_lock=unittest.mock.MagicMock())
+        vars(service).update(model="old model", index="old index")
+        service._load_model.side_effect = lambda generation: generation["embedding_model"]
+        service._connect_index.side_effect = lambda generation: generation["index_name"]
+        service._open_local_store.side_effect = lambda generation: f"store {generation['id']}"
+        generation = self.registry.create("small-model")
+        self.registry.update(generation["id"], status="ready")
+        
+        self.assertFalse(follow_active_generation(service))
+        self.registry.activate(generation["id"])
+        self.assertTrue(follow_active_generation(service))
+        
+        self.assertEqual((service.model, service.index, service.local_store),
+                         ("small-model", "capstone-g2", "store g2"))
+
+
+class TestPdfSources(unittest.TestCase):
+    """Test in-memory PDF source handling"""
+    
+    def test_memoryview_stream_read_and_seek(self):
+        """Test that MemoryViewStream behaves like a seekable file"""
+        from src.utils.streams import MemoryViewStream
+        stream = MemoryViewStream(b"%PDF-1.7 body %%EOF")
+        
+        self.assertEqual(stream.read(4), b"%PDF")
+        stream.seek(-5, 2)
+        self.assertEqual(stream.read(), b"%%EOF")
+        self.assertEqual(stream.read(10), b"")
+        stream.seek(0)
+        buffer = bytearray(3)
+        self.assertEqual(stream.readinto(buffer), 3)
+        self.assertEqual(bytes(buffer), b"%PD")
+    
+    def test_upload_buffer_is_not_copied(self):
+        """Test that uploads are read through their buffer, not getvalue()"""
+        import io
+        from src.utils.streams import open_binary_source
+        
+        upload = io.BytesIO(b"%PDF-1.7 data")
+        upload.name = "Infosys.pdf"
+        upload.getvalue = Mock(side_effect=AssertionError("copied"))
+        
+        stream, name, owned = open_binary_source(upload)
+        self.assertEqual(name, "Infosys.pdf")
+        self.assertTrue(owned)
+        self.assertEqual(stream.read(4), b"%PDF")
+        stream.close()
+    
+    def test_non_seekable_stream_is_buffered(self):
+        """Test that non-seekable streams are wrapped in a seekable buffer"""
+        import io
+        from src.utils.streams import open_binary_source
+        
+        class PipeStream(io.RawIOBase):
+            def __init__(self, data):
+                self.data = io.BytesIO(data)
+            def readable(self):
+                return True
+            def readinto(self, b):
+                return self.data.readinto(b)
+        
+        stream, name, owned = open_binary_source(PipeStream(b"%PDF-1.7"))
+        self.assertIsNone(name)
+        self.assertTrue(stream.seekable())
+        self.assertEqual(stream.read(), b"%PDF-1.7")
+    
+    def test_path_passed_through(self):
+        """Test that file paths are handed to pdfplumber unchanged"""
+        from src.utils.streams import open_binary_source
+        source, name, owned = open_binary_source("data/pdfs/Infosys.pdf")
+        self.assertEqual(source, "data/pdfs/Infosys.pdf")
+        self.assertEqual(name, "Infosys.pdf")
+        self.assertFalse(owned)
+
+
+class TestIngestionQueue(unittest.TestCase):
+    """Test the background ingestion queue"""
+    
+    def _fake_processor(self, success=True, release=None):
+        processor = Mock()
+        
+        def process(pdf_file, company_name=None, progress_callback=None):
+            if release is not None:
+                release.wait(5)
+            progress_callback("pages", 3, 3)
+            progress_callback("chunks", 10, 10)
+            progress_callback("vectors", 10, 10)
+            if not success:
+                return False, "No text found in PDF"
+            return True, f"Successfully processed 10 chunks from {company_name}"
+        
+        processor.process_and_store_pdf.side_effect = process
+        return processor
+    
+    def test_job_progress_and_success(self):
+        """Test that a job reports progress and completes"""
+        from src.services.ingestion_queue import IngestionQueue
+        queue = IngestionQueue(processor=self._fake_processor())
+        
+        job_id = queue.submit(b"%PDF", company_name="Infosys")
+        self.assertTrue(queue.wait([job_id], timeout=5))
+        
+        status = queue.get_status(job_id)
+        self.assertEqual(status["status"], "succeeded")
+        self.assertEqual(status["progress"]["vectors"], [10, 10])
+        self.assertEqual(status["fraction"], 1.0)
+        queue.shutdown()
+    
+    def test_replacement_job_uses_replace_company(self):
+        """Test that replacement jobs go through replace_company's checks"""
+        from src.services.ingestion_queue import IngestionQueue
+        processor = self._fake_processor()
+        processor.replace_company.return_value = (False, "Nope is not stored; upload it as a new document")
+        queue = IngestionQueue(processor=processor)
+        
+        job_id = queue.submit(b"%PDF", company_name="Nope", filename="renamed.pdf", replace=True)
+        queue.wait([job_id], timeout=5)
+        
+        self.assertEqual(queue.get_status(job_id)["status"], "failed")
+        self.assertEqual(processor.replace_company.call_args.args[:2], ("Nope", b"%PDF"))
+        processor.process_and_store_pdf.assert_not_called()
+        queue.shutdown()
+    
+    def test_failed_job(self):
+        """Test that processor failures are surfaced in the job status"""
+        from src.services.ingestion_queue import IngestionQueue
+        queue = IngestionQueue(processor=self._fake_processor(success=False))
+        
+        job_id = queue.submit(b"%PDF", company_name="Empty")
+        queue.wait([job_id], timeout=5)
+        
+        status = queue.get_status(job_id)
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["message"], "No text found in PDF")
+        queue.shutdown()
+    
+    def test_submit_many_summary(self):
+        """Test parallel batch submission and the combined summary"""
+        from src.services.ingestion_queue import IngestionQueue
+        processor = Mock()
+        processor.process_and_store_pdf.side_effect = (
+            lambda pdf_file, company_name=None, progress_callback=None:
+            (True, "ok") if company_name != "Broken" else (False, "Error processing PDF")
+        )
+        queue = IngestionQueue(processor=processor, max_workers=3)
+        
+        job_ids, errors = queue.submit_many([
+            ("Infosys.pdf", b"a"), ("Wipro.pdf", b"b"), ("Broken.pdf", b"c")
+        ])
+        queue.wait(job_ids, timeout=5)
+        summary = queue.summarize(job_ids)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(summary["total_files"], 3)
+        self.assertEqual(summary["successful"], 2)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["pending"], 0)
+        processor.process_and_store_pdf.assert_any_call(b"a", "Infosys", progress_callback=unittest.mock.ANY)
+        queue.shutdown()
+    
+    def test_queue_is_bounded(self):
+        """Test that submissions beyond the pending limit are rejected"""
+        import threading
+        from src.services.ingestion_queue import IngestionQueue
+        release = threading.Event()
+        queue = IngestionQueue(processor=self._fake_processor(release=release),
+                               max_workers=1, max_pending=2)
+        
+        jobs = [queue.submit(b"%PDF", company_name=f"C{i}") for i in range(2)]
+        with self.assertRaises(RuntimeError):
+            queue.submit(b"%PDF", company_name="C2")
+        
+        release.set()
+        self.assertTrue(queue.wait(jobs, timeout=5))
+        queue.shutdown()
+
+
+class TestPdfExtraction(unittest.TestCase):
+    """Test pluggable PDF extraction engines"""
+    
+    def test_suspicious_reason(self):
+        """Test detection of pages that need the layout-aware engine"""
+        from src.services.pdf_extraction import suspicious_reason
+        
+        self.assertEqual(suspicious_reason("   "), "empty")
+        self.assertEqual(suspicious_reason("(cid:12)(cid:13)(cid:14) ab"), "garbled")
+        self.assertEqual(suspicious_reason("\n".join(["Scope 1", "12,345", "FY24"] * 10)), "table")
+        prose = "\n".join(["The company reduced its emissions across all plants this year."] * 30)
+        self.assertIsNone(suspicious_reason(prose))
+    
+    def test_fallback_only_for_suspicious_pages(self):
+        """Test that only suspicious pages are re-extracted, with per-engine stats"""
+        from src.services.pdf_extraction import FallbackExtractor
+        
+        fast = Mock()
+        fast.name, fast.version = "fast", "1"
+        fast.extract_pages.return_value = {1: "Normal prose page text.", 2: "", 3: "More prose."}
+        accurate = Mock()
+        accurate.name, accurate.version = "accurate", "1"
+        accurate.extract_pages.return_value = {2: "Recovered text"}
+        
+        extractor = FallbackExtractor(fast, accurate)
+        pages = extractor.extract_pages("report.pdf")
+        
+        accurate.extract_pages.assert_called_once_with("report.pdf", [2])
+        self.assertEqual(pages[2], "Recovered text")
+        self.assertEqual(extractor.last_stats["fallback_pages"], {2: "empty"})
+        self.assertEqual(extractor.last_stats["engines"]["fast"]["pages"], 3)
+        self.assertEqual(extractor.last_stats["engines"]["accurate"]["pages"], 1)
+        self.assertEqual(extractor.stats["accurate"]["pages"], 1)
+    
+    def test_scanned_pages_are_ocred_and_cached(self):
+        """Test that only text-less pages reach OCR and repeated pages hit the cache"""
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from src.services.ocr import OcrCache, OcrEngine
+        from src.services.pdf_extraction import FallbackExtractor
+        
+        fast = Mock()
+        fast.name, fast.version = "fast", "1"
+        fast.extract_pages.return_value = {1: "A page with a proper text layer.", 2: "", 3: " 4 "}
+        accurate = Mock()
+        accurate.name, accurate.version = "accurate", "1"
+        accurate.extract_pages.return_value = {2: "", 3: "4"}
+        
+        with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(2) as executor:
+            ocr = OcrEngine(cache=OcrCache(tmp), executor=executor)
+            extractor = FallbackExtractor(fast, accurate, ocr)
+            images = {2: ((2, 1), b"\x00\x01"), 3: ((2, 1), b"\x00\x02")}
+            with patch("src.services.ocr.pdfium") as pdfium, \
+                    patch.object(OcrEngine, "_render", lambda self, pdf, n: images[n]), \
+                    patch("src.services.ocr.recognize_image",
+                          side_effect=lambda pixels, *args: f"Scanned text {pixels[-1]}") as ocr_call:
+                pages = extractor.extract_pages("report.pdf")
+                self.assertEqual(pages, {1: "A page with a proper text layer.",
+                                         2: "Scanned text 1", 3: "Scanned text 2"})
+                self.assertEqual(extractor.last_stats["ocr_pages"], [2, 3])
+                self.assertEqual(extractor.last_stats["engines"]["tesseract"]["pages"], 2)
+                
+                extractor.extract_pages("report.pdf")
+                self.assertEqual(ocr_call.call_count, 2)
+        self.assertIn("+tesseract-1-eng", extractor.cache_key)
+    
+    def test_ocr_pool_restarts_after_a_worker_crash(self):
+        """Test that a dead OCR worker restarts the pool instead of blanking pages"""
+        import tempfile
+        from concurrent.futures import Future, ThreadPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        from src.services.ocr import OcrCache, OcrEngine
+        
+        def crash(*args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("worker killed"))
+            return future
+        broken = Mock()
+        broken.submit.side_effect = crash
+        
+        def recognize(pixels, *args):
+            if pixels == b"\x03":
+                raise RuntimeError("tesseract failed")
+            return f"Scanned text {pixels[-1]}"
+        
+        with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(2) as fresh:
+            ocr = OcrEngine(cache=OcrCache(tmp), workers=2)
+            with patch("src.services.ocr.pdfium"), \
+                    patch.object(OcrEngine, "_render", lambda self, pdf, n: ((1, 1), bytes([n]))), \
+                    patch("src.services.ocr.get_ocr_executor", return_value=broken), \
+                    patch("src.services.ocr.restart_ocr_executor", return_value=fresh) as restart, \
+                    patch("src.services.ocr.recognize_image", side_effect=recognize):
+                pages = ocr.extract_pages("scan.pdf", [1, 2, 3])
+        
+        restart.assert_called_once_with(broken)
+        self.assertEqual(pages, {1: "Scanned text 1", 2: "Scanned text 2", 3: ""})
+    
+    def test_unknown_engine(self):
+        """Test that unknown engine names are rejected"""
+        from src.services.pdf_extraction import get_extraction_engine
+        with self.assertRaises(ValueError):
+            get_extraction_engine("nope")
+
+
+class TestDeduplication(unittest.TestCase):
+    """Test header/footer stripping and near-duplicate chunk removal"""
+    
+    def test_strip_repeated_headers_and_footers(self):
+        """Test that lines repeated at page edges are removed, body text kept"""
+        from src.services.deduplication import strip_boilerplate
+        
+        pages = [
+            f"Sustainability Report 2024\nBody text about {topic}.\nPage {n} of 5"
+            for n, topic in enumerate(["water", "waste", "energy", "safety", "governance"], 1)
+        ]
+        cleaned, removed = strip_boilerplate(pages)
+        
+        self.assertEqual(removed, 10)
+        self.assertEqual(cleaned[2], "Body text about energy.")
+    
+    def test_short_documents_untouched(self):
+        """Test that documents with too few pages keep every line"""
+        from src.services.deduplication import strip_boilerplate
+        pages = ["Header\nOne", "Header\nTwo"]
+        self.assertEqual(strip_boilerplate(pages), (pages, 0))
+    
+    def test_near_duplicate_chunks_dropped(self):
+        """Test that near-identical disclaimers are dropped and distinct text kept"""
+        from src.services.deduplication import ChunkDeduplicator
+        
+        disclaimer = " ".join([
+            "This report contains forward looking statements that involve risks and",
+            "uncertainties. Actual results may differ materially from those expressed or",
+            "implied in such statements due to changes in regulation, commodity prices,",
+            "weather conditions, grid availability, financing costs and other factors",
+            "beyond the control of the Company. The Company undertakes no obligation to",
+            "update these statements to reflect events or circumstances after the date",
+            "of this report. Figures for previous years have been regrouped wherever",
+            "necessary to conform to the current year presentation and all data is",
+            "reported for the standalone entity unless stated otherwise in the notes."
+        ])
+        chunks = [
+            disclaimer,
+            "Scope 1 emissions fell by twelve percent as coal units were retired early.",
+            disclaimer.replace("materially", "significantly"),
+            disclaimer
+        ]
+        kept, dropped = ChunkDeduplicator().deduplicate(chunks)
+        
+        self.assertEqual(dropped, 2)
+        self.assertEqual(kept, chunks[:2])
+
+
+class TestPageTextCache(unittest.TestCase):
+    """Test the on-disk extracted-text cache"""
+    
+    def setUp(self):
+        import tempfile
+        from src.services.text_cache import PageTextCache
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PageTextCache(self.tmp.name)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_round_trip_and_miss(self):
+        """Test storing pages and reading them back per extractor version"""
+        self.assertIsNone(self.cache.get_pages("ab" * 32, "auto-1"))
+        
+        self.cache.put_pages("ab" * 32, "auto-1", ["Page one", "", "Page three"])
+        
+        self.assertEqual(self.cache.page_count("ab" * 32, "auto-1"), 3)
+        self.assertEqual(self.cache.get_pages("ab" * 32, "auto-1"), ["Page one", "", "Page three"])
+        self.assertEqual(list(self.cache.iter_pages("ab" * 32, "auto-1"))[2], (3, "Page three"))
+        self.assertIsNone(self.cache.get_pages("ab" * 32, "auto-2"))
+    
+    def test_hash_independent_of_source_type(self):
+        """Test that a path, bytes stream and BytesIO of one PDF hash the same"""
+        import io
+        from src.services.text_cache import hash_pdf_source
+        from src.utils.streams import MemoryViewStream
+        
+        path = os.path.join(self.tmp.name, "report.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 fake")
+        
+        expected = hash_pdf_source(path)
+        self.assertEqual(hash_pdf_source(io.BytesIO(b"%PDF-1.4 fake")), expected)
+        self.assertEqual(hash_pdf_source(MemoryViewStream(b"%PDF-1.4 fake")), expected)
+    
+    def test_cache_hit_reports_no_extraction(self):
+        """Test that a cached document does not repeat the previous document's engine stats"""
+        import io
+        from src.services.document_processor import DocumentProcessor
+        extractor = Mock(cache_key="auto-1", last_stats={"engines": {"fast": {"pages": 1}}})
+        extractor.extract_pages.return_value = {1: "text"}
+        processor = DocumentProcessor(manifest=Mock(), extractor=extractor, text_cache=self.cache,
+                                      local_store=Mock(), facts_store=Mock())
+        
+        processor.extract_pages_from_pdf(io.BytesIO(b"%PDF a"))
+        self.assertEqual(processor.last_extraction_stats["engines"]["fast"]["pages"], 1)
+        processor.extract_pages_from_pdf(io.BytesIO(b"%PDF a"))
+        self.assertEqual(processor.last_extraction_stats, {})
+        extractor.extract_pages.assert_called_once()
+
+
+class TestLocalVectorStore(unittest.TestCase):
+    """Test the quantized local vector store"""
+    
+    def _vectors(self, count=300, dim=64):
+        import numpy as np
+        rng = np.random.default_rng(0)
+        return rng.normal(size=(count, dim)).astype(np.float32)
+    
+    def test_int8_search_and_company_filter(self):
+        """Test that int8 codes find the query's own vector and honour filters"""
+        from src.services.vector_store import LocalVectorStore
+        vectors = self._vectors()
+        store = LocalVectorStore("int8", train_size=100)
+        store.upsert(
+            [f"v{i}" for i in range(len(vectors))], vectors,
+            [{"company": "A" if i % 2 else "B", "text": f"chunk {i}"} for i in range(len(vectors))]
+        )
+        
+        self.assertEqual(store.query(vectors[7], 1)[0]["text"], "chunk 7")
+        results = store.query(vectors[7], 5, company_name="B")
+        self.assertTrue(all(r["company"] == "B" for r in results))
+        self.assertEqual(store.memory_bytes, 300 * 64 + 2 * 64 * 4)
+    
+    def test_training_waits_for_a_sample_and_refits_as_it_grows(self):
+        """Test that int8 trains on train_size vectors, not the first window, and refits"""
+        from src.services.vector_store import LocalVectorStore
+        vectors = self._vectors(400)
+        vectors[:20] *= 0.01  # A first window unlike the rest of the corpus
+        store = LocalVectorStore("int8", train_size=100, refit_growth=2)
+        
+        def upsert(start, end):
+            store.upsert([f"v{i}" for i in range(start, end)], vectors[start:end],
+                         [{"company": "A", "text": f"chunk {i}"} for i in range(start, end)])
+        
+        upsert(0, 20)
+        self.assertFalse(store.quantizer.fitted)
+        self.assertEqual(store.query(vectors[3], 1)[0]["text"], "chunk 3")
+        for start in range(20, 100, 20):
+            upsert(start, start + 20)
+        self.assertTrue(store.quantizer.fitted)
+        scale = store.quantizer.scale.copy()
+        for start in range(100, 400, 20):
+            upsert(start, start + 20)
+        
+        self.assertFalse((store.quantizer.scale == scale).all())
+        self.assertEqual(store.memory_bytes, 400 * 64 + 2 * 64 * 4)
+        hits = sum(store.query(vectors[i], 1)[0]["text"] == f"chunk {i}" for i in range(400))
+        self.assertGreater(hits, 390)
+    
+    def test_upsert_delete_save_load(self):
+        """Test overwrite by id, tombstones and persistence"""
+        import tempfile
+        from src.services.vector_store import LocalVectorStore
+        vectors = self._vectors(3)
+        store = LocalVectorStore("float16")
+        store.upsert(["a", "b", "c"], vectors, [{"company": "A", "text": t} for t in "abc"])
+        store.upsert(["a"], vectors[2:], [{"company": "A", "text": "a2", "page": 4}])
+        store.delete(["c"])
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store.save(os.path.join(tmp, "index"))
+            loaded = LocalVectorStore.load(os.path.join(tmp, "index"))
+        
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.query(vectors[2], 1)[0]["text"], "a2")
+        self.assertEqual(loaded.get(["a", "c"]), {"a": {"id": "a", "company": "A", "text": "a2", "page": 4}})
+    
+    def test_later_saves_append_segments(self):
+        """Test that saves after the first only write the changed rows"""
+        import json
+        import tempfile
+        from src.services.vector_store import LocalVectorStore
+        vectors = self._vectors(140)
+        store = LocalVectorStore("float16")
+        store.upsert([f"v{i}" for i in range(100)], vectors[:100],
+                     [{"company": "A", "text": f"chunk {i}"} for i in range(100)])
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            store.save(path)
+            snapshot = os.path.getmtime(os.path.join(path, "metadata.json"))
+            for i in range(100, 140):
+                store.upsert([f"v{i}"], vectors[i:i + 1], [{"company": "B", "text": f"chunk {i}"}])
+                if i < 120:
+                    store.delete([f"v{i - 100}"])
+                store.save()
+            with open(os.path.join(path, "segments.json"), encoding="utf-8") as f:
+                segments = json.load(f)
+            loaded = LocalVectorStore.load(path)
+            
+            self.assertEqual(os.path.getmtime(os.path.join(path, "metadata.json")), snapshot)
+            self.assertLess(len(segments), 16)
+            self.assertEqual(sorted(os.listdir(path)),
+                             sorted(segments + ["metadata.json", "segments.json", "vectors.npz"]))
+        self.assertEqual(len(loaded), 120)
+        self.assertEqual(loaded.get(["v5", "v120"]),
+                         {"v120": {"id": "v120", "company": "B", "text": "chunk 120"}})
+        self.assertEqual(loaded.query(vectors[139], 1)[0]["text"], "chunk 139")
+    
+    def test_processes_sharing_a_directory_merge_their_saves(self):
+        """Test that a save replays its changes on top of another process's save"""
+        import tempfile
+        from src.services.vector_store import LocalVectorStore
+        vectors = self._vectors(30)
+        meta = lambda company, start, end: [{"company": company, "text": f"chunk {i}"}
+                                            for i in range(start, end)]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            app = LocalVectorStore("float16", path=path)
+            app.upsert([f"a{i}" for i in range(10)], vectors[:10], meta("A", 0, 10))
+            app.save()
+            server = LocalVectorStore.load(path)
+            app.upsert([f"a{i}" for i in range(10, 20)], vectors[10:20], meta("A", 10, 20))
+            app.save()
+            server.upsert([f"b{i}" for i in range(20, 30)], vectors[20:30], meta("B", 20, 30))
+            server.delete(["a0"])
+            server.save()
+            
+            app._checked_at = 0.0
+            self.assertEqual(app.query(vectors[25], 1)[0]["id"], "b25")
+            self.assertEqual(len(app), 29)
+            self.assertEqual(len(LocalVectorStore.load(path)), 29)
+            self.assertEqual(server.get(["a15", "a0"]).keys(), {"a15"})
+    
+    def test_replaced_documents_are_compacted(self):
+        """Test that re-ingesting a company does not grow the store forever"""
+        import tempfile
+        from src.services.vector_store import LocalVectorStore
+        vectors = self._vectors(50)
+        store = LocalVectorStore("float16")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            for generation in range(10):
+                ids = [f"A@g{generation}_{i}" for i in range(50)]
+                store.upsert(ids, vectors, [{"company": "A", "text": f"chunk {i}"} for i in range(50)])
+                store.delete([f"A@g{generation - 1}_{i}" for i in range(50)])
+                store.save(path)
+            loaded = LocalVectorStore.load(path)
+        
+        self.assertEqual(store._count, 50)
+        self.assertEqual(loaded._count, 50)
+        self.assertEqual(loaded.query(vectors[3], 1)[0]["id"], "A@g9_3")
+    
+    def test_recall_report(self):
+        """Test recall and bytes per vector reported for each format"""
+        from src.services.vector_store import recall_report
+        vectors = self._vectors(dim=128)
+        report = recall_report(vectors, vectors[:20] + 0.1, top_k=5)
+        
+        by_format = {row["quantization"]: row for row in report}
+        self.assertEqual(by_format["float32"]["recall_at_k"], 1.0)
+        self.assertGreater(by_format["int8"]["recall_at_k"], 0.8)
+        self.assertEqual([row["bytes_per_vector"] for row in report], [512, 256, 128, 64])
+
+
+class TestRetrievalEvaluation(unittest.TestCase):
+    """Test the retrieval evaluation harness"""
+    
+    class BagOfWordsModel:
+        """Deterministic stand-in for the embedding model"""
+        
+        def encode(self, texts, show_progress_bar=False):
+            import re
+            import zlib
+            import numpy as np
+            vectors = np.zeros((len(texts), 256), dtype=np.float32)
+            for row, text in enumerate(texts):
+                for word in re.findall(r"[a-z]+", text.lower()):
+                    vectors[row, zlib.crc32(word.encode()) % 256] += 1
+            return vectors
+    
+    def setUp(self):
+        from src.services.document_processor import DocumentProcessor
+        self.processor = DocumentProcessor(manifest=Mock(), extractor=Mock(), text_cache=Mock())
+        self.processor.model = self.BagOfWordsModel()
+        self.documents = {
+            "JSW": ["The company recycled ninety percent of its fly ash in the reporting year. " * 2,
+                    "Water consumption fell by twelve percent through zero liquid discharge plants. " * 2],
+            "Tata": ["Scope one emissions were reduced using renewable power purchase agreements. " * 2]
+        }
+        self.questions = [
+            {"question": "How much fly ash was recycled?", "company": "JSW",
+             "expected": ["recycled ninety percent of its fly ash"]},
+            {"question": "How were scope one emissions reduced?", "company": None,
+             "expected": ["emissions were reduced using renewable power purchase agreements"]}
+        ]
+    
+    def test_is_relevant_matches_across_chunk_boundaries(self):
+        """Test passage matching for chunks shorter and longer than the passage"""
+        from src.services.evaluation import is_relevant
+        passage = "water consumption fell by twelve percent through zero liquid discharge plants"
+        
+        self.assertTrue(is_relevant("In 2023 " + passage + " at all sites.", [passage]))
+        self.assertTrue(is_relevant("fell by twelve percent through zero", [passage]))
+        self.assertFalse(is_relevant("Scope one emissions were reduced", [passage]))
+    
+    def test_sweep_reports_quality_and_cost(self):
+        """Test recall, MRR and size per setting and the recommendation"""
+        from src.services.evaluation import RetrievalEvaluator, recommend
+        evaluator = RetrievalEvaluator(self.processor, self.documents, self.questions, "float32")
+        
+        rows = evaluator.sweep([80, 400], [20, 400], [1, 3])
+        
+        self.assertEqual([(r["chunk_size"], r["top_k"]) for r in rows],
+                         [(80, 1), (80, 3), (400, 1), (400, 3)])
+        self.assertTrue(all(r["recall_at_k"] == 1.0 and r["mrr"] == 1.0 for r in rows))
+        self.assertGreater(rows[0]["chunks"], rows[2]["chunks"])
+        self.assertEqual(rows[0]["index_bytes"], rows[0]["chunks"] * 256 * 4)
+        self.assertEqual((recommend(rows)["chunk_size"], recommend(rows)["top_k"]), (400, 1))
+
+
+class TestLazyImports(unittest.TestCase):
+    """Test deferred imports and the startup profiler"""
+    
+    def test_lazy_module_imports_on_first_use(self):
+        """Test that a lazy module is only imported when an attribute is used"""
+        import sys
+        from src.utils.lazy_imports import lazy_module
+        
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy_module("colorsys")
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertIn("colorsys", sys.modules)
+    
+    def test_lazy_resource_created_once(self):
+        """Test that lazy resources are built once and can be replaced"""
+        from src.utils.lazy_imports import lazy_resource
+        
+        class Service:
+            builds = 0
+            
+            @lazy_resource("model")
+            def model(self):
+                Service.builds += 1
+                return object()
+        
+        service = Service()
+        self.assertIs(service.model, service.model)
+        self.assertEqual(Service.builds, 1)
+        service.model = "fake"
+        self.assertEqual(service.model, "fake")
+    
+    def test_profiler_excludes_nested_time(self):
+        """Test that nested stages are not double counted in category totals"""
+        import time
+        from src.utils.startup_profiler import StartupProfiler
+        
+        profiler = StartupProfiler()
+        with profiler.stage("load model", "model"):
+            with profiler.stage("import torch", "import"):
+                time.sleep(0.05)
+        
+        totals = profiler.totals()
+        self.assertGreaterEqual(totals["import"], 0.05)
+        self.assertLess(totals["model"], 0.05)
+        self.assertIn("import torch", profiler.report("test"))
+
+
+class TestRequestProfiler(unittest.TestCase):
+    """Test opt-in per-request profiling"""
+    
+    def _busy_work(self, seconds=0.05):
+        import time
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            sum(range(100))
+    
+    def test_forced_profiles_write_files_and_hot_functions(self):
+        """Test cProfile and sampling output, nesting and sampling rate"""
+        import tempfile
+        from src.utils.profiling import RequestProfiler
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = RequestProfiler("off", output_dir=tmp, interval=0.001)
+            with profiler.profile("ask", force=True) as run:
+                with profiler.profile("inner", force=True) as nested:
+                    self._busy_work()
+            self.assertIsNone(nested)
+            self.assertTrue(run.profile_path.endswith(".prof"))
+            with open(run.summary_path) as f:
+                self.assertIn("_busy_work", f.read())
+            
+            with profiler.profile("ask", force="sampling") as run:
+                self._busy_work()
+            with open(run.profile_path) as f:
+                self.assertIn("_busy_work", f.read())
+            with open(run.summary_path) as f:
+                self.assertIn("self %", f.read())
+            
+            with profiler.profile("ask") as unsampled:
+                pass
+            self.assertIsNone(unsampled)
+            self.assertEqual(len(os.listdir(tmp)), 4)
+            
+            sampled = RequestProfiler("sampling", sample_rate=0.0, output_dir=tmp)
+            with sampled.profile("ask") as run:
+                pass
+            self.assertIsNone(run)
+
+
+class TestQueryServer(unittest.TestCase):
+    """Test the resident query server and its thin client"""
+    
+    def setUp(self):
+        from src.services.query_server import QueryServer, QueryClient
+        self.search_service = Mock()
+        self.search_service.semantic_search.return_value = [
+            {"score": 0.9, "company": "JSW", "text": "Water target"}
+        ]
+        self.qa_service = Mock()
+        self.qa_service.ask_question.return_value = ([], "Answer")
+        self.queue = Mock()
+        self.queue.submit.return_value = "job1"
+        self.queue.get_status.side_effect = lambda job_id: {"status": "queued"} if job_id == "job1" else None
+        self.queue.pending_count.return_value = 1
+        
+        self.server = QueryServer("127.0.0.1", 0, self.search_service, self.qa_service, self.queue)
+        self.server.start()
+        self.client = QueryClient(self.server.url, timeout=5)
+    
+    def tearDown(self):
+        self.server.shutdown()
+    
+    def test_search_and_ask(self):
+        """Test that requests reach the shared services"""
+        results = self.client.search("water", top_k=2, company="JSW")
+        sources, answer = self.client.ask("water?", companies=["A", "B"])
+        
+        self.assertEqual(results[0]["company"], "JSW")
+        self.search_service.semantic_search.assert_called_once_with("water", top_k=2, company_name="JSW")
+        self.assertEqual((sources, answer), ([], "Answer"))
+        self.assertEqual(self.qa_service.ask_question.call_args.kwargs["company_names"], ["A", "B"])
+    
+    def test_ingest_jobs_and_errors(self):
+        """Test ingestion, job status and error responses"""
+        from src.services.query_server import QueryServerError
+        
+        self.assertEqual(self.client.ingest("data/pdfs/JSW.pdf"), "job1")
+        self.assertEqual(self.client.job_status("job1"), {"status": "queued"})
+        self.assertEqual(self.client.health()["pending_jobs"], 1)
+        with self.assertRaises(QueryServerError):
+            self.client.job_status("missing")
+        with self.assertRaises(QueryServerError):
+            self.client.search("   ")
+    
+    def test_busy_service_returns_503(self):
+        """Test that shed requests are reported as busy with Retry-After"""
+        import json
+        import urllib.error
+        import urllib.request
+        from src.services.admission import ServiceBusyError
+        self.search_service.semantic_search.side_effect = ServiceBusyError("encoder", "Service busy")
+        
+        request = urllib.request.Request(self.server.url + "/search", data=b'{"query": "water"}',
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(request, timeout=5)
+        self.assertEqual(raised.exception.code, 503)
+        self.assertEqual(raised.exception.headers["Retry-After"], "1")
+        self.assertTrue(json.loads(raised.exception.read())["busy"])
+        self.assertIn("encoder", self.client.health()["admission"])
+    
+    def test_errors_are_not_reported_as_busy(self):
+        """Test that only overload is a 503 and malformed requests are a 400"""
+        import urllib.error
+        import urllib.request
+        from src.config.settings import QUERY_SERVER_MAX_TOP_K
+        from src.services.ingestion_queue import IngestionQueueFullError
+        from src.services.query_server import QueryServerError
+        
+        def post(body):
+            request = urllib.request.Request(self.server.url + "/search", data=body, method="POST",
+                                             headers={"Content-Type": "application/json"})
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(request, timeout=5)
+            return raised.exception.code
+        
+        self.assertEqual(post(b"[]"), 400)
+        self.assertEqual(post(b'{"query": "water", "companies": ["JSW"]}'), 400)
+        self.client.search("water", top_k=10 ** 6)
+        self.assertEqual(self.search_service.semantic_search.call_args.kwargs["top_k"],
+                         QUERY_SERVER_MAX_TOP_K)
+        
+        self.search_service.semantic_search.side_effect = RuntimeError("index corrupt")
+        self.assertEqual(post(b'{"query": "water"}'), 500)
+        self.queue.submit.side_effect = IngestionQueueFullError("Ingestion queue is full")
+        with self.assertRaises(QueryServerError) as raised:
+            self.client.ingest("data/pdfs/JSW.pdf")
+        self.assertTrue(raised.exception.busy)
+    
+    def test_cross_site_requests_are_rejected(self):
+        """Test that non-JSON bodies and foreign Host headers are refused"""
+        import urllib.error
+        import urllib.request
+        self.qa_service.ask_question.return_value = ([{"source": "esg_facts"}], "Scope 1: 10 tCO2e")
+        
+        def status(headers):
+            request = urllib.request.Request(self.server.url + "/ask", data=b'{"query": "water"}',
+                                             headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=5):
+                    return 200
+            except urllib.error.HTTPError as e:
+                return e.code
+        
+        self.assertEqual(status({"Content-Type": "text/plain"}), 415)
+        self.assertEqual(status({"Content-Type": "application/json", "Host": "evil.example:8765"}), 403)
+        self.assertEqual(status({"Content-Type": "application/json; charset=utf-8"}), 200)
+        self.qa_service.ask_question.assert_called_once()
+        self.assertTrue(self.server.ask({"query": "scope 1?"})["routed"])
+    
+    def test_unreachable_server(self):
+        """Test that a stopped server raises QueryServerError"""
+        from src.services.query_server import QueryClient, QueryServerError
+        url = self.server.url
+        self.server.shutdown()
+        self.server.shutdown = lambda: None
+        with self.assertRaises(QueryServerError):
+            QueryClient(url, timeout=1).health()
+
+
+class TestBatchQA(unittest.TestCase):
+    """Test concurrent batch question answering with checkpointing"""
+    
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp.name, "questions.jsonl")
+        self.output_path = os.path.join(self.tmp.name, "answers.jsonl")
+        with open(self.input_path, "w") as f:
+            f.write('{"id": "q1", "question": "Water target?", "company": "JSW"}\n')
+            f.write('"Emission goals?"\n')
+            f.write('{"id": "q3", "question": "Compare waste", "companies": ["A", "B"]}\n')
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _read_output(self):
+        import json
+        with open(self.output_path) as f:
+            return {record["id"]: record for record in map(json.loads, f)}
+    
+    def test_answers_stream_to_output(self):
+        """Test that every question is answered with its company filters"""
+        from src.services.batch_qa import BatchQARunner
+        ask = Mock(return_value=([{"score": 0.9, "company": "JSW", "text": "t", "id": "x"}], "A"))
+        
+        summary = BatchQARunner(ask, max_workers=2, retries=0).run(self.input_path, self.output_path)
+        records = self._read_output()
+        
+        self.assertEqual((summary["answered"], summary["failed"]), (3, 0))
+        self.assertEqual(set(records), {"q1", "line-2", "q3"})
+        self.assertEqual(records["q1"]["sources"], [{"company": "JSW", "score": 0.9, "text": "t"}])
+        ask.assert_any_call("Compare waste", None, ["A", "B"])
+        ask.assert_any_call("Water target?", "JSW", None)
+    
+    def test_resume_skips_completed_questions(self):
+        """Test that a rerun only retries failed and missing questions"""
+        from src.services.batch_qa import BatchQARunner
+        with open(self.output_path, "w") as f:
+            f.write('{"id": "q1", "status": "ok", "answer": "done"}\n')
+            f.write('{"id": "q3", "status": "error", "error": "quota"}\n')
+            f.write('{"id": "line-2", "sta')  # cut off by an interrupted run
+        ask = Mock(return_value=([], "A"))
+        
+        summary = BatchQARunner(ask, retries=0).run(self.input_path, self.output_path)
+        
+        self.assertEqual((summary["skipped"], summary["answered"]), (1, 2))
+        self.assertEqual(ask.call_count, 2)
+        self.assertEqual(self._read_output()["q3"]["status"], "ok")
+    
+    def test_failures_are_recorded(self):
+        """Test that a failing question does not stop the batch"""
+        from src.services.batch_qa import BatchQARunner
+        def ask(question, company, companies):
+            if question == "Emission goals?":
+                raise RuntimeError("quota")
+            return [], "A"
+        
+        summary = BatchQARunner(ask, retries=0).run(self.input_path, self.output_path)
+        
+        self.assertEqual((summary["answered"], summary["failed"]), (2, 1))
+        self.assertEqual(self._read_output()["line-2"]["error"], "RuntimeError: quota")
+    
+    def test_busy_answers_are_retried(self):
+        """Test that retrieval-only answers are not recorded as done"""
+        from src.services.admission import RETRIEVAL_ONLY_ANSWER
+        from src.services.batch_qa import BatchQARunner, load_checkpoint
+        ask = Mock(side_effect=[([], RETRIEVAL_ONLY_ANSWER), ([], "A")])
+        
+        with patch('src.services.batch_qa.time.sleep'):
+            record = BatchQARunner(ask, retries=1)._answer(
+                {"id": "q", "question": "Q", "company": None, "companies": None})
+        self.assertEqual((record["status"], record["answer"]), ("ok", "A"))
+        self.assertNotIn("error", record)
+        
+        ask = Mock(return_value=([], RETRIEVAL_ONLY_ANSWER))
+        BatchQARunner(ask, retries=0).run(self.input_path, self.output_path)
+        self.assertEqual(load_checkpoint(self.output_path), set())
 
 
 class TestSearchService(unittest.TestCase):
@@ -172,6 +1513,199 @@ class TestSearchService(unittest.TestCase):
         # This is a simplified test - in reality you'd test the actual embedding
         embedding = mock_model.encode("test query")
         self.assertEqual(len(embedding), 1024)
+    
+    def _cached_service(self):
+        import tempfile
+        from src.services.ingestion_manifest import IngestionManifest
+        from src.services.search_service import SearchService
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        manifest = IngestionManifest(os.path.join(self.tmp.name, "manifest.json"))
+        manifest.record_ingestion("A", 3)
+        manifest.record_ingestion("B", 3)
+        local_store = Mock()
+        local_store.query.side_effect = lambda vector, top_k, company: [{"company": company, "text": "t"}]
+        service = SearchService(local_store=local_store, manifest=manifest)
+        service.model = Mock()
+        return service, manifest
+    
+    def test_results_cached_until_company_changes(self):
+        """Test that repeated searches skip the encoder until the company is re-ingested"""
+        service, manifest = self._cached_service()
+        
+        service.semantic_search("Water  targets?", company_name="A")
+        service.semantic_search("water targets?", company_name="A")
+        manifest.record_ingestion("B", 5)
+        service.semantic_search("water targets?", company_name="A")
+        self.assertEqual(service.model.encode.call_count, 1)
+        
+        manifest.record_ingestion("A", 4)
+        service.semantic_search("water targets?", company_name="A")
+        self.assertEqual(service.model.encode.call_count, 2)
+        
+        service.multi_company_search("water targets?", ["A", "B"], top_k=TOP_K)
+        self.assertEqual(service.local_store.query.call_args.args[2], "B")
+        self.assertEqual(service.cache.stats()["hits"], 3)
+    
+    def test_comparison_keeps_results_when_one_company_is_busy(self):
+        """Test that a shed company is flagged instead of failing the comparison"""
+        from src.services.admission import ServiceBusyError
+        service, _ = self._cached_service()
+        
+        def query(vector, top_k, company):
+            if company in ("B", "C"):
+                raise ServiceBusyError("vector_query", "Service busy")
+            return [{"company": company, "text": "t"}]
+        
+        service.local_store.query.side_effect = query
+        results = service.multi_company_search("water?", ["A", "B"])
+        self.assertEqual([r["company"] for r in results], ["A"])
+        self.assertEqual(results.busy_companies, ["B"])
+        executor = service._executor
+        service.multi_company_search("energy?", ["A", "B"])
+        self.assertIs(service._executor, executor)
+        with self.assertRaises(ServiceBusyError):
+            service.multi_company_search("waste?", ["B", "C"])
+    
+    def test_neighbors_expand_hits_by_id(self):
+        """Test that hits are widened with adjacent chunks fetched by id"""
+        from src.services.document_processor import DocumentProcessor
+        processor = DocumentProcessor()
+        processor.deduplicate = False
+        records = processor.prepare_chunk_records(["x" * 40, "y" * 40, "z" * 40],
+                                                  chunk_size=30, overlap=10)
+        stored = {f"A_{r['chunk']}": dict(r, id=f"A_{r['chunk']}", company="A") for r in records}
+        
+        service, _ = self._cached_service()
+        service.local_store.query.side_effect = lambda vector, top_k, company: [
+            dict(stored["A_2"], score=0.9), dict(stored["A_4"], score=0.8)
+        ]
+        service.local_store.get.side_effect = lambda ids: {i: stored[i] for i in ids if i in stored}
+        results = service.semantic_search("q", company_name="A", window=1)
+        
+        text = "".join(page + "\n" for page in ("x" * 40, "y" * 40, "z" * 40))
+        self.assertEqual(sorted(service.local_store.get.call_args.args[0]), ["A_1", "A_3", "A_5"])
+        # A_3 is merged into the better hit only
+        self.assertEqual(results[0]["text"], text[stored["A_1"]["char_start"]:stored["A_3"]["char_end"]])
+        self.assertEqual(results[1]["text"], text[stored["A_4"]["char_start"]:stored["A_5"]["char_end"]])
+        self.assertEqual((results[0]["page"], results[0]["page_end"]), (1, 3))
+        self.assertEqual(service.semantic_search("q", company_name="A", window=0)[0]["text"],
+                         stored["A_2"]["text"])
+    
+    def test_cache_evicts_least_recently_used(self):
+        """Test LRU eviction and stamp validation"""
+        from src.services.search_cache import SearchResultCache
+        cache = SearchResultCache(max_entries=2)
+        cache.put("a", 1, [{"text": "a"}])
+        cache.put("b", 1, [{"text": "b"}])
+        cache.get("a", 1)
+        cache.put("c", 1, [{"text": "c"}])
+        
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.get("a", 1), [{"text": "a"}])
+        self.assertIsNone(cache.get("a", 2))
+        self.assertEqual(cache.stats()["evictions"], 1)
+    
+    def test_multi_company_results_are_balanced(self):
+        """Test that per-company results are interleaved round-robin"""
+        from src.services.search_service import search_concurrently, merge_balanced
+        
+        results = {
+            "A": [{"company": "A", "text": "a1"}, {"company": "A", "text": "a2"}],
+            "B": [{"company": "B", "text": "b1"}],
+            "C": []
+        }
+        by_company = search_concurrently(lambda company: results[company], ["A", "B", "C", "A"])
+        
+        self.assertEqual(list(by_company), ["A", "B", "C"])
+        self.assertEqual([r["text"] for r in merge_balanced(by_company)], ["a1", "b1", "a2"])
+
+
+class TestAdmissionControl(unittest.TestCase):
+    """Test bounded stage concurrency and load shedding"""
+    
+    def test_full_queue_fails_fast_and_timeout_rejects(self):
+        """Test that callers beyond the wait queue are rejected immediately"""
+        import threading
+        import time
+        from src.services.admission import ServiceBusyError, StageLimiter
+        limiter = StageLimiter("encoder", max_concurrent=1, max_queue=1, max_wait=0.2)
+        
+        limiter.acquire()
+        waiter_error = []
+        def wait():
+            try:
+                limiter.acquire()
+            except ServiceBusyError as e:
+                waiter_error.append(e)
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        while limiter.stats()["waiting"] == 0:
+            time.sleep(0.005)
+        
+        start = time.perf_counter()
+        with self.assertRaises(ServiceBusyError):
+            limiter.acquire()
+        self.assertLess(time.perf_counter() - start, 0.1)
+        waiter.join()
+        
+        self.assertEqual(waiter_error[0].stage, "encoder")
+        limiter.release()
+        with limiter.slot():
+            self.assertEqual(limiter.stats()["active"], 1)
+        stats = limiter.stats()
+        self.assertEqual((stats["active"], stats["admitted"], stats["rejected"]), (0, 2, 2))
+    
+    def test_busy_llm_degrades_to_retrieval_only(self):
+        """Test that a saturated LLM stage returns the sources without an answer"""
+        from src.services.admission import (
+            RETRIEVAL_ONLY_ANSWER, AdmissionController, ServiceBusyError
+        )
+        from src.services.qa_service import QAService
+        admission = AdmissionController({"llm": 0}, max_queue=0)
+        search_service = Mock()
+        search_service.semantic_search.return_value = [{"company": "A", "text": "t", "score": 1.0}]
+        qa_service = QAService(admission=admission)
+        qa_service.client = Mock()
+        
+        sources, answer = qa_service.ask_question("q", search_service)
+        self.assertEqual((len(sources), answer), (1, RETRIEVAL_ONLY_ANSWER))
+        qa_service.client.models.generate_content.assert_not_called()
+        
+        qa_service.retrieval_only_when_busy = False
+        with self.assertRaises(ServiceBusyError):
+            qa_service.ask_question("q", search_service)
+
+
+class TestLoadTest(unittest.TestCase):
+    """Test the concurrent-user load generator"""
+    
+    def test_report_counts_outcomes_and_stage_percentiles(self):
+        """Test outcomes, percentiles and open-loop request counts"""
+        from src.services.admission import ServiceBusyError
+        from src.services.load_test import LoadGenerator, ResourceSampler, percentile
+        
+        def ask(question):
+            if question["id"] == "busy":
+                raise ServiceBusyError("llm", "Service busy")
+            if question["id"] == "bad":
+                raise KeyError("x")
+            return {"search": 0.001, "degraded": question["id"] == "slow"}
+        questions = [{"id": name, "question": name} for name in ("ok", "slow", "busy", "bad")]
+        generator = LoadGenerator(ask, questions, concurrency=3, sampler=ResourceSampler(interval=0.01))
+        report = generator.run(requests=8)
+        
+        self.assertEqual([report[k] for k in ("requests", "ok", "degraded", "busy", "error")],
+                         [8, 2, 2, 2, 2])
+        self.assertEqual(report["error_rate"], 0.5)
+        self.assertEqual(report["errors_by_type"], {"ServiceBusyError": 2, "KeyError": 2})
+        self.assertEqual(report["latency_ms"]["search"]["count"], 4)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        
+        open_loop = LoadGenerator(ask, questions[:1], rate=200, poisson=False,
+                                  sampler=ResourceSampler(interval=0.01))
+        self.assertEqual(open_loop.run(requests=10)["ok"], 10)
 
 
 class TestQAService(unittest.TestCase):
@@ -214,6 +1748,247 @@ class TestQAService(unittest.TestCase):
             
             # Verify generate_content was called
             mock_client.return_value.models.generate_content.assert_called_once()
+    
+    def test_comparison_uses_per_company_sections(self):
+        """Test that comparison questions search each company and group the context"""
+        from src.services.qa_service import QAService
+        
+        with patch('src.services.qa_service.genai.Client') as mock_client:
+            mock_client.return_value.models.generate_content.return_value = Mock(text="Answer")
+            search_service = Mock()
+            search_service.multi_company_search.return_value = [
+                {"company": "JSW", "text": "Water target A", "score": 0.9},
+                {"company": "Adani", "text": "Water target B", "score": 0.8}
+            ]
+            
+            chunks, answer = QAService().ask_question(
+                "Compare water targets", search_service, company_names=["Adani", "JSW", "NTPC"]
+            )
+            
+            search_service.multi_company_search.assert_called_once_with(
+                "Compare water targets", ["Adani", "JSW", "NTPC"]
+            )
+            search_service.semantic_search.assert_not_called()
+            prompt = mock_client.return_value.models.generate_content.call_args.kwargs["contents"]
+            self.assertLess(prompt.index("=== Adani ==="), prompt.index("=== JSW ==="))
+            self.assertIn("=== NTPC ===\n\nNo sources found for this company.", prompt)
+            self.assertEqual(answer, "Answer")
+
+
+class TestStructuredQueryRouter(unittest.TestCase):
+    """Test structured ESG question routing"""
+    
+    @classmethod
+    def setUpClass(cls):
+        from src.services.structured_query import StructuredQueryRouter
+        cls.router = StructuredQueryRouter()
+    
+    def test_company_score_lookup(self):
+        """Test that a company score question is answered from the table"""
+        sources, answer = self.router.route("What is Adani Ports' ESG risk score?")
+        
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(sources[0]["company"], "Adani Ports and Special Economic Zone Ltd.")
+        self.assertIn("12.6", answer)
+    
+    def test_sector_controversy_filter(self):
+        """Test sector + level filtering for ranking questions"""
+        sources, answer = self.router.route("Which energy companies have high controversy?")
+        
+        companies = [s["company"] for s in sources]
+        self.assertEqual(companies, ["Adani Enterprises Ltd."])
+    
+    def test_ranking_with_limit(self):
+        """Test ascending ranking with an explicit limit"""
+        sources, _ = self.router.route("Top 3 companies with the lowest ESG risk score")
+        
+        self.assertEqual(len(sources), 3)
+        self.assertEqual(sources[0]["company"], "Tata Consultancy Services Ltd.")
+    
+    def test_selected_company_used_as_context(self):
+        """Test that the selected company is used when the question names none"""
+        sources, answer = self.router.route("What is the ESG risk level?",
+                                            company_name="Infosys Ltd.")
+        self.assertEqual(sources[0]["company"], "Infosys Ltd.")
+        self.assertIn("Low", answer)
+    
+    def test_document_questions_fall_back(self):
+        """Test that questions needing document text are not routed"""
+        self.assertIsNone(self.router.route("How does Infosys reduce its emissions?"))
+        self.assertIsNone(self.router.route("What are the water conservation targets?"))
+    
+    def test_practice_questions_fall_back(self):
+        """Test that questions about what a company does are answered from its report"""
+        self.assertIsNone(self.router.route("What does Infosys do about carbon exposure?"))
+        self.assertIsNone(self.router.route("What is Infosys doing on emissions?"))
+        self.assertIsNone(self.router.route("Infosys's approach to climate risk exposure"))
+        self.assertIsNotNone(self.router.route("What is the risk exposure of Infosys?"))
+    
+    def test_comparisons_and_unlisted_companies_fall_back(self):
+        """Test that answers never silently drop a company the question names"""
+        self.assertIsNone(self.router.route("Compare Adani Ports and JSW Energy ESG risk score"))
+        self.assertIsNone(self.router.route("ESG risk of Reliance compared to others in oil"))
+        self.assertIsNone(self.router.route("What is JSW Energy's ESG risk score?"))
+        self.assertEqual(self.router.table.find_companies("Does the company use any coal?"), [])
+        self.assertEqual(self.router.table.find_companies("Coal India risk score")[0]["symbol"],
+                         "COALINDIA")
+    
+    def test_sector_lists_are_matched_and_limited(self):
+        """Test that list answers use abbreviated sectors and the ranking limit"""
+        from src.config.settings import STRUCTURED_RANKING_LIMIT
+        sources, answer = self.router.route("Show me ESG risk scores of IT companies")
+        
+        self.assertTrue(answer.startswith("Information Technology companies ranked"))
+        self.assertLessEqual(len(sources), STRUCTURED_RANKING_LIMIT)
+        row = dict(self.router.table.rows[0], predicted_esg_score=None, controversy_score=None)
+        self.assertIn("n/a", self.router._row_to_source(row, "controversy")["text"])
+    
+    def test_prefix_alias_not_matched_for_other_company(self):
+        """Test that a shared name prefix followed by another name word is not an alias"""
+        table = self.router.table
+        self.assertEqual([r["symbol"] for r in table.find_companies("JSW risk score")], ["JSWSTEEL"])
+        self.assertEqual(table.find_companies("ESG score of JSW Energy"), [])
+    
+    def test_ask_question_skips_search(self):
+        """Test that QAService answers routed questions without search or LLM"""
+        from src.services.qa_service import QAService
+        
+        with patch('src.services.qa_service.genai.Client') as mock_client:
+            qa_service = QAService(query_router=self.router)
+            search_service = Mock()
+            
+            top_chunks, answer = qa_service.ask_question(
+                "What is the ESG risk score of Wipro?", search_service
+            )
+            
+            self.assertIn("13.2", answer)
+            search_service.semantic_search.assert_not_called()
+            mock_client.return_value.models.generate_content.assert_not_called()
+
+
+class TestCompanyCatalog(unittest.TestCase):
+    """Test the cached company catalog"""
+    
+    def setUp(self):
+        import tempfile
+        from src.services.ingestion_manifest import IngestionManifest
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_dir = os.path.join(self.tmp_dir.name, "pdfs")
+        os.makedirs(self.pdf_dir)
+        self.manifest_path = os.path.join(self.tmp_dir.name, "manifest.json")
+        self.manifest = IngestionManifest(self.manifest_path)
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def _catalog(self):
+        from src.services.company_catalog import CompanyCatalog
+        return CompanyCatalog(manifest=self.manifest, data_folder=self.pdf_dir)
+    
+    def test_ingestion_event_invalidates_cache(self):
+        """Test that recorded ingestions show up with chunk counts"""
+        catalog = self._catalog()
+        self.assertEqual(catalog.get_companies(), ["General"])
+        
+        self.manifest.record_ingestion("Infosys", 42, source="Infosys.pdf")
+        
+        self.assertIn("Infosys", catalog.get_companies())
+        self.assertEqual(catalog.get_chunk_count("Infosys"), 42)
+        self.assertEqual(catalog.get_entries()["Infosys"]["symbol"], "INFY")
+    
+    def test_cache_reused_until_folder_changes(self):
+        """Test that the catalog is only rebuilt when the data folder changes"""
+        catalog = self._catalog()
+        with patch.object(catalog, "_build", wraps=catalog._build) as build:
+            catalog.get_companies()
+            catalog.get_companies()
+            self.assertEqual(build.call_count, 1)
+            
+            open(os.path.join(self.pdf_dir, "Wipro.pdf"), "wb").close()
+            os.utime(self.pdf_dir, ns=(0, 1))
+            
+            self.assertIn("Wipro", catalog.get_companies())
+            self.assertEqual(build.call_count, 2)
+    
+    def test_manifest_persists(self):
+        """Test that the manifest is shared through its file"""
+        from src.services.ingestion_manifest import IngestionManifest
+        self.manifest.record_ingestion("Wipro", 7)
+        
+        reloaded = IngestionManifest(self.manifest_path)
+        self.assertEqual(reloaded.get_company("Wipro")["chunks"], 7)
+        self.assertEqual(reloaded.version, self.manifest.version)
+    
+    def test_concurrent_writers_keep_every_entry(self):
+        """Test that two manifests on one file (two processes) never lose entries"""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.services.ingestion_manifest import IngestionManifest
+        other = IngestionManifest(self.manifest_path)
+        
+        def record(i):
+            (self.manifest if i % 2 else other).record_ingestion(f"Company{i}", i + 1)
+        
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(record, range(40)))
+        
+        companies = IngestionManifest(self.manifest_path).get_companies()
+        self.assertEqual(len(companies), 40)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["manifest.json", "manifest.json.lock", "pdfs"])
+    
+    def test_esg_only_companies_hidden_by_default(self):
+        """Test that ESG-table-only companies are opt-in"""
+        catalog = self._catalog()
+        self.assertNotIn("Wipro Ltd.", catalog.get_companies())
+        self.assertIn("Wipro Ltd.", catalog.get_companies(include_esg_only=True))
+
+
+class TestCompanyRouter(unittest.TestCase):
+    """Test automatic company filters for General searches"""
+    
+    def setUp(self):
+        import tempfile
+        import numpy as np
+        from src.services.company_router import CompanyRouter
+        from src.services.ingestion_manifest import IngestionManifest
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        manifest = IngestionManifest(os.path.join(self.tmp_dir.name, "manifest.json"))
+        for company in ("Infosys", "Wipro", "JSW_Energy", "Coal India", "Sun_Pharma"):
+            manifest.record_ingestion(company, 5)
+        # One axis per table row, so a row's own axis is its description
+        self.encode = Mock(side_effect=lambda texts: np.eye(len(texts)))
+        self.router = CompanyRouter(self.encode, "test-model", manifest=manifest,
+                                    cache_dir=self.tmp_dir.name)
+        self.rows = [row["company"] for row in self.router.table.rows]
+        self.axis = lambda company: np.eye(len(self.rows))[self.rows.index(company)]
+    
+    def test_routes_named_companies(self):
+        """Test name routing, including stored reports missing from the ESG table"""
+        self.assertEqual(self.router.route("What does Infosys say about water?"), "Infosys")
+        self.assertEqual(self.router.route("JSW Energy renewable capacity"), "JSW_Energy")
+        self.assertIsNone(self.router.route("Compare Infosys and Wipro on emissions"))
+        self.assertIsNone(self.router.route("Which companies have the lowest emissions?"))
+        self.assertIsNone(self.router.route("Scope 1 emissions of Tata Steel"))  # Not stored
+        self.encode.assert_not_called()
+    
+    def test_everyday_words_do_not_route(self):
+        """Test that one-word aliases that are ordinary words do not filter searches"""
+        coal_india = self.axis("Coal India Ltd.")  # Even a perfect description match
+        for question in ("Does the company use any coal?", "Is power generation from coal declining?",
+                         "What is the sun's role in solar energy adoption?"):
+            self.assertIsNone(self.router.route(question, coal_india), question)
+        self.assertEqual(self.router.route("Coal India water use"), "Coal India")
+        self.assertEqual(self.router.route("Sun Pharma emissions"), "Sun_Pharma")
+        self.encode.assert_not_called()
+    
+    def test_routes_by_description_when_confident(self):
+        """Test that only a clear description match routes, with cached embeddings"""
+        wipro, infosys = self.axis("Wipro Ltd."), self.axis("Infosys Ltd.")
+        
+        self.assertEqual(self.router.route("IT services water use", wipro), "Wipro")
+        self.assertIsNone(self.router.route("IT services water use", wipro + infosys))
+        self.assertEqual(self.encode.call_count, 1)
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 3)  # Manifest, its lock file and embeddings
 
 
 class TestConfigSettings(unittest.TestCase):